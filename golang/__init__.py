@@ -21,8 +21,12 @@
 
 - `go` spawns lightweight thread.
 - `chan` and `select` provide channels with Go semantic.
+- `Selector` is select with cases prepared once for repeated use.
+- `Poller` watches many channels for readiness to receive.
+- `aselect` and `chan.arecv`/`chan.asend` integrate channels with asyncio.
 - `func` allows to define methods separate from class.
 - `defer` allows to schedule a cleanup from the main control flow.
+- `deferring` provides defer scope for a `with` block without `func`.
 - `error` and package `errors` provide error chaining.
 - `b`, `u`, `bstr`/`ustr` and `biter`/`uiter` provide uniform UTF8-based approach to strings.
 - `gimport` allows to import python modules by full path in a Go workspace.
@@ -35,19 +39,19 @@ from __future__ import print_function, absolute_import
 
 __version__ = "0.1"
 
-__all__ = ['go', 'chan', 'select', 'default', 'nilchan', 'defer', 'panic',
-           'recover', 'func', 'error', 'b', 'u', 'bstr', 'ustr', 'biter', 'uiter', 'bbyte', 'uchr',
+__all__ = ['go', 'chan', 'select', 'aselect', 'Selector', 'Poller', 'default', 'nilchan', 'defer', 'panic',
+           'recover', 'deferring', 'func', 'error', 'b', 'u', 'bstr', 'ustr', 'biter', 'uiter', 'bbyte', 'uchr',
            'gimport']
 
 import setuptools_dso
 setuptools_dso.dylink_prepare_dso('golang.runtime.libgolang')
 
 from golang._gopath import gimport  # make gimport available from golang
-import inspect, sys
-import decorator, six
+import inspect, sys, functools
+import six
 
 from golang._golang import \
-    _pysys_exc_clear    as _sys_exc_clear,  \
+    _goframe,                               \
     _pyframe_dellocal   as _frame_dellocal
 
 
@@ -153,7 +157,7 @@ def _func(f):
     # if f was already wrapped with _func - no need to wrap it again
     _ = f
     if getattr(f, '__go_wrapper__', None) is not _goframe:
-        _ = decorator.decorate(f, _goframe)
+        _ = _gowrap(f)
         _.__go_wrapper__ = _goframe
 
     # repack _ into e.g. @staticmethod if that was used on f.
@@ -162,132 +166,26 @@ def _func(f):
 
     return _
 
-# _goframe is used by @func to run f under separate frame.
-def _goframe(f, *argv, **kw):
-    __goframe__ = _GoFrame()
-    with __goframe__:
-        return f(*argv, **kw)
-
-# _GoFrame serves __goframe__ that is setup by _goframe.
-class _GoFrame:
-    def __init__(self):
-        self.deferv    = []     # defer registers funcs here
-        self.recovered = False  # whether exception, if there was any, was recovered
-
-        # py2: to-be next exception in exception chain (PEP 3134)
-        if six.PY2:
-            self.exc_ctx    = None  # exception context to chain new exception into
-            self.exc_ctx_tb = None  # exc_tb we got when catching .exc_ctx.
-                                    # we will set .exc_ctx.__traceback__ to this
-                                    # if/when .exc_ctx will be chained into.
-    def __enter__(self):
-        pass
-
-    # __exit__ simulates both except and finally.
-    def __exit__(__goframe__, exc_type, exc_val, exc_tb):
-        if exc_val is not None:
-            __goframe__.recovered = False
-
-        # py2: simulate exception chaining (PEP 3134)
-        if six.PY2:
-            if exc_val is not None:
-                # exc_val is current outer exception raised by e.g. earlier
-                # defers; it can be itself chained.
-                # .exc_ctx is current inner exception we saved before calling
-                # code that raised exc_val. For example:
-                #
-                #   _GoFrame.__exit__:
-                #       saves .exc_ctx      # .exc_ctx = A1
-                #       with __goframe__:
-                #           call other defer from .deferv
-                #       __exit__(exc_val):  # exc_val = B3 (-> linked to B2 -> B1)
-                #
-                # the order in which exceptions were raised is: A1 B1 B2 B3
-                # thus A1 is the context of B1, or in other words, .exc_ctx
-                # should be linked to from tail of exc_val exception chain.
-                exc_tail = exc_val
-                while 1:
-                    _ = getattr(exc_tail, '__context__', None)
-                    if _ is None:
-                        break
-                    exc_tail = _
-                exc_tail.__context__ = __goframe__.exc_ctx
-
-                # make sure .__cause__ and .__suppress_context__ are always present
-                if not hasattr(exc_val, '__cause__'):
-                    exc_val.__cause__     = None
-                if not hasattr(exc_val, '__suppress_context__'):
-                    exc_val.__suppress_context__ = False
-
-                # set .__traceback__ only for chained-to exceptions. top-level
-                # raised exception must remain without __traceback__, because
-                # if it was not yet caught, setting __traceback__ here early
-                # will be wrong compared to what sys.exc_info() returns in
-                # caller except block.
-                if __goframe__.exc_ctx is not None:
-                    __goframe__.exc_ctx.__traceback__ = __goframe__.exc_ctx_tb
-                __goframe__.exc_ctx    = exc_val
-                __goframe__.exc_ctx_tb = exc_tb
-
-        if len(__goframe__.deferv) != 0:
-            d = __goframe__.deferv.pop()
-
-            # even if d panics - we have to call other defers
-            with __goframe__:
-                d()
-
-        return __goframe__.recovered
-
-# recover checks whether there is exception/panic currently being raised and returns it.
+# _gowrap returns function that calls f via _goframe.
 #
-# If it was panic - it returns the argument that was passed to panic.
-# If there is other exception - it returns the exception object.
+# The wrapper has f's __name__, __doc__, __module__, etc, and __wrapped__ = f,
+# so that inspect.signature reports signature of f.
 #
-# If there is no exception/panic, or the panic argument was None - recover returns None.
-# Recover also returns None if it was not called by a deferred function directly.
-def recover():
-    fcall = inspect.currentframe().f_back   # caller's frame (deferred func)
-    fgo   = fcall.f_back                    # caller's parent frame defined by _GoFrame.__exit__
-    try:
-        goframe = fgo.f_locals['__goframe__']
-    except KeyError:
-        # called not under go func/defer
-        return None
-
-    _, exc, exc_tb = sys.exc_info()
-    if exc is not None:
-        goframe.recovered = True
-        # recovered: clear current exception context
-        _sys_exc_clear()
-        if six.PY2:
-            goframe.exc_ctx    = None
-            goframe.exc_ctx_tb = None
-
-            # the exception is caught. Now is the correct time to set its .__traceback__
-            #
-            # we don't need to set .__context__ and the like here - _GoFrame.__exit__
-            # makes sure to add those attributes to any exception recover might catch -
-            # because hereby part of recover is always run under defer.
-            exc.__traceback__ = exc_tb
-
-    if type(exc) is _PanicError:
-        exc = exc.args[0]
-    return exc
-
-# defer registers f to be called when caller function exits.
-#
-# It is similar to try/finally but does not force the cleanup part to be far
-# away in the end.
-def defer(f):
-    fcall = inspect.currentframe().f_back   # caller's frame
-    fgo   = fcall.f_back                    # caller's parent frame defined by @func
-    try:
-        goframe = fgo.f_locals['__goframe__']
-    except KeyError:
-        panic("function %s uses defer, but not @func" % fcall.f_code.co_name)
-
-    goframe.deferv.append(f)
-
+# Contrary to decorator.decorate, it neither generates code nor computes f's
+# signature at decoration time, and does not check the arguments against
+# that signature on every call: there are usually many @func functions and
+# methods defined at import time, while their signatures are rarely asked for.
+if six.PY3:
+    def _gowrap(f):
+        def _gowrapper(*argv, **kw):
+            return _goframe(f, *argv, **kw)
+        return functools.update_wrapper(_gowrapper, f)
+else:
+    # py2: inspect.getargspec does not take __wrapped__ into account.
+    # -> use decorator to create wrapper with exactly the same signature as f.
+    import decorator
+    def _gowrap(f):
+        return decorator.decorate(f, _goframe)
 
 # py2: defer simulates exception chaining. Adjust traceback.print_exception()
 # and default sys.excepthook so that, out of the box, dump of chained exceptions
@@ -367,10 +265,16 @@ from ._golang import    \
     pygo        as go,      \
     pychan      as chan,    \
     pyselect    as select,  \
+    pyaselect   as aselect, \
+    PySelector  as Selector, \
+    PyPoller    as Poller,  \
     pydefault   as default, \
     pynilchan   as nilchan, \
     _PanicError,            \
     pypanic     as panic,   \
+    pydefer     as defer,   \
+    pyrecover   as recover, \
+    pydeferring as deferring, \
     pyerror     as error,   \
     pyb         as b,       \
     pybstr      as bstr,    \
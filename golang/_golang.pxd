@@ -25,6 +25,7 @@ Cython/nogil API
 
 - `go` spawns lightweight thread.
 - `chan[T]`, `makechan[T]` and `select` provide C-level channels with Go semantic.
+- `Poller` watches many channels for readiness to receive.
 - `error` is the interface that represents errors.
 - `panic` stops normal execution of current goroutine by throwing a C-level exception.
 
@@ -84,6 +85,12 @@ cdef extern from "golang/libgolang.h" namespace "golang" nogil:
         pair[T, cbool] recv_()              const
         void close()                        const
 
+        # non-blocking/timed send/recv
+        cbool trysend(const T&)             const
+        cbool trysend(const T&, double timeout)         const
+        cbool tryrecv_(T *prx, cbool *pok)  const
+        cbool tryrecv_(T *prx, cbool *pok, double timeout)  const
+
         # send/recv in select
         _selcase sends(const T *ptx)        const
         _selcase recvs()                    const
@@ -94,6 +101,9 @@ cdef extern from "golang/libgolang.h" namespace "golang" nogil:
         unsigned len()                      const
         unsigned cap()                      const
 
+        # readiness file descriptor
+        int fd()                            const
+
         # compare wrt nil; =nil
         cbool operator==(Nil)               const
         cbool operator!=(Nil)               const
@@ -105,9 +115,29 @@ cdef extern from "golang/libgolang.h" namespace "golang" nogil:
     chan[T] makechan[T]()
     chan[T] makechan[T](unsigned size)
 
+    # _wrapchan wraps raw channel with chan[T].
+    # raw channel must be either nil or its element size must correspond to T.
+    #
+    # it allows nogil code to access channel of pychan with record dtype, e.g.
+    # _wrapchan[S](pych._ch) for pychan(dtype='C.struct{int64,double}'), where
+    # S is struct { int64_t a; double b; }.
+    chan[T] _wrapchan[T](_chan *_ch)
+
+    # _chantimeout_ns converts timeout in seconds to nanoseconds for timed
+    # channel operations. timeout <= 0 means "don't wait".
+    uint64_t _chantimeout_ns(double timeout)
+
     struct structZ:
         pass
 
+    # Poller watches many channels for readiness to receive.
+    cppclass Poller:
+        void add[T](const chan[T]&)
+        void remove[T](const chan[T]&)
+        _chan *wait()
+        _chan *trywait()
+        _chan *trywait(double timeout)
+
     enum _chanop:
         _CHANSEND
         _CHANRECV
@@ -194,11 +224,15 @@ cdef extern from "golang/libgolang.h" namespace "golang" nogil:
 cdef void topyexc() except *
 cpdef pypanic(arg)
 
-# pychan is python wrapper over chan<object> or chan<structZ|bool|int|double|...>
+# pychan is python wrapper over chan<object> or chan<structZ|bool|int|double|record|...>
 from cython cimport final
 from golang cimport os
 
 # DType describes type of channel elements.
+#
+# Builtin dtypes are listed below. Record dtypes, e.g. C.bytes[64] or
+# C.struct{int64,double}, are registered at runtime on first use and get
+# values >= DTYPE_NTYPES.
 # TODO consider supporting NumPy dtypes too.
 cdef enum DType:
     DTYPE_PYOBJECT   = 0    # chan[object]
@@ -207,7 +241,8 @@ cdef enum DType:
     DTYPE_INT        = 3    # chan[int]
     DTYPE_DOUBLE     = 4    # chan[double]
     DTYPE_OS_SIGNAL  = 5    # chan[os::Signal]  TODO register dynamically
-    DTYPE_NTYPES     = 6
+    DTYPE_PYBUFFER   = 6    # chan[pyx::runtime::_PyBuffer*]
+    DTYPE_NTYPES     = 7
 
 # pychan wraps a channel into python object.
 #
@@ -250,6 +285,11 @@ cdef class pychan:
     @staticmethod
     cdef pychan _from_chan_osSignal (chan[os.Signal] ch)
 
+    # _send serves send, try_send and send_timeout;
+    # _recv_ serves recv, recv_, try_recv and recv_timeout.
+    cdef bint   _send (pychan pych, obj, uint64_t timeout_ns) except -1
+    cdef object _recv_(pychan pych, cbool *pok, cbool *pdone, uint64_t timeout_ns)
+
 
 # pyerror wraps an error into python object.
 #
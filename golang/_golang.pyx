@@ -36,6 +36,8 @@ _init_libgolang()
 _init_libpyxruntime()
 
 from cpython cimport PyObject, Py_INCREF, Py_DECREF, PY_MAJOR_VERSION
+from cpython.ref cimport Py_XDECREF
+from cpython cimport PyFrameObject
 ctypedef PyObject *pPyObject # https://github.com/cython/cython/issues/534
 cdef extern from "Python.h":
     ctypedef struct PyTupleObject:
@@ -43,11 +45,24 @@ cdef extern from "Python.h":
     void Py_FatalError(const char *msg)
 
 from libcpp.vector cimport vector
-from cython cimport final
+from libc.stdint cimport UINT64_MAX, int8_t, int16_t, int32_t, int64_t, \
+        uint8_t, uint16_t, uint32_t, uint64_t, uintptr_t
+from libc.stdlib cimport malloc, free
+from libc.string cimport memset, memcpy
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from cpython.bytearray cimport PyByteArray_AS_STRING
+from cpython.number cimport PyIndex_Check
+from cpython.buffer cimport PyObject_CheckBuffer, PyBUF_FULL_RO
+from cython cimport final, freelist
 
 from golang cimport os  # TODO remove after dtypes are reworked to register dynamically
+from golang.runtime.internal cimport syscall
+from golang.pyx cimport runtime
+from cpython.pythread cimport PyThread_type_lock, PyThread_allocate_lock, PyThread_free_lock, \
+        PyThread_acquire_lock, PyThread_release_lock, WAIT_LOCK
 
 import sys
+import os as pyos
 import types as pytypes
 
 # ---- panic ----
@@ -107,6 +122,240 @@ cdef extern from *:
 def _pysys_exc_clear():
     XPySys_ExcClear()
 
+
+# ---- defer/recover ----
+
+# recover checks whether there is exception/panic currently being raised and returns it.
+#
+# If it was panic - it returns the argument that was passed to panic.
+# If there is other exception - it returns the exception object.
+#
+# If there is no exception/panic, or the panic argument was None - recover returns None.
+# Recover also returns None if it was not called by a deferred function directly.
+def pyrecover():
+    cdef PyFrameObject* fcall = PyEval_GetFrame()   # caller's frame (deferred func)
+    goframe = _pydeferringof(fcall, False)  # @func or `with deferring()` that runs deferred calls in caller's parent
+    if goframe is None:
+        # called not under go func/defer
+        return None
+
+    _, exc, exc_tb = sys.exc_info()
+    if exc is not None:
+        goframe.recovered = True
+        # recovered: clear current exception context
+        XPySys_ExcClear()
+        if PY_MAJOR_VERSION < 3:
+            goframe.exc_ctx    = None
+            goframe.exc_ctx_tb = None
+
+            # the exception is caught. Now is the correct time to set its .__traceback__
+            #
+            # we don't need to set .__context__ and the like here - deferring._exit
+            # makes sure to add those attributes to any
+            # exception recover might catch - because hereby part of recover is
+            # always run under defer.
+            exc.__traceback__ = exc_tb
+
+    if type(exc) is _PanicError:
+        exc = exc.args[0]
+    return exc
+
+# defer registers f to be called when caller function exits.
+#
+# It is similar to try/finally but does not force the cleanup part to be far
+# away in the end.
+#
+# If defer is used inside `with deferring()` block, f is called when the block exits.
+def pydefer(f):
+    cdef PyFrameObject* fcall = PyEval_GetFrame()   # caller's frame
+    scope = None
+    if len(_deferscopes) != 0 and fcall != NULL:
+        scope = _deferscopes.get(<object>fcall)     # `with deferring()` in caller
+        if scope is None:
+            scope = _pydeferringof(fcall, True)     # @func in caller's parent, or defer called by deferred func
+    if scope is None:
+        pypanic("function %s uses defer, but not @func" %
+                ((<object>fcall).f_code.co_name if fcall != NULL else "?"))
+
+    cdef pydeferring dscope = scope
+    if dscope.deferv is None:
+        dscope.deferv = []
+    dscope.deferv.append(f)
+
+
+# _deferscopes keeps defer scopes that are currently active: `with deferring()`
+# blocks and calls of @func functions.
+#
+# It is keyed by frame, that runs the `with`, or that calls _goframe, for
+# defer to find the scope without any frame introspection. It is per-goroutine
+# defer stack in effect: every goroutine runs its own frames, so this works for
+# both thread- and gevent-based goroutines, contrary to per-thread state that
+# would be shared by all goroutines of a gevent hub.
+cdef dict _deferscopes = {} # frame -> pydeferring
+
+# deferring returns context manager that provides defer scope for `with` block.
+#
+# It allows to use defer without @func. Functions deferred inside the block
+# are called in LIFO order when the block exits, even if the block raises
+# exception. As with @func, exceptions raised by deferred calls are chained,
+# and deferred calls can use recover. For example:
+#
+#   with deferring():
+#       mu.lock()
+#       defer(mu.unlock)
+#       ...
+#
+# Entering and exiting the block is cheap, which makes it suitable for
+# latency-critical code where @func overhead is noticeable.
+@final
+@freelist(16)   # @func creates a scope on every call
+cdef class pydeferring:
+    cdef list           deferv      # defer registers funcs here; None until first defer
+    cdef public bint    recovered   # whether exception, if there was any, was recovered
+    cdef public object  exc_ctx     # py2: exception context to chain new exception into
+    cdef public object  exc_ctx_tb  # py2: exc_tb we got when catching .exc_ctx
+    cdef object         _f          # frame that runs `with deferring()`
+    cdef object         _prev       # deferring scope previously active in ._f
+    cdef bint           _running    # whether deferred calls are being run
+    cdef bint           _func       # scope is set up by @func for call of function body
+
+    def __enter__(pydeferring scope):
+        if scope._f is not None:
+            pypanic("deferring: already entered")
+        scope._enter()
+        return scope
+
+    def __exit__(pydeferring scope, exc_type, exc_val, exc_tb):
+        return scope._exit(exc_type, exc_val, exc_tb)
+
+    cdef _enter(pydeferring scope):
+        # cython functions don't have frames: PyEval_GetFrame is frame of
+        # `with deferring()`, or of @func wrapper that calls _goframe.
+        cdef PyFrameObject* f = PyEval_GetFrame()
+        if f != NULL:
+            scope._f    = <object>f
+            scope._prev = _deferscopes.get(scope._f)
+            _deferscopes[scope._f] = scope
+
+    cdef bint _exit(pydeferring scope, exc_type, exc_val, exc_tb) except -1:
+        if exc_val is not None:
+            scope.recovered = False
+            if PY_MAJOR_VERSION < 3:
+                _py2excchain(scope, exc_val, exc_tb)
+
+        scope._running = True
+        try:
+            scope._rundefers()
+        finally:
+            scope._running = False
+            if scope._f is not None:
+                if scope._prev is None:
+                    del _deferscopes[scope._f]
+                else:
+                    _deferscopes[scope._f] = scope._prev
+                scope._f = scope._prev = None
+
+        return scope.recovered
+
+    # _rundefers calls deferred functions in LIFO order.
+    #
+    # If a deferred call raises, the rest of deferred calls is run while that
+    # exception is being handled, so that it is chained into exceptions they
+    # raise, and so that they can recover it.
+    cdef _rundefers(pydeferring scope):
+        while scope.deferv:
+            d = scope.deferv.pop()
+            try:
+                d()
+            except:
+                scope.recovered = False
+                if PY_MAJOR_VERSION < 3:
+                    _, exc, exc_tb = sys.exc_info()
+                    _py2excchain(scope, exc, exc_tb)
+                scope._rundefers()
+                if scope.recovered:
+                    return
+                raise
+
+# _pydeferringof returns defer scope that runs deferred calls in parent of
+# frame f, or None.
+#
+# If body=True it also returns @func scope whose function body is run by f.
+cdef object _pydeferringof(PyFrameObject* f, bint body):
+    if len(_deferscopes) == 0 or f == NULL:
+        return None
+    cdef PyFrameObject* fback = PyFrame_GetBack(f)
+    if fback == NULL:
+        return None
+    scope = _deferscopes.get(<object>fback)
+    Py_XDECREF(<PyObject*>fback)
+    if scope is None:
+        return None
+    if (<pydeferring>scope)._running:
+        return scope    # f is deferred call
+    if body and (<pydeferring>scope)._func:
+        return scope    # f is @func function body
+    return None
+
+# _goframe is used by @func to run f under separate defer scope.
+#
+# It is called by @func wrapper, and, since cython functions don't have
+# frames, f and functions deferred by f are called directly from under the
+# frame of the wrapper. The defer scope is registered for that frame.
+def _goframe(f, *argv, **kw):
+    cdef pydeferring scope = pydeferring.__new__(pydeferring)
+    scope._func = True
+    scope._enter()
+    try:
+        ret = f(*argv, **kw)
+    except:
+        exc_type, exc_val, exc_tb = sys.exc_info()
+        if not scope._exit(exc_type, exc_val, exc_tb):
+            raise
+        return None
+    scope._exit(None, None, None)
+    return ret
+
+# _py2excchain simulates exception chaining (PEP 3134) on py2 for exception
+# exc_val raised in the scope of goframe.
+#
+# exc_val is current outer exception raised by e.g. earlier defers; it can be
+# itself chained. goframe.exc_ctx is current inner exception we saved before
+# calling code that raised exc_val. For example:
+#
+#   deferring._exit:
+#       saves .exc_ctx      # .exc_ctx = A1
+#       call other defer from .deferv
+#       _exit(exc_val):     # exc_val = B3 (-> linked to B2 -> B1)
+#
+# the order in which exceptions were raised is: A1 B1 B2 B3
+# thus A1 is the context of B1, or in other words, .exc_ctx should be linked
+# to from tail of exc_val exception chain.
+cdef _py2excchain(goframe, exc_val, exc_tb):
+    # exc_val can be itself chained; link .exc_ctx from tail of its chain
+    exc_tail = exc_val
+    while 1:
+        _ = getattr(exc_tail, '__context__', None)
+        if _ is None:
+            break
+        exc_tail = _
+    exc_tail.__context__ = goframe.exc_ctx
+
+    # make sure .__cause__ and .__suppress_context__ are always present
+    if not hasattr(exc_val, '__cause__'):
+        exc_val.__cause__ = None
+    if not hasattr(exc_val, '__suppress_context__'):
+        exc_val.__suppress_context__ = False
+
+    # set .__traceback__ only for chained-to exceptions. top-level raised
+    # exception must remain without __traceback__, because if it was not yet
+    # caught, setting __traceback__ here early will be wrong compared to what
+    # sys.exc_info() returns in caller except block.
+    if goframe.exc_ctx is not None:
+        goframe.exc_ctx.__traceback__ = goframe.exc_ctx_tb
+    goframe.exc_ctx    = exc_val
+    goframe.exc_ctx_tb = exc_tb
+
 # ---- go ----
 
 # go spawns lightweight thread.
@@ -175,6 +424,18 @@ cdef void __goviac(void *arg) nogil:
 
 # ---- channels ----
 
+# chanElemBuf is large enough to keep any builtin dtype.
+# NOTE sizeof(chanElemBuf) = max(_.size) from builtin part of dtypeRegistry
+# (this is checked at runtime on module init).
+ctypedef uint64_t chanElemBuf
+
+# Elements of record dtypes, e.g. C.bytes[64] or C.struct{int64,double}, can be
+# larger than chanElemBuf. Buffers that must be able to keep element of any
+# dtype are arrays of _ELEMBUF_NWORD chanElemBuf words.
+cdef enum:
+    _ELEMSIZE_MAX   = 512   # max size of record dtype
+    _ELEMBUF_NWORD  = 64    # = _ELEMSIZE_MAX / sizeof(chanElemBuf)
+
 # _frompyx indicates that a constructor is called from pyx code
 cdef object _frompyx = object()
 
@@ -203,7 +464,16 @@ cdef class pychan:
             return
 
         # pychan[X!=object]: just decref the raw chan and we are done.
+        # if X holds references and we are the last holder of the channel -
+        # drain it to release references held by buffered data.
+        cdef chanElemBuf _x
+        cdef cbool ok
         if pych.dtype != DTYPE_PYOBJECT:
+            if dtypeinfo(pych.dtype).decref != NULL and _chanrefcnt(pych._ch) == 1:
+                while _chanlen(pych._ch) != 0:
+                    # NOTE not _pyexc - see ch.recv() vvv
+                    _chantryrecv_(pych._ch, &_x, &ok, 0)
+                    dtype_decref(pych.dtype, &_x)
             _chanxdecref(pych._ch)
             pych._ch = NULL
             return
@@ -241,53 +511,127 @@ cdef class pychan:
 
     # send sends object to a receiver.
     def send(pychan pych, obj):
-        cdef chanElemBuf _tx = 0
+        pych._send(obj, UINT64_MAX)
+
+    # try_send sends object to a receiver if it can be done without blocking.
+    #
+    # it returns whether obj was sent.
+    def try_send(pychan pych, obj): # -> sent
+        return pych._send(obj, 0)
+
+    # send_timeout is like send, but waits for at most timeout seconds.
+    #
+    # it returns whether obj was sent.
+    def send_timeout(pychan pych, obj, double timeout): # -> sent
+        return pych._send(obj, _chantimeout_ns(timeout))
+
+    cdef bint _send(pychan pych, obj, uint64_t timeout_ns) except -1: # -> sent
+        cdef chanElemBuf _tx[_ELEMBUF_NWORD]
+        cdef cbool sent
 
         if pych.dtype == DTYPE_PYOBJECT:
             # increment obj reference count - until received the channel is
             # holding pointer to the object.
             Py_INCREF(obj)
-            (<PyObject **>&_tx)[0] = <PyObject *>obj
+            (<PyObject **>_tx)[0] = <PyObject *>obj
         else:
-            py_to_c(pych.dtype, obj, &_tx)
+            py_to_c(pych.dtype, obj, _tx)
 
         try:
             with nogil:
-                _chansend_pyexc(pych._ch, &_tx)
+                sent = _chantrysend_pyexc(pych._ch, _tx, timeout_ns)
         except: # not only _PanicError as send can also throw e.g. bad_alloc
             # the object was not sent - e.g. it was "send on a closed channel"
             if pych.dtype == DTYPE_PYOBJECT:
                 Py_DECREF(obj)
+            else:
+                dtype_decref(pych.dtype, _tx)
             raise
 
+        if not sent:
+            if pych.dtype == DTYPE_PYOBJECT:
+                Py_DECREF(obj)
+            else:
+                dtype_decref(pych.dtype, _tx)
+        return sent
+
     # recv_ is "comma-ok" version of recv.
     #
     # ok is true - if receive was delivered by a successful send.
     # ok is false - if receive is due to channel being closed and empty.
     def recv_(pychan pych): # -> (rx, ok)
-        cdef chanElemBuf _rx = 0
-        cdef bint ok
+        cdef cbool ok, done
+        rx = pych._recv_(&ok, &done, UINT64_MAX)
+        return (rx, ok)
+
+    # recv receives from the channel.
+    def recv(pychan pych): # -> rx
+        cdef cbool ok, done
+        return pych._recv_(&ok, &done, UINT64_MAX)
+
+    # try_recv is like recv_, but receives only if it can be done without blocking.
+    #
+    # it returns (rx, ok, done) where done tells whether receive was done.
+    # If receive was not done, rx=None and ok=False. Receive from closed and
+    # empty channel is always done and returns (None, False, True).
+    def try_recv(pychan pych): # -> (rx, ok, done)
+        cdef cbool ok, done
+        rx = pych._recv_(&ok, &done, 0)
+        return (rx, ok, done)
+
+    # recv_timeout is like try_recv, but waits for at most timeout seconds.
+    def recv_timeout(pychan pych, double timeout): # -> (rx, ok, done)
+        cdef cbool ok, done
+        rx = pych._recv_(&ok, &done, _chantimeout_ns(timeout))
+        return (rx, ok, done)
+
+    cdef object _recv_(pychan pych, cbool *pok, cbool *pdone, uint64_t timeout_ns): # -> rx
+        cdef chanElemBuf _rx[_ELEMBUF_NWORD]
+        cdef cbool ok = False
+        cdef cbool done
 
         with nogil:
-            ok = _chanrecv__pyexc(pych._ch, &_rx)
+            done = _chantryrecv__pyexc(pych._ch, _rx, &ok, timeout_ns)
+        pok[0]   = ok
+        pdone[0] = done
 
-        cdef object rx = None
-        cdef PyObject *_rxpy
-        if pych.dtype == DTYPE_PYOBJECT:
-            _rxpy = (<PyObject **>&_rx)[0]
-            if _rxpy != nil:
-                # we received the object and the channel dropped pointer to it.
-                rx = <object>_rxpy
-                Py_DECREF(rx)
-        else:
-            rx = c_to_py(pych.dtype, &_rx)
+        if not done:
+            return None
+        return _pychan_rxtopy(pych.dtype, _rx)
 
-        return (rx, ok)
+    # __iter__ allows to receive from the channel via `for x in ch`.
+    #
+    # the iteration stops when the channel is closed and its buffer is drained.
+    def __iter__(pychan pych):
+        return _pychanIter(pych, 1)
 
-    # recv receives from the channel.
-    def recv(pychan pych): # -> rx
-        rx, _ = pych.recv_()    # TODO call recv_ via C
-        return rx
+    # iter is like __iter__, but allows to receive up to prefetch elements at once.
+    #
+    # every time the iterator runs out of already received elements, it
+    # receives the next element and then, without blocking, up to prefetch-1
+    # more elements that are buffered in the channel. All that is done in one
+    # nogil section which amortizes GIL release/reacquire over the batch.
+    #
+    # NOTE prefetched elements are received from the channel: other receivers
+    # won't get them even if the iteration is stopped early.
+    def iter(pychan pych, prefetch=1):
+        return _pychanIter(pych, prefetch)
+
+    # asend, arecv_ and arecv are asyncio variants of send, recv_ and recv.
+    #
+    # they return awaitable, for example:
+    #
+    #   rx = await ch.arecv()
+    #
+    # see pyaselect for details.
+    def asend(pychan pych, obj):
+        return _AsyncSelect._start(((pych.send, obj),), True)
+
+    def arecv_(pychan pych): # -> awaitable (rx, ok)
+        return _AsyncSelect._start((pych.recv_,), True)
+
+    def arecv(pychan pych): # -> awaitable rx
+        return _AsyncSelect._start((pych.recv,), True)
 
     # close closes sending side of the channel.
     def close(pychan pych):
@@ -297,6 +641,15 @@ cdef class pychan:
     def __len__(pychan pych):
         return _chanlen_pyexc(pych._ch)
 
+    # fileno returns file descriptor that becomes readable when recv is likely not to block.
+    #
+    # it allows to wait for the channel with select/epoll/selectors-based event
+    # loops. The file descriptor is owned by the channel and must not be read
+    # from or closed. Once it is reported as readable, the receive should be done
+    # via select(ch.recv, default) as some other receiver might win the data first.
+    def fileno(pychan pych):
+        return _chanfd_pyexc(pych._ch)
+
     def __repr__(pychan pych):
         if pych._ch == nil:
             if pych.dtype == DTYPE_PYOBJECT:
@@ -374,6 +727,94 @@ cdef class pychan:
     cdef pychan _from_chan_osSignal (chan[os.Signal] ch):
         return pychan_from_raw(ch._rawchan(),   DTYPE_OS_SIGNAL)
 
+# _pychan_rxtopy converts element received into *prx from pychan[dtype] to Python object.
+cdef object _pychan_rxtopy(DType dtype, const chanElemBuf *prx):
+    cdef object rx = None
+    cdef PyObject *_rxpy
+    if dtype == DTYPE_PYOBJECT:
+        _rxpy = (<PyObject **>prx)[0]
+        if _rxpy != nil:
+            # we received the object and the channel dropped pointer to it.
+            rx = <object>_rxpy
+            Py_DECREF(rx)
+    else:
+        rx = c_to_py(dtype, prx)
+    return rx
+
+# _pychanIter is the iterator returned by pychan.__iter__ and pychan.iter .
+@final
+cdef class _pychanIter:
+    cdef pychan              ch
+    cdef vector[chanElemBuf] rxv    # prefetched elements, each taking nword words
+    cdef int                 nword
+    cdef int                 i, n   # elements [i:n] were prefetched, but not yet returned
+    cdef bint                closed # whether channel close was observed
+
+    def __cinit__(_pychanIter it, pychan ch not None, int prefetch):
+        if prefetch < 1:
+            raise ValueError("pychan.iter: prefetch must be >= 1")
+        it.ch = ch
+        it.nword = _elemnword(ch.dtype)
+        it.rxv.resize(prefetch * it.nword)
+        it.i = it.n = 0
+        it.closed = False
+
+    def __dealloc__(_pychanIter it):
+        # drop references to prefetched objects that were not returned
+        cdef PyObject *_rxpy
+        if it.ch is None:
+            return
+        while it.i < it.n:
+            if it.ch.dtype == DTYPE_PYOBJECT:
+                _rxpy = (<PyObject **>&it.rxv[it.i * it.nword])[0]
+                if _rxpy != nil:
+                    Py_DECREF(<object>_rxpy)
+            else:
+                dtype_decref(it.ch.dtype, &it.rxv[it.i * it.nword])
+            it.i += 1
+
+    def __iter__(_pychanIter it):
+        return it
+
+    def __next__(_pychanIter it):
+        if it.i == it.n:
+            if it.closed:
+                raise StopIteration
+            it._prefetch()
+            if it.n == 0:
+                raise StopIteration
+
+        rx = _pychan_rxtopy(it.ch.dtype, &it.rxv[it.i * it.nword])
+        it.i += 1
+        return rx
+
+    # _prefetch receives next element, and up to prefetch-1 more, if they are ready, into rxv.
+    cdef _prefetch(_pychanIter it):
+        cdef _chan        *_ch  = it.ch._ch
+        cdef chanElemBuf  *rxv  = it.rxv.data()
+        cdef int           nw   = it.nword
+        cdef int           nmax = it.rxv.size() / nw
+        cdef int           n    = 0
+        cdef cbool         ok, closed = False
+
+        with nogil:
+            _chantryrecv__pyexc(_ch, &rxv[0], &ok, UINT64_MAX)
+            if ok:
+                n = 1
+            else:
+                closed = True
+            while not closed and n < nmax:
+                if not _chantryrecv__pyexc(_ch, &rxv[n*nw], &ok, 0):
+                    break
+                if not ok:
+                    closed = True
+                    break
+                n += 1
+
+        it.i = 0
+        it.n = n
+        it.closed = closed
+
 cdef void pychan_asserttype(pychan pych, DType dtype) nogil:
     if pych.dtype != dtype:
         panic("pychan: channel type mismatch")
@@ -384,7 +825,6 @@ cdef pychan pychan_from_raw(_chan *_ch, DType dtype):
     pych._ch   = _ch; _chanxincref(_ch)
     return pych
 
-
 # pydefault represents default case for pyselect.
 pydefault  = object()
 
@@ -416,79 +856,128 @@ pydefault  = object()
 #       # default case
 #       ...
 def pyselect(*pycasev):
-    cdef int i, n = len(pycasev), selected
-    cdef vector[_selcase] casev = vector[_selcase](n, default)
-    cdef pychan pych
-    cdef chanElemBuf _rx = 0  # all select recvs are setup to receive into _rx
+    cdef int selected
+    cdef vector[_selcase] casev = vector[_selcase](len(pycasev), default)
+    cdef chanElemBuf _rx[_ELEMBUF_NWORD]  # all select recvs are setup to receive into _rx
     cdef cbool rxok = False   # (its ok as only one receive will be actually executed)
 
     selected = -1
     try:
         # prepare casev for chanselect
-        for i in range(n):
-            pycase = pycasev[i]
-            # default
-            if pycase is pydefault:
-                casev[i] = default
-
-            # send
-            elif type(pycase) is tuple:
-                if len(pycase) != 2:
-                    pypanic("pyselect: invalid [%d]() case" % len(pycase))
-                _tcase = <PyTupleObject *>pycase
-
-                pysend = <object>(_tcase.ob_item[0])
-                if pysend.__self__.__class__ is not pychan:
-                    pypanic("pyselect: send on non-chan: %r" % (pysend.__self__.__class__,))
-                pych = pysend.__self__
-
-                if pysend.__name__ != "send":       # XXX better check PyCFunction directly
-                    pypanic("pyselect: send expected: %r" % (pysend,))
-
-                tx = <object>(_tcase.ob_item[1])
-                casev[i] = _selsend(pych._ch, nil)
-                casev[i].flags = _INPLACE_DATA
-                casev[i].user  = pych.dtype
-
-                if pych.dtype == DTYPE_PYOBJECT:
-                    # incref tx as if corresponding channel is holding pointer to the object while it is being sent.
-                    # we'll decref the object if it won't be sent.
-                    # see pychan.send for details.
-                    Py_INCREF(tx)
-                    (<PyObject **>&casev[i].itxrx)[0] = <PyObject *>tx
-
-                else:
-                    # NOTE vvv assumes that size for all dtypes fit into 64 bits
-                    py_to_c(pych.dtype, tx, &casev[i].itxrx)  # NOTE can raise exception
-
-            # recv
-            else:
-                pyrecv = pycase
-                if pyrecv.__self__.__class__ is not pychan:
-                    pypanic("pyselect: recv on non-chan: %r" % (pyrecv.__self__.__class__,))
-                pych = pyrecv.__self__
-
-                if pyrecv.__name__ == "recv":       # XXX better check PyCFunction directly
-                    casev[i] = _selrecv(pych._ch, &_rx)
-                elif pyrecv.__name__ == "recv_":    # XXX better check PyCFunction directly
-                    casev[i] = _selrecv_(pych._ch, &_rx, &rxok)
-                else:
-                    pypanic("pyselect: recv expected: %r" % (pyrecv,))
-
-                casev[i].user = pych.dtype
+        _pyselcasev_prepare(pycasev, casev, _rx, &rxok)
 
         with nogil:
             selected = _chanselect_pyexc(casev.data(), casev.size())
 
     finally:
-        # decref not sent tx (see ^^^ send prepare)
-        for i in range(n):
-            if casev[i].op == _CHANSEND and casev[i].user == DTYPE_PYOBJECT and (i != selected):
-                _tx = (<PyObject **>casev[i].ptx())[0]
-                tx  = <object>_tx
-                Py_DECREF(tx)
+        # decref not sent tx (see _pyselcasev_prepare)
+        _pyselcasev_release(casev, selected)
+        _pyselcasev_free(casev)
 
     # return what was selected
+    return _pyselcase_result(casev, selected, _rx, rxok)
+
+# _pyselcasev_prepare converts pyselect cases into casev for _chanselect.
+#
+# All recv cases are setup to receive into *prx and *prxok; prx must have
+# space for _ELEMBUF_NWORD words.
+# Objects sent via pychan[object] are incref'ed. The caller must call
+# _pyselcasev_release after select, even if _pyselcasev_prepare raises.
+# Values sent via pychan[X] with X not fitting into _selcase.itxrx are stored
+# in malloc'ed memory. The caller must call _pyselcasev_free when casev is no
+# longer used, even if _pyselcasev_prepare raises.
+cdef _pyselcasev_prepare(tuple pycasev, vector[_selcase]& casev, chanElemBuf *prx, cbool *prxok):
+    cdef int i, n = len(pycasev)
+    cdef pychan pych
+
+    for i in range(n):
+        pycase = pycasev[i]
+        # default
+        if pycase is pydefault:
+            casev[i] = default
+
+        # send
+        elif type(pycase) is tuple:
+            if len(pycase) != 2:
+                pypanic("pyselect: invalid [%d]() case" % len(pycase))
+            _tcase = <PyTupleObject *>pycase
+
+            pysend = <object>(_tcase.ob_item[0])
+            if pysend.__self__.__class__ is not pychan:
+                pypanic("pyselect: send on non-chan: %r" % (pysend.__self__.__class__,))
+            pych = pysend.__self__
+
+            # NOTE bound methods compare equal if they have the same __self__
+            # and __func__, which, for builtin methods, is the same C function.
+            if pysend != pych.send:
+                pypanic("pyselect: send expected: %r" % (pysend,))
+
+            tx = <object>(_tcase.ob_item[1])
+            casev[i] = _selsend(pych._ch, nil)
+            casev[i].flags = _INPLACE_DATA
+            casev[i].user  = pych.dtype
+
+            if pych.dtype == DTYPE_PYOBJECT:
+                # incref tx as if corresponding channel is holding pointer to the object while it is being sent.
+                # we'll decref the object if it won't be sent.
+                # see pychan.send for details.
+                Py_INCREF(tx)
+                (<PyObject **>&casev[i].itxrx)[0] = <PyObject *>tx
+
+            elif dtypeinfo(pych.dtype).size <= sizeof(uint64_t):  # fits into .itxrx
+                py_to_c(pych.dtype, tx, <chanElemBuf *>&casev[i].itxrx)  # NOTE can raise exception
+
+            else:
+                casev[i].flags = <_selflags>0
+                casev[i].ptxrx = malloc(dtypeinfo(pych.dtype).size)
+                if casev[i].ptxrx == nil:
+                    raise MemoryError()
+                py_to_c(pych.dtype, tx, <chanElemBuf *>casev[i].ptxrx)  # NOTE can raise exception
+
+        # recv
+        else:
+            pyrecv = pycase
+            if pyrecv.__self__.__class__ is not pychan:
+                pypanic("pyselect: recv on non-chan: %r" % (pyrecv.__self__.__class__,))
+            pych = pyrecv.__self__
+
+            if pyrecv == pych.recv:             # see ^^^ about bound methods compare
+                casev[i] = _selrecv(pych._ch, prx)
+            elif pyrecv == pych.recv_:
+                casev[i] = _selrecv_(pych._ch, prx, prxok)
+            else:
+                pypanic("pyselect: recv expected: %r" % (pyrecv,))
+
+            casev[i].user = pych.dtype
+
+# _pyselcasev_release decrefs objects of pychan[object] send cases that were
+# not selected (see _pyselcasev_prepare). The same is done for references held
+# by not sent data of other dtypes, e.g. pychan[C.PyBuffer].
+cdef _pyselcasev_release(vector[_selcase]& casev, int selected):
+    cdef int i, n = casev.size()
+    for i in range(n):
+        if casev[i].op != _CHANSEND or (i == selected):
+            continue
+        if casev[i].user == DTYPE_PYOBJECT:
+            _tx = (<PyObject **>casev[i].ptx())[0]
+            tx  = <object>_tx
+            Py_DECREF(tx)
+        else:
+            dtype_decref(<DType>casev[i].user, <const chanElemBuf *>casev[i].ptx())
+
+# _pyselcasev_free frees memory allocated for values of send cases by _pyselcasev_prepare.
+cdef _pyselcasev_free(vector[_selcase]& casev):
+    cdef int i, n = casev.size()
+    for i in range(n):
+        if casev[i].op == _CHANSEND and casev[i].user != DTYPE_PYOBJECT and \
+           not (casev[i].flags & _INPLACE_DATA):
+            free(casev[i].ptxrx)
+            casev[i].ptxrx = nil
+
+# _pyselcase_result returns pyselect result for selected case.
+#
+# *prx and rxok must be what was setup for recv cases by _pyselcasev_prepare.
+cdef _pyselcase_result(vector[_selcase]& casev, int selected, const chanElemBuf *prx, cbool rxok):
     cdef _chanop op = casev[selected].op
     if op == _DEFAULT:
         return selected, None
@@ -504,19 +993,440 @@ def pyselect(*pycasev):
     if rxtype == DTYPE_PYOBJECT:
         # we received nil or the object; if it is object, corresponding channel
         # dropped pointer to it (see pychan.recv_ for details).
-        _rxpy = (<PyObject **>&_rx)[0]
+        _rxpy = (<PyObject **>prx)[0]
         if _rxpy != nil:
             rx = <object>_rxpy
             Py_DECREF(rx)
 
     else:
-        rx = c_to_py(rxtype, &_rx)
+        rx = c_to_py(rxtype, prx)
 
     if casev[selected].rxok != nil:
         return selected, (rx, rxok)
     else:
         return selected, rx
 
+
+# PySelector is select whose cases are prepared once and can be executed many times.
+#
+# It is useful when the same select is run in a loop: cases are validated and
+# converted to _selcase vector only once - at construction time - and each
+# .select() call only does the channel work. For example:
+#
+#   sel = Selector(
+#       ch1.recv,           # 0
+#       (ch2.send, obj2),   # 1
+#       default,            # 2
+#   )
+#   while 1:
+#       _, _rx = sel.select()
+#       ...
+#
+# .select returns the same as pyselect would return for the cases.
+# .select(txv) additionally updates values to send: txv must provide one value
+# for every send case, in the order send cases were given to the constructor.
+#
+# Selector must not be used by several goroutines simultaneously.
+@final
+cdef class PySelector:
+    cdef tuple              chanv   # channels of the cases; keeps them alive
+    cdef vector[_selcase]   casev
+    cdef vector[int]        txidx   # indices of send cases in casev
+    cdef chanElemBuf        _rx[_ELEMBUF_NWORD] # all recvs are setup to receive into _rx
+    cdef cbool              _rxok
+    cdef cbool              _busy
+
+    def __cinit__(PySelector sel, *pycasev):
+        cdef int i
+        sel.casev   = vector[_selcase](len(pycasev), default)
+        sel._rxok   = False
+        sel._busy   = False
+
+        # NOTE objects to send via pychan[object] are incref'ed by prepare and
+        # are owned by the selector until __dealloc__ (even if prepare raises).
+        _pyselcasev_prepare(pycasev, sel.casev, sel._rx, &sel._rxok)
+        for i in range(sel.casev.size()):
+            if sel.casev[i].op == _CHANSEND:
+                sel.txidx.push_back(i)
+
+        # keep only the channels alive, not pycasev: send cases of pycasev
+        # also reference objects to send, and the selector must not hold those
+        # on top of what prepare took.
+        chanv = []
+        for pycase in pycasev:
+            if pycase is pydefault:
+                continue
+            if type(pycase) is tuple:
+                pycase = pycase[0]
+            chanv.append(pycase.__self__)
+        sel.chanv = tuple(chanv)
+
+    def __dealloc__(PySelector sel):
+        _pyselcasev_release(sel.casev, -1)
+        _pyselcasev_free(sel.casev)
+
+    def select(PySelector sel, txv=None): # -> (selected, rx)
+        cdef int i, selected
+        if sel._busy:
+            pypanic("Selector: select called simultaneously")
+        sel._busy = True
+        try:
+            if txv is not None:
+                sel._settx(txv)
+
+            # the channel takes reference to sent object (see pychan.send) -
+            # - give it one more on top of what selector owns.
+            for i in sel.txidx:
+                if sel.casev[i].user == DTYPE_PYOBJECT:
+                    Py_INCREF(<object>(<PyObject **>sel.casev[i].ptx())[0])
+                else:
+                    dtype_incref(<DType>sel.casev[i].user, <const chanElemBuf *>sel.casev[i].ptx())
+
+            selected = -1
+            try:
+                with nogil:
+                    selected = _chanselect_pyexc(sel.casev.data(), sel.casev.size())
+            finally:
+                _pyselcasev_release(sel.casev, selected)
+
+            return _pyselcase_result(sel.casev, selected, sel._rx, sel._rxok)
+        finally:
+            sel._busy = False
+
+    # _settx updates values to send.
+    cdef _settx(PySelector sel, txv):
+        cdef int i, k
+        cdef _selcase *cas
+        cdef PyObject *_old
+        cdef chanElemBuf _oldbuf
+        txv = tuple(txv)
+        if len(txv) != sel.txidx.size():
+            pypanic("Selector: select: %d values to send, but there are %d send cases"
+                        % (len(txv), sel.txidx.size()))
+        for k in range(len(txv)):
+            tx  = txv[k]
+            cas = &sel.casev[sel.txidx[k]]
+            if cas.user == DTYPE_PYOBJECT:
+                _old = (<PyObject **>&cas.itxrx)[0]
+                Py_INCREF(tx)
+                (<PyObject **>&cas.itxrx)[0] = <PyObject *>tx
+                Py_DECREF(<object>_old)
+            else:
+                _oldbuf = (<chanElemBuf *>cas.ptx())[0]  # data with references fit into chanElemBuf
+                py_to_c(<DType>cas.user, tx, <chanElemBuf *>cas.ptx())  # NOTE can raise exception
+                dtype_decref(<DType>cas.user, &_oldbuf)
+
+
+# ---- poller ----
+
+# Poller watches many channels for readiness to receive.
+#
+# Channels are registered with the poller once via .add, after which .wait
+# returns a channel that is ready to receive without locking, or registering
+# waiters on, all registered channels, as select has to do. For example:
+#
+#   poller = Poller()
+#   for ch in chv:
+#       poller.add(ch)
+#   while len(poller) > 0:
+#       ch = poller.wait()
+#       v, ok, done = ch.try_recv()
+#       if not done:
+#           continue            # other receiver won the data first
+#       if not ok:
+#           poller.remove(ch)   # ch is closed and drained
+#           continue
+#       ...
+#
+# A channel is ready when it has buffered data, a blocked sender, or is
+# closed. A closed channel thus stays ready until it is removed. The same channel is returned again by subsequent waits while it stays
+# ready, and ready channels are returned in round-robin order.
+@final
+cdef class PyPoller:
+    cdef _poller   *_p
+    cdef dict       _chanv  # _chan* -> pychan; keeps channels alive
+
+    def __cinit__(PyPoller poller):
+        poller._p     = _makepoller_pyexc()
+        poller._chanv = {}
+
+    def __dealloc__(PyPoller poller):
+        if poller._p != NULL:
+            with nogil:
+                _pollerfree_pyexc(poller._p)
+            poller._p = NULL
+
+    # add registers channel with the poller.
+    def add(PyPoller poller, pychan ch):
+        with nogil:
+            _polleradd_pyexc(poller._p, ch._ch)
+        poller._chanv[<uintptr_t>ch._ch] = ch
+
+    # remove unregisters channel from the poller.
+    def remove(PyPoller poller, pychan ch):
+        with nogil:
+            _pollerremove_pyexc(poller._p, ch._ch)
+        del poller._chanv[<uintptr_t>ch._ch]
+
+    def __len__(PyPoller poller):
+        return len(poller._chanv)
+
+    # wait waits for a registered channel to become ready to receive and returns it.
+    #
+    # if timeout (in seconds) is given, wait waits for at most timeout and
+    # returns None if no channel became ready.
+    def wait(PyPoller poller, timeout=None): # -> pychan | None
+        cdef uint64_t timeout_ns = UINT64_MAX
+        cdef uint64_t deadline   = UINT64_MAX   # UINT64_MAX = no deadline
+        cdef uint64_t now
+        if timeout is not None:
+            timeout_ns = _chantimeout_ns(timeout)
+            now = _nanotime()
+            if timeout_ns < UINT64_MAX - now:
+                deadline = now + timeout_ns
+        cdef _chan *_ch
+        while 1:
+            with nogil:
+                _ch = _pollerwait_pyexc(poller._p, timeout_ns)
+            if _ch == nil:
+                return None
+            ch = poller._chanv.get(<uintptr_t>_ch)
+            if ch is not None:
+                return ch
+            # the channel was removed while we were returning it -> retry,
+            # but wait only for what is left till the deadline.
+            if deadline != UINT64_MAX:
+                now = _nanotime()
+                timeout_ns = (deadline - now) if now < deadline else 0
+
+
+# ---- asyncio ----
+
+# pyaselect is asyncio variant of pyselect.
+#
+# It returns awaitable that completes when one of the cases was executed. The
+# result is the same as pyselect would return. For example:
+#
+#   _, _rx = await aselect(
+#       ch1.recv,           # 0
+#       (ch2.send, obj2),   # 1
+#   )
+#
+# While waiting, neither asyncio loop nor any OS thread is blocked: waiters
+# are registered on all channels via _chanselect_async, and the goroutine that
+# makes a case ready wakes up the loop via self-pipe (see _AsyncioWaker).
+#
+# If the awaitable is canceled, select is canceled too, unless a case was
+# already executed. In the latter case what was received is lost.
+#
+# aselect must be called from a coroutine or callback run by asyncio loop.
+def pyaselect(*pycasev):
+    return _AsyncSelect._start(pycasev, False)
+
+cdef struct _aop   # see below
+
+# _awaker is C-level part of _AsyncioWaker that is accessed by notify without GIL.
+cdef struct _awaker:
+    PyThread_type_lock  mu
+    _aop                *readyq # notified, but not yet completed selects (LIFO)
+    int                 wfd     # write end of the self-pipe
+
+# _aop is C-level part of _AsyncSelect that is accessed by notify without GIL.
+cdef struct _aop:
+    _awaker     *waker
+    _aop        *next       # in waker.readyq
+    PyObject    *pyasel     # -> _AsyncSelect
+
+# _aop_notify is called by libgolang when a case of async select becomes ready.
+#
+# it queues the select to the waker and wakes up its loop.
+cdef void _aop_notify(void *arg) nogil:
+    cdef _aop    *aop = <_aop*>arg
+    cdef _awaker *w   = aop.waker
+    cdef char b = 0
+    PyThread_acquire_lock(w.mu, WAIT_LOCK)
+    cdef bint wakeup = (w.readyq == NULL)
+    aop.next = w.readyq
+    w.readyq = aop
+    cdef int wfd = w.wfd
+    PyThread_release_lock(w.mu)
+    # if the pipe is full, the loop is already woken up
+    if wakeup:
+        syscall.Write(wfd, &b, 1)
+
+# _AsyncSelect is select that is being waited on by asyncio loop.
+@final
+cdef class _AsyncSelect:
+    cdef vector[_selcase] casev
+    cdef chanElemBuf      rx[_ELEMBUF_NWORD] # all recvs are setup to receive here
+    cdef cbool            rxok
+    cdef bint             one       # result is rx only, instead of (selected, rx)
+    cdef _selasync       *asel      # !NULL while waiting
+    cdef _aop             aop       # passed to notify
+    cdef object           waker     # _AsyncioWaker keeping .aop.waker alive
+    cdef object           fut       # asyncio.Future representing the select
+
+    @staticmethod
+    cdef object _start(tuple pycasev, bint one): # -> asyncio.Future
+        loop = _pyasyncio().get_running_loop()
+        fut  = loop.create_future()
+
+        cdef _AsyncSelect asel = _AsyncSelect.__new__(_AsyncSelect)
+        asel.casev = vector[_selcase](len(pycasev), default)
+        asel.rxok  = False
+        asel.one   = one
+        asel.asel  = NULL
+        asel.waker = _asyncio_waker(loop)
+        asel.aop.waker  = &(<_AsyncioWaker>asel.waker).w
+        asel.aop.next   = NULL
+        asel.aop.pyasel = <PyObject*>asel
+
+        cdef int selected = -1
+        try:
+            _pyselcasev_prepare(pycasev, asel.casev, asel.rx, &asel.rxok)
+            with nogil:
+                selected = _chanselect_async_pyexc(asel.casev.data(), asel.casev.size(),
+                                                   _aop_notify, &asel.aop, &asel.asel)
+        except:
+            _pyselcasev_release(asel.casev, -1)
+            raise
+
+        # a case was ready - we are done
+        if selected != -1:
+            _pyselcasev_release(asel.casev, selected)
+            fut.set_result(asel._result(selected))
+            return fut
+
+        # wait: asel is kept alive until notified or canceled
+        Py_INCREF(asel)
+        asel.fut = fut
+        fut.add_done_callback(asel._on_fut_done)
+        return fut
+
+    def __dealloc__(_AsyncSelect asel):
+        _pyselcasev_free(asel.casev)
+
+    # _result returns what awaiting on the select gives.
+    cdef _result(_AsyncSelect asel, int selected):
+        _ = _pyselcase_result(asel.casev, selected, asel.rx, asel.rxok)
+        if asel.one:
+            return _[1]
+        return _
+
+    # _complete is called by _AsyncioWaker after notify.
+    cdef _complete(_AsyncSelect asel):
+        fut = asel.fut
+        asel.fut = None
+        cdef int selected = -1
+        try:
+            with nogil:
+                selected = _selasync_done_pyexc(asel.asel)  # frees .asel
+        except BaseException as e: # send on closed channel
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        finally:
+            asel.asel = NULL
+            _pyselcasev_release(asel.casev, selected)
+
+        result = asel._result(selected)
+        if not fut.done():
+            fut.set_result(result)
+
+    # _on_fut_done cancels the select if fut was canceled.
+    def _on_fut_done(_AsyncSelect asel, fut):
+        if not fut.cancelled() or asel.asel == NULL:
+            return
+        cdef cbool canceled
+        with nogil:
+            canceled = _selasync_cancel(asel.asel)
+        if not canceled:
+            return  # a case was already selected; _complete will finish it
+
+        asel.asel = NULL
+        asel.fut  = None
+        _pyselcasev_release(asel.casev, -1)
+        Py_DECREF(asel)
+
+# _AsyncioWaker completes async selects in the thread of asyncio loop.
+#
+# There is one waker per loop. It watches read end of a self-pipe, which
+# _aop_notify writes to when queueing notified select to .w.readyq.
+@final
+cdef class _AsyncioWaker:
+    cdef _awaker w
+    cdef int     rfd
+
+    def __cinit__(_AsyncioWaker waker, loop):
+        waker.w.readyq = NULL
+        waker.w.wfd    = -1
+        waker.rfd      = -1
+        waker.w.mu     = PyThread_allocate_lock()
+        if waker.w.mu == NULL:
+            raise MemoryError()
+        waker.rfd, waker.w.wfd = pyos.pipe()
+        pyos.set_blocking(waker.rfd,   False)
+        pyos.set_blocking(waker.w.wfd, False)
+        loop.add_reader(waker.rfd, waker._drain)
+
+    def __dealloc__(_AsyncioWaker waker):
+        if waker.rfd != -1:
+            syscall.Close(waker.rfd)
+        if waker.w.wfd != -1:
+            syscall.Close(waker.w.wfd)
+        if waker.w.mu != NULL:
+            PyThread_free_lock(waker.w.mu)
+
+    def _drain(_AsyncioWaker waker):
+        cdef char buf[128]
+        while syscall.Read(waker.rfd, buf, sizeof(buf)) > 0:
+            pass
+
+        PyThread_acquire_lock(waker.w.mu, WAIT_LOCK)
+        cdef _aop *readyq = waker.w.readyq
+        waker.w.readyq = NULL
+        PyThread_release_lock(waker.w.mu)
+
+        # complete in notification order
+        cdef _aop *aop = NULL
+        cdef _aop *aopnext
+        while readyq != NULL:
+            aopnext = readyq.next
+            readyq.next = aop
+            aop = readyq
+            readyq = aopnext
+
+        cdef _AsyncSelect asel
+        while aop != NULL:
+            aopnext = aop.next
+            asel = <_AsyncSelect>aop.pyasel
+            Py_DECREF(asel) # ref taken by _AsyncSelect._start
+            asel._complete()
+            aop = aopnext
+
+# _asyncio_waker returns waker for asyncio loop.
+cdef object _asyncio_wakers = None # {} loop -> _AsyncioWaker  (weak wrt loop)
+cdef _AsyncioWaker _asyncio_waker(loop):
+    global _asyncio_wakers
+    if _asyncio_wakers is None:
+        import weakref
+        _asyncio_wakers = weakref.WeakKeyDictionary()
+    waker = _asyncio_wakers.get(loop)
+    if waker is None:
+        waker = _AsyncioWaker(loop)
+        _asyncio_wakers[loop] = waker
+    return waker
+
+# _pyasyncio returns asyncio module.
+# it is imported lazily not to slow down golang import for programs that don't use asyncio.
+cdef object _asyncio = None
+cdef object _pyasyncio():
+    global _asyncio
+    if _asyncio is None:
+        import asyncio
+        _asyncio = asyncio
+    return _asyncio
+
 # ---- init libgolang runtime ---
 
 cdef extern from "golang/libgolang.h" namespace "golang" nogil:
@@ -557,32 +1467,47 @@ cdef void _init_libpyxruntime() except*:
 
 cdef extern from "golang/libgolang.h" namespace "golang" nogil:
     _chan  *_makechan(unsigned elemsize, unsigned size)
-    chan[T] _wrapchan[T](_chan *)
     void    _chanxincref(_chan *ch)
     void    _chanxdecref(_chan *ch)
     int     _chanrefcnt(_chan *ch)
-    void    _chansend(_chan *ch, const void *ptx)
-    bint    _chanrecv_(_chan *ch, void *prx)
+    bint    _chantrysend(_chan *ch, const void *ptx, uint64_t timeout_ns)
+    bint    _chantryrecv_(_chan *ch, void *prx, cbool *pok, uint64_t timeout_ns)
     void    _chanclose(_chan *ch)
     unsigned _chanlen(_chan *ch)
+    int     _chanfd(_chan *ch)
 
     int  _chanselect(_selcase *casev, int casec)
     _selcase _selsend(_chan *ch, const void *ptx)
     _selcase _selrecv(_chan *ch, void *prx)
     _selcase _selrecv_(_chan *ch, void *prx, bint *pok)
 
+    struct _selasync
+    int  _chanselect_async(const _selcase *casev, int casec, void (*notify)(void *) nogil, void *arg, _selasync **pasel)
+    int  _selasync_done(_selasync *asel)
+    bint _selasync_cancel(_selasync *asel)
+
     void _taskgo(void (*f)(void *), void *arg)
 
+    struct _poller
+    _poller *_makepoller()
+    void     _pollerfree(_poller *p)
+    void     _polleradd(_poller *p, _chan *ch)
+    void     _pollerremove(_poller *p, _chan *ch)
+    _chan   *_pollerwait(_poller *p, uint64_t timeout_ns)
+
+cdef extern from "golang/time.h" namespace "golang::time" nogil:
+    uint64_t _nanotime()
+
 cdef nogil:
 
     _chan* _makechan_pyexc(unsigned elemsize, unsigned size)    except +topyexc:
         return _makechan(elemsize, size)
 
-    void _chansend_pyexc(_chan *ch, const void *ptx)            except +topyexc:
-        _chansend(ch, ptx)
+    bint _chantrysend_pyexc(_chan *ch, const void *ptx, uint64_t timeout_ns)           except +topyexc:
+        return _chantrysend(ch, ptx, timeout_ns)
 
-    bint _chanrecv__pyexc(_chan *ch, void *prx)                 except +topyexc:
-        return _chanrecv_(ch, prx)
+    bint _chantryrecv__pyexc(_chan *ch, void *prx, cbool *pok, uint64_t timeout_ns)    except +topyexc:
+        return _chantryrecv_(ch, prx, pok, timeout_ns)
 
     void _chanclose_pyexc(_chan *ch)                            except +topyexc:
         _chanclose(ch)
@@ -590,19 +1515,40 @@ cdef nogil:
     unsigned _chanlen_pyexc(_chan *ch)                          except +topyexc:
         return _chanlen(ch)
 
+    int _chanfd_pyexc(_chan *ch)                                except +topyexc:
+        return _chanfd(ch)
+
     int _chanselect_pyexc(const _selcase *casev, int casec)     except +topyexc:
         return _chanselect(casev, casec)
 
+    int _chanselect_async_pyexc(const _selcase *casev, int casec, void (*notify)(void *) nogil, void *arg, _selasync **pasel)  except +topyexc:
+        return _chanselect_async(casev, casec, notify, arg, pasel)
+
+    int _selasync_done_pyexc(_selasync *asel)                   except +topyexc:
+        return _selasync_done(asel)
+
     void _taskgo_pyexc(void (*f)(void *) nogil, void *arg)      except +topyexc:
         _taskgo(f, arg)
 
+    _poller* _makepoller_pyexc()                                except +topyexc:
+        return _makepoller()
+
+    void _pollerfree_pyexc(_poller *p)                          except +topyexc:
+        _pollerfree(p)
+
+    void _polleradd_pyexc(_poller *p, _chan *ch)                except +topyexc:
+        _polleradd(p, ch)
+
+    void _pollerremove_pyexc(_poller *p, _chan *ch)             except +topyexc:
+        _pollerremove(p, ch)
+
+    _chan* _pollerwait_pyexc(_poller *p, uint64_t timeout_ns)   except +topyexc:
+        return _pollerwait(p, timeout_ns)
+
 
 # ---- runtime support for channel types ----
 
-# chanElemBuf is large enough to keep any dtype.
-# NOTE sizeof(chanElemBuf) = max(_.size) from dtypeRegistry (this is checked at
-# runtime on module init).
-ctypedef uint64_t chanElemBuf
+cdef struct _DTypeField   # see "record dtypes" below
 
 # DTypeInfo provides runtime information for a DType:
 # dtype name, element size, py <-> c element conversion routines and typed nil instance.
@@ -612,26 +1558,55 @@ cdef struct DTypeInfo:
 
     # py_to_c converts python object to C-level data of dtype.
     # If conversion fails, corresponding exception is raised.
-    bint      (*py_to_c)(object obj, chanElemBuf *cto) except False
+    bint      (*py_to_c)(const DTypeInfo *t, object obj, chanElemBuf *cto) except False
 
     # c_to_py converts C-level data into python object according to dtype.
     # The conversion cannot fail, but this can raise exception e.g. due to
     # error when allocating result object.
-    object    (*c_to_py) (const chanElemBuf *cfrom)
+    # If data of dtype holds a reference, c_to_py takes it over.
+    object    (*c_to_py) (const DTypeInfo *t, const chanElemBuf *cfrom)
+
+    # incref/decref increment/decrement reference held by C-level data of dtype.
+    # They are nil if data of dtype does not hold references. They are also nil
+    # for pyobj - Py_INCREF/Py_DECREF are manually inlined for it.
+    # NOTE data of dtypes with references must fit into chanElemBuf.
+    void      (*incref)(const chanElemBuf *p)
+    void      (*decref)(const chanElemBuf *p)
 
     # pynil points to pychan instance that represents nil[dtype].
     # it holds one reference and is never freed.
     PyObject   *pynil
 
+    # fieldv describes layout of record dtypes; it is nil for builtin dtypes.
+    # it is never freed.
+    _DTypeField *fieldv
+    int          nfield
+
 # py_to_c converts Python object to C-level data according to dtype.
 cdef bint py_to_c(DType dtype, object obj, chanElemBuf *cto) except False:
     dtypei = dtypeinfo(dtype)
-    return dtypei.py_to_c(obj, cto)
+    return dtypei.py_to_c(dtypei, obj, cto)
 
 # c_to_py converts C-level data into Python object according to dtype.
 cdef object c_to_py(DType dtype, const chanElemBuf *cfrom):
     dtypei = dtypeinfo(dtype)
-    return dtypei.c_to_py(cfrom)
+    return dtypei.c_to_py(dtypei, cfrom)
+
+# dtype_incref/dtype_decref increment/decrement reference held by C-level data of dtype.
+# They are noop for dtypes whose data does not hold references.
+cdef void dtype_incref(DType dtype, const chanElemBuf *p):
+    dtypei = dtypeinfo(dtype)
+    if dtypei.incref != NULL:
+        dtypei.incref(p)
+
+cdef void dtype_decref(DType dtype, const chanElemBuf *p):
+    dtypei = dtypeinfo(dtype)
+    if dtypei.decref != NULL:
+        dtypei.decref(p)
+
+# _elemnword returns how many chanElemBuf words are needed to keep element of dtype.
+cdef int _elemnword(DType dtype):
+    return max(1, (dtypeinfo(dtype).size + sizeof(chanElemBuf) - 1) // sizeof(chanElemBuf))
 
 # mkpynil creates pychan instance that represents nil[dtype].
 cdef PyObject *mkpynil(DType dtype):
@@ -645,12 +1620,18 @@ cdef pychan pynil(DType dtype):
     return <pychan>dtypei.pynil
 
 # {} dtype -> DTypeInfo.
-# XXX const
-cdef DTypeInfo[<int>DTYPE_NTYPES] dtypeRegistry
+#
+# [0:DTYPE_NTYPES) are builtin dtypes; record dtypes are appended at
+# [DTYPE_NTYPES:dtypeRegistryN) on first use (see parse_dtype).
+# NOTE _DTYPE_NTYPES_MAX is limited by _selcase.user, where pyselect keeps dtype.
+cdef enum:
+    _DTYPE_NTYPES_MAX = 256
+cdef DTypeInfo[<int>_DTYPE_NTYPES_MAX] dtypeRegistry
+cdef int dtypeRegistryN = DTYPE_NTYPES
 
 # dtypeinfo returns DTypeInfo corresponding to dtype.
 cdef DTypeInfo* dtypeinfo(DType dtype) nogil:
-    if not (0 <= dtype < DTYPE_NTYPES):
+    if not (0 <= dtype < dtypeRegistryN):
         # no need to ->pyexc, as this bug means memory corruption and so is fatal
         panic("BUG: pychan dtype invalid")
     return &dtypeRegistry[<int>dtype]
@@ -665,6 +1646,10 @@ dtypeRegistry[<int>DTYPE_PYOBJECT] = DTypeInfo(
     py_to_c     = NULL, # must not be called for pyobj
     c_to_py     = NULL, # must not be called for pyobj
     pynil       = mkpynil(DTYPE_PYOBJECT),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
 # pynilchan is nil py channel.
@@ -681,16 +1666,20 @@ dtypeRegistry[<int>DTYPE_STRUCTZ] = DTypeInfo(
     py_to_c     = structZ_py_to_c,
     c_to_py     = structZ_c_to_py,
     pynil       = mkpynil(DTYPE_STRUCTZ),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
-cdef bint structZ_py_to_c(object obj, chanElemBuf *cto) except False:
+cdef bint structZ_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
     # for structZ the only accepted value from python is None
     if obj is not None:
         raise TypeError("type mismatch: expect structZ; got %r" % (obj,))
     # nothing to do - size = 0
     return True
 
-cdef object structZ_c_to_py(const chanElemBuf *cfrom):
+cdef object structZ_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
     return None
 
 
@@ -701,16 +1690,20 @@ dtypeRegistry[<int>DTYPE_BOOL] = DTypeInfo(
     py_to_c     = bool_py_to_c,
     c_to_py     = bool_c_to_py,
     pynil       = mkpynil(DTYPE_BOOL),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
-cdef bint bool_py_to_c(object obj, chanElemBuf *cto) except False:
+cdef bint bool_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
     # don't accept int/double/str/whatever.
     if type(obj) is not bool:
         raise TypeError("type mismatch: expect bool; got %r" % (obj,))
     (<cbool *>cto)[0] = obj # raises *Error if conversion fails
     return True
 
-cdef object bool_c_to_py(const chanElemBuf *cfrom):
+cdef object bool_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
     return (<cbool *>cfrom)[0]
 
 
@@ -721,9 +1714,13 @@ dtypeRegistry[<int>DTYPE_INT] = DTypeInfo(
     py_to_c     = int_py_to_c,
     c_to_py     = int_c_to_py,
     pynil       = mkpynil(DTYPE_INT),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
-cdef bint int_py_to_c(object obj, chanElemBuf *cto) except False:
+cdef bint int_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
     # don't accept bool
     if isinstance(obj, bool):
         raise TypeError("type mismatch: expect int; got %r" % (obj,))
@@ -734,7 +1731,7 @@ cdef bint int_py_to_c(object obj, chanElemBuf *cto) except False:
     (<int *>cto)[0] = obj # raises *Error if conversion fails
     return True
 
-cdef object int_c_to_py(const chanElemBuf *cfrom):
+cdef object int_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
     return (<int *>cfrom)[0]
 
 
@@ -745,16 +1742,20 @@ dtypeRegistry[<int>DTYPE_DOUBLE] = DTypeInfo(
     py_to_c     = double_py_to_c,
     c_to_py     = double_c_to_py,
     pynil       = mkpynil(DTYPE_DOUBLE),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
-cdef bint double_py_to_c(object obj, chanElemBuf *cto) except False:
+cdef bint double_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
     # don't accept bool
     if isinstance(obj, bool):
         raise TypeError("type mismatch: expect float; got %r" % (obj,))
     (<double *>cto)[0] = obj # raises *Error if conversion fails
     return True
 
-cdef object double_c_to_py(const chanElemBuf *cfrom):
+cdef object double_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
     return (<double *>cfrom)[0]
 
 
@@ -766,18 +1767,71 @@ dtypeRegistry[<int>DTYPE_OS_SIGNAL] = DTypeInfo(
     py_to_c     = ossig_py_to_c,
     c_to_py     = ossig_c_to_py,
     pynil       = mkpynil(DTYPE_OS_SIGNAL),
+    incref      = NULL,
+    decref      = NULL,
+    fieldv      = NULL,
+    nfield      = 0,
 )
 
-cdef bint ossig_py_to_c(object obj, chanElemBuf *cto) except False:
+cdef bint ossig_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
     if not isinstance(obj, os.PySignal):
         raise TypeError("type mismatch: expect os.PySignal; got %r" % (obj,))
     (<os.Signal*>cto)[0] = (<os.PySignal>obj).sig
 
-cdef object ossig_c_to_py(const chanElemBuf *cfrom):
+cdef object ossig_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
     sig = (<os.Signal*>cfrom)[0]
     return os.PySignal.from_sig(sig)
 
 
+# DTYPE_PYBUFFER
+dtypeRegistry[<int>DTYPE_PYBUFFER] = DTypeInfo(
+    name        = "C.PyBuffer",
+    size        = sizeof(runtime._PyBuffer*),
+    py_to_c     = pybuffer_py_to_c,
+    c_to_py     = pybuffer_c_to_py,
+    pynil       = mkpynil(DTYPE_PYBUFFER),
+    incref      = pybuffer_incref,
+    decref      = pybuffer_decref,
+    fieldv      = NULL,
+    nfield      = 0,
+)
+
+# chan[C.PyBuffer] element is _PyBuffer* holding 1 reference. It pins
+# buffer of sent object until the receiver drops the reference. For example
+# nogil receiver can do:
+#
+#   PyBuffer pyb = adoptref[_PyBuffer](_wrapchan[_pPyBuffer](pych._ch).recv())
+#   ... use pyb.view.buf, pyb.view.len, etc; buffer is released when pyb goes away.
+#
+# Python receiver gets memoryview of the sent object.
+ctypedef runtime._PyBuffer *_pPyBuffer # https://github.com/cython/cython/issues/534
+
+cdef bint pybuffer_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
+    if not PyObject_CheckBuffer(obj):
+        raise TypeError("type mismatch: expect buffer; got %r" % (obj,))
+    cdef runtime.PyBuffer pyb
+    runtime.PyBuffer_Get(<PyObject *>obj, PyBUF_FULL_RO, &pyb)
+    pyb._ptr().incref() # for the element; pyb's own reference goes away on return
+    (<_pPyBuffer *>cto)[0] = pyb._ptr()
+    return True
+
+cdef object pybuffer_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
+    cdef runtime.PyBuffer pyb = adoptref[runtime._PyBuffer]((<_pPyBuffer *>cfrom)[0])
+    if pyb == nil:
+        return None
+    return memoryview(<object>pyb.view.obj)
+
+cdef void pybuffer_incref(const chanElemBuf *p):
+    cdef _pPyBuffer _pyb = (<_pPyBuffer *>p)[0]
+    if _pyb != nil:
+        _pyb.incref()
+
+cdef void pybuffer_decref(const chanElemBuf *p):
+    cdef _pPyBuffer _pyb = (<_pPyBuffer *>p)[0]
+    if _pyb != nil:
+        _pyb.decref()
+
+
 # verify at init time that sizeof(chanElemBuf) = max(_.size)
 cdef verify_chanElemBuf():
     cdef int size_max = 0
@@ -800,18 +1854,256 @@ cdef DType parse_dtype(dtype) except <DType>-1:
     if dtype is object:
         return DTYPE_PYOBJECT
 
-    _ = name2dtype.get(dtype)
+    _ = dtype_byname(dtype)
     if _ is not None:
         return _
 
     # accept classes with .dtype attribute
     if hasattr(dtype, "dtype"):
-        _ = name2dtype.get(dtype.dtype)
+        _ = dtype_byname(dtype.dtype)
         if _ is not None:
             return _
 
     raise TypeError("pychan: invalid dtype: %r" % (dtype,))
 
+# dtype_byname returns dtype corresponding to name, or None if there is no such dtype.
+# record dtypes are registered on first use.
+cdef object dtype_byname(name): # -> DType | None
+    _ = name2dtype.get(name)
+    if _ is None and isinstance(name, (str, unicode)):
+        _ = record_dtype(name)
+    return _
+
+
+# ---- record dtypes ----
+#
+# Record dtypes allow to pass small values by value through the channel:
+#
+#   - C.bytes[N]                - N bytes; py value is bytes of length N;
+#   - C.struct{T1,T2,...}       - C struct with fields of types T1, T2, ...;
+#                                 py value is tuple (v1, v2, ...).
+#
+# Struct field type can be bool, int8, int16, int32, int64, uint8, uint16,
+# uint32, uint64, float, double and bytes[N]. Fields are laid out with natural
+# alignment, the same way C compiler lays out corresponding struct, e.g.
+# C.struct{int64,double} corresponds to struct { int64_t a; double b; }. Nogil
+# code can thus access channel of record dtype via _wrapchan[thatStruct](pych._ch).
+
+cdef enum _FieldKind:
+    _FIELD_BOOL
+    _FIELD_INT8
+    _FIELD_INT16
+    _FIELD_INT32
+    _FIELD_INT64
+    _FIELD_UINT8
+    _FIELD_UINT16
+    _FIELD_UINT32
+    _FIELD_UINT64
+    _FIELD_FLOAT
+    _FIELD_DOUBLE
+    _FIELD_BYTES
+
+# _DTypeField describes one field of a record dtype.
+cdef struct _DTypeField:
+    _FieldKind  kind
+    unsigned    offset
+    unsigned    size
+
+# {} field type name -> (kind, size)  ; bytes[N] is handled in parse_field
+cdef dict _fieldTypes = {
+    "bool":     (_FIELD_BOOL,   sizeof(cbool)),
+    "int8":     (_FIELD_INT8,   sizeof(int8_t)),
+    "int16":    (_FIELD_INT16,  sizeof(int16_t)),
+    "int32":    (_FIELD_INT32,  sizeof(int32_t)),
+    "int64":    (_FIELD_INT64,  sizeof(int64_t)),
+    "uint8":    (_FIELD_UINT8,  sizeof(uint8_t)),
+    "uint16":   (_FIELD_UINT16, sizeof(uint16_t)),
+    "uint32":   (_FIELD_UINT32, sizeof(uint32_t)),
+    "uint64":   (_FIELD_UINT64, sizeof(uint64_t)),
+    "float":    (_FIELD_FLOAT,  sizeof(float)),
+    "double":   (_FIELD_DOUBLE, sizeof(double)),
+}
+
+# _fieldKindNames[kind] is name of field type of kind.
+cdef list _fieldKindNames = [None]*(_FIELD_BYTES+1)
+cdef init_fieldKindNames():
+    for name, (kind, _) in _fieldTypes.items():
+        _fieldKindNames[kind] = name
+    _fieldKindNames[_FIELD_BYTES] = "bytes"
+init_fieldKindNames()
+
+# _recordNames keeps .name of registered record dtypes alive.
+cdef list _recordNames = []
+
+# parse_field parses field type, e.g. "int64" or "bytes[8]".
+#
+# it returns (name, kind, size, align), or None if the type is invalid.
+cdef object parse_field(str typ):
+    _ = _fieldTypes.get(typ)
+    if _ is not None:
+        kind, size = _
+        return (typ, kind, size, size)
+
+    if typ.startswith("bytes[") and typ.endswith("]"):
+        n = typ[len("bytes["):-1]
+        if n.isdigit() and int(n) > 0:
+            n = int(n)
+            return ("bytes[%d]" % n, _FIELD_BYTES, n, 1)
+
+    return None
+
+# record_dtype parses and registers record dtype with given name.
+#
+# it returns the dtype, or None if name does not represent a record dtype.
+cdef object record_dtype(name): # -> DType | None
+    global dtypeRegistryN
+    name = str(name)
+    fieldv = None
+    isstruct = False
+    _ = "".join(name.split())   # "C.struct{int64, double}" -> "C.struct{int64,double}"
+    if _.startswith("C.bytes["):
+        fieldv = [parse_field(_[len("C."):])]
+    elif _.startswith("C.struct{") and _.endswith("}"):
+        fieldv = [parse_field(f) for f in _[len("C.struct{"):-1].split(",")]
+        isstruct = True
+    if fieldv is None or None in fieldv:
+        return None
+
+    if isstruct:
+        canon = "C.struct{%s}" % ",".join([f[0] for f in fieldv])
+    else:
+        canon = "C.%s" % fieldv[0][0]
+    _ = name2dtype.get(canon)
+    if _ is not None:
+        name2dtype[name] = _
+        return _
+
+    # layout the fields
+    cdef unsigned offset = 0, align, align_max = 1
+    layout = []
+    for (_, kind, size, align) in fieldv:
+        offset = (offset + align - 1) // align * align
+        layout.append((kind, offset, size))
+        offset += size
+        align_max = max(align_max, align)
+    cdef unsigned size_ = (offset + align_max - 1) // align_max * align_max
+    if size_ > _ELEMSIZE_MAX:
+        raise TypeError("pychan: dtype %r is too large: %d bytes ; max %d" % (name, size_, _ELEMSIZE_MAX))
+    if dtypeRegistryN >= _DTYPE_NTYPES_MAX:
+        raise TypeError("pychan: dtype %r: too many record dtypes" % (name,))
+
+    cdef int nfield = len(layout)
+    cdef _DTypeField *_fieldv = <_DTypeField *>malloc(nfield * sizeof(_DTypeField))
+    if _fieldv == nil:
+        raise MemoryError()
+    cdef int i
+    for i in range(nfield):
+        _fieldv[i].kind, _fieldv[i].offset, _fieldv[i].size = layout[i]
+
+    bname = canon.encode("utf-8")
+    _recordNames.append(bname)
+    cdef DType dtype = <DType>dtypeRegistryN
+    cdef DTypeInfo *t = &dtypeRegistry[<int>dtype]
+    t.name    = bname
+    t.size    = size_
+    t.py_to_c = struct_py_to_c  if isstruct else  bytes_py_to_c
+    t.c_to_py = struct_c_to_py  if isstruct else  bytes_c_to_py
+    t.incref  = NULL
+    t.decref  = NULL
+    t.fieldv  = _fieldv
+    t.nfield  = nfield
+    dtypeRegistryN += 1
+    t.pynil   = mkpynil(dtype)
+
+    name2dtype[canon] = dtype
+    name2dtype[name]  = dtype
+    return dtype
+
+
+# C.bytes[N]
+cdef bint bytes_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
+    return field_py_to_c(&t.fieldv[0], obj, <char *>cto)
+
+cdef object bytes_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
+    return field_c_to_py(&t.fieldv[0], <const char *>cfrom)
+
+# C.struct{...}
+cdef bint struct_py_to_c(const DTypeInfo *t, object obj, chanElemBuf *cto) except False:
+    if type(obj) is not tuple or len(obj) != t.nfield:
+        raise TypeError("type mismatch: expect %s; got %r" % (t.name, obj))
+    memset(cto, 0, t.size) # don't leak garbage via padding
+    cdef int i
+    for i in range(t.nfield):
+        field_py_to_c(&t.fieldv[i], (<tuple>obj)[i], <char *>cto + t.fieldv[i].offset)
+    return True
+
+cdef object struct_c_to_py(const DTypeInfo *t, const chanElemBuf *cfrom):
+    cdef int i
+    return tuple([field_c_to_py(&t.fieldv[i], <const char *>cfrom + t.fieldv[i].offset)
+                        for i in range(t.nfield)])
+
+# field_py_to_c converts python object to C-level data of record field.
+cdef bint field_py_to_c(const _DTypeField *f, object obj, char *p) except False:
+    cdef _FieldKind kind = f.kind
+
+    if kind == _FIELD_BOOL:
+        # don't accept int/double/str/whatever.
+        if type(obj) is not bool:
+            raise TypeError("type mismatch: expect bool; got %r" % (obj,))
+        (<cbool *>p)[0] = obj
+
+    elif kind == _FIELD_FLOAT or kind == _FIELD_DOUBLE:
+        # don't accept bool
+        if isinstance(obj, bool):
+            raise TypeError("type mismatch: expect %s; got %r" % (_fieldKindNames[kind], obj))
+        if kind == _FIELD_FLOAT:
+            (<float *>p)[0]  = obj  # raises *Error if conversion fails
+        else:
+            (<double *>p)[0] = obj  # raises *Error if conversion fails
+
+    elif kind == _FIELD_BYTES:
+        if not isinstance(obj, (bytes, bytearray)) or len(obj) != f.size:
+            raise TypeError("type mismatch: expect bytes[%d]; got %r" % (f.size, obj))
+        if isinstance(obj, bytes):
+            memcpy(p, PyBytes_AS_STRING(obj), f.size)
+        else:
+            memcpy(p, PyByteArray_AS_STRING(obj), f.size)
+
+    else:
+        # don't accept bool and don't allow e.g. 3.14 to be implicitly truncated to just 3
+        if isinstance(obj, bool) or not PyIndex_Check(obj):
+            raise TypeError("type mismatch: expect %s; got %r" % (_fieldKindNames[kind], obj))
+        # vvv raise OverflowError if obj does not fit
+        if   kind == _FIELD_INT8:   (<int8_t   *>p)[0] = obj
+        elif kind == _FIELD_INT16:  (<int16_t  *>p)[0] = obj
+        elif kind == _FIELD_INT32:  (<int32_t  *>p)[0] = obj
+        elif kind == _FIELD_INT64:  (<int64_t  *>p)[0] = obj
+        elif kind == _FIELD_UINT8:  (<uint8_t  *>p)[0] = obj
+        elif kind == _FIELD_UINT16: (<uint16_t *>p)[0] = obj
+        elif kind == _FIELD_UINT32: (<uint32_t *>p)[0] = obj
+        elif kind == _FIELD_UINT64: (<uint64_t *>p)[0] = obj
+        else:
+            panic("BUG: record field kind invalid")
+
+    return True
+
+# field_c_to_py converts C-level data of record field into python object.
+cdef object field_c_to_py(const _DTypeField *f, const char *p):
+    cdef _FieldKind kind = f.kind
+    if   kind == _FIELD_BOOL:   return (<cbool    *>p)[0]
+    elif kind == _FIELD_INT8:   return (<int8_t   *>p)[0]
+    elif kind == _FIELD_INT16:  return (<int16_t  *>p)[0]
+    elif kind == _FIELD_INT32:  return (<int32_t  *>p)[0]
+    elif kind == _FIELD_INT64:  return (<int64_t  *>p)[0]
+    elif kind == _FIELD_UINT8:  return (<uint8_t  *>p)[0]
+    elif kind == _FIELD_UINT16: return (<uint16_t *>p)[0]
+    elif kind == _FIELD_UINT32: return (<uint32_t *>p)[0]
+    elif kind == _FIELD_UINT64: return (<uint64_t *>p)[0]
+    elif kind == _FIELD_FLOAT:  return (<float    *>p)[0]
+    elif kind == _FIELD_DOUBLE: return (<double   *>p)[0]
+    elif kind == _FIELD_BYTES:  return PyBytes_FromStringAndSize(p, f.size)
+    panic("BUG: record field kind invalid")
+
 
 # ---- strings ----
 
@@ -1117,6 +2409,22 @@ def _pyframe_dellocal(frame, name):
     assert name not in frame.f_locals
 
 
+# frame access helpers for defer/recover.
+cdef extern from "frameobject.h":
+    """
+    #if PY_VERSION_HEX < 0x03090000     // 3.9
+    static inline PyFrameObject* PyFrame_GetBack(PyFrameObject* frame)
+    {
+        PyFrameObject* back = frame->f_back;
+        Py_XINCREF(back);
+        return back;
+    }
+    #endif
+    """
+    PyFrameObject* PyEval_GetFrame()
+    PyFrameObject* PyFrame_GetBack(PyFrameObject* f)
+
+
 # ---- init golang/runtime.py ----
 
 def _():
@@ -31,6 +31,7 @@ from cpython cimport Py_EQ, Py_NE, Py_LT, Py_GT, Py_LE, Py_GE
 from cpython.iterobject cimport PySeqIter_New
 from cpython cimport PyThreadState_GetDict, PyDict_SetItem
 from cpython cimport PyObject_CheckBuffer
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_GET_SIZE
 
 cdef extern from "Python.h":
     PyTypeObject PyBytes_Type
@@ -545,10 +546,18 @@ cdef class _pybstr(bytes):   # https://github.com/cython/cython/issues/711
 
 
     # all other string methods
+    #
+    # NOTE for pure-ASCII data most text methods are handled directly on bytes
+    # without decoding to unicode and encoding back. See _bisascii & co for details.
 
-    def capitalize(self):                       return pyb(pyu(self).capitalize())
+    def capitalize(self):                       return pyb(zbytes.capitalize(self) if _bisascii(self) else pyu(self).capitalize())
     def casefold(self):                         return pyb(pyu(self).casefold())
-    def center(self, width, fillchar=' '):      return pyb(pyu(self).center(width, fillchar))
+    def center(self, width, fillchar=' '):
+        if _bisascii(self):
+            bfill = _bascii_char(fillchar)
+            if bfill is not None:
+                return pyb(zbytes.center(self, width, bfill))
+        return pyb(pyu(self).center(width, fillchar))
 
     def count(self, sub, start=None, end=None): return zbytes.count(self, _pyb_coerce(sub), start, end)
 
@@ -562,28 +571,39 @@ cdef class _pybstr(bytes):   # https://github.com/cython/cython/issues/711
         if end   is None: end   = PY_SSIZE_T_MAX
         return zbytes.endswith(self, _pyb_coerce(suffix), start, end)
 
-    def expandtabs(self, tabsize=8):            return pyb(pyu(self).expandtabs(tabsize))
+    def expandtabs(self, tabsize=8):            return pyb(zbytes.expandtabs(self, tabsize) if _bisascii(self) else pyu(self).expandtabs(tabsize))
 
     # NOTE find/index & friends should return byte-position, not unicode-position
     def find(self, sub, start=None, end=None):  return zbytes.find(self, _pyb_coerce(sub), start, end)
     def index(self, sub, start=None, end=None): return zbytes.index(self, _pyb_coerce(sub), start, end)
 
-    def isalnum(self):      return pyu(self).isalnum()
-    def isalpha(self):      return pyu(self).isalpha()
+    # NOTE for ASCII data decimal and numeric characters are exactly the digits
+    def isalnum(self):      return zbytes.isalnum(self) if _bisascii(self) else pyu(self).isalnum()
+    def isalpha(self):      return zbytes.isalpha(self) if _bisascii(self) else pyu(self).isalpha()
     # isascii(self)         no need to override
-    def isdecimal(self):    return pyu(self).isdecimal()
-    def isdigit(self):      return pyu(self).isdigit()
+    def isdecimal(self):    return zbytes.isdigit(self) if _bisascii(self) else pyu(self).isdecimal()
+    def isdigit(self):      return zbytes.isdigit(self) if _bisascii(self) else pyu(self).isdigit()
     def isidentifier(self): return pyu(self).isidentifier()
-    def islower(self):      return pyu(self).islower()
-    def isnumeric(self):    return pyu(self).isnumeric()
+    def islower(self):      return zbytes.islower(self) if _bisascii(self) else pyu(self).islower()
+    def isnumeric(self):    return zbytes.isdigit(self) if _bisascii(self) else pyu(self).isnumeric()
     def isprintable(self):  return pyu(self).isprintable()
-    def isspace(self):      return pyu(self).isspace()
-    def istitle(self):      return pyu(self).istitle()
+    def isspace(self):      return _bisuspace(self)     if _bisascii(self) else pyu(self).isspace()
+    def istitle(self):      return zbytes.istitle(self) if _bisascii(self) else pyu(self).istitle()
 
     def join(self, iterable):               return pyb(zbytes.join(self, (_pyb_coerce(_) for _ in iterable)))
-    def ljust(self, width, fillchar=' '):   return pyb(pyu(self).ljust(width, fillchar))
-    def lower(self):                        return pyb(pyu(self).lower())
-    def lstrip(self, chars=None):           return pyb(pyu(self).lstrip(chars))
+    def ljust(self, width, fillchar=' '):
+        if _bisascii(self):
+            bfill = _bascii_char(fillchar)
+            if bfill is not None:
+                return pyb(zbytes.ljust(self, width, bfill))
+        return pyb(pyu(self).ljust(width, fillchar))
+    def lower(self):                        return pyb(zbytes.lower(self) if _bisascii(self) else pyu(self).lower())
+    def lstrip(self, chars=None):
+        if _bisascii(self):
+            bchars = _bascii_chars(chars)
+            if bchars is not None:
+                return pyb(zbytes.lstrip(self, bchars))
+        return pyb(pyu(self).lstrip(chars))
     def partition(self, sep):               return tuple(pyb(_) for _ in zbytes.partition(self, _pyb_coerce(sep)))
     def removeprefix(self, prefix):         return pyb(pyu(self).removeprefix(prefix))
     def removesuffix(self, suffix):         return pyb(pyu(self).removesuffix(suffix))
@@ -593,16 +613,37 @@ cdef class _pybstr(bytes):   # https://github.com/cython/cython/issues/711
     def rfind(self, sub, start=None, end=None):   return zbytes.rfind(self, _pyb_coerce(sub), start, end)
     def rindex(self, sub, start=None, end=None):  return zbytes.rindex(self, _pyb_coerce(sub), start, end)
 
-    def rjust(self, width, fillchar=' '):   return pyb(pyu(self).rjust(width, fillchar))
+    def rjust(self, width, fillchar=' '):
+        if _bisascii(self):
+            bfill = _bascii_char(fillchar)
+            if bfill is not None:
+                return pyb(zbytes.rjust(self, width, bfill))
+        return pyb(pyu(self).rjust(width, fillchar))
     def rpartition(self, sep):              return tuple(pyb(_) for _ in zbytes.rpartition(self, _pyb_coerce(sep)))
     def rsplit(self, sep=None, maxsplit=-1):
-        v = pyu(self).rsplit(sep, maxsplit)
+        if _bsplit_isascii(self, sep):
+            v = zbytes.rsplit(self, _bascii_sep(sep), maxsplit)
+        else:
+            v = pyu(self).rsplit(sep, maxsplit)
         return list([pyb(_) for _ in v])
-    def rstrip(self, chars=None):           return pyb(pyu(self).rstrip(chars))
+    def rstrip(self, chars=None):
+        if _bisascii(self):
+            bchars = _bascii_chars(chars)
+            if bchars is not None:
+                return pyb(zbytes.rstrip(self, bchars))
+        return pyb(pyu(self).rstrip(chars))
     def split(self, sep=None, maxsplit=-1):
-        v = pyu(self).split(sep, maxsplit)
+        if _bsplit_isascii(self, sep):
+            v = zbytes.split(self, _bascii_sep(sep), maxsplit)
+        else:
+            v = pyu(self).split(sep, maxsplit)
         return list([pyb(_) for _ in v])
-    def splitlines(self, keepends=False):   return list(pyb(_) for _ in pyu(self).splitlines(keepends))
+    def splitlines(self, keepends=False):
+        if _bisascii(self)  and  not _bhasctl(self, _ulinebreak_ctlmask):
+            v = zbytes.splitlines(self, keepends)
+        else:
+            v = pyu(self).splitlines(keepends)
+        return list(pyb(_) for _ in v)
 
     def startswith(self, prefix, start=None, end=None):
         if isinstance(prefix, tuple):
@@ -614,9 +655,14 @@ cdef class _pybstr(bytes):   # https://github.com/cython/cython/issues/711
         if end   is None: end   = PY_SSIZE_T_MAX
         return zbytes.startswith(self, _pyb_coerce(prefix), start, end)
 
-    def strip(self, chars=None):            return pyb(pyu(self).strip(chars))
-    def swapcase(self):                     return pyb(pyu(self).swapcase())
-    def title(self):                        return pyb(pyu(self).title())
+    def strip(self, chars=None):
+        if _bisascii(self):
+            bchars = _bascii_chars(chars)
+            if bchars is not None:
+                return pyb(zbytes.strip(self, bchars))
+        return pyb(pyu(self).strip(chars))
+    def swapcase(self):                     return pyb(zbytes.swapcase(self) if _bisascii(self) else pyu(self).swapcase())
+    def title(self):                        return pyb(zbytes.title(self) if _bisascii(self) else pyu(self).title())
     def translate(self, table, delete=None):
         # bytes mode  (compatibility with str/py2)
         if table is None  or isinstance(table, zbytes)  or  delete is not None:
@@ -626,8 +672,8 @@ cdef class _pybstr(bytes):   # https://github.com/cython/cython/issues/711
         else:
             return pyb(pyu(self).translate(table))
 
-    def upper(self):                        return pyb(pyu(self).upper())
-    def zfill(self, width):                 return pyb(pyu(self).zfill(width))
+    def upper(self):                        return pyb(zbytes.upper(self) if _bisascii(self) else pyu(self).upper())
+    def zfill(self, width):                 return pyb(zbytes.zfill(self, width) if _bisascii(self) else pyu(self).zfill(width))
 
     @staticmethod
     def maketrans(x=None, y=None, z=None):
@@ -1966,6 +2012,140 @@ class _BFormatter(pystring.Formatter):
             return super(_BFormatter, self).get_field(field_name, args, kwargs)
 
 
+# ---- ASCII fast paths ----
+
+# bstr text methods, when invoked on pure-ASCII data, are handled directly on
+# bytes instead of going through  pyb(pyu(self).meth())  which decodes whole
+# string to unicode and encodes the result back. For ASCII data bytes methods
+# give the same result as unicode methods with the following exceptions that
+# are handled explicitly:
+#
+# - unicode treats \x1c-\x1f as whitespace, while bytes does not. This
+#   affects strip/lstrip/rstrip, split/rsplit and isspace.
+# - unicode treats \v, \f and \x1c-\x1e as line boundaries, while bytes does
+#   not. This affects splitlines.
+#
+# For non-ASCII data the unicode path is used.
+
+# _uwhitespace is the set of ASCII characters that unicode treats as whitespace.
+cdef bytes _uwhitespace = b' \t\n\x0b\x0c\r\x1c\x1d\x1e\x1f'
+
+# _u*_ctlmask are bitmasks of control characters (< 0x20) for _bhasctl.
+cdef unsigned _uwhitespace_ctlmask = 0xf0003e00  # \t \n \v \f \r \x1c-\x1f
+cdef unsigned _usplit_ctlmask      = 0xf0000000  # \x1c-\x1f        - unicode-only whitespace
+cdef unsigned _ulinebreak_ctlmask  = 0x70001800  # \v \f \x1c-\x1e  - unicode-only line boundaries
+
+# _asciibytev[c] = bytes([c])  for c in [0, 0x80)
+cdef tuple _asciibytev = tuple([bytes(bytearray([c])) for c in range(0x80)])
+
+# _bisascii returns whether bytes object s consists of only ASCII characters.
+cdef inline bint _bisascii(s):
+    return _xisascii(PyBytes_AS_STRING(s), PyBytes_GET_SIZE(s))
+
+# _bhasctl returns whether bytes object s contains any of control characters
+# specified by ctlmask.
+cdef inline bint _bhasctl(s, unsigned ctlmask):
+    return _xhasctl(PyBytes_AS_STRING(s), PyBytes_GET_SIZE(s), ctlmask)
+
+# _bisuspace returns unicode.isspace for ASCII bytes object s.
+cdef inline bint _bisuspace(s):
+    cdef Py_ssize_t n = PyBytes_GET_SIZE(s)
+    return n > 0  and  _xisctlonly(PyBytes_AS_STRING(s), n, _uwhitespace_ctlmask)
+
+# _bascii_char returns bytes to be used as fillchar for bytes-level
+# center/ljust/rjust on ASCII data.
+#
+# None is returned if the unicode path has to be used.
+cdef _bascii_char(fillchar): # -> bytes | None
+    if isinstance(fillchar, (bytes, unicode))  and  len(fillchar) == 1:
+        c = ord(fillchar)
+        if c < 0x80:
+            return _asciibytev[c]
+    return None
+
+# _bascii_chars returns bytes to be used as chars for bytes-level
+# strip/lstrip/rstrip on ASCII data.
+#
+# Non-ASCII characters from chars are UTF-8 encoded to bytes >= 0x80 which
+# never occur in ASCII data. This way stripping with encoded chars gives the
+# same result as stripping with chars on the unicode level.
+#
+# None is returned if the unicode path has to be used.
+cdef _bascii_chars(chars): # -> bytes | None
+    if chars is None:
+        return _uwhitespace
+    if isinstance(chars, bytes):
+        return chars
+    if isinstance(chars, unicode):
+        return pyb(chars)
+    return None
+
+# _bsplit_isascii returns whether s.split(sep) and s.rsplit(sep) can be
+# handled on bytes level.
+cdef bint _bsplit_isascii(s, sep):
+    if not _bisascii(s):
+        return False
+    if sep is None:
+        return not _bhasctl(s, _usplit_ctlmask)
+    return isinstance(sep, (bytes, unicode))
+
+# _bascii_sep returns bytes to be used as sep for bytes-level split/rsplit.
+# sep=None, meaning to split by whitespace, is returned as is.
+cdef _bascii_sep(sep): # -> bytes | None
+    if sep is None  or  isinstance(sep, bytes):
+        return sep
+    return pyb(sep)
+
+cdef extern from *:
+    """
+    // _xisascii returns whether s[:n] consists of only ASCII characters.
+    // the check is done 8 bytes at a time.
+    static int _xisascii(const char *s, Py_ssize_t n) {
+        const char *end = s + n;
+        while (end - s >= 8) {
+            uint64_t w;
+            memcpy(&w, s, 8);   // unaligned load
+            if (w & 0x8080808080808080ULL)
+                return 0;
+            s += 8;
+        }
+        for (; s < end; s++) {
+            if (*s & 0x80)
+                return 0;
+        }
+        return 1;
+    }
+
+    // _xhasctl returns whether s[:n] contains any control character c < 0x20
+    // with bit c set in ctlmask.
+    static int _xhasctl(const char *s, Py_ssize_t n, unsigned ctlmask) {
+        for (Py_ssize_t i = 0; i < n; i++) {
+            unsigned char c = s[i];
+            if (c < 0x20  &&  (ctlmask >> c) & 1)
+                return 1;
+        }
+        return 0;
+    }
+
+    // _xisctlonly returns whether s[:n] consists of only ' ' and control
+    // characters c < 0x20 with bit c set in ctlmask.
+    static int _xisctlonly(const char *s, Py_ssize_t n, unsigned ctlmask) {
+        for (Py_ssize_t i = 0; i < n; i++) {
+            unsigned char c = s[i];
+            if (c == ' ')
+                continue;
+            if (c < 0x20  &&  (ctlmask >> c) & 1)
+                continue;
+            return 0;
+        }
+        return 1;
+    }
+    """
+    bint _xisascii(const char *s, Py_ssize_t n)
+    bint _xhasctl(const char *s, Py_ssize_t n, unsigned ctlmask)
+    bint _xisctlonly(const char *s, Py_ssize_t n, unsigned ctlmask)
+
+
 # ---- misc ----
 
 cdef object _xpyu_coerce(obj):
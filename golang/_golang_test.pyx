@@ -27,9 +27,11 @@
 
 from __future__ import print_function, absolute_import
 
-from golang cimport go, chan, _chan, makechan, pychan, nil, select, \
-    default, structZ, panic, pypanic, topyexc, cbool
+from golang cimport go, chan, _chan, makechan, _wrapchan, pychan, nil, select, \
+    default, structZ, panic, pypanic, topyexc, cbool, adoptref
 from golang cimport time
+from golang.pyx cimport runtime
+from libc.stdint cimport int64_t
 from cpython cimport PyObject, PyErr_SetString, PyErr_Clear, PyErr_Occurred
 
 cdef extern from "golang/libgolang.h" namespace "golang" nogil:
@@ -220,12 +222,20 @@ cdef extern from * nogil:
     """
     extern void _test_chan_cpp_refcount();
     extern void _test_chan_cpp();
+    extern void _test_chan_cpp_elemops();
     extern void _test_chan_vs_stackdeadwhileparked();
+    extern void _test_chan_vs_native_thread();
     extern void _test_go_cpp();
     extern void _test_close_wakeup_all_vsrecv();
     extern void _test_close_wakeup_all_vsselect();
     extern void _test_select_win_while_queue();
     extern void _test_select_inplace();
+    extern void _test_chanselect_async();
+    extern void _test_chan_fd();
+    extern void _test_chan_trysendrecv();
+    extern void _test_chan_dataq_grow();
+    extern void _test_runtime_memstats();
+    extern void _test_poller();
     extern void _test_defer();
     extern void _test_refptr();
     extern void _test_global();
@@ -233,12 +243,20 @@ cdef extern from * nogil:
     """
     void _test_chan_cpp_refcount()              except +topyexc
     void _test_chan_cpp()                       except +topyexc
+    void _test_chan_cpp_elemops()               except +topyexc
     void _test_chan_vs_stackdeadwhileparked()   except +topyexc
+    void _test_chan_vs_native_thread()          except +topyexc
     void _test_go_cpp()                         except +topyexc
     void _test_close_wakeup_all_vsrecv()        except +topyexc
     void _test_close_wakeup_all_vsselect()      except +topyexc
     void _test_select_win_while_queue()         except +topyexc
     void _test_select_inplace()                 except +topyexc
+    void _test_chanselect_async()               except +topyexc
+    void _test_chan_fd()                        except +topyexc
+    void _test_chan_trysendrecv()               except +topyexc
+    void _test_chan_dataq_grow()                except +topyexc
+    void _test_runtime_memstats()               except +topyexc
+    void _test_poller()                         except +topyexc
     void _test_defer()                          except +topyexc
     void _test_refptr()                         except +topyexc
     void _test_global()                         except +topyexc
@@ -249,9 +267,15 @@ def test_chan_cpp_refcount():
 def test_chan_cpp():
     with nogil:
         _test_chan_cpp()
+def test_chan_cpp_elemops():
+    with nogil:
+        _test_chan_cpp_elemops()
 def test_chan_vs_stackdeadwhileparked():
     with nogil:
         _test_chan_vs_stackdeadwhileparked()
+def test_chan_vs_native_thread():
+    with nogil:
+        _test_chan_vs_native_thread()
 def test_go_cpp():
     with nogil:
         _test_go_cpp()
@@ -267,6 +291,24 @@ def test_select_win_while_queue():
 def test_select_inplace():
     with nogil:
         _test_select_inplace()
+def test_chanselect_async():
+    with nogil:
+        _test_chanselect_async()
+def test_chan_fd():
+    with nogil:
+        _test_chan_fd()
+def test_chan_trysendrecv():
+    with nogil:
+        _test_chan_trysendrecv()
+def test_chan_dataq_grow():
+    with nogil:
+        _test_chan_dataq_grow()
+def test_runtime_memstats():
+    with nogil:
+        _test_runtime_memstats()
+def test_poller():
+    with nogil:
+        _test_poller()
 def test_defer():
     with nogil:
         _test_defer()
@@ -350,6 +392,47 @@ cdef nogil:
         pych.chan_double().close()
 
 
+# helpers for pychan(dtype='C.struct{int64,double}')  py <-> c  tests.
+cdef struct _rec_int64_double:
+    int64_t a
+    double  b
+
+def pychan_rec_recv(pychan pych):
+    with nogil: _ = _pychan_rec_recv(pych)
+    return (_.a, _.b)
+def pychan_rec_send(pychan pych, obj):
+    cdef _rec_int64_double _
+    _.a, _.b = obj
+    with nogil: _pychan_rec_send(pych, _)
+
+cdef nogil:
+    _rec_int64_double _pychan_rec_recv(pychan pych)                         except +topyexc:
+        return _wrapchan[_rec_int64_double](pych._ch).recv()
+    void              _pychan_rec_send(pychan pych, _rec_int64_double obj)  except +topyexc:
+        _wrapchan[_rec_int64_double](pych._ch).send(obj)
+
+
+# helpers for pychan(dtype='C.PyBuffer')  py -> c  tests.
+ctypedef runtime._PyBuffer *_pPyBuffer # https://github.com/cython/cython/issues/534
+
+# pychan_buffer_recvsum receives buffer from pych in nogil mode and returns sum of its bytes.
+# it returns -1 if the channel was closed.
+def pychan_buffer_recvsum(pychan pych):
+    with nogil: _ = _pychan_buffer_recvsum(pych)
+    return _
+
+cdef nogil:
+    long _pychan_buffer_recvsum(pychan pych)    except +topyexc:
+        cdef runtime.PyBuffer pyb = adoptref[runtime._PyBuffer](_wrapchan[_pPyBuffer](pych._ch).recv())
+        if pyb == nil:
+            return -1
+        cdef const unsigned char *p = <const unsigned char *>pyb.view.buf
+        cdef long i, s = 0
+        for i in range(pyb.view.len):
+            s += p[i]
+        return s
+
+
 # verify that pychan_from_raw is not leaking C channel.
 def test_pychan_from_raw_noleak():
     # pychan_from_raw used to create another channel and leak it
@@ -409,6 +492,25 @@ cdef void _bench_chan_nogil__func1(chan[int] ch, chan[structZ] done) nogil:
             done.close()
             return
 
+# bench_chan_vs_native_thread_nogil and bench_chan_pingpong_vs_native_thread_nogil
+# measure throughput and latency of channel communication with a native thread
+# not spawned by the runtime (see runtime/libgolang_test.cpp).
+cdef extern from * nogil:
+    """
+    extern void _bench_chan_vs_native_thread(int N);
+    extern void _bench_chan_pingpong_vs_native_thread(int N);
+    """
+    void _bench_chan_vs_native_thread(int N)            except +topyexc
+    void _bench_chan_pingpong_vs_native_thread(int N)   except +topyexc
+def bench_chan_vs_native_thread_nogil(b):
+    cdef int N = b.N
+    with nogil:
+        _bench_chan_vs_native_thread(N)
+def bench_chan_pingpong_vs_native_thread_nogil(b):
+    cdef int N = b.N
+    with nogil:
+        _bench_chan_pingpong_vs_native_thread(N)
+
 # bench_select_nogil mirrors golang_test.py:bench_select
 def bench_select_nogil(b):
     cdef int N = b.N
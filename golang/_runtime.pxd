@@ -21,11 +21,19 @@
 """Package runtime mirrors Go package runtime.
 
  - `ARCH`, `OS`, `CC` indicate architecture, operating system and C compiler.
+ - `ReadMemStats` provides statistics about runtime memory allocator.
 """
 
 from golang cimport string
+from libc.stdint cimport uint64_t
 
 cdef extern from "golang/runtime.h" namespace "golang::runtime" nogil:
     string ARCH
     string OS
     string CC
+
+    struct MemStats:
+        uint64_t Mallocs
+        uint64_t Frees
+        uint64_t CacheHits
+    void ReadMemStats(MemStats *m)
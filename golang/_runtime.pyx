@@ -29,3 +29,23 @@ from golang cimport pyb
 PyARCH  = pyb(ARCH)
 PyOS    = pyb(OS)
 PyCC    = pyb(CC)
+
+
+# MemStats records statistics about memory that libgolang runtime allocates
+# for channels, waiters and select.
+class PyMemStats(object):
+    __slots__ = ('Mallocs', 'Frees', 'CacheHits')
+
+    def __repr__(m):
+        return 'MemStats(Mallocs=%d, Frees=%d, CacheHits=%d)' % (m.Mallocs, m.Frees, m.CacheHits)
+
+# ReadMemStats returns runtime memory allocator statistics.
+def PyReadMemStats(): # -> MemStats
+    cdef MemStats m
+    with nogil:
+        ReadMemStats(&m)
+    pym = PyMemStats()
+    pym.Mallocs   = m.Mallocs
+    pym.Frees     = m.Frees
+    pym.CacheHits = m.CacheHits
+    return pym
@@ -24,6 +24,11 @@
  - `Once` allows to execute an action only once.
  - `WaitGroup` allows to wait for a collection of tasks to finish.
  - `Sema`(*), `Mutex` and `RWMutex` provide low-level synchronization.
+ - `WeightedSema`(*) bounds usage of a resource, e.g. memory, by weight.
+ - `Broadcast`(*) and `Cond` allow to wait for and notify about events.
+ - `Pool` allows to reuse temporary objects.
+ - `SingleFlight`(*) suppresses duplicate concurrent calls.
+ - `Map` is a map safe for concurrent use.
 
 See also https://golang.org/pkg/sync for Go sync package documentation.
 
@@ -32,7 +37,8 @@ See also https://golang.org/pkg/sync for Go sync package documentation.
     provides corresponding Go equivalents.
 """
 
-from golang cimport error, refptr
+from golang cimport chan, structZ, error, refptr
+from libc.stdint cimport int64_t, uint64_t
 from golang cimport context
 
 cdef extern from "golang/sync.h" namespace "golang::sync" nogil:
@@ -52,6 +58,49 @@ cdef extern from "golang/sync.h" namespace "golang::sync" nogil:
         void RUnlock()
         void UnlockToRLock()
 
+    cppclass WeightedSema:
+        WeightedSema(int64_t n)
+        error acquire(context.Context ctx, int64_t w)
+        bint  try_acquire(int64_t w)
+        void  release(int64_t w)
+
+    cppclass Broadcast:
+        uint64_t gen()
+        void broadcast()
+        uint64_t wait(uint64_t gen)
+        chan[structZ] changed(uint64_t gen)
+
+    cppclass Cond:
+        Mutex *L
+        Cond(Mutex *L)
+        void wait()
+        void signal()
+        void broadcast()
+
+    cppclass Pool[T]:
+        Pool()
+        Pool(...)           # ... = func<T*()>
+        T   *get()
+        void put(T *obj)
+
+    cppclass SingleFlight[K, V]:
+        cppclass Result:
+            V       val
+            error   err
+            bint    shared
+        # do_ -> (val, err, shared) - not exposed to pyx since Cython cannot use C++ tuples
+        chan[Result] do_chan(const K &key, ...)     # ... = func<tuple<V, error>()>
+        void forget(const K &key)
+
+    cppclass Map[K, V]:
+        # load/load_or_store/load_and_delete -> (value, ok) are not exposed to pyx
+        # since Cython cannot use C++ tuples
+        V    get(const K &key)
+        bint has(const K &key)
+        void store(const K &key, const V &value)
+        void delete "delete_" (const K &key)
+        size_t len()
+
     cppclass Once:
         void do "do_" (...)     # ... = func<void()>
 
@@ -63,11 +112,15 @@ cdef extern from "golang/sync.h" namespace "golang::sync" nogil:
     # WorkGroup
     cppclass _WorkGroup:
         void  go(...)                       # ... = func<error(context::Context)>
+        bint  try_go(...)                   # ... = func<error(context::Context)>
         error wait()
+        void  set_limit(int n)
 
     cppclass WorkGroup (refptr[_WorkGroup]):
         # WorkGroup.X = WorkGroup->X in C++.
-        void  go    "_ptr()->go"    (...)   # ... = func<error(context::Context)>
-        error wait  "_ptr()->wait"  ()
+        void  go        "_ptr()->go"        (...)   # ... = func<error(context::Context)>
+        bint  try_go    "_ptr()->try_go"    (...)   # ... = func<error(context::Context)>
+        error wait      "_ptr()->wait"      ()
+        void  set_limit "_ptr()->set_limit" (int n)
 
     WorkGroup NewWorkGroup(context.Context ctx)
@@ -23,9 +23,10 @@
 from __future__ import print_function, absolute_import
 
 from cython  cimport final
-from cpython cimport PyObject, PY_MAJOR_VERSION
-from golang  cimport nil, newref, topyexc
-from golang  cimport context
+from cpython cimport PyObject, Py_INCREF, Py_DECREF, PY_MAJOR_VERSION
+from golang  cimport chan, structZ, pychan, pyerror, nil, newref, topyexc, _chantimeout_ns
+from libc.stdint cimport int64_t, uint64_t, UINT64_MAX
+from golang  cimport context, time
 from golang.pyx cimport runtime
 ctypedef runtime._PyError* runtime_pPyError # https://github.com/cython/cython/issues/534
 
@@ -33,9 +34,42 @@ ctypedef runtime._PyError* runtime_pPyError # https://github.com/cython/cython/i
 cdef extern from "golang/sync.h" namespace "golang::sync" nogil:
     context.Context _WorkGroup_ctx(_WorkGroup *_wg)
 
+    cppclass _Pool:
+        void *get()
+        void put(void *obj)
+        void _trim()
+
+# _Pool of Python objects. The pool owns references to cached objects.
+#
+# The pool is not trimmed by libgolang trimming ticks: those run on timer
+# goroutine, and freeing Python objects there would need to take the GIL, which
+# can block the timer for long and crash at interpreter finalization. PyPool
+# trims itself instead (see PyPool._maytrim), so that the pool calls
+# _pypool_free only from under PyPool methods with the GIL held.
+cdef extern from * nogil:
+    """
+    static void _pypool_free(void *obj) {
+        Py_DECREF((PyObject *)obj);
+    }
+    static golang::sync::_Pool *_makepypool() {
+        return new golang::sync::_Pool(golang::nil, _pypool_free, /*autotrim=*/false);
+    }
+    """
+    _Pool *_makepypool()
+
+# Broadcast._wait_timed is internal and is not exposed in sync.pxd
+cdef extern from * nogil:
+    """
+    static uint64_t _Broadcast_wait_timed(golang::sync::Broadcast *bc, uint64_t gen, uint64_t timeout_ns) {
+        return bc->_wait_timed(gen, timeout_ns);
+    }
+    """
+    uint64_t _Broadcast_wait_timed(Broadcast *bc, uint64_t gen, uint64_t timeout_ns)
+
 from libcpp.cast cimport dynamic_cast
 
 import sys as pysys
+from golang._golang import pygo
 
 
 @final
@@ -117,6 +151,399 @@ cdef class PyRWMutex:
     # TODO then `with mu.RLocker()` would mean "with read lock".
 
 
+@final
+cdef class PyWeightedSema:
+    """WeightedSema provides weighted semaphore.
+
+    It bounds usage of a resource of total size n: .acquire(ctx, w) waits
+    until w units are available, or ctx is canceled, and .release(w) gives w
+    units back. Waiters are served in FIFO order, so that large requests are
+    not starved by small ones.
+
+    For example:
+
+      inflight = sync.WeightedSema(64*1024*1024)  # bytes in flight
+      ...
+      inflight.acquire(ctx, len(data))            # raises ctx.err() if ctx is canceled
+      try:
+          process(data)
+      finally:
+          inflight.release(len(data))
+    """
+    cdef WeightedSema *sema
+
+    def __cinit__(PyWeightedSema pysema, int64_t n):
+        pysema.sema = new WeightedSema(n)
+
+    def __dealloc__(PyWeightedSema pysema):
+        del pysema.sema
+        pysema.sema = NULL
+
+    def acquire(PyWeightedSema pysema, context.PyContext pyctx not None, int64_t w=1):
+        cdef error err
+        with nogil:
+            err = wsema_acquire_pyexc(pysema.sema, pyctx.ctx, w)
+        if err != nil:
+            raise pyerror.from_error(err)
+
+    def try_acquire(PyWeightedSema pysema, int64_t w=1): # -> bool
+        cdef bint ok
+        with nogil:
+            ok = wsema_tryacquire_pyexc(pysema.sema, w)
+        return ok
+
+    def release(PyWeightedSema pysema, int64_t w=1):
+        with nogil:
+            wsema_release_pyexc(pysema.sema, w)
+
+
+@final
+cdef class PyBroadcast:
+    """Broadcast allows to wait for and notify about events.
+
+    Broadcast maintains generation counter that is incremented on every
+    .broadcast(). Waiters remember current generation via .gen() and then
+    .wait(gen) for the generation to change, for example:
+
+      # waiter                      # notifier
+      with mu:                      with mu:
+          while not condition:          modify condition
+              gen = bc.gen()            bc.broadcast()
+              mu.unlock()
+              bc.wait(gen)
+              mu.lock()
+
+    .changed(gen) returns channel that becomes ready when the generation
+    changes from gen. It can be used to wait for notification inside select:
+
+      _, _rx = select(
+          ctx.done().recv,            # 0
+          bc.changed(gen).recv,       # 1
+      )
+
+    Contrary to closing and recreating a channel on every notification,
+    .broadcast() does not allocate memory.
+    """
+    cdef Broadcast bc
+
+    # FIXME cannot catch/pyreraise panic of .bc ctor
+    # https://github.com/cython/cython/issues/3165
+
+    def gen(PyBroadcast pybc): # -> int
+        cdef uint64_t gen
+        with nogil:
+            gen = broadcast_gen_pyexc(&pybc.bc)
+        return gen
+
+    def broadcast(PyBroadcast pybc):
+        with nogil:
+            broadcast_broadcast_pyexc(&pybc.bc)
+
+    # wait waits for generation to change from gen and returns new generation.
+    #
+    # if timeout (in seconds) is given, wait waits for at most timeout and
+    # returns gen if the generation did not change.
+    def wait(PyBroadcast pybc, uint64_t gen, timeout=None): # -> int
+        cdef uint64_t timeout_ns = UINT64_MAX
+        if timeout is not None:
+            timeout_ns = _chantimeout_ns(timeout)
+        with nogil:
+            gen = broadcast_wait_pyexc(&pybc.bc, gen, timeout_ns)
+        return gen
+
+    def changed(PyBroadcast pybc, uint64_t gen): # -> pychan(dtype='C.structZ')
+        cdef chan[structZ] ch
+        with nogil:
+            ch = broadcast_changed_pyexc(&pybc.bc, gen)
+        return pychan.from_chan_structZ(ch)
+
+
+@final
+cdef class PyCond:
+    """Cond provides condition variable.
+
+    It mirrors sync.Cond from Go: .L must be locked when calling .wait();
+    .wait() atomically unlocks .L and suspends execution until woken up by
+    .signal() or .broadcast(). .L is locked again before .wait() returns.
+    """
+    cdef Cond *cond
+    cdef readonly PyMutex L
+
+    def __cinit__(PyCond pycond, PyMutex L not None):
+        pycond.L    = L
+        pycond.cond = new Cond(&L.mu)
+
+    def __dealloc__(PyCond pycond):
+        del pycond.cond
+        pycond.cond = NULL
+
+    def wait(PyCond pycond):
+        with nogil:
+            cond_wait_pyexc(pycond.cond)
+
+    def signal(PyCond pycond):
+        with nogil:
+            cond_signal_pyexc(pycond.cond)
+
+    def broadcast(PyCond pycond):
+        with nogil:
+            cond_broadcast_pyexc(pycond.cond)
+
+
+@final
+cdef class PyPool:
+    """Pool allows to reuse temporary objects.
+
+    .get() returns object from the pool, or, if the pool is empty, new object
+    created via new(). .put() gives object back to the pool for reuse. For
+    example:
+
+      bufpool = sync.Pool(new=bytearray)
+      ...
+      buf = bufpool.get()
+      ... use buf
+      bufpool.put(buf)
+
+    Objects that stay unused in the pool are released automatically by
+    subsequent .get and .put, and when the pool is destroyed.
+    The pool does not reset objects given back to it via .put().
+
+    See sync::Pool in C++ API for details.
+    """
+    cdef _Pool   *_pool
+    cdef object  _new       # func() -> object | None
+    cdef double  _trimt     # time of last trimming tick
+
+    def __cinit__(PyPool pypool, new=None):
+        pypool._new   = new
+        pypool._pool  = pypool_new_pyexc()
+        pypool._trimt = time.now()
+
+    def __dealloc__(PyPool pypool):
+        del pypool._pool    # releases objects cached in the pool
+        pypool._pool = NULL
+
+    def get(PyPool pypool):
+        pypool._maytrim()
+        cdef PyObject *_obj = pypool_get_pyexc(pypool._pool)
+        if _obj != NULL:
+            obj = <object>_obj
+            Py_DECREF(obj)  # reference that was owned by the pool
+            return obj
+        if pypool._new is None:
+            return None
+        return pypool._new()
+
+    def put(PyPool pypool, obj):
+        if obj is None:
+            return
+        Py_INCREF(obj)      # reference is owned by the pool from now on
+        pypool_put_pyexc(pypool._pool, <PyObject *>obj)
+        pypool._maytrim()
+
+    # _trim performs one trimming tick right away.
+    def _trim(PyPool pypool):
+        pypool._trimt = time.now()
+        pypool_trim_pyexc(pypool._pool)
+
+    # _maytrim performs trimming tick if _pypoolTrimInterval passed since the
+    # previous one. It is called by .get and .put instead of the pool being
+    # trimmed by libgolang trimming ticks.
+    cdef _maytrim(PyPool pypool):
+        cdef double now = time.now()
+        if now - pypool._trimt >= _pypoolTrimInterval:
+            pypool._trimt = now
+            pypool_trim_pyexc(pypool._pool)
+
+# _pypoolTrimInterval is the period of PyPool trimming ticks.
+# it is the same as _poolTrimInterval in sync.cpp .
+cdef double _pypoolTrimInterval = 1*time.second
+
+
+# _PyFlightCall represents in-flight or completed call of PySingleFlight.
+class _PyFlightCall(object):
+    __slots__ = (
+        'wg',       # PyWaitGroup       done when the call completes
+        'val',      # fn result
+        'exc',      # exception raised by fn, or None
+        'dups',     # number of callers that joined the call
+        'chans',    # [] of chan to deliver result to .do_chan callers
+    )
+
+    def __init__(c):
+        c.wg    = PyWaitGroup()
+        c.val   = None
+        c.exc   = None
+        c.dups  = 0
+        c.chans = []
+
+@final
+cdef class PySingleFlight:
+    """SingleFlight provides duplicate call suppression.
+
+    Concurrent .do(key, fn) calls with the same key share one execution of fn:
+    the first call runs fn and the other calls wait for it to complete and
+    receive the same result, or the same exception, for example:
+
+      sf = sync.SingleFlight()
+      ...
+      v, shared = sf.do(key, lambda: load_expensive(key))
+
+    .do_chan() is similar to .do(), but does not block and delivers the result
+    as (val, exc, shared) via returned channel, which allows to wait for it
+    inside select. .forget(key) tells SingleFlight to forget about key: next
+    .do(key) will call fn instead of waiting for currently running call to
+    complete.
+
+    SingleFlight is modelled after https://godoc.org/golang.org/x/sync/singleflight.
+    """
+    cdef PyMutex _mu
+    cdef dict    _m     # key -> in-flight _PyFlightCall
+
+    def __cinit__(PySingleFlight sf):
+        sf._mu = PyMutex()
+        sf._m  = {}
+
+    # do executes fn, making sure that only one execution is in-flight for a
+    # given key at a time.
+    def do(PySingleFlight sf, key, fn): # -> (val, shared)
+        sf._mu.lock()
+        c = sf._m.get(key)
+        if c is not None:
+            c.dups += 1
+            sf._mu.unlock()
+            c.wg.wait()
+            if c.exc is not None:
+                raise c.exc
+            return c.val, True
+
+        c = _PyFlightCall()
+        c.wg.add(1)
+        sf._m[key] = c
+        sf._mu.unlock()
+
+        sf._docall(c, key, fn)
+        if c.exc is not None:
+            raise c.exc
+        return c.val, c.dups > 0
+
+    # do_chan is like do but returns channel that will receive (val, exc, shared)
+    # when the result is ready. The channel is not closed.
+    def do_chan(PySingleFlight sf, key, fn): # -> chan
+        ch = pychan(1)
+        sf._mu.lock()
+        c = sf._m.get(key)
+        if c is not None:
+            c.dups += 1
+            c.chans.append(ch)
+            sf._mu.unlock()
+            return ch
+
+        c = _PyFlightCall()
+        c.wg.add(1)
+        c.chans.append(ch)
+        sf._m[key] = c
+        sf._mu.unlock()
+
+        pygo(sf._docall, c, key, fn)
+        return ch
+
+    # forget tells SingleFlight to forget about key.
+    def forget(PySingleFlight sf, key):
+        with sf._mu:
+            sf._m.pop(key, None)
+
+    # _docall runs fn for call c and delivers its result.
+    def _docall(PySingleFlight sf, c, key, fn):
+        try:
+            c.val = fn()
+        except:
+            c.exc = pysys.exc_info()[1]
+        finally:
+            c.wg.done()
+            with sf._mu:
+                if sf._m.get(key) is c: # not forgotten
+                    del sf._m[key]
+                shared = c.dups > 0
+            for ch in c.chans:
+                ch.send((c.val, c.exc, shared)) # cap=1 - does not block
+
+
+@final
+cdef class PyMap:
+    """Map is a map safe for concurrent use by multiple goroutines.
+
+    It mirrors sync.Map from Go: .load(), .store(), .load_or_store(),
+    .load_and_delete() and .delete() operate on individual keys atomically,
+    and .range(f) calls f(key, value) for every item until f returns false.
+
+    Python-level Map is implemented on top of dict, whose individual operations
+    are atomic with respect to the GIL for keys with builtin __hash__ and
+    __eq__. This way lookups need no additional locking, and concurrent
+    lookups do not block each other. Only .store() and the insert path of
+    .load_or_store() are serialized with a mutex, so that .load_or_store()
+    stays atomic for any key.
+
+    See sync::Map in C++ API for map that is usable from nogil code.
+    """
+    cdef dict    _d
+    cdef PyMutex _mu    # serializes .store and insert in .load_or_store
+
+    def __cinit__(PyMap m):
+        m._d  = {}
+        m._mu = PyMutex()
+
+    def load(PyMap m, key): # -> (value, ok)
+        v = m._d.get(key, _missing)
+        if v is _missing:
+            return None, False
+        return v, True
+
+    def store(PyMap m, key, value):
+        with m._mu:
+            m._d[key] = value
+
+    def load_or_store(PyMap m, key, value): # -> (actual, loaded)
+        v = m._d.get(key, _missing)
+        if v is not _missing:
+            return v, True
+
+        # NOTE lookup + insert is not atomic under GIL alone: key's __hash__
+        # and __eq__, or GC, can run Python code and switch to another thread
+        # or goroutine in between. Redo the lookup and insert under ._mu, so
+        # that concurrent .load_or_store and .store of the key are serialized.
+        with m._mu:
+            v = m._d.get(key, _missing)
+            if v is not _missing:
+                return v, True
+            m._d[key] = value
+            return value, False
+
+    def load_and_delete(PyMap m, key): # -> (value, loaded)
+        v = m._d.pop(key, _missing)
+        if v is _missing:
+            return None, False
+        return v, True
+
+    def delete(PyMap m, key):
+        m._d.pop(key, None)
+
+    # range calls f(key, value) for every item present in the map.
+    # It stops the iteration when f returns false.
+    #
+    # range iterates over a snapshot of the map, so f is free to access it.
+    def range(PyMap m, f):
+        for k, v in list(m._d.items()):
+            if not f(k, v):
+                break
+
+    def __len__(PyMap m):
+        return len(m._d)
+
+# _missing is used by PyMap to detect absent keys.
+cdef object _missing = object()
+
+
 @final
 cdef class PyOnce:
     """Once allows to execute an action only once.
@@ -206,6 +633,11 @@ cdef class PyWorkGroup:
           wg.go(f1)
           wg.go(f2)
 
+    The number of simultaneously running goroutines can be limited via
+    .set_limit(n). With limit set, .go() blocks until a goroutine becomes
+    available, and .try_go() returns False instead of blocking. Goroutines
+    are reused to run functions of blocked .go() calls.
+
     WorkGroup is modelled after https://godoc.org/golang.org/x/sync/errgroup but
     is not equal to it.
     """
@@ -228,6 +660,18 @@ cdef class PyWorkGroup:
         with nogil:
             workgroup_go_pyctxfunc_pyexc(pywg.wg, pywg._pyctx.ctx, <PyObject*>pyrunf)
 
+    def try_go(PyWorkGroup pywg, f, *argv, **kw): # -> bool
+        def pyrunf():
+            f(pywg._pyctx, *argv, **kw)
+        cdef bint ok
+        with nogil:
+            ok = workgroup_trygo_pyctxfunc_pyexc(pywg.wg, pywg._pyctx.ctx, <PyObject*>pyrunf)
+        return ok
+
+    def set_limit(PyWorkGroup pywg, int n):
+        with nogil:
+            workgroup_setlimit_pyexc(pywg.wg, n)
+
     def wait(PyWorkGroup pyg):
         cdef error err
         with nogil:
@@ -351,6 +795,38 @@ cdef nogil:
     void rwmutex_unlocktorlock_pyexc(RWMutex *mu)   except +topyexc:
         mu.UnlockToRLock()
 
+    error wsema_acquire_pyexc(WeightedSema *sema, context.Context ctx, int64_t w)   except +topyexc:
+        return sema.acquire(ctx, w)
+    bint wsema_tryacquire_pyexc(WeightedSema *sema, int64_t w)  except +topyexc:
+        return sema.try_acquire(w)
+    void wsema_release_pyexc(WeightedSema *sema, int64_t w)     except +topyexc:
+        sema.release(w)
+
+    uint64_t broadcast_gen_pyexc(Broadcast *bc)                 except +topyexc:
+        return bc.gen()
+    void broadcast_broadcast_pyexc(Broadcast *bc)               except +topyexc:
+        bc.broadcast()
+    uint64_t broadcast_wait_pyexc(Broadcast *bc, uint64_t gen, uint64_t timeout_ns) except +topyexc:
+        return _Broadcast_wait_timed(bc, gen, timeout_ns)
+    chan[structZ] broadcast_changed_pyexc(Broadcast *bc, uint64_t gen)  except +topyexc:
+        return bc.changed(gen)
+
+    void cond_wait_pyexc(Cond *cond)        except +topyexc:
+        cond.wait()
+    void cond_signal_pyexc(Cond *cond)      except +topyexc:
+        cond.signal()
+    void cond_broadcast_pyexc(Cond *cond)   except +topyexc:
+        cond.broadcast()
+
+    _Pool *pypool_new_pyexc()                               except +topyexc:
+        return _makepypool()
+    PyObject *pypool_get_pyexc(_Pool *pool)                 except +topyexc:
+        return <PyObject *>pool.get()
+    void pypool_put_pyexc(_Pool *pool, PyObject *obj)       except +topyexc:
+        pool.put(obj)
+    void pypool_trim_pyexc(_Pool *pool)                     except +topyexc:
+        pool._trim()
+
     void waitgroup_done_pyexc(WaitGroup *wg)                except +topyexc:
         wg.done()
     void waitgroup_add_pyexc(WaitGroup *wg, int delta)      except +topyexc:
@@ -362,6 +838,10 @@ cdef nogil:
         return NewWorkGroup(ctx)
     void workgroup_go_pyctxfunc_pyexc(WorkGroup wg, context.Context ctx, PyObject *pyf) except +topyexc:
         wg.go(_PyCtxFunc(ctx, pyf))
+    bint workgroup_trygo_pyctxfunc_pyexc(WorkGroup wg, context.Context ctx, PyObject *pyf) except +topyexc:
+        return wg.try_go(_PyCtxFunc(ctx, pyf))
+    void workgroup_setlimit_pyexc(WorkGroup wg, int n)      except +topyexc:
+        wg.set_limit(n)
     error workgroup_wait_pyexc(WorkGroup wg)                except +topyexc:
         return wg.wait()
 
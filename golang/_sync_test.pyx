@@ -177,6 +177,25 @@ def test_once():
         _test_once()
 
 
+# verify Map via pyx-level API
+cdef void _test_map() nogil except +topyexc:
+    cdef sync.Map[int, int] m
+    if m.has(1):
+        panic("map: has(1) on empty map")
+    m.store(1, 2)
+    if not (m.has(1) and m.get(1) == 2):
+        panic("map: store(1, 2) not loaded back")
+    if not (m.get(3) == 0):
+        panic("map: get of absent key != 0")
+    m.delete(1)
+    if not (m.len() == 0):
+        panic("map: len != 0 after delete")
+
+def test_map():
+    with nogil:
+        _test_map()
+
+
 # sync_test.cpp
 cdef extern from * nogil:
     """
@@ -186,3 +205,42 @@ cdef extern from * nogil:
 def test_sync_once_cpp():
     with nogil:
         _test_sync_once_cpp()
+
+cdef extern from * nogil:
+    """
+    extern void _test_sync_broadcast_cpp();
+    extern void _test_sync_cond_cpp();
+    extern void _test_sync_pool_cpp();
+    extern void _test_sync_workgroup_limit_cpp();
+    extern void _test_sync_weightedsema_cpp();
+    extern void _test_sync_singleflight_cpp();
+    extern void _test_sync_map_cpp();
+    """
+    void _test_sync_broadcast_cpp()             except +topyexc
+    void _test_sync_cond_cpp()                  except +topyexc
+    void _test_sync_pool_cpp()                  except +topyexc
+    void _test_sync_workgroup_limit_cpp()       except +topyexc
+    void _test_sync_weightedsema_cpp()          except +topyexc
+    void _test_sync_singleflight_cpp()          except +topyexc
+    void _test_sync_map_cpp()                   except +topyexc
+def test_sync_broadcast_cpp():
+    with nogil:
+        _test_sync_broadcast_cpp()
+def test_sync_cond_cpp():
+    with nogil:
+        _test_sync_cond_cpp()
+def test_sync_pool_cpp():
+    with nogil:
+        _test_sync_pool_cpp()
+def test_sync_workgroup_limit_cpp():
+    with nogil:
+        _test_sync_workgroup_limit_cpp()
+def test_sync_weightedsema_cpp():
+    with nogil:
+        _test_sync_weightedsema_cpp()
+def test_sync_singleflight_cpp():
+    with nogil:
+        _test_sync_singleflight_cpp()
+def test_sync_map_cpp():
+    with nogil:
+        _test_sync_map_cpp()
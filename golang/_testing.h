@@ -26,6 +26,7 @@
 #include "golang/libgolang.h"
 #include <sstream>
 #include <string.h>
+#include <utility>
 #include <vector>
 
 // std::to_string<T> - provide missing pieces.
@@ -80,6 +81,34 @@ void __assert_eq(const string& loc, const string &expr, const T &have, const U &
     }
 };
 
+// shared<T> is T allocated on heap to be shared in between a test and
+// goroutines it spawns.
+//
+// A goroutine must not access stack of another goroutine while that goroutine
+// is parked (see STACK_DEAD_WHILE_PARKED), so the test has to keep state it
+// shares with spawned goroutines on heap, and pass it to them by value:
+//
+//   auto st = _testing::newshared<State>();
+//   go([st]() { st->... });
+//   ...
+template<typename T>
+class shared : public object, public T {
+public:
+    template<typename... Argv>
+    shared(Argv&&... argv) : T(std::forward<Argv>(argv)...) {}
+
+    void decref() {
+        if (__decref())
+            delete this;
+    }
+};
+
+// newshared creates new shared<T> constructed with argv.
+template<typename T, typename... Argv>
+refptr<shared<T>> newshared(Argv&&... argv) {
+    return adoptref(new shared<T>(std::forward<Argv>(argv)...));
+}
+
 }}  // golang::_testing::
 
 
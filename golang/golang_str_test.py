@@ -1928,6 +1928,47 @@ def test_strings_methods():
     _("мир").zfill(10,                              ok="0000000мир")
     _("123").zfill(10,                              ok="0000000123")
 
+    # ASCII data - bstr handles it on bytes level; verify that the result is
+    # the same as on unicode level including for characters like \x1c-\x1f
+    # and \v that unicode treats as whitespace and line boundaries.
+    _("hello WORLD").capitalize(                    ok="Hello world")
+    _("abc").center(8,                              ok="  abc   ")
+    _("abc").center(8, "ж",                         ok="жжabcжжж")
+    _("a\tb").expandtabs(4,                         ok="a   b")
+    _("abc1").isalnum(                              ok=True)
+    _("abc").isalpha(                               ok=True)
+    _("123").isdecimal(                             ok=True)
+    _("1.5").isnumeric(                             ok=False)
+    _("abc").islower(                               ok=True)
+    _(" \t\x1c\x1f").isspace(                       ok=True)
+    _(" a ").isspace(                               ok=False)
+    _("").isspace(                                  ok=False)
+    _("Hello World").istitle(                       ok=True)
+    _("abc").ljust(6, "*",                          ok="abc***")
+    _("ABC").lower(                                 ok="abc")
+    _("\x1c\x1f abc \x1e").lstrip(                  ok="abc \x1e")
+    _("xyabc").lstrip("yx",                         ok="abc")
+    _("abc").lstrip("жa",                           ok="bc")
+    _("abc").rjust(6,                               ok="   abc")
+    _("a b\x1cc").rsplit(                           ok=["a", "b", "c"])
+    _("a b c").rsplit(None, 1,                      ok=["a b", "c"])
+    _("a,b,c").rsplit(",", 1,                       ok=["a,b", "c"])
+    _("abc\r\n").rstrip("\r\n",                     ok="abc")
+    _("abc \x1f").rstrip(                           ok="abc")
+    _("a b\x1dc\td").split(                         ok=["a", "b", "c", "d"])
+    _(" a  b c ").split(None, 1,                    ok=["a", "b c "])
+    _("a,b,,c").split(",",                          ok=["a", "b", "", "c"])
+    _("a,b").split("ж",                             ok=["a,b"])
+    _("a\nb\r\nc\rd").splitlines(                   ok=["a", "b", "c", "d"])
+    _("a\x0bb\x0cc\x1cd\x1de\x1ef\x1fg").splitlines(ok=["a", "b", "c", "d", "e", "f\x1fg"])
+    _("a\x0bb\n").splitlines(True,                  ok=["a\x0b", "b\n"])
+    _("\x1c abc \x1d").strip(                       ok="abc")
+    _("xabcx").strip("x",                           ok="abc")
+    _("aBc").swapcase(                              ok="AbC")
+    _("hello wORLD").title(                         ok="Hello World")
+    _("abc").upper(                                 ok="ABC")
+    _("-12").zfill(5,                               ok="-0012")
+
 
 # verify bstr.translate in bytes mode
 def test_strings_bstr_translate_bytemode():
@@ -2830,6 +2871,22 @@ def bench_bencode(b):
     for i in xrange(b.N):
         bb(s)
 
+# bstr text methods on ASCII data
+def bench_bstr_lower(b):
+    s = golang.b('Hello World '*10)
+    for i in xrange(b.N):
+        s.lower()
+
+def bench_bstr_strip(b):
+    s = golang.b(' Hello World '*10)
+    for i in xrange(b.N):
+        s.strip()
+
+def bench_bstr_split(b):
+    s = golang.b('Hello World '*10)
+    for i in xrange(b.N):
+        s.split()
+
 
 # ---- misc ----
 
@@ -20,8 +20,8 @@
 
 from __future__ import print_function, absolute_import
 
-from golang import go, chan, select, default, nilchan, _PanicError, func, panic, \
-        defer, recover, u
+from golang import go, chan, select, aselect, Selector, Poller, default, nilchan, _PanicError, func, panic, \
+        defer, recover, deferring, u
 from golang import sync
 from pytest import raises, mark, fail, skip
 from _pytest._code import Traceback
@@ -338,6 +338,144 @@ def test_chan_sendrecv_2way():
         assert ch.recv() == ('world %d' % i)
 
 
+# verify chan.try_send/try_recv and chan.send_timeout/recv_timeout.
+def test_chan_try_and_timeout():
+    ch = chan(1)
+    assert ch.try_recv() == (None, False, False)
+    assert ch.recv_timeout(0.001) == (None, False, False)
+    assert len_recvq(ch) == 0
+    assert ch.try_send(1) == True
+    assert ch.try_send(2) == False
+    assert ch.send_timeout(2, 0.001) == False
+    assert len_sendq(ch) == 0
+    assert ch.try_recv() == (1, True, True)
+    assert ch.send_timeout(2, 0) == True
+    assert ch.recv_timeout(1) == (2, True, True)
+
+    # timed wait completed by peer
+    ch2 = chan()
+    go(lambda: ch2.send(3))
+    assert ch2.recv_timeout(10) == (3, True, True)
+    done = chan()
+    def _():
+        assert ch2.recv() == 4
+        done.close()
+    go(_)
+    assert ch2.send_timeout(4, 10) == True
+    done.recv()
+
+    # not sent object is not leaked
+    obj = object()
+    gc.collect()
+    nref = sys.getrefcount(obj)
+    assert ch2.try_send(obj) == False
+    assert ch2.send_timeout(obj, 0.001) == False
+    gc.collect()
+    assert sys.getrefcount(obj) == nref
+
+    # closed
+    ch2.close()
+    assert ch2.try_recv() == (None, False, True)
+    assert ch2.recv_timeout(1) == (None, False, True)
+    with panics("send on closed channel"): ch2.try_send(5)
+    with panics("send on closed channel"): ch2.send_timeout(5, 1)
+
+    # non-object dtype
+    ch3 = chan(1, dtype='C.int')
+    assert ch3.try_recv() == (None, False, False)
+    assert ch3.try_send(6) == True
+    assert ch3.try_recv() == (6, True, True)
+
+    # nil channel is never ready
+    assert nilchan.try_send(1) == False
+    assert nilchan.try_recv() == (None, False, False)
+    assert nilchan.recv_timeout(0.001) == (None, False, False)
+
+
+# verify `for x in ch` and ch.iter(prefetch=N).
+@mark.parametrize('prefetch', [None, 1, 3, 100])
+def test_chan_iter(prefetch):
+    def chiter(ch):
+        if prefetch is None:
+            return iter(ch)
+        return ch.iter(prefetch=prefetch)
+
+    N = 10
+    ch = chan(4)
+    def _():
+        for i in range(N):
+            ch.send(i)
+        ch.close()
+    go(_)
+    assert list(chiter(ch)) == list(range(N))
+
+    # closed with data in buffer
+    ch = chan(3, dtype='C.int')
+    ch.send(1); ch.send(2)
+    ch.close()
+    it = chiter(ch)
+    assert next(it) == 1
+    assert next(it) == 2
+    with raises(StopIteration):
+        next(it)
+    with raises(StopIteration):
+        next(it)
+
+    # prefetched, but not consumed objects are not leaked
+    obj = object()
+    gc.collect()
+    nref = sys.getrefcount(obj)
+    ch = chan(3)
+    ch.send(obj); ch.send(obj); ch.send(obj)
+    it = chiter(ch)
+    assert next(it) is obj
+    del it
+    gc.collect()
+    assert sys.getrefcount(obj) == nref + 3 - (1 if prefetch in (None, 1) else 3)
+
+def test_chan_iter_invalid():
+    with raises(ValueError):
+        chan().iter(prefetch=0)
+
+
+# verify chan.fileno - that it can be used to wait for the channel via OS-level select.
+@mark.skipif(sys.platform == 'win32', reason="OS-level select works only with sockets on windows")
+def test_chan_fileno():
+    import select as ioselect
+    def readable(ch, timeout=0):
+        r, _, _ = ioselect.select([ch], [], [], timeout)
+        return r == [ch]
+
+    ch = chan(1)
+    assert not readable(ch)
+    ch.send(1)
+    assert readable(ch)
+    assert select(ch.recv, default) == (0, 1)
+    assert not readable(ch)
+
+    # wakeup by sender from another goroutine
+    ch2 = chan()
+    go(lambda: ch2.send(2))
+    assert readable(ch2, timeout=10)
+    assert ch2.recv() == 2
+    assert not readable(ch2)
+
+    # close
+    ch.close()
+    assert readable(ch)
+    assert ch.recv_() == (None, False)
+    assert readable(ch)
+
+    # non-object dtype
+    ch3 = chan(1, dtype='C.int')
+    assert not readable(ch3)
+    ch3.send(3)
+    assert readable(ch3)
+
+    with panics("fd of nil channel"):
+        nilchan.fileno()
+
+
 # benchmark sync chan send/recv.
 # pyx/nogil mirror is in _golang_test.pyx
 def bench_chan(b):
@@ -680,6 +818,27 @@ def test_select():
     assert len_sendq(ch2) == len_recvq(ch2) == 0
 
 
+    # blocking select with send and recv on the same channel.
+    # select must not match its own cases with each other, and must not
+    # deadlock while registering them. Cases are queued in random order, so
+    # try several times for registering recv before send to be exercised.
+    for i in range(10):
+        ch1 = chan()
+        ch2 = chan()
+        def _():
+            waitBlocked(ch2.recv)
+            ch2.send('c')
+        go(_)
+        _, _rx = select(
+            ch1.recv,           # 0
+            ch2.recv_,          # 1
+            (ch1.send, 'x'),    # 2
+        )
+        assert (_, _rx) == (1, ('c', True))
+        assert len_sendq(ch1) == len_recvq(ch1) == 0
+        assert len_sendq(ch2) == len_recvq(ch2) == 0
+
+
 # verify that select does not leak references to passed objects.
 @mark.skipif(not hasattr(sys, 'getrefcount'),   # skipped e.g. on PyPy
              reason="needs sys.getrefcount")
@@ -720,6 +879,136 @@ def test_select_refleak():
     assert sys.getrefcount(obj1) == nref2
 
 
+# verify Selector - select with precompiled cases.
+def test_selector():
+    ch1 = chan(1)
+    ch2 = chan(1)
+    ch3 = chan(1, dtype='C.int')
+
+    sel = Selector(
+        ch1.recv,           # 0
+        ch2.recv_,          # 1
+        (ch3.send, 1),      # 2
+        default,            # 3
+    )
+
+    assert sel.select() == (2, None)
+    assert ch3.recv() == 1
+    assert sel.select(txv=(2,)) == (2, None)
+    assert ch3.recv() == 2
+    ch3.send(0)
+    assert sel.select() == (3, None)            # ch3 is full; send value stays 2
+    assert ch3.recv() == 0
+
+    ch1.send('a')
+    ch3.send(0)
+    assert sel.select() == (0, 'a')
+    ch2.send('b')
+    assert sel.select() == (1, ('b', True))
+    ch2.close()
+    assert sel.select() == (1, (None, False))
+    assert ch3.recv() == 0
+    assert sel.select() in ((1, (None, False)), (2, None))
+
+    # blocking
+    ch4 = chan()
+    sel = Selector(ch1.recv, ch4.recv)
+    go(lambda: ch1.send('c'))
+    assert sel.select() == (0, 'c')
+
+    # selector keeps its channels alive
+    sel_ = Selector((chan(1).send, 1), default)
+    gc.collect()
+    assert sel_.select() == (0, None)
+    assert sel_.select() == (1, None)
+
+    # invalid
+    with panics("Selector: select: 2 values to send, but there are 0 send cases"):
+        sel.select((1,2))
+    with panics("pyselect: invalid [3]() case"):
+        Selector((1,2,3))
+    with raises(TypeError):
+        Selector((ch3.send, 'zzz'))
+
+    # refcounting of sent objects
+    ch = chan(1)
+    obj1 = object()
+    obj2 = object()
+    gc.collect()
+    nref1 = sys.getrefcount(obj1)
+    nref2 = sys.getrefcount(obj2)
+    sel = Selector((ch.send, obj1), default)
+    assert sys.getrefcount(obj1) == nref1 + 1
+    assert sel.select() == (0, None)
+    assert sel.select() == (1, None)
+    assert sel.select(txv=[obj2]) == (1, None)
+    assert sys.getrefcount(obj1) == nref1 + 1
+    assert sys.getrefcount(obj2) == nref2 + 1
+    assert ch.recv() is obj1
+    assert sys.getrefcount(obj1) == nref1
+    del sel
+    gc.collect()
+    assert sys.getrefcount(obj1) == nref1
+    assert sys.getrefcount(obj2) == nref2
+
+
+def test_poller():
+    ch1 = chan(1)
+    ch2 = chan(dtype='C.int')
+    ch3 = chan()
+    poller = Poller()
+    for ch in (ch1, ch2, ch3):
+        poller.add(ch)
+    assert len(poller) == 3
+    assert poller.wait(timeout=0) is None
+    assert poller.wait(timeout=0.001) is None
+
+    ch1.send('a')
+    assert poller.wait() is ch1
+    assert poller.wait() is ch1     # stays ready until received from
+    assert ch1.try_recv() == ('a', True, True)
+    assert poller.wait(timeout=0) is None
+
+    # blocking: woken up by the peer
+    go(lambda: ch2.send(2))
+    assert poller.wait() is ch2
+    assert ch2.try_recv() == (2, True, True)
+
+    # closed -> ready
+    ch3.close()
+    assert poller.wait() is ch3
+    poller.remove(ch3)
+    assert len(poller) == 2
+    assert poller.wait(timeout=0) is None
+
+    # invalid
+    with panics("poller: add: channel is already registered"):
+        poller.add(ch1)
+    with panics("poller: remove: channel is not registered"):
+        poller.remove(ch3)
+    with panics("poller: add of nil channel"):
+        poller.add(nilchan)
+
+    # drain loop stops when all channels are closed
+    chv = [chan(2), chan(2)]
+    poller = Poller()
+    for ch in chv:
+        poller.add(ch)
+        ch.send(1); ch.send(2); ch.close()
+    rxv = []
+    while len(poller) > 0:
+        ch = poller.wait(timeout=10)
+        assert ch is not None
+        rx, ok, done = ch.try_recv()
+        if not done:
+            continue
+        if not ok:
+            poller.remove(ch)
+            continue
+        rxv.append(rx)
+    assert sorted(rxv) == [1, 1, 2, 2]
+
+
 # benchmark sync chan send vs recv on select side.
 # pyx/nogil mirror is in _golang_test.pyx
 def bench_select(b):
@@ -747,6 +1036,143 @@ def bench_select(b):
     ch1.close()
     done.recv()
 
+# benchmark the same as bench_select, but with precompiled Selector.
+def bench_selector(b):
+    ch1  = chan()
+    ch2  = chan()
+    done = chan()
+    def _():
+        sel = Selector(
+            ch1.recv_,   # 0
+            ch2.recv_,   # 1
+        )
+        while 1:
+            _, _rx = sel.select()
+            if _ == 0:
+                _, ok = _rx
+                if not ok:
+                    done.close()
+                    return
+    go(_)
+
+    _ = (ch1, ch2)
+    for i in xrange(b.N):
+        ch = _[i%2]
+        ch.send(1)
+
+    ch1.close()
+    done.recv()
+
+
+# verify asyncio integration: chan.arecv/arecv_/asend and aselect.
+@mark.skipif(six.PY2, reason="asyncio is py3-only")
+def test_chan_asyncio():
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        _test_chan_asyncio(loop)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+def _test_chan_asyncio(loop):
+    import asyncio
+    run = loop.run_until_complete
+
+    # inloop calls f from inside running loop and returns its result.
+    # asend/arecv/aselect must be called this way - e.g. from a coroutine.
+    def inloop(f, *argv):
+        fut = loop.create_future()
+        def _():
+            try:
+                fut.set_result(f(*argv))
+            except BaseException as e:
+                fut.set_exception(e)
+        loop.call_soon(_)
+        return run(fut)
+
+    # outside of running loop
+    ch = chan(1)
+    with raises(RuntimeError):
+        ch.arecv()
+    with raises(RuntimeError):
+        aselect(ch.recv, default)
+
+    # ready case completes immediately
+    ch = chan(1)
+    ch.send(1)
+    fut = inloop(ch.arecv)
+    assert fut.done()
+    assert run(fut) == 1
+    fut = inloop(ch.asend, 2)
+    assert fut.done()
+    assert run(fut) is None
+    assert ch.recv() == 2
+
+    # recv woken up by goroutine
+    ch = chan()
+    def _():
+        ch.send('a')
+        ch.close()
+    fut = inloop(ch.arecv)
+    assert not fut.done()
+    assert len_recvq(ch) == 1
+    go(_)
+    assert run(fut) == 'a'
+    assert run(inloop(ch.arecv_)) == (None, False)
+    assert run(inloop(ch.arecv))  is None
+
+    # send woken up by goroutine
+    ch   = chan()
+    done = chan()
+    def _():
+        assert ch.recv() == 'b'
+        done.close()
+    fut = inloop(ch.asend, 'b')
+    assert not fut.done()
+    assert len_sendq(ch) == 1
+    go(_)
+    assert run(fut) is None
+    done.recv()
+
+    # aselect
+    ch1 = chan()
+    ch2 = chan()
+    fut = inloop(aselect, ch1.recv, ch2.recv_, (ch1.send, 'x'))
+    assert not fut.done()
+    go(ch2.send, 'c')
+    assert run(fut) == (1, ('c', True))
+    assert len_recvq(ch1) == len_sendq(ch1) == len_recvq(ch2) == 0
+    assert run(inloop(aselect, ch1.recv, default)) == (1, None)
+
+    # cancel
+    ch = chan()
+    fut = inloop(ch.arecv)
+    assert len_recvq(ch) == 1
+    fut.cancel()
+    run(asyncio.sleep(0))   # let done callbacks run
+    assert len_recvq(ch) == 0
+    assert select((ch.send, 1), default) == (1, None)
+
+    # send on closed channel
+    ch = chan()
+    fut = inloop(ch.asend, 1)
+    ch.close()
+    with panics("send on closed channel"):
+        run(fut)
+
+    # many waiters do not need many threads
+    ch = chan()
+    N  = 1000
+    futv = inloop(lambda: [ch.arecv() for i in xrange(N)])
+    assert len_recvq(ch) == N
+    def _():
+        for i in xrange(N):
+            ch.send(i)
+    go(_)
+    assert sorted(run(asyncio.gather(*futv))) == list(xrange(N))
+
 
 def test_blockforever():
     with panicWhenBlocked():
@@ -973,6 +1399,162 @@ def test_chan_dtype_misc(dtype):
         assert (nilch2 != nilch)    == True
 
 
+# verify chan(dtype=X) with record dtypes.
+def test_chan_dtype_record():
+    # C.bytes[N]
+    ch = chan(2, dtype='C.bytes[4]')
+    ch.send(b'abcd')
+    ch.send(bytearray(b'\x00\x01\x02\x03'))
+    assert ch.recv() == b'abcd'
+    _ = ch.recv()
+    assert type(_) is bytes
+    assert _ == b'\x00\x01\x02\x03'
+    for obj in (b'abc', b'abcde', u'abcd', 1234, None):
+        with raises(TypeError) as exc:
+            ch.send(obj)
+        assert exc.value.args == ("type mismatch: expect bytes[4]; got %r" % (obj,),)
+    ch.close()
+    assert ch.recv_() == (b'\x00'*4, False)
+
+    # C.struct{...}
+    ch = chan(1, dtype='C.struct{int64,double}')
+    ch.send((-1, 2.5))
+    assert ch.recv() == (-1, 2.5)
+    ch.send((1<<62, 3))         # int -> double  ok
+    _ = ch.recv()
+    assert _ == (1<<62, 3.0)
+    assert type(_[1]) is float
+    for obj in ((1,), (1, 2.0, 3), [1, 2.0], (1.5, 2.0), (True, 2.0), ('a', 2.0), (1, 'b'), (1, None), 1, None):
+        with raises(TypeError):
+            ch.send(obj)
+    with raises(OverflowError):
+        ch.send((1<<63, 0.0))
+    ch.close()
+    assert ch.recv_() == ((0, 0.0), False)
+
+    # all field types, padding
+    ch = chan(1, dtype='C.struct{bool,int8,int16,int32,int64,uint8,uint16,uint32,uint64,float,double,bytes[3]}')
+    obj = (True, -128, -32768, -(1<<31), -(1<<63), 255, 65535, (1<<32)-1, (1<<64)-1, 0.5, 1.25, b'xyz')
+    ch.send(obj)
+    assert ch.recv() == obj
+    for obj2 in ((True, 128) + obj[2:], obj[:5] + (-1,) + obj[6:], obj[:11] + (b'xy',)):
+        with raises((TypeError, OverflowError)):
+            ch.send(obj2)
+
+    # dtype name is canonicalized; the same dtype results in the same nil
+    nilch = chan.nil('C.struct{ int64, double }')
+    assert nilch is chan.nil('C.struct{int64,double}')
+    assert repr(nilch) == "chan.nil('C.struct{int64,double}')"
+    assert nilch != chan.nil('C.struct{double,int64}')
+    assert nilch == nilchan
+
+    # invalid record dtypes
+    for dtype in ('C.bytes[0]', 'C.bytes[-1]', 'C.bytes[x]', 'C.bytes[4', 'C.struct{}',
+                  'C.struct{int64,}', 'C.struct{int}', 'C.struct{int64', 'C.struct{C.int64}'):
+        with raises(TypeError) as exc:
+            chan(dtype=dtype)
+        assert exc.value.args == ("pychan: invalid dtype: %r" % (dtype,),)
+    with raises(TypeError) as exc:
+        chan(dtype='C.bytes[100000]')
+    assert 'too large' in exc.value.args[0]
+
+# verify that record dtypes larger than 8 bytes work with all channel operations.
+def test_chan_dtype_record_large():
+    blk = lambda i: (b'%02d' % i) * 32
+    ch = chan(4, dtype='C.bytes[64]')
+
+    # select
+    _, _rx = select((ch.send, blk(1)))
+    assert (_, _rx) == (0, None)
+    _, _rx = select(ch.recv_)
+    assert (_, _rx) == (0, (blk(1), True))
+    with raises(TypeError):
+        select((ch.send, b'short'))
+
+    # Selector
+    sel = Selector((ch.send, blk(2)), default)
+    assert sel.select() == (0, None)
+    assert sel.select([blk(3)]) == (0, None)
+    assert ch.recv() == blk(2)
+    assert ch.recv() == blk(3)
+    del sel
+
+    # try/timeout
+    assert ch.try_recv() == (None, False, False)
+    assert ch.try_send(blk(4)) == True
+    assert ch.try_recv() == (blk(4), True, True)
+
+    # iteration with prefetch
+    for i in range(4):
+        ch.send(blk(i))
+    ch.close()
+    assert list(ch.iter(prefetch=3)) == [blk(i) for i in range(4)]
+
+# verify that record channel can be used by nogil code.
+def test_chan_dtype_record_nogil():
+    ch = chan(dtype='C.struct{int64,double}')
+    def _():
+        _golang_test.pychan_rec_send(ch, (7, 0.5))
+        ch.send(_golang_test.pychan_rec_recv(ch))
+    go(_)
+    assert ch.recv() == (7, 0.5)
+    ch.send((-3, 1.5))
+    assert ch.recv() == (-3, 1.5)
+
+    # element size is verified when raw channel is wrapped
+    with panics("wrapchan: elemsize mismatch"):
+        _golang_test.pychan_rec_recv(chan(dtype='C.bytes[8]'))
+
+
+# verify chan(dtype='C.PyBuffer') - channel that pins buffers of sent objects.
+def test_chan_dtype_pybuffer():
+    ch = chan(2, dtype='C.PyBuffer')
+    data = bytearray(b'hello')
+    ch.send(data)
+
+    # the buffer is pinned while it is in the channel
+    with raises(BufferError):
+        data.extend(b'!')
+    _ = ch.recv()
+    assert type(_) is memoryview
+    _[0:1] = b'H'   # zero-copy
+    assert data == bytearray(b'Hello')
+    _.release()
+    data.extend(b'!')   # unpinned
+
+    for obj in (u'abc', 1, None, object()):
+        with raises(TypeError) as exc:
+            ch.send(obj)
+        assert exc.value.args == ("type mismatch: expect buffer; got %r" % (obj,),)
+
+    # not sent buffer is unpinned
+    ch2 = chan(dtype='C.PyBuffer')
+    assert ch2.try_send(data) == False
+    assert select((ch2.send, data), default) == (1, None)
+    sel = Selector((ch2.send, data), default)
+    assert sel.select() == (1, None)
+    del sel
+    data.extend(b'!')
+
+    # nogil receiver
+    done = chan()
+    def _():
+        done.send(_golang_test.pychan_buffer_recvsum(ch))
+    go(_)
+    ch.send(b'\x01\x02\x03')
+    assert done.recv() == 6
+
+    # buffered, but not received data is unpinned when the channel is gone
+    ch3 = chan(1, dtype='C.PyBuffer')
+    ch3.send(data)
+    del ch3
+    data.extend(b'!')
+
+    ch = chan(dtype='C.PyBuffer')
+    ch.close()
+    assert ch.recv_() == (None, False)
+
+
 def test_func():
     # test how @func works inside module namespace
     tpy = dir_testprog + "/golang_test_func.py"
@@ -999,6 +1581,30 @@ def test_func():
     s = b''.join([_(l) for l in s.splitlines(True)])
     run(s)
 
+# verify that @func wrapper provides introspection of the wrapped function.
+def test_func_introspect():
+    def f(x, y=3, *argv, **kw):
+        """doc for f"""
+        return (x, y, argv, kw)
+    f.attr = 'zzz'
+    g = func(f)
+
+    assert g is not f
+    assert g.__name__   == 'f'
+    assert g.__module__ == __name__
+    assert g.__doc__    == "doc for f"
+    assert g.attr       == 'zzz'
+    assert fmtargspec(g) == '(x, y=3, *argv, **kw)'
+    if six.PY3:
+        assert g.__qualname__ == f.__qualname__
+        assert g.__wrapped__  is f
+
+    assert g(1)                 == (1, 3, (), {})
+    assert g(1, 2, 3, z=4)      == (1, 2, (3,), {'z': 4})
+    assert g(y=5, x=6)          == (6, 5, (), {})
+    with raises(TypeError):
+        g()
+
 
 # @func overhead at def time.
 def bench_def(b):
@@ -1010,6 +1616,28 @@ def bench_func_def(b):
         @func
         def _(): pass
 
+# @func overhead at import time of a module with many @func functions and methods.
+def bench_import(b):
+    _bench_import(b, "")
+
+def bench_func_import(b):
+    _bench_import(b, "@func")
+
+def _bench_import(b, deco):
+    src = ["from golang import func"]
+    for i in range(100):
+        src += ["%s" % deco,
+                "def f%d(x, y=%d, *argv, **kw):" % (i, i),
+                "    return x + y"]
+    src += ["class C(object):"]
+    for i in range(100):
+        src += ["    %s" % deco,
+                "    def m%d(self, x, y=%d):" % (i, i),
+                "        return x + y"]
+    code = compile("\n".join(src), "<bench_import>", "exec")
+    for i in xrange(b.N):
+        six.exec_(code, {})
+
 # @func overhead at call time.
 def bench_call(b):
     def _(): pass
@@ -1262,6 +1890,182 @@ def test_deferrecover():
     assert v == ['del', 5, 1]
 
 
+def test_deferring():
+    # defer inside `with deferring()` block - calls run in LIFO order on block exit
+    v = []
+    def _():
+        v.append('a')
+        with deferring():
+            defer(lambda: v.append(1))
+            defer(lambda: v.append(2))
+            v.append('b')
+        v.append('c')
+    _()
+    assert v == ['a', 'b', 2, 1, 'c']
+
+    # deferred calls are run even if the block raises
+    v = []
+    def _():
+        with deferring():
+            defer(lambda: v.append(1))
+            defer(lambda: v.append(2))
+            1/0
+    with raises(ZeroDivisionError): _()
+    assert v == [2, 1]
+
+    # nested blocks
+    v = []
+    def _():
+        with deferring():
+            defer(lambda: v.append(1))
+            with deferring():
+                defer(lambda: v.append(2))
+            v.append(3)
+            defer(lambda: v.append(4))
+    _()
+    assert v == [2, 3, 4, 1]
+
+    # deferring inside @func: defer goes to innermost scope
+    v = []
+    @func
+    def _():
+        defer(lambda: v.append(1))
+        with deferring():
+            defer(lambda: v.append(2))
+        v.append(3)
+    _()
+    assert v == [2, 3, 1]
+
+    # defer called by deferred function - goes to the same scope
+    v = []
+    def _():
+        with deferring():
+            def d():
+                v.append(1)
+                defer(lambda: v.append(2))
+            defer(d)
+    _()
+    assert v == [1, 2]
+
+    # defer in function called from the block, but not @func - is caught
+    def nofunc():
+        defer(lambda: None)
+    def _():
+        with deferring():
+            nofunc()
+    with panics("function nofunc uses defer, but not @func"):
+        _()
+
+    # recover
+    v = []
+    def _():
+        with deferring():
+            def d():
+                v.append(recover())
+            defer(d)
+            panic("zzz")
+        v.append('after')
+    _()
+    assert v == ['zzz', 'after']
+
+    # recover not called by deferred function directly - returns None
+    v = []
+    def _():
+        with deferring():
+            def d():
+                def rrr():
+                    return recover()
+                v.append(rrr())
+            defer(d)
+            panic("aaa")
+    with panics("aaa"):
+        _()
+    assert v == [None]
+
+    # recover called from the block itself (not deferred) - returns None
+    def _():
+        with deferring():
+            try:
+                raise RuntimeError("bbb")
+            except RuntimeError:
+                assert recover() is None
+                raise
+    with raises(RuntimeError, match="bbb"):
+        _()
+
+    # exception raised by deferred call is chained and can be recovered by
+    # call deferred before it
+    v = []
+    def _():
+        with deferring():
+            defer(lambda: v.append(recover()))
+            def d():
+                raise RuntimeError("ddd")
+            defer(d)
+            panic("ccc")
+    _()
+    assert len(v) == 1
+    e = v[0]
+    assert type(e) is RuntimeError
+    assert e.args == ("ddd",)
+    assert type(e.__context__) is _PanicError
+    assert e.__context__.args == ("ccc",)
+
+    # not recovered - exception raised by the last deferred call propagates
+    def _():
+        with deferring():
+            def d1():
+                raise RuntimeError("d1")
+            defer(d1)
+            def d2():
+                raise RuntimeError("d2")
+            defer(d2)
+            raise RuntimeError("body")
+    with raises(RuntimeError) as exci:
+        _()
+    e1 = exci.value
+    assert e1.args == ("d1",)
+    e2 = e1.__context__
+    assert type(e2) is RuntimeError
+    assert e2.args == ("d2",)
+    e3 = e2.__context__
+    assert type(e3) is RuntimeError
+    assert e3.args == ("body",)
+    assert e3.__context__ is None
+
+    # defer scopes are per-goroutine
+    ch = chan()
+    v1 = []; v2 = []
+    def g(v, x):
+        with deferring():
+            defer(lambda: v.append(x))
+            ch.send(x)
+            ch.recv()
+    done = chan()
+    def _():
+        g(v1, 1)
+        done.close()
+    go(_)
+    assert ch.recv() == 1
+    def _():
+        with deferring():
+            defer(lambda: v2.append(2))
+            ch.send(None)
+    _()
+    done.recv()
+    assert v1 == [1]
+    assert v2 == [2]
+
+    # deferring cannot be entered twice
+    def _():
+        d = deferring()
+        with d:
+            with d:
+                pass
+    with panics("deferring: already entered"):
+        _()
+
+
 # verify that defer correctly establishes exception chain (even on py2).
 def test_defer_excchain():
     # just @func/raise embeds traceback and adds ø chain
@@ -1457,7 +2261,7 @@ def test_recover_traceback_and_excchain():
             assert e2.__traceback__ is not None
             t2 = Traceback(e2.__traceback__)
             assert t2[-1].name == "pp2"
-            # [-2] == _GoFrame.__exit__
+            # [-2] == deferring._rundefers
 
             e1 = e2.__context__
             assert type(e1) is RuntimeError
@@ -1575,9 +2379,7 @@ RuntimeError: gamma
 
     assertDoc("""\
 Traceback (most recent call last):
-  File "PYGOLANG/golang/__init__.py", line ..., in _goframe
-    return f(*argv, **kw)
-           ^^^^^^^^^^^^^^                                       +PY311 -PY313
+  File "golang/_golang.pyx", line ..., in golang._golang._goframe...
   File "PYGOLANG/golang/golang_test.py", line ..., in caller
     raise RuntimeError("ccc")
 RuntimeError: ccc
@@ -1585,9 +2387,7 @@ RuntimeError: ccc
 During handling of the above exception, another exception occurred:
 
 Traceback (most recent call last):
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()
-    ~^^                                                         +PY313
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._rundefers...
   File "PYGOLANG/golang/golang_test.py", line ..., in q2
     raise RuntimeError("bbb")
 RuntimeError: bbb
@@ -1599,17 +2399,9 @@ Traceback (most recent call last):
     caller()
     ~~~~~~^^                                                    +PY313
   ...
-  File "PYGOLANG/golang/__init__.py", line ..., in _goframe
-    return f(*argv, **kw)                                       -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()                                                         -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()
-    ~^^                                                         +PY313
+  File "golang/_golang.pyx", line ..., in golang._golang._goframe...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._exit...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._rundefers...
   File "PYGOLANG/golang/golang_test.py", line ..., in q1
     raise RuntimeError("aaa")
 RuntimeError: aaa
@@ -1622,17 +2414,9 @@ Traceback (most recent call last):
     caller()
     ~~~~~~^^                                                    +PY313
   ...
-  File "PYGOLANG/golang/__init__.py", line ..., in _goframe
-    return f(*argv, **kw)                                       -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()                                                         -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()
-    ~^^                                                         +PY313
+  File "golang/_golang.pyx", line ..., in golang._golang._goframe...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._exit...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._rundefers...
   File "PYGOLANG/golang/golang_test.py", line ..., in q1
     raise RuntimeError("aaa")
 RuntimeError: aaa
@@ -1641,9 +2425,7 @@ RuntimeError: aaa
     e.__cause__ = e.__context__
     assertDoc("""\
 Traceback (most recent call last):
-  File "PYGOLANG/golang/__init__.py", line ..., in _goframe
-    return f(*argv, **kw)
-           ^^^^^^^^^^^^^^                                       +PY311 -PY313
+  File "golang/_golang.pyx", line ..., in golang._golang._goframe...
   File "PYGOLANG/golang/golang_test.py", line ..., in caller
     raise RuntimeError("ccc")
 RuntimeError: ccc
@@ -1651,9 +2433,7 @@ RuntimeError: ccc
 During handling of the above exception, another exception occurred:
 
 Traceback (most recent call last):
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()
-    ~^^                                                         +PY313
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._rundefers...
   File "PYGOLANG/golang/golang_test.py", line ..., in q2
     raise RuntimeError("bbb")
 RuntimeError: bbb
@@ -1665,17 +2445,9 @@ Traceback (most recent call last):
     caller()
     ~~~~~~^^                                                    +PY313
   ...
-  File "PYGOLANG/golang/__init__.py", line ..., in _goframe
-    return f(*argv, **kw)                                       -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()                                                         -PY310
-    with __goframe__:                                           +PY310
-         ^^^^^^^^^^^                                            +PY312
-  File "PYGOLANG/golang/__init__.py", line ..., in __exit__
-    d()
-    ~^^                                                         +PY313
+  File "golang/_golang.pyx", line ..., in golang._golang._goframe...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._exit...
+  File "golang/_golang.pyx", line ..., in golang._golang.pydeferring._rundefers...
   File "PYGOLANG/golang/golang_test.py", line ..., in q1
     raise RuntimeError("aaa")
 RuntimeError: aaa
@@ -1753,6 +2525,15 @@ def bench_defer(b):
     for i in xrange(b.N):
         _()
 
+def bench_deferring(b):
+    def fin(): pass
+    def _():
+        with deferring():
+            defer(fin)
+
+    for i in xrange(b.N):
+        _()
+
 
 # test_error lives in errors_test.py
 # strings tests live in golang_str_test.py
@@ -37,7 +37,8 @@
 //
 //  - `go` spawns new task.
 //  - `chan<T>`, and `select` provide channels with Go semantic and automatic
-//    lifetime management.
+//    lifetime management. Elements can be of any type, e.g. string or
+//    refptr, not only trivially copyable ones.
 //  - `defer` schedules cleanup.
 //  - `error` is the interface that represents errors.
 //  - `panic` throws exception that represent C-level panic.
@@ -140,9 +141,14 @@
 //
 //  - `_taskgo` spawns new task.
 //  - `_makechan` creates raw channel with Go semantic.
+//  - `_makechan_elemops` creates raw channel for elements that are not trivially copyable.
 //  - `_chanxincref` and `_chanxdecref` manage channel lifetime.
 //  - `_chansend` and `_chanrecv` send/receive over raw channel.
+//  - `_chantrysend` and `_chantryrecv_` send/receive without blocking or with timeout.
+//  - `_chanfd` provides file descriptor that reflects channel readiness.
 //  - `_chanselect`, `_selsend`, `_selrecv`, ... provide raw select functionality.
+//  - `_chanselect_async` provides raw select that does not block.
+//  - `_makepoller`, `_polleradd`, `_pollerwait`, ... provide raw poller over many channels.
 //
 //
 // Runtimes
@@ -220,15 +226,27 @@ LIBGOLANG_API void _taskgo(void (*f)(void *arg), void *arg);
 
 typedef struct _chan _chan;
 LIBGOLANG_API _chan *_makechan(unsigned elemsize, unsigned size);
+
+// _chanelemops describes how a channel transfers elements whose type is not
+// trivially copyable. See _makechan_elemops for details.
+typedef struct _chanelemops {
+    void (*move)   (void *dst, void *src);  // construct *dst by moving from *src
+    void (*zero)   (void *dst);             // construct zero value at *dst
+    void (*destroy)(void *p);               // destroy *p
+} _chanelemops;
+LIBGOLANG_API _chan *_makechan_elemops(unsigned elemsize, unsigned size, const _chanelemops *elemops);
 LIBGOLANG_API void _chanxincref(_chan *ch);
 LIBGOLANG_API void _chanxdecref(_chan *ch);
 LIBGOLANG_API int  _chanrefcnt(_chan *ch);
 LIBGOLANG_API void _chansend(_chan *ch, const void *ptx);
 LIBGOLANG_API void _chanrecv(_chan *ch, void *prx);
 LIBGOLANG_API bool _chanrecv_(_chan *ch, void *prx);
+LIBGOLANG_API bool _chantrysend(_chan *ch, const void *ptx, uint64_t timeout_ns);
+LIBGOLANG_API bool _chantryrecv_(_chan *ch, void *prx, bool *pok, uint64_t timeout_ns);
 LIBGOLANG_API void _chanclose(_chan *ch);
 LIBGOLANG_API unsigned _chanlen(_chan *ch);
 LIBGOLANG_API unsigned _chancap(_chan *ch);
+LIBGOLANG_API int _chanfd(_chan *ch);
 
 enum _chanop {
     _CHANSEND   = 0,
@@ -317,6 +335,27 @@ _selcase _selrecv_(_chan *ch, void *prx, bool *pok) {
 // _default represents default case for _chanselect.
 extern LIBGOLANG_API const _selcase _default;
 
+// _chanselect_async, _selasync_done and _selasync_cancel provide select that
+// does not block: instead of parking current goroutine, notify callback is
+// invoked when one of the cases becomes ready. This allows to integrate
+// channels with event loops, e.g. asyncio.
+typedef struct _selasync _selasync;
+LIBGOLANG_API int  _chanselect_async(const _selcase *casev, int casec,
+                                     void (*notify)(void *arg), void *arg, _selasync **pasel);
+LIBGOLANG_API int  _selasync_done(_selasync *asel);
+LIBGOLANG_API bool _selasync_cancel(_selasync *asel);
+
+// _makepoller, _polleradd, _pollerremove, _pollerwait and _pollerfree provide
+// poller that watches many channels for readiness to receive. Contrary to
+// select, channels are registered with the poller only once, and waiting on
+// the poller does not depend on number of registered channels.
+typedef struct _poller _poller;
+LIBGOLANG_API _poller *_makepoller(void);
+LIBGOLANG_API void   _pollerfree(_poller *p);
+LIBGOLANG_API void   _polleradd(_poller *p, _chan *ch);
+LIBGOLANG_API void   _pollerremove(_poller *p, _chan *ch);
+LIBGOLANG_API _chan *_pollerwait(_poller *p, uint64_t timeout_ns);
+
 
 // libgolang runtime - the runtime must be initialized before any other libgolang use.
 typedef struct _libgolang_sema _libgolang_sema;
@@ -406,6 +445,7 @@ LIBGOLANG_API void _libgolang_init(const _libgolang_runtime_ops *runtime_ops);
 // for testing
 LIBGOLANG_API int _tchanrecvqlen(_chan *ch);
 LIBGOLANG_API int _tchansendqlen(_chan *ch);
+LIBGOLANG_API unsigned _tchandataqcap(_chan *ch);
 LIBGOLANG_API extern void (*_tblockforever)(void);
 
 #ifdef __cplusplus
@@ -423,6 +463,7 @@ LIBGOLANG_API extern void (*_tblockforever)(void);
 #include <functional>
 #include <initializer_list>
 #include <memory>
+#include <new>
 #include <string>
 #include <type_traits>
 #include <utility>
@@ -457,6 +498,42 @@ static inline void go(F /*func<void(Argv...)>*/ f, Argv... argv) {
     }, frun);
 }
 
+// _chantimeout_ns converts timeout in seconds to nanoseconds for _chantrysend/_chantryrecv_.
+static inline uint64_t _chantimeout_ns(double timeout) {
+    if (timeout <= 0)
+        return 0;
+    timeout *= 1E9; // s -> ns
+    if (timeout >= (double)UINT64_MAX)
+        return UINT64_MAX;
+    return (uint64_t)timeout;
+}
+
+// _chanelemops_for<T> provides element operations for chan<T>.
+//
+// Trivially copyable elements are transferred by plain memcpy and don't need
+// element operations at all. Other elements are move-constructed into and out
+// of channel buffer and peer slots.
+template<typename T>
+struct _chanelemops_for {
+    static constexpr bool trivial = std::is_trivially_copyable<T>::value ||
+                                    std::is_empty<T>::value; // e.g. struct{}
+
+    static void move(void *dst, void *src)  { new (dst) T(std::move(*(T *)src)); }
+    static void zero(void *dst)             { new (dst) T(); }
+    static void destroy(void *p)            { ((T *)p)->~T(); }
+
+    // get returns element operations for chan<T>, or nil if T is trivially copyable.
+    static const _chanelemops *get() {
+        // NOTE positional init - designated initializers are C++20
+        static const _chanelemops ops = {
+            move,       // .move
+            zero,       // .zero
+            destroy,    // .destroy
+        };
+        return trivial ? nil : &ops;
+    }
+};
+
 template<typename T> class chan;
 template<typename T> static chan<T> makechan(unsigned size=0);
 template<typename T> static chan<T> _wrapchan(_chan *_ch);
@@ -495,21 +572,52 @@ public:
         return *this;
     }
 
-    // _chan does plain memcpy to copy elements.
-    // TODO allow all types (e.g. element=chan )
-    static_assert(std::is_trivially_copyable<T>::value, "TODO chan<T>: T copy is not trivial");
+    // Trivially copyable elements are transferred with plain memcpy. Elements
+    // of other types, e.g. string, vector or refptr, are move-constructed into
+    // and out of channel buffer. Such T must be default-constructible.
 
     // send/recv/close
-    inline void send(const T &ptx)    const  { _chansend(_ch, &ptx);                  }
+    //
+    // send(const T&) sends a copy of the value; send(T&&) moves the value into
+    // the channel and leaves it moved-from once sent.
+    inline void send(const T &tx)     const  { if (_chanelemops_for<T>::trivial)
+                                                   _chansend(_ch, &tx);
+                                               else {
+                                                   T _tx(tx); _chansend(_ch, &_tx);
+                                               }                                      }
+    inline void send(T &&tx)          const  { _chansend(_ch, &tx);                   }
     inline T recv()                   const  { T rx; _chanrecv(_ch, &rx); return rx;  }
     inline std::pair<T,bool> recv_()  const  { T rx; bool ok = _chanrecv_(_ch, &rx);
-                                               return std::make_pair(rx, ok);         }
+                                               return std::make_pair(std::move(rx), ok); }
     inline void close()               const  { _chanclose(_ch);                       }
 
+    // trysend/tryrecv_ are non-blocking (timeout=0), or timed, variants of send/recv_.
+    //
+    // trysend returns whether the value was sent.
+    // tryrecv_ returns whether receive was done, and, if done, sets *prx and *pok as recv_ would.
+    inline bool trysend(const T &tx, double timeout=0) const {
+        if (_chanelemops_for<T>::trivial)
+            return _chantrysend(_ch, &tx, _chantimeout_ns(timeout));
+        T _tx(tx);
+        return _chantrysend(_ch, &_tx, _chantimeout_ns(timeout));
+    }
+    inline bool tryrecv_(T *prx, bool *pok, double timeout=0) const {
+        return _chantryrecv_(_ch, prx, pok, _chantimeout_ns(timeout));
+    }
+
     // send/recv in select
 
     // ch.sends creates `ch.send(*ptx)` case for select.
-    [[nodiscard]] inline _selcase sends(const T *ptx) const { return _selsend(_ch, ptx); }
+    //
+    // if T is not trivially copyable, *ptx is moved from if this case is
+    // selected. For such T ptx must thus point to non-const value.
+    [[nodiscard]] inline _selcase sends(T *ptx) const { return _selsend(_ch, ptx); }
+    [[nodiscard]] inline _selcase sends(const T *ptx) const {
+        static_assert(_chanelemops_for<T>::trivial,
+                      "chan<T>.sends(const T*): T is not trivially copyable; *ptx would be moved from");
+        return _selsend(_ch, ptx);
+    }
+    [[nodiscard]] inline _selcase sends(Nil) const { return _selsend(_ch, nil); } // for _INPLACE_DATA
 
     // ch.recvs creates `*prx = ch.recv()` case for select.
     //
@@ -523,6 +631,10 @@ public:
     inline unsigned len()       const  { return _chanlen(_ch); }
     inline unsigned cap()       const  { return _chancap(_ch); }
 
+    // fd returns file descriptor that becomes readable when recv is likely not to block.
+    // see _chanfd for details.
+    inline int fd()             const  { return _chanfd(_ch); }
+
     // compare wrt nil
     inline bool operator==(Nil) const  { return (_ch == nil); }
     inline bool operator!=(Nil) const  { return (_ch != nil); }
@@ -547,17 +659,17 @@ unsigned _elemsize() {
 template<typename T> static inline
 chan<T> makechan(unsigned size) {
     chan<T> ch;
-    ch._ch = _makechan(_elemsize<T>(), size);
+    ch._ch = _makechan_elemops(_elemsize<T>(), size, _chanelemops_for<T>::get());
     return ch;
 }
 
 // _wrapchan<T> wraps raw channel with chan<T>.
-// raw channel must be either nil or its element size must correspond to T.
-LIBGOLANG_API void __wrapchan(_chan *_ch, unsigned elemsize);
+// raw channel must be either nil or its element size and element operations must correspond to T.
+LIBGOLANG_API void __wrapchan(_chan *_ch, unsigned elemsize, bool elemtrivial);
 template<typename T> static inline
 chan<T> _wrapchan(_chan *_ch) {
     chan<T> ch;
-    __wrapchan(_ch, _elemsize<T>());
+    __wrapchan(_ch, _elemsize<T>(), _chanelemops_for<T>::trivial);
     ch._ch = _ch;
     return ch;
 }
@@ -594,6 +706,44 @@ int select(const std::vector<_selcase> &casev) {
     return _chanselect(casev.data(), casev.size());
 }
 
+// Poller watches many channels for readiness to receive.
+//
+// Channels are registered with the poller once, and wait returns a ready
+// channel without locking, or registering waiters on, all registered
+// channels. This is useful for fan-in over many channels, for example:
+//
+//   Poller poller;
+//   poller.add(ch1);
+//   poller.add(ch2);
+//   while (1) {
+//       _chan *ch = poller.wait();
+//       if (ch == ch1._rawchan())
+//           ch1.tryrecv_(&v1, &ok);
+//       ...
+//   }
+//
+// See _makepoller for details.
+class Poller {
+    _poller *_p;
+
+public:
+    inline Poller()  { _p = _makepoller(); }
+    inline ~Poller() { _pollerfree(_p); _p = nil; }
+
+    // add/remove register/unregister channel with the poller.
+    template<typename T> inline void add(const chan<T> &ch)     { _polleradd(_p, ch._rawchan());    }
+    template<typename T> inline void remove(const chan<T> &ch)  { _pollerremove(_p, ch._rawchan()); }
+
+    // wait waits for a registered channel to become ready to receive and returns it.
+    // trywait is non-blocking (timeout=0), or timed, variant of wait; it returns nil on timeout.
+    inline _chan *wait()                    { return _pollerwait(_p, UINT64_MAX);                 }
+    inline _chan *trywait(double timeout=0) { return _pollerwait(_p, _chantimeout_ns(timeout));   }
+
+private:
+    Poller(const Poller&);  // don't copy
+    Poller(Poller&&);       // don't move
+};
+
 // defer(f) mimics `defer f()` from golang.
 // NOTE contrary to Go f is called at end of current scope, not function.
 #define defer(f) golang::_deferred _defer_(__COUNTER__) (f)
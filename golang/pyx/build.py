@@ -327,10 +327,12 @@ def _with_build_defaults(name, kw):   # -> (pygo, kw')
         'strings.h',
         'sync.h',
         'time.h',
+        'time/rate.h',
         'os.h',
         'os/signal.h',
         'pyx/runtime.h',
         'unicode/utf8.h',
+        'x/cache.h',
         '_testing.h',
         '_compat/windows/strings.h',
         '_compat/windows/unistd.h',
@@ -376,6 +378,8 @@ def Extension(name, sources, **kw):
         '_sync.pxd',
         'time.pxd',
         '_time.pxd',
+        'time/rate.pxd',
+        'time/_rate.pxd',
         'os.pxd',
         '_os.pxd',
         'os/signal.pxd',
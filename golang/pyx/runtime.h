@@ -26,6 +26,7 @@
 //  - `PyError` represents Python exception, that can be caught/reraised from
 //     nogil code, and is interoperated with libgolang `error`.
 //  - `PyFunc` represents Python function that can be called from nogil code.
+//  - `PyBuffer` pins memory of Python object, so that it can be accessed from nogil code.
 
 #include <golang/libgolang.h>
 #include <Python.h>
@@ -104,6 +105,36 @@ public:
     LIBPYXRUNTIME_API error operator() () const;
 };
 
+// PyBuffer pins buffer of Python object via buffer protocol.
+// PyBuffer can be used from nogil code.
+//
+// .view.buf, .view.len, .view.shape, etc. stay valid while there are
+// references to PyBuffer. The buffer is released back to Python object when
+// the last reference goes away, which can happen without holding the GIL.
+typedef refptr<class _PyBuffer> PyBuffer;
+class _PyBuffer final : public object {
+public:
+    Py_buffer view; // acquired by PyObject_GetBuffer
+
+    // don't new - create only via runtime::PyBuffer_Get();
+private:
+    _PyBuffer();
+    ~_PyBuffer();
+    friend LIBPYXRUNTIME_API int PyBuffer_Get(PyObject *obj, int flags, PyBuffer *pbuf);
+public:
+    LIBPYXRUNTIME_API void incref();
+    LIBPYXRUNTIME_API void decref();
+
+private:
+    _PyBuffer(const _PyBuffer&);    // don't copy
+    _PyBuffer(_PyBuffer&&);         // don't move
+};
+
+// PyBuffer_Get pins buffer of obj as PyObject_GetBuffer(obj, flags) does.
+// It must be called with GIL held.
+// It returns 0 on success, or -1 with Python exception set on error.
+LIBPYXRUNTIME_API int PyBuffer_Get(PyObject *obj, int flags, PyBuffer *pbuf);
+
 // libpyxruntime must be initialized before use via _init.
 // _pyatexit_nogil must be called when python interpreter is shut down.
 //
@@ -24,6 +24,7 @@ Python/Cython runtimes that can be used from nogil code.
  - `PyError` represents Python exception, that can be caught/reraised from
     nogil code, and is interoperated with libgolang `error`.
  - `PyFunc` represents Python function that can be called from nogil code.
+ - `PyBuffer` pins memory of Python object, so that it can be accessed from nogil code.
 """
 
 from golang  cimport error, _error, refptr, gobject, string
@@ -46,3 +47,13 @@ cdef extern from "golang/pyx/runtime.h" namespace "golang::pyx::runtime" nogil:
     cppclass PyFunc:
         __init__(PyObject *pyf)
         error operator() ()
+
+    cppclass _PyBuffer (gobject):
+        Py_buffer view
+        void decref()
+
+    cppclass PyBuffer (refptr[_PyBuffer]):
+        # PyBuffer.X = PyBuffer->X in C++
+        Py_buffer view "_ptr()->view"
+
+    int PyBuffer_Get(PyObject *obj, int flags, PyBuffer *pbuf) except -1
@@ -70,6 +70,21 @@ extern LIBGOLANG_API const string OS;
 extern LIBGOLANG_API const string CC;
 
 
+// MemStats records statistics about memory that libgolang runtime allocates
+// for channels, waiters and select.
+//
+// The runtime keeps freed blocks in per-thread caches and reuses them, so in
+// steady state blocking channel operations and selects don't go to malloc.
+struct MemStats {
+    uint64_t Mallocs;       // blocks allocated via malloc
+    uint64_t Frees;         // blocks released via free
+    uint64_t CacheHits;     // allocations served from runtime caches
+};
+
+// ReadMemStats populates m with runtime memory allocator statistics.
+LIBGOLANG_API void ReadMemStats(MemStats *m);
+
+
 }} // golang::runtime::
 
 #endif  // _NXD_LIBGOLANG_RUNTIME_H
@@ -24,9 +24,11 @@ from __future__ import print_function, absolute_import
 
 # _init is invoked by golang at tail of its importing to avoid cyclic-import issues.
 def _init():
-    global _init, ARCH, OS, CC
+    global _init, ARCH, OS, CC, MemStats, ReadMemStats
     from golang._runtime import \
         PyARCH              as ARCH,    \
         PyOS                as OS,      \
-        PyCC                as CC
+        PyCC                as CC,      \
+        PyMemStats          as MemStats,\
+        PyReadMemStats      as ReadMemStats
     del _init
@@ -60,8 +60,19 @@ from libc.errno  cimport EBADF
 from posix.fcntl cimport mode_t, F_GETFL, F_SETFL, O_NONBLOCK, O_ACCMODE, O_RDONLY, O_WRONLY, O_RDWR
 from posix.stat cimport struct_stat, S_ISREG, S_ISDIR, S_ISBLK
 from posix.strings cimport bzero
+cdef extern from "<fcntl.h>" nogil:
+    const int O_CLOEXEC     # not provided by posix.fcntl of Cython < 3
 
 from gevent import fileobject as gfileobj
+from gevent import get_hub as pygget_hub
+import os as pyos
+
+from libcpp.vector cimport vector
+from cpython.pythread cimport PyThread_type_lock, PyThread_allocate_lock, WAIT_LOCK
+cdef extern from "pythread.h" nogil:
+    long PyThread_get_thread_ident()
+    int  PyThread_acquire_lock(PyThread_type_lock, int mode)
+    void PyThread_release_lock(PyThread_type_lock)
 
 
 # _goviapy & _togo serve go
@@ -90,17 +101,31 @@ cdef:
         return True
 
     _libgolang_sema* _sema_alloc():
+        gs = <GSema*>calloc(1, sizeof(GSema))
+        if gs == NULL:
+            return NULL
         pygsema = Semaphore()
         Py_INCREF(pygsema)
-        return <_libgolang_sema*>pygsema
+        gs.pygsema = <PyObject*>pygsema
+        return <_libgolang_sema*>gs
 
     bint _sema_free(_libgolang_sema *gsema):
-        pygsema = <PYGSema>gsema
-        Py_DECREF(pygsema)
+        gs = <GSema*>gsema
+        PyThread_acquire_lock(_xmu, WAIT_LOCK)
+        pygsema = gs.pygsema
+        gs.pygsema = NULL
+        xqueued = gs.xqueued
+        PyThread_release_lock(_xmu)
+
+        Py_DECREF(<object>pygsema)
+        if not xqueued:
+            free(gs)
+        # else gs is freed by _xdrain when it dequeues it
         return True
 
     bint _sema_acquire(_libgolang_sema *gsema, uint64_t timeout_ns, cbool* pacq):
-        pygsema = <PYGSema>gsema
+        gs = <GSema*>gsema
+        pygsema = <PYGSema>gs.pygsema
         timeout = None
         if timeout_ns != UINT64_MAX:
             timeout = float(timeout_ns) * 1e-9
@@ -108,7 +133,8 @@ cdef:
         return True
 
     bint _sema_release(_libgolang_sema *gsema):
-        pygsema = <PYGSema>gsema
+        gs = <GSema*>gsema
+        pygsema = <PYGSema>gs.pygsema
         pygsema.release()
         return True
 
@@ -150,17 +176,69 @@ cdef nogil:
             panic("pyxgo: gevent: sema: free: failed")
 
     cbool sema_acquire(_libgolang_sema *gsema, uint64_t timeout_ns):
+        cdef GSema* gs = <GSema*>gsema
+        cdef bint xthread = (PyThread_get_thread_ident() != _xhubthread)
+
+        # fast path: take a free token without going to gevent
+        PyThread_acquire_lock(_xmu, WAIT_LOCK)
+        if gs.nfree != 0:
+            gs.nfree -= 1
+            PyThread_release_lock(_xmu)
+            return True
+        if xthread:
+            gs.xwaiters += 1
+        else:
+            gs.hwaiters += 1
+        PyThread_release_lock(_xmu)
+
+        # slow path: wait on pygsema
         cdef PyExc exc
         cdef cbool acq
         with gil:
             pyexc_fetch(&exc)
             ok = _sema_acquire(gsema, timeout_ns, &acq)
             pyexc_restore(exc)
+
+        PyThread_acquire_lock(_xmu, WAIT_LOCK)
+        if xthread:
+            gs.xwaiters -= 1
+        else:
+            gs.hwaiters -= 1
+        PyThread_release_lock(_xmu)
+
         if not ok:
             panic("pyxgo: gevent: sema: acquire: failed")
         return acq
 
     void sema_release(_libgolang_sema *gsema):
+        cdef GSema* gs = <GSema*>gsema
+        cdef bint xthread = (PyThread_get_thread_ident() != _xhubthread)
+        cdef bint wakeup = False
+        cdef int  waketx
+        cdef char b = 0
+
+        PyThread_acquire_lock(_xmu, WAIT_LOCK)
+        # nobody waits -> leave the token for the fast path of sema_acquire
+        if gs.hwaiters == 0 and gs.xwaiters == 0:
+            gs.nfree += 1
+            PyThread_release_lock(_xmu)
+            return
+        # only greenlets wait, and we are a foreign thread -> hand over to the hub
+        if xthread and gs.xwaiters == 0 and _xwaketx != -1:
+            gs.nfree += 1
+            if not gs.xqueued:
+                gs.xqueued = True
+                _xq.push_back(gs)
+                wakeup = (_xq.size() == 1)
+            waketx = _xwaketx
+            PyThread_release_lock(_xmu)
+            # if the pipe is full, the hub is already woken up
+            if wakeup:
+                syscall.Write(waketx, &b, 1)
+            return
+        PyThread_release_lock(_xmu)
+
+        # wakeup waiter via pygsema
         cdef PyExc exc
         with gil:
             pyexc_fetch(&exc)
@@ -169,6 +247,31 @@ cdef nogil:
         if not ok:
             panic("pyxgo: gevent: sema: release: failed")
 
+    # Semaphore is represented by GSema which wraps gevent Semaphore.
+    #
+    # Native threads not spawned by gevent - for example threads of a C
+    # extension that does its work with the GIL released - might use the same
+    # channels as greenlets do. Releasing gevent semaphore from such a thread
+    # requires the GIL, which might be held by the hub thread for a long time,
+    # and, if a greenlet waits on the semaphore, goes through gevent's own
+    # cross-thread notification, which is slow.
+    #
+    # To avoid that, semaphore releases that happen while nobody waits are
+    # accounted in GSema.nfree, and sema_acquire takes such tokens without
+    # touching pygsema and the GIL. When only greenlets wait, release from a
+    # foreign thread also goes to .nfree, queues the semaphore to _xq, and
+    # wakes up the hub via _xwaketx pipe. The hub then moves queued tokens to
+    # pygsema in _xdrain. Only when a foreign thread waits on pygsema, the
+    # release is performed directly under the GIL.
+
+    struct GSema:
+        PyObject* pygsema   # gevent Semaphore; NULL after sema_free
+        # protected by _xmu
+        int       nfree     # n(tokens) not transferred to pygsema
+        int       hwaiters  # n(greenlets of hub thread) blocked in pygsema.acquire
+        int       xwaiters  # n(foreign threads) blocked in pygsema.acquire
+        bint      xqueued   # whether GSema is in _xq
+
     # ---- time ----
 
     void nanosleep(uint64_t dt):
@@ -434,6 +537,79 @@ cdef nogil:
             io_fstat        = io_fstat,
     )
 
+# state of sema bridge (see GSema)
+cdef long               _xhubthread = PyThread_get_thread_ident()
+cdef PyThread_type_lock _xmu        = PyThread_allocate_lock()
+cdef vector[GSema*]     _xq         # semaphores with tokens released by foreign threads for the hub
+cdef int                _xwakerx    = -1
+cdef int                _xwaketx    = -1
+cdef object             _xwatcher   = None  # hub.loop.io(_xwakerx) -> _xdrain
+
+# _xdrain is run by the hub when foreign threads queue semaphore releases.
+def _xdrain():
+    cdef char buf[128]
+    while syscall.Read(_xwakerx, buf, sizeof(buf)) > 0:
+        pass
+
+    cdef vector[GSema*] q
+    cdef vector[PyObject*] pyv
+    cdef vector[int] nv
+    cdef GSema* gs
+    PyThread_acquire_lock(_xmu, WAIT_LOCK)
+    q.swap(_xq)
+    for gs in q:
+        gs.xqueued = False
+        if gs.pygsema == NULL:
+            free(gs)    # sema_free was called while gs was queued
+            continue
+        if gs.nfree != 0 and (gs.hwaiters != 0 or gs.xwaiters != 0):
+            Py_INCREF(<object>gs.pygsema)
+            pyv.push_back(gs.pygsema)
+            nv.push_back(gs.nfree)
+            gs.nfree = 0
+    PyThread_release_lock(_xmu)
+
+    for i in range(pyv.size()):
+        pygsema = <object>pyv[i]
+        Py_DECREF(pygsema)
+        for _ in range(nv[i]):
+            pygsema.release()
+
+# _xsetup (re)initializes the bridge in current thread and its hub.
+cdef _xsetup():
+    global _xhubthread, _xwakerx, _xwaketx, _xwatcher
+    cdef int vfd[2]
+    if syscall.Pipe(vfd, O_CLOEXEC) < 0:
+        panic("pyxgo: gevent: pipe(_xwakerx, _xwaketx) failed")
+    for i in range(2):
+        if syscall.Fcntl(vfd[i], F_SETFL, O_NONBLOCK) < 0:
+            panic("pyxgo: gevent: fcntl(O_NONBLOCK) failed")
+    _xhubthread = PyThread_get_thread_ident()
+    _xwakerx, _xwaketx = vfd[0], vfd[1]
+    # the watcher does not keep the loop alive, similarly to gevent's own
+    # loop.run_callback_threadsafe wakeup.
+    _xwatcher = pygget_hub().loop.io(_xwakerx, 1, ref=False)
+    _xwatcher.start(_xdrain)
+
+# after fork the pipe is shared with the parent and, if there was another
+# thread, _xmu might remain locked -> set up new bridge in the child, applying
+# releases that were queued before the fork.
+def _xafterfork_child():
+    global _xmu, _xwakerx, _xwaketx, _xwatcher
+    _xmu = PyThread_allocate_lock()
+    _xwatcher.stop()
+    syscall.Close(_xwakerx)
+    syscall.Close(_xwaketx)
+    _xwakerx = _xwaketx = -1
+    _xdrain()
+    _xsetup()
+
+IF POSIX:
+    _xsetup()
+    if hasattr(pyos, 'register_at_fork'): # py3
+        pyos.register_at_fork(after_in_child=_xafterfork_child)
+
+
 from cpython cimport PyCapsule_New
 libgolang_runtime_ops = PyCapsule_New(&gevent_ops,
         "golang.runtime._runtime_gevent.libgolang_runtime_ops", NULL)
@@ -26,6 +26,9 @@
 #include <signal.h>
 #include <string.h>
 #include <unistd.h>
+#ifdef LIBGOLANG_OS_linux
+# include <sys/eventfd.h>
+#endif
 
 #include <string>
 
@@ -102,6 +105,17 @@ __Errno Close(int fd) {
     return err;
 }
 
+#ifdef LIBGOLANG_OS_linux
+int Eventfd(unsigned initval, int flags) {
+    int save_errno = errno;
+    int fd = ::eventfd(initval, flags);
+    if (fd < 0)
+        fd = -errno;
+    errno = save_errno;
+    return fd;
+}
+#endif
+
 #ifndef LIBGOLANG_OS_windows
 __Errno Fcntl(int fd, int cmd, int arg) {
     int save_errno = errno;
@@ -63,6 +63,9 @@ LIBGOLANG_API int/*n|err*/ Read(int fd, void *buf, size_t count);
 LIBGOLANG_API int/*n|err*/ Write(int fd, const void *buf, size_t count);
 
 LIBGOLANG_API __Errno Close(int fd);
+#ifdef LIBGOLANG_OS_linux
+LIBGOLANG_API int/*fd|err*/ Eventfd(unsigned initval, int flags);
+#endif
 #ifndef LIBGOLANG_OS_windows
 LIBGOLANG_API __Errno Fcntl(int fd, int cmd, int arg);
 #endif
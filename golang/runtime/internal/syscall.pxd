@@ -27,5 +27,6 @@ cdef extern from "golang/runtime/internal/syscall.h" namespace "golang::internal
     int Fcntl(int fd, int cmd, int arg)
     int Fstat(int fd, struct_stat *out_st)
     int Open(const char *path, int flags, mode_t mode)
+    int Pipe(int vfd[2], int flags)
     int Read(int fd, void *buf, size_t count)
     int Write(int fd, const void *buf, size_t count)
@@ -28,7 +28,9 @@
 // - because Cython (currently ?) does not allow to add methods to `cdef struct`.
 
 #include "golang/libgolang.h"
+#include "golang/runtime.h"
 #include "golang/runtime/internal.h"
+#include "golang/runtime/internal/syscall.h"
 #include "golang/sync.h"
 #include "golang/time.h"
 
@@ -37,13 +39,16 @@
 #include <functional>
 #include <limits>
 #include <memory>
-#include <mutex>        // lock_guard
+#include <mutex>        // lock_guard, mutex
 #include <random>
 #include <string>
 
 #include <stdlib.h>
 #include <string.h>
 #include <strings.h>
+#ifdef LIBGOLANG_OS_linux
+# include <sys/eventfd.h>
+#endif
 
 // linux/list.h needs ARRAY_SIZE    XXX -> better use c.h or ccan/array_size.h ?
 #ifndef ARRAY_SIZE
@@ -65,6 +70,7 @@ using std::atomic;
 using std::bad_alloc;
 using std::exception;
 using std::max;
+using std::min;
 using std::numeric_limits;
 using std::unique_ptr;
 using std::vector;
@@ -72,7 +78,31 @@ using std::vector;
 // golang::
 namespace golang {
 
-static void *zalloc(size_t size);
+static void *_rtalloc(size_t size);
+static void  _rtfree(void *p, size_t size);
+
+// _rtallocator is allocator for std containers that allocates via _rtalloc.
+template<typename T>
+struct _rtallocator {
+    typedef T value_type;
+
+    _rtallocator() {}
+    template<typename U> _rtallocator(const _rtallocator<U>&) {}
+
+    T *allocate(size_t n) {
+        T *p = (T *)_rtalloc(n * sizeof(T));
+        if (p == nil)
+            throw bad_alloc();
+        return p;
+    }
+    void deallocate(T *p, size_t n) {
+        _rtfree(p, n * sizeof(T));
+    }
+};
+template<typename T, typename U>
+bool operator==(const _rtallocator<T>&, const _rtallocator<U>&) { return true;  }
+template<typename T, typename U>
+bool operator!=(const _rtallocator<T>&, const _rtallocator<U>&) { return false; }
 
 // ---- panic ----
 
@@ -200,6 +230,11 @@ void Sema::acquire() {
     _semaacquire(sema->_gsema);
 }
 
+bool Sema::_acquire_timed(uint64_t timeout_ns) {
+    Sema *sema = this;
+    return _semaacquire_timed(sema->_gsema, timeout_ns);
+}
+
 void Sema::release() {
     Sema *sema = this;
     _semarelease(sema->_gsema);
@@ -269,10 +304,17 @@ int object::refcnt() const {
 struct _WaitGroup;
 struct _RecvSendWaiting;
 
+// _DATAQ_NINLINE is max number of elements that channel data queue keeps
+// right past _chan memory. Data queue of channels with larger capacity is
+// grown on heap on demand.
+static const unsigned _DATAQ_NINLINE = 16;
+
 // _chan is a raw channel with Go semantic.
 //
 // Over raw channel the data is sent/received via elemsize'ed memcpy of void*
-// and the caller must make sure to pass correct arguments.
+// and the caller must make sure to pass correct arguments. If the channel was
+// created with element operations (see _makechan_elemops), the data is instead
+// move-constructed with them.
 //
 // See chan<T> for type-safe wrapper.
 //
@@ -284,45 +326,87 @@ struct _RecvSendWaiting;
 struct _chan : object {
     unsigned    _cap;       // channel capacity (in elements)
     unsigned    _elemsize;  // size of element
+    const _chanelemops *_elemops; // element operations; nil -> memcpy
 
     sync::Mutex _mu;
     list_head   _recvq;     // blocked receivers (_ -> _RecvSendWaiting.in_rxtxq)
     list_head   _sendq;     // blocked senders   (_ -> _RecvSendWaiting.in_rxtxq)
     bool        _closed;
 
-    // data queue (circular buffer) goes past _chan memory and occupies [_cap*_elemsize] bytes.
+    // data queue (circular buffer).
+    //
+    // It is grown on demand up to _cap elements, and shrunk back when mostly
+    // unused, so that channels with large capacity, that are nearly always
+    // empty, don't pin memory. Up to _DATAQ_NINLINE first elements go past
+    // _chan memory; larger data queue is allocated on heap.
+    char       *_dataq;     // -> ring memory: past _chan, or on heap
+    unsigned    _dataq_cap; // current ring capacity (in elements; <= _cap)
     unsigned    _dataq_n;   // total number of entries in dataq
     unsigned    _dataq_r;   // index for next read  (in elements; can be used only if _dataq_n > 0)
-    unsigned    _dataq_w;   // index for next write (in elements; can be used only if _dataq_n < _cap)
+    unsigned    _dataq_w;   // index for next write (in elements; can be used only if _dataq_n < _dataq_cap)
+
+    // readiness file descriptor (see fd). It is created lazily on first
+    // request, and until then _fdr=-1 and channel operations don't touch it.
+    int         _fdr;       // fd returned to user; readable <=> recv is likely not to block
+    int         _fdw;       // fd to signal _fdr readiness (=_fdr for eventfd)
+    bool        _fdready;   // whether _fdr is currently signalled
+
+    // pollers watching the channel (see _poller). Their ready queues are
+    // updated when readiness of the channel changes.
+    list_head   _pollq;     // _ -> _pollentry.in_chan
+    bool        _pollready; // readiness as last reported to pollers
 
     void decref();
 
     void send(const void *ptx);
     bool recv_(void *prx);
     void recv(void *prx);
-    bool _trysend(const void *tx);
-    bool _tryrecv(void *prx, bool *pok);
+    bool _send_timed(const void *ptx, uint64_t timeout_ns);
+    bool _recv_timed(void *prx, bool *pok, uint64_t timeout_ns);
+    bool _trysend(const void *tx, _WaitGroup *self=nil);
+    bool _tryrecv(void *prx, bool *pok, _WaitGroup *self=nil);
     void close();
     unsigned len();
     unsigned cap();
+    int fd();
 
     void _dataq_append(const void *ptx);
     void _dataq_popleft(void *prx);
+    bool _dataq_resize(unsigned ncap);
+    unsigned _dataq_ninline() const;
+    void _fdsync();
+    bool _recvready();
 private:
     _chan(const _chan&);    // don't copy
     _chan(_chan&&);         // don't move
 
-    template<bool onstack> void _send2 (const void *);
-    void __send2 (const void *, _WaitGroup*, _RecvSendWaiting*);
-    template<bool onstack> bool _recv2_(void *);
-    bool __recv2_(void *, _WaitGroup*, _RecvSendWaiting*);
+    template<bool onstack> bool _send2 (const void *, uint64_t timeout_ns);
+    bool __send2 (const void *, _WaitGroup*, _RecvSendWaiting*, uint64_t timeout_ns);
+    template<bool onstack> bool _recv2_(void *, bool *pok, uint64_t timeout_ns);
+    bool __recv2_(void *, bool *pok, _WaitGroup*, _RecvSendWaiting*, uint64_t timeout_ns);
+    bool _cancelwait(_RecvSendWaiting *me);
+    void __fdsync();
 
-    friend _chan *_makechan(unsigned elemsize, unsigned size);
+    friend _chan *_makechan_elemops(unsigned elemsize, unsigned size, const _chanelemops *elemops);
     _chan() {}; // used by _makechan to init _mu, object, ...
 };
 
+// _rtobject is base for runtime objects that are allocated on heap via
+// _rtalloc instead of plain new.
+struct _rtobject {
+    static void *operator new(size_t size) {
+        void *p = _rtalloc(size);
+        if (p == nil)
+            throw bad_alloc();
+        return p;
+    }
+    static void operator delete(void *p, size_t size) {
+        _rtfree(p, size);
+    }
+};
+
 // _RecvSendWaiting represents a receiver/sender waiting on a chan.
-struct _RecvSendWaiting {
+struct _RecvSendWaiting : _rtobject {
     _WaitGroup  *group; // group of waiters this receiver/sender is part of
     _chan       *chan;  // channel receiver/sender is waiting on
 
@@ -348,7 +432,7 @@ private:
 // _WaitGroup is a group of waiting senders and receivers.
 //
 // Only 1 waiter from the group can succeed waiting.
-struct _WaitGroup {
+struct _WaitGroup : _rtobject {
     sync::Sema  _sema;  // used for wakeup
 
     sync::Mutex _mu;    // lock    NOTE ∀ chan order is always: chan._mu > ._mu
@@ -356,9 +440,15 @@ struct _WaitGroup {
     //   .which  _{Send|Recv}Waiting     instance which succeeded waiting.
     const _RecvSendWaiting    *which;
 
+    // if !nil, wakeup calls _notify(_notify_arg) instead of releasing _sema.
+    // (used by _chanselect_async)
+    void (*_notify)(void *arg);
+    void  *_notify_arg;
+
     _WaitGroup();
     bool try_to_win(_RecvSendWaiting *waiter);
     void wait();
+    bool wait_timed(uint64_t timeout_ns);
     void wakeup();
 private:
     _WaitGroup(const _WaitGroup&);  // don't copy
@@ -397,6 +487,8 @@ _WaitGroup::_WaitGroup() {
     _WaitGroup *group = this;
     group->_sema.acquire();
     group->which = nil;
+    group->_notify     = nil;
+    group->_notify_arg = nil;
 }
 
 // try_to_win tries to win waiter after it was dequeued from a channel's {_send|_recv}q.
@@ -424,6 +516,14 @@ void _WaitGroup::wait() {
     group->_sema.acquire();
 }
 
+// wait_timed is like wait, but waits for at most timeout_ns.
+//
+// returns: whether the group was woken up.
+bool _WaitGroup::wait_timed(uint64_t timeout_ns) { // -> woken
+    _WaitGroup *group = this;
+    return group->_sema._acquire_timed(timeout_ns);
+}
+
 // wakeup notifies the group that the winning case becomes ready.
 //
 // prior to wakeup try_to_win must have been called.
@@ -436,7 +536,10 @@ void _WaitGroup::wakeup() {
     _WaitGroup *group = this;
     if (group->which == nil)
         bug("wakeup: group.which=nil");
-    group->_sema.release();
+    if (group->_notify != nil)
+        group->_notify(group->_notify_arg);
+    else
+        group->_sema.release();
 }
 
 // _dequeWaiter dequeues a send or recv waiter from a channel's _recvq or _sendq.
@@ -444,9 +547,20 @@ void _WaitGroup::wakeup() {
 // the channel owning {_recv|_send}q must be locked.
 // if the waiter is successfully dequeued, the caller must wake it up, but only
 // after copying sent/recv data.
-_RecvSendWaiting *_dequeWaiter(list_head *queue) {
-    while (!list_empty(queue)) {
-        _RecvSendWaiting *w = list_entry(queue->next, _RecvSendWaiting, in_rxtxq);
+//
+// waiters from group self are skipped and left in the queue: select, while
+// registering its cases, must not match its send case with its own recv case
+// on the same channel and vice versa. This is what Go does as well. Besides,
+// select registers its cases with self._mu held, and so trying to win its own
+// waiter would deadlock.
+_RecvSendWaiting *_dequeWaiter(list_head *queue, _WaitGroup *self=nil) {
+    list_head *h = queue->next;
+    while (h != queue) {
+        _RecvSendWaiting *w = list_entry(h, _RecvSendWaiting, in_rxtxq);
+        h = h->next;
+        if (w->group == self)
+            continue;
+
         list_del_init(&w->in_rxtxq); // _init is important as we can try to remove the
                                      // waiter the second time in select.
         // if this waiter can win its group - return it.
@@ -460,33 +574,88 @@ _RecvSendWaiting *_dequeWaiter(list_head *queue) {
     return nil;
 }
 
+// _elemmove, _elemassign, _elemclear and _elemdestroy transfer channel elements
+// according to channel element operations. elemops=nil means plain memcpy.
+//
+// _elemmove constructs *dst from *src, while _elemassign and _elemclear
+// overwrite already constructed *dst with *src and zero value correspondingly.
+static inline void _elemmove(const _chanelemops *elemops, unsigned elemsize, void *dst, const void *src) {
+    if (elemops == nil)
+        memcpy(dst, src, elemsize);
+    else
+        elemops->move(dst, (void *)src);
+}
+static inline void _elemassign(const _chanelemops *elemops, unsigned elemsize, void *dst, const void *src) {
+    if (elemops != nil)
+        elemops->destroy(dst);
+    _elemmove(elemops, elemsize, dst, src);
+}
+static inline void _elemclear(const _chanelemops *elemops, unsigned elemsize, void *dst) {
+    if (elemops == nil) {
+        memset(dst, 0, elemsize);
+        return;
+    }
+    elemops->destroy(dst);
+    elemops->zero(dst);
+}
+static inline void _elemdestroy(const _chanelemops *elemops, void *p) {
+    if (elemops != nil)
+        elemops->destroy(p);
+}
+
 // _makechan creates new _chan(elemsize, size).
 //
 // returned channel has refcnt=1.
 // _makechan always returns !nil and panics on memory allocation failure.
 _chan *_makechan(unsigned elemsize, unsigned size) {
+    return _makechan_elemops(elemsize, size, nil);
+}
+
+// _makechan_elemops creates new _chan(elemsize, size) whose elements are
+// transferred with elemops instead of memcpy.
+//
+// It is used for elements that are not trivially copyable, e.g. string or
+// refptr. Elements are move-constructed into channel buffer and peer slots
+// and are destroyed when no longer needed. For such channels:
+//
+//  - *ptx given to send is moved from if the send succeeds, and is left intact otherwise;
+//  - *prx given to recv must hold valid element; it is assigned the received value.
+//
+// elemops=nil means that elements are trivially copyable, which is the same as _makechan.
+// elemops must stay valid while the channel is alive.
+_chan *_makechan_elemops(unsigned elemsize, unsigned size, const _chanelemops *elemops) {
     _chan *ch;
-    ch = (_chan *)zalloc(sizeof(_chan) + size*elemsize);
+    unsigned ninline = (elemsize == 0 ? size : min(size, _DATAQ_NINLINE));
+    ch = (_chan *)_rtalloc(sizeof(_chan) + ninline*elemsize);
     if (ch == nil)
         panic("makechan: alloc failed");
+    memset((void *)ch, 0, sizeof(_chan) + ninline*elemsize);
     new (ch) _chan(); // init .object, ._mu, ...
 
     ch->_cap      = size;
     ch->_elemsize = elemsize;
+    ch->_dataq    = (char *)(ch+1);
+    ch->_dataq_cap= ninline;
+    ch->_elemops  = elemops;
     ch->_closed   = false;
+    ch->_fdr      = -1;
+    ch->_fdw      = -1;
 
     INIT_LIST_HEAD(&ch->_recvq);
     INIT_LIST_HEAD(&ch->_sendq);
+    INIT_LIST_HEAD(&ch->_pollq);
 
     return ch;
 }
 
 // __wrapchan serves _wrapchan<T>.
-void __wrapchan(_chan *ch, unsigned elemsize) {
+void __wrapchan(_chan *ch, unsigned elemsize, bool elemtrivial) {
     if (ch == nil)
         return; // nil, no elemsize checking
     if (ch->_elemsize != elemsize)
         panic("wrapchan: elemsize mismatch");
+    if ((ch->_elemops == nil) != elemtrivial)
+        panic("wrapchan: elemops mismatch");
     _chanxincref(ch);
 }
 
@@ -519,9 +688,23 @@ void _chan::decref() {
         panic("chan: decref: free: recvq not empty");
     if (!list_empty(&ch->_sendq))
         panic("chan: decref: free: sendq not empty");
+    if (!list_empty(&ch->_pollq))
+        bug("chan: decref: free: pollq not empty");
+    if (ch->_fdr != -1) {
+        internal::syscall::Close(ch->_fdr);
+        if (ch->_fdw != ch->_fdr)
+            internal::syscall::Close(ch->_fdw);
+    }
+    if (ch->_elemops != nil) {
+        for (unsigned i = 0; i < ch->_dataq_n; i++)
+            ch->_elemops->destroy(&ch->_dataq[((ch->_dataq_r + i) % ch->_dataq_cap) * ch->_elemsize]);
+    }
+    if (ch->_dataq != (char *)(ch+1))
+        free(ch->_dataq);
     ch->_mu.~Mutex();
-    memset((void *)ch, 0, sizeof(*ch) + ch->_cap*ch->_elemsize);
-    free(ch);
+    size_t size = sizeof(*ch) + ch->_dataq_ninline()*ch->_elemsize;
+    memset((void *)ch, 0, size);
+    _rtfree(ch, size);
 }
 
 // _chanrefcnt returns current reference counter of the channel.
@@ -534,6 +717,7 @@ int _chanrefcnt(_chan *ch) {
 
 
 void _blockforever();
+static void _nilwait(uint64_t timeout_ns);
 
 
 // send sends data to a receiver.
@@ -544,58 +728,94 @@ void _chansend(_chan *ch, const void *ptx) {
         _blockforever(); // (C++ assumes `this` is never nil and optimizes it out)
     ch->send(ptx);
 }
-template<> void _chan::_send2</*onstack=*/true> (const void *ptx);
-template<> void _chan::_send2</*onstack=*/false>(const void *ptx);
 void _chan::send(const void *ptx) {
     _chan *ch = this;
+    (void)ch->_send_timed(ptx, UINT64_MAX);
+}
+
+// _chantrysend is like _chansend, but waits for send to complete for at most timeout_ns.
+//
+// timeout_ns=0 means "don't block". timeout_ns=UINT64_MAX means "wait forever".
+// returns: whether the data was sent.
+bool _chantrysend(_chan *ch, const void *ptx, uint64_t timeout_ns) { // -> sent
+    if (ch == nil) {
+        _nilwait(timeout_ns);
+        return false;
+    }
+    return ch->_send_timed(ptx, timeout_ns);
+}
+
+template<> bool _chan::_send2</*onstack=*/true> (const void *ptx, uint64_t timeout_ns);
+template<> bool _chan::_send2</*onstack=*/false>(const void *ptx, uint64_t timeout_ns);
+bool _chan::_send_timed(const void *ptx, uint64_t timeout_ns) { // -> sent
+    _chan *ch = this;
 
     ch->_mu.lock();
         bool done = ch->_trysend(ptx);
         if (done)
-            return;
+            return true;
 
-        (_runtime->flags & STACK_DEAD_WHILE_PARKED) \
-            ? ch->_send2</*onstack=*/false>(ptx)
-            : ch->_send2</*onstack=*/true >(ptx);
+        if (timeout_ns == 0) {
+            ch->_mu.unlock();
+            return false;
+        }
+
+        return (_runtime->flags & STACK_DEAD_WHILE_PARKED) \
+            ? ch->_send2</*onstack=*/false>(ptx, timeout_ns)
+            : ch->_send2</*onstack=*/true >(ptx, timeout_ns);
 }
 
-template<> void _chan::_send2</*onstack=*/true> (const void *ptx) {
+template<> bool _chan::_send2</*onstack=*/true> (const void *ptx, uint64_t timeout_ns) {
         _WaitGroup         g;
         _RecvSendWaiting   me;
-        __send2(ptx, &g, &me);
+        return __send2(ptx, &g, &me, timeout_ns);
 }
 
-template<> void _chan::_send2</*onstack=*/false>(const void *ptx) { _chan *ch = this;
+template<> bool _chan::_send2</*onstack=*/false>(const void *ptx, uint64_t timeout_ns) { _chan *ch = this;
         unique_ptr<_WaitGroup>        g  (new _WaitGroup);
         unique_ptr<_RecvSendWaiting>  me (new _RecvSendWaiting);
 
         // ptx stack -> heap (if ptx is on stack)   TODO avoid copy if ptx is !onstack
-        void *ptx_onheap = malloc(ch->_elemsize);
+        const _chanelemops *elemops  = ch->_elemops;
+        unsigned            elemsize = ch->_elemsize;
+        void *ptx_onheap = _rtalloc(elemsize);
         if (ptx_onheap == nil) {
             ch->_mu.unlock();
             throw bad_alloc();
         }
-        memcpy(ptx_onheap, ptx, ch->_elemsize);
+        _elemmove(elemops, elemsize, ptx_onheap, ptx);
+        bool sent = false;
         defer([&]() {
-            free(ptx_onheap);
+            // not sent -> give the value back to *ptx
+            if (!sent && elemops != nil)
+                _elemassign(elemops, elemsize, (void *)ptx, ptx_onheap);
+            _elemdestroy(elemops, ptx_onheap);
+            _rtfree(ptx_onheap, elemsize);
         });
 
-        __send2(ptx_onheap, g.get(), me.get());
+        sent = __send2(ptx_onheap, g.get(), me.get(), timeout_ns);
+        return sent;
 }
 
-void _chan::__send2(const void *ptx, _WaitGroup *g, _RecvSendWaiting *me) {  _chan *ch = this;
+bool _chan::__send2(const void *ptx, _WaitGroup *g, _RecvSendWaiting *me, uint64_t timeout_ns) {  _chan *ch = this;
         me->init(g, ch);
         me->pdata   = (void *)ptx; // we add it to _sendq; the memory will be only read
         me->ok      = false;
 
         list_add_tail(&me->in_rxtxq, &ch->_sendq);
+        ch->_fdsync();
     ch->_mu.unlock();
 
-    g->wait();
+    if (!g->wait_timed(timeout_ns)) {
+        if (ch->_cancelwait(me))
+            return false;
+        g->wait(); // receiver/closer dequeued us right after timeout -> wait for its wakeup
+    }
     if (g->which != me)
         bug("chansend: g.which != me");
     if (!me->ok)
         panic("send on closed channel");
+    return true;
 }
 
 // recv_ is "comma-ok" version of recv.
@@ -609,62 +829,97 @@ bool _chanrecv_(_chan *ch, void *prx) {
         _blockforever();
     return ch->recv_(prx);
 }
-template<> bool _chan::_recv2_</*onstack=*/true> (void *prx);
-template<> bool _chan::_recv2_</*onstack=*/false>(void *prx);
 bool _chan::recv_(void *prx) { // -> ok
     _chan *ch = this;
+    bool ok;
+    (void)ch->_recv_timed(prx, &ok, UINT64_MAX);
+    return ok;
+}
+
+// _chantryrecv_ is like _chanrecv_, but waits for receive to complete for at most timeout_ns.
+//
+// timeout_ns=0 means "don't block". timeout_ns=UINT64_MAX means "wait forever".
+// returns: whether receive was done. If it was done, *pok is set as _chanrecv_
+// would return. If not - *prx and *pok are left unmodified.
+bool _chantryrecv_(_chan *ch, void *prx, bool *pok, uint64_t timeout_ns) { // -> done
+    if (ch == nil) {
+        _nilwait(timeout_ns);
+        return false;
+    }
+    return ch->_recv_timed(prx, pok, timeout_ns);
+}
+
+template<> bool _chan::_recv2_</*onstack=*/true> (void *prx, bool *pok, uint64_t timeout_ns);
+template<> bool _chan::_recv2_</*onstack=*/false>(void *prx, bool *pok, uint64_t timeout_ns);
+bool _chan::_recv_timed(void *prx, bool *pok, uint64_t timeout_ns) { // -> done
+    _chan *ch = this;
 
     ch->_mu.lock();
-        bool ok, done = ch->_tryrecv(prx, &ok);
+        bool done = ch->_tryrecv(prx, pok);
         if (done)
-            return ok;
+            return true;
+
+        if (timeout_ns == 0) {
+            ch->_mu.unlock();
+            return false;
+        }
 
         return (_runtime->flags & STACK_DEAD_WHILE_PARKED) \
-            ? ch->_recv2_</*onstack=*/false>(prx)
-            : ch->_recv2_</*onstack=*/true> (prx);
+            ? ch->_recv2_</*onstack=*/false>(prx, pok, timeout_ns)
+            : ch->_recv2_</*onstack=*/true> (prx, pok, timeout_ns);
 }
 
-template<> bool _chan::_recv2_</*onstack=*/true> (void *prx) {
+template<> bool _chan::_recv2_</*onstack=*/true> (void *prx, bool *pok, uint64_t timeout_ns) {
         _WaitGroup         g;
         _RecvSendWaiting   me;
-        return __recv2_(prx, &g, &me);
+        return __recv2_(prx, pok, &g, &me, timeout_ns);
 }
 
-template<> bool _chan::_recv2_</*onstack=*/false>(void *prx) {  _chan *ch = this;
+template<> bool _chan::_recv2_</*onstack=*/false>(void *prx, bool *pok, uint64_t timeout_ns) {  _chan *ch = this;
         unique_ptr<_WaitGroup>        g  (new _WaitGroup);
         unique_ptr<_RecvSendWaiting>  me (new _RecvSendWaiting);
 
         if (prx == nil)
-            return __recv2_(prx, g.get(), me.get());
+            return __recv2_(prx, pok, g.get(), me.get(), timeout_ns);
 
         // prx stack -> onheap + copy back (if prx is on stack) TODO avoid copy if prx is !onstack
-        unsigned ch_elemsize = ch->_elemsize;
-        void *prx_onheap = malloc(ch_elemsize);
+        const _chanelemops *ch_elemops  = ch->_elemops;
+        unsigned            ch_elemsize = ch->_elemsize;
+        void *prx_onheap = _rtalloc(ch_elemsize);
         if (prx_onheap == nil) {
             ch->_mu.unlock();
             throw bad_alloc();
         }
+        if (ch_elemops != nil)
+            ch_elemops->zero(prx_onheap);
         defer([&]() {
-            free(prx_onheap);
+            _elemdestroy(ch_elemops, prx_onheap);
+            _rtfree(prx_onheap, ch_elemsize);
         });
 
-        bool ok = __recv2_(prx_onheap, g.get(), me.get());
+        bool done = __recv2_(prx_onheap, pok, g.get(), me.get(), timeout_ns);
         // NOTE don't access ch after wakeup
-        memcpy(prx, prx_onheap, ch_elemsize);
-        return ok;
+        if (done)
+            _elemassign(ch_elemops, ch_elemsize, prx, prx_onheap);
+        return done;
 }
 
-bool _chan::__recv2_(void *prx, _WaitGroup *g, _RecvSendWaiting *me) {  _chan *ch = this;
+bool _chan::__recv2_(void *prx, bool *pok, _WaitGroup *g, _RecvSendWaiting *me, uint64_t timeout_ns) {  _chan *ch = this;
         me->init(g, ch);
         me->pdata   = prx;
         me->ok      = false;
         list_add_tail(&me->in_rxtxq, &ch->_recvq);
     ch->_mu.unlock();
 
-    g->wait();
+    if (!g->wait_timed(timeout_ns)) {
+        if (ch->_cancelwait(me))
+            return false;
+        g->wait(); // sender/closer dequeued us right after timeout -> wait for its wakeup
+    }
     if (g->which != me)
         bug("chanrecv: g.which != me");
-    return me->ok;
+    *pok = me->ok;
+    return true;
 }
 
 // recv receives from the channel.
@@ -681,13 +936,42 @@ void _chan::recv(void *prx) {
     return;
 }
 
+// _cancelwait cancels waiting of me on the channel after wait timed out.
+//
+// returns: true if me was removed from the channel wait queue.
+//          false if a peer already dequeued me; in that case the peer will
+//          wakeup me and the caller must wait for that wakeup.
+bool _chan::_cancelwait(_RecvSendWaiting *me) { // -> cancelled
+    _chan *ch = this;
+
+    // me can be dequeued only under ch._mu and the dequeue is done with list_del_init.
+    ch->_mu.lock();
+        bool queued = !list_empty(&me->in_rxtxq);
+        if (queued) {
+            list_del_init(&me->in_rxtxq);
+            ch->_fdsync();
+        }
+    ch->_mu.unlock();
+    return queued;
+}
+
+// _nilwait serves try send/recv on nil channel, which is never ready.
+static void _nilwait(uint64_t timeout_ns) {
+    if (timeout_ns == UINT64_MAX)
+        _blockforever();
+    if (timeout_ns != 0)
+        time::_tasknanosleep(timeout_ns);
+}
+
 
 // _trysend(ch, *ptx) -> done
 //
 // must be called with ._mu held.
 // if done or panic - returns with ._mu released.
 // if !done - returns with ._mu still being held.
-bool _chan::_trysend(const void *ptx) { // -> done
+//
+// waiters from group self are not considered as receivers (see _dequeWaiter).
+bool _chan::_trysend(const void *ptx, _WaitGroup *self) { // -> done
     _chan *ch = this;
 
     if (ch->_closed) {
@@ -697,13 +981,13 @@ bool _chan::_trysend(const void *ptx) { // -> done
 
     // synchronous channel
     if (ch->_cap == 0) {
-        _RecvSendWaiting *recv = _dequeWaiter(&ch->_recvq);
+        _RecvSendWaiting *recv = _dequeWaiter(&ch->_recvq, self);
         if (recv == nil)
             return false;
 
         ch->_mu.unlock();
         if (recv->pdata != nil)
-            memcpy(recv->pdata, ptx, ch->_elemsize);
+            _elemassign(ch->_elemops, ch->_elemsize, recv->pdata, ptx);
         recv->wakeup(/*ok=*/true);
         return true;
     }
@@ -712,15 +996,23 @@ bool _chan::_trysend(const void *ptx) { // -> done
         if (ch->_dataq_n >= ch->_cap)
             return false;
 
+        // grow data queue, if it is full, but below capacity
+        if (ch->_dataq_n == ch->_dataq_cap) {
+            unsigned ncap = (ch->_dataq_cap > ch->_cap/2 ? ch->_cap : 2*ch->_dataq_cap);
+            if (!ch->_dataq_resize(ncap)) {
+                ch->_mu.unlock();
+                throw bad_alloc();
+            }
+        }
+
         ch->_dataq_append(ptx);
-        _RecvSendWaiting *recv = _dequeWaiter(&ch->_recvq);
-        if (recv != nil) {
+        _RecvSendWaiting *recv = _dequeWaiter(&ch->_recvq, self);
+        if (recv != nil)
             ch->_dataq_popleft(recv->pdata);
-            ch->_mu.unlock();
+        ch->_fdsync();
+        ch->_mu.unlock();
+        if (recv != nil)
             recv->wakeup(/*ok=*/true);
-        } else {
-            ch->_mu.unlock();
-        }
         return true;
     }
 }
@@ -734,7 +1026,9 @@ bool _chan::_trysend(const void *ptx) { // -> done
 //
 // if !done - (*prx, *pok) are left unmodified.
 // if prx=nil received value is not copied into *prx.
-bool _chan::_tryrecv(void *prx, bool *pok) { // -> done
+//
+// waiters from group self are not considered as senders (see _dequeWaiter).
+bool _chan::_tryrecv(void *prx, bool *pok, _WaitGroup *self) { // -> done
     _chan *ch = this;
 
     // buffered
@@ -743,14 +1037,13 @@ bool _chan::_tryrecv(void *prx, bool *pok) { // -> done
         *pok = true;
 
         // wakeup a blocked writer, if there is any
-        _RecvSendWaiting *send = _dequeWaiter(&ch->_sendq);
-        if (send != nil) {
+        _RecvSendWaiting *send = _dequeWaiter(&ch->_sendq, self);
+        if (send != nil)
             ch->_dataq_append(send->pdata);
-            ch->_mu.unlock();
+        ch->_fdsync();
+        ch->_mu.unlock();
+        if (send != nil)
             send->wakeup(/*ok=*/true);
-        } else {
-            ch->_mu.unlock();
-        }
 
         return true;
     }
@@ -759,19 +1052,20 @@ bool _chan::_tryrecv(void *prx, bool *pok) { // -> done
     if (ch->_closed) {
         ch->_mu.unlock();
         if (prx != nil)
-            memset(prx, 0, ch->_elemsize);
+            _elemclear(ch->_elemops, ch->_elemsize, prx);
         *pok = false;
         return true;
     }
 
     // sync | empty: there is waiting writer
-    _RecvSendWaiting *send = _dequeWaiter(&ch->_sendq);
+    _RecvSendWaiting *send = _dequeWaiter(&ch->_sendq, self);
+    ch->_fdsync();  // _dequeWaiter might have also removed waiters that lost their select
     if (send == nil)
         return false;
 
     ch->_mu.unlock();
     if (prx != nil)
-        memcpy(prx, send->pdata, ch->_elemsize);
+        _elemassign(ch->_elemops, ch->_elemsize, prx, send->pdata);
     *pok = true;
     send->wakeup(/*ok=*/true);
     return true;
@@ -803,7 +1097,7 @@ void _chan::close() {
                 break;
 
             if (recv->pdata != nil)
-                memset(recv->pdata, 0, ch->_elemsize);
+                _elemclear(ch->_elemops, ch->_elemsize, recv->pdata);
             wakeupv.push_back(recv);
         }
 
@@ -815,6 +1109,8 @@ void _chan::close() {
 
             wakeupv.push_back(send);
         }
+
+        ch->_fdsync();
     ch->_mu.unlock();
 
     // perform scheduled wakeups outside of ch._mu
@@ -848,18 +1144,113 @@ unsigned _chan::cap() {
     return ch->_cap;
 }
 
+// fd returns file descriptor that reflects readiness of the channel for receive.
+//
+// The file descriptor becomes readable when channel has buffered data, a
+// blocked sender, or is closed, and becomes non-readable again when none of
+// that holds. It can be used to plug the channel into epoll/select-based event
+// loops: once fd is reported as readable, the receive should be done
+// via select with default, because other receivers, or other cases of the
+// sender's select, might win the data first.
+//
+// The file descriptor is created on first call and is owned by the channel:
+// it must not be read from, written to, or closed by the user. Channels whose
+// fd was never requested don't pay for its maintenance.
+int _chanfd(_chan *ch) {
+    if (ch == nil)
+        panic("fd of nil channel");
+    return ch->fd();
+}
+int _chan::fd() {
+    _chan *ch = this;
+    int fdr, fdw;
+
+    ch->_mu.lock();
+    defer([&]() {
+        ch->_mu.unlock();
+    });
+
+    if (ch->_fdr != -1)
+        return ch->_fdr;
+
+#ifdef LIBGOLANG_OS_linux
+    fdr = fdw = internal::syscall::Eventfd(0, EFD_CLOEXEC);
+    if (fdr < 0)
+        panic("chan: fd: eventfd failed");
+#else
+    int vfd[2];
+    if (internal::syscall::Pipe(vfd, O_CLOEXEC) < 0)
+        panic("chan: fd: pipe failed");
+    fdr = vfd[0];
+    fdw = vfd[1];
+#endif
+
+    ch->_fdr     = fdr;
+    ch->_fdw     = fdw;
+    ch->_fdready = false;
+    ch->_fdsync();
+    return fdr;
+}
+
+// _recvready returns whether recv is likely not to block.
+// called with ch._mu locked.
+inline bool _chan::_recvready() {
+    _chan *ch = this;
+    return (ch->_dataq_n > 0 || ch->_closed || !list_empty(&ch->_sendq));
+}
+
+static void _pollnotify(_chan *ch, bool ready);
+
+// _fdsync updates readiness of ch._fdr, and of pollers that watch ch,
+// according to current channel state.
+// called with ch._mu locked.
+// it is noop if ch.fd was never requested and ch is not watched by any poller.
+inline void _chan::_fdsync() {
+    _chan *ch = this;
+    if (ch->_fdr == -1 && list_empty(&ch->_pollq))
+        return;
+    ch->__fdsync();
+}
+void _chan::__fdsync() {
+    _chan *ch = this;
+
+    bool ready = ch->_recvready();
+    if (!list_empty(&ch->_pollq) && ready != ch->_pollready) {
+        _pollnotify(ch, ready);
+        ch->_pollready = ready;
+    }
+
+    if (ch->_fdr == -1 || ready == ch->_fdready)
+        return;
+
+    // _fdready tracks fd state precisely, so neither write nor read below can block.
+    int n;
+#ifdef LIBGOLANG_OS_linux
+    uint64_t v = 1;
+#else
+    char     v = 0;
+#endif
+    if (ready)
+        n = internal::syscall::Write(ch->_fdw, &v, sizeof(v));
+    else
+        n = internal::syscall::Read (ch->_fdr, &v, sizeof(v));
+    if (n != sizeof(v))
+        bug("chan: fd: signal failed");
+    ch->_fdready = ready;
+}
+
 // _dataq_append appends next element to ch._dataq.
 // called with ch._mu locked.
 void _chan::_dataq_append(const void *ptx) {
     _chan *ch = this;
 
-    if (ch->_dataq_n >= ch->_cap)
+    if (ch->_dataq_n >= ch->_dataq_cap)
         bug("chan: dataq.append on full dataq");
-    if (ch->_dataq_w >= ch->_cap)
+    if (ch->_dataq_w >= ch->_dataq_cap)
         bug("chan: dataq.append: w >= cap");
 
-    memcpy(&((char *)(ch+1))[ch->_dataq_w * ch->_elemsize], ptx, ch->_elemsize);
-    ch->_dataq_w++; ch->_dataq_w %= ch->_cap;
+    _elemmove(ch->_elemops, ch->_elemsize, &ch->_dataq[ch->_dataq_w * ch->_elemsize], ptx);
+    ch->_dataq_w++; ch->_dataq_w %= ch->_dataq_cap;
     ch->_dataq_n++;
 }
 
@@ -871,13 +1262,60 @@ void _chan::_dataq_popleft(void *prx) {
 
     if (ch->_dataq_n == 0)
         bug("chan: dataq.popleft on empty dataq");
-    if (ch->_dataq_r >= ch->_cap)
+    if (ch->_dataq_r >= ch->_dataq_cap)
         bug("chan: dataq.popleft: r >= cap");
 
+    void *pelem = &ch->_dataq[ch->_dataq_r * ch->_elemsize];
     if (prx != nil)
-        memcpy(prx, &((char *)(ch+1))[ch->_dataq_r * ch->_elemsize], ch->_elemsize);
-    ch->_dataq_r++; ch->_dataq_r %= ch->_cap;
+        _elemassign(ch->_elemops, ch->_elemsize, prx, pelem);
+    _elemdestroy(ch->_elemops, pelem);
+    ch->_dataq_r++; ch->_dataq_r %= ch->_dataq_cap;
     ch->_dataq_n--;
+
+    // shrink data queue, if it became mostly unused.
+    // it is ok if shrinking fails - we will retry on next popleft.
+    unsigned ninline = ch->_dataq_ninline();
+    if (ch->_dataq_cap > ninline && ch->_dataq_n <= ch->_dataq_cap/4)
+        (void)ch->_dataq_resize(max(ninline, ch->_dataq_cap/2));
+}
+
+// _dataq_ninline returns how many elements of ch._dataq go past _chan memory.
+inline unsigned _chan::_dataq_ninline() const {
+    const _chan *ch = this;
+    return (ch->_elemsize == 0 ? ch->_cap : min(ch->_cap, _DATAQ_NINLINE));
+}
+
+// _dataq_resize reallocates ch._dataq to have capacity for ncap elements.
+// called with ch._mu locked.
+// ncap must be >= ch._dataq_n and <= ch._cap.
+// returns false if memory allocation failed. ch._dataq is left unchanged in such case.
+bool _chan::_dataq_resize(unsigned ncap) {
+    _chan *ch = this;
+
+    if (!(ch->_dataq_n <= ncap && ncap <= ch->_cap))
+        bug("chan: dataq.resize: invalid ncap");
+
+    char *inline_ = (char *)(ch+1);
+    char *dataq   = inline_;
+    if (ncap > ch->_dataq_ninline()) {
+        dataq = (char *)malloc(ncap * ch->_elemsize);
+        if (dataq == nil)
+            return false;
+    }
+
+    for (unsigned i = 0; i < ch->_dataq_n; i++) {
+        void *pelem = &ch->_dataq[((ch->_dataq_r + i) % ch->_dataq_cap) * ch->_elemsize];
+        _elemmove(ch->_elemops, ch->_elemsize, &dataq[i * ch->_elemsize], pelem);
+        _elemdestroy(ch->_elemops, pelem);
+    }
+    if (ch->_dataq != inline_)
+        free(ch->_dataq);
+
+    ch->_dataq     = dataq;
+    ch->_dataq_cap = ncap;
+    ch->_dataq_r   = 0;
+    ch->_dataq_w   = ch->_dataq_n % ncap;
+    return true;
 }
 
 
@@ -915,10 +1353,18 @@ void *_selcase::prx() const {
 
 
 static const _RecvSendWaiting _sel_txrx_prepoll_won;
-template<bool onstack> static int _chanselect2(const _selcase *, int, const vector<int>&);
-template<> int _chanselect2</*onstack=*/true> (const _selcase *, int, const vector<int>&);
-template<> int _chanselect2</*onstack=*/false>(const _selcase *, int, const vector<int>&);
-static int __chanselect2(const _selcase *, int, const vector<int>&, _WaitGroup*);
+static const _RecvSendWaiting _sel_async_cancelled;
+// _selorder is order in which select tries its cases.
+typedef vector<int, _rtallocator<int>> _selorder;
+
+template<bool onstack> static int _chanselect2(const _selcase *, int, const _selorder&);
+template<> int _chanselect2</*onstack=*/true> (const _selcase *, int, const _selorder&);
+template<> int _chanselect2</*onstack=*/false>(const _selcase *, int, const _selorder&);
+static int __chanselect2(const _selcase *, int, const _selorder&, _WaitGroup*);
+static int _selpoll(const _selcase *, int, const _selorder&, int *, bool *);
+static int _selregister(const _selcase *, int, const _selorder&, _WaitGroup*, _RecvSendWaiting *, int *);
+static void _selunregister(_RecvSendWaiting *, int);
+static int _selresult(const _selcase *, _WaitGroup*);
 
 // PRNG for select.
 // TODO consider switching to xoroshiro or wyrand if speed is an issue
@@ -927,6 +1373,17 @@ static int __chanselect2(const _selcase *, int, const vector<int>&, _WaitGroup*)
 static std::random_device        _devrand;
 static thread_local std::mt19937 _t_rng(_devrand());
 
+// _selshuffle returns random order in which select should try casev.
+//
+// select promise: if multiple cases are ready - one will be selected randomly
+static _selorder _selshuffle(int casec) {
+    _selorder nv(casec); // n -> n(case)
+    for (int i=0; i <casec; i++)
+        nv[i] = i;
+    std::shuffle(nv.begin(), nv.end(), _t_rng);
+    return nv;
+}
+
 // _chanselect executes one ready send or receive channel case.
 //
 // if no case is ready and default case was provided, select chooses default.
@@ -949,13 +1406,48 @@ int _chanselect(const _selcase *casev, int casec) {
     if (casec < 0)
         panic("select: casec < 0");
 
-    // select promise: if multiple cases are ready - one will be selected randomly
-    vector<int> nv(casec); // n -> n(case)      TODO -> caller stack-allocate nv
-    for (int i=0; i <casec; i++)
-        nv[i] = i;
-    std::shuffle(nv.begin(), nv.end(), _t_rng);
+    _selorder nv = _selshuffle(casec);
 
     // first pass: poll all cases and bail out in the end if default was provided
+    int  ndefault;
+    bool havenonnil;
+    int n = _selpoll(casev, casec, nv, &ndefault, &havenonnil);
+    if (n != -1)
+        return n;
+
+    // execute default if we have it
+    if (ndefault != -1)
+        return ndefault;
+
+    // select{} or with nil-channels only -> block forever
+    if (!havenonnil)
+        _blockforever();
+
+    // second pass: subscribe and wait on all rx/tx cases
+
+    // keep all channels alive while _chanselect2 runs.
+    // we need to keep them alive because upon wakeup:
+    // - __chanselect2 needs to unregister all registered waiters from all channels,
+    // - _chanselect2<onstack=false> needs to access casev[selected].ch->_elemsize.
+    for (int i=0; i < casec; i++)
+        _chanxincref(casev[i].ch);
+    defer([&]() {
+        for (int i=0; i < casec; i++)
+            _chanxdecref(casev[i].ch);
+    });
+
+    return (_runtime->flags & STACK_DEAD_WHILE_PARKED) \
+        ? _chanselect2</*onstack=*/false>(casev, casec, nv)
+        : _chanselect2</*onstack=*/true> (casev, casec, nv);
+}
+
+// _selpoll serves first pass of _chanselect and _chanselect_async.
+//
+// it tries to execute cases in nv order without blocking and returns number
+// of executed case, or -1 if no case was ready.
+// *pndefault is set to number of default case, or -1 if there is no default.
+// *phavenonnil is set to whether there is at least one !nil channel.
+static int _selpoll(const _selcase *casev, int casec, const _selorder& nv, int *pndefault, bool *phavenonnil) {
     int  ndefault = -1;
     bool havenonnil = false; // whether we have at least one !nil channel
     for (auto n : nv) {
@@ -1012,45 +1504,36 @@ int _chanselect(const _selcase *casev, int casec) {
         }
     }
 
-    // execute default if we have it
-    if (ndefault != -1)
-        return ndefault;
-
-    // select{} or with nil-channels only -> block forever
-    if (!havenonnil)
-        _blockforever();
-
-    // second pass: subscribe and wait on all rx/tx cases
-
-    // keep all channels alive while _chanselect2 runs.
-    // we need to keep them alive because upon wakeup:
-    // - __chanselect2 needs to unregister all registered waiters from all channels,
-    // - _chanselect2<onstack=false> needs to access casev[selected].ch->_elemsize.
-    for (int i=0; i < casec; i++)
-        _chanxincref(casev[i].ch);
-    defer([&]() {
-        for (int i=0; i < casec; i++)
-            _chanxdecref(casev[i].ch);
-    });
-
-    return (_runtime->flags & STACK_DEAD_WHILE_PARKED) \
-        ? _chanselect2</*onstack=*/false>(casev, casec, nv)
-        : _chanselect2</*onstack=*/true> (casev, casec, nv);
+    *pndefault   = ndefault;
+    *phavenonnil = havenonnil;
+    return -1;
 }
 
-template<> int _chanselect2</*onstack=*/true> (const _selcase *casev, int casec, const vector<int>& nv) {
+template<> int _chanselect2</*onstack=*/true> (const _selcase *casev, int casec, const _selorder& nv) {
     _WaitGroup  g;
     return __chanselect2(casev, casec, nv, &g);
 }
 
-template<> int _chanselect2</*onstack=*/false>(const _selcase *casev, int casec, const vector<int>& nv) {
+// _elemslot returns size of heap slot for element of elemsize bytes.
+// slots are kept aligned for elements with element operations to be constructed there.
+static inline unsigned _elemslot(unsigned elemsize) {
+    const unsigned align = alignof(std::max_align_t);
+    return (elemsize + align - 1) & ~(align - 1);
+}
+
+template<> int _chanselect2</*onstack=*/false>(const _selcase *casev, int casec, const _selorder& nv) {
     unique_ptr<_WaitGroup>  g (new _WaitGroup);
     int i;
-    unsigned rxmax=0, txtotal=0;
+    unsigned rxmax=0, txtotal=0, rxopstotal=0;
 
     // reallocate chan .tx / .rx to heap; adjust casev
     // XXX avoid doing this if all .tx and .rx are on heap or have inplace data?
-    unique_ptr<_selcase[]>  casev_onheap (new _selcase[casec]);
+    _selcase *casev_onheap = (_selcase *)_rtalloc(casec * sizeof(_selcase));
+    if (casev_onheap == nil)
+        throw bad_alloc();
+    defer([&]() {
+        _rtfree(casev_onheap, casec * sizeof(_selcase));
+    });
     for (i = 0; i < casec; i++) {
         const _selcase *cas = &casev[i];
         casev_onheap[i] = *cas;
@@ -1058,81 +1541,123 @@ template<> int _chanselect2</*onstack=*/false>(const _selcase *casev, int casec,
             continue;
         if (cas->op == _CHANSEND) {
             if (!(cas->flags & _INPLACE_DATA))
-                txtotal += cas->ch->_elemsize;
+                txtotal += _elemslot(cas->ch->_elemsize);
         }
         else if (cas->op == _CHANRECV) {
-            rxmax = max(rxmax, cas->ch->_elemsize);
+            if (cas->ch->_elemops == nil)
+                rxmax = max(rxmax, cas->ch->_elemsize);
+            else
+                rxopstotal += _elemslot(cas->ch->_elemsize);
         }
         else {
             bug("select: invalid op  ; _chanselect2: !onstack: A");
         }
     }
 
-    // tx are appended sequentially; all rx go to &rxtxdata[0]
-    char *rxtxdata = (char *)malloc(max(rxmax, txtotal));
+    // tx are appended sequentially; rx with element operations are appended
+    // after them, each into its own slot, because the slot has to hold
+    // constructed element; all other rx go to the common slot at the end.
+    size_t rxtxsize = txtotal + rxopstotal + rxmax;
+    char *rxtxdata = (char *)_rtalloc(rxtxsize);
     if (rxtxdata == nil)
         throw bad_alloc();
-    defer([&]() {
-        free(rxtxdata);
-    });
 
-    char *ptx = rxtxdata;
+    char *ptxrx = rxtxdata;
     for (i = 0; i <casec; i++) {
         _selcase *cas = &casev_onheap[i];
         if (cas->ch == nil) // nil chan
             continue;
         if (cas->op == _CHANSEND) {
             if (!(cas->flags & _INPLACE_DATA)) {
-                memcpy(ptx, cas->ptxrx, cas->ch->_elemsize);
-                cas->ptxrx = ptx;
-                ptx += cas->ch->_elemsize;
+                _elemmove(cas->ch->_elemops, cas->ch->_elemsize, ptxrx, cas->ptxrx);
+                cas->ptxrx = ptxrx;
+                ptxrx += _elemslot(cas->ch->_elemsize);
             }
         }
-        else if (cas->op == _CHANRECV) {
-            cas->ptxrx = rxtxdata;
-        } else {
-            bug("select: invalid op  ; _chanselect2: !onstack: B");
+    }
+    for (i = 0; i <casec; i++) {
+        _selcase *cas = &casev_onheap[i];
+        if (cas->ch == nil) // nil chan
+            continue;
+        if (cas->op == _CHANRECV) {
+            if (cas->ch->_elemops == nil) {
+                cas->ptxrx = rxtxdata + txtotal + rxopstotal;
+            } else {
+                cas->ch->_elemops->zero(ptxrx);
+                cas->ptxrx = ptxrx;
+                ptxrx += _elemslot(cas->ch->_elemsize);
+            }
         }
     }
 
+    // on exit: give not-sent tx back to their original locations and destroy heap copies.
+    // NOTE it is ok to access cas->ch because we pin all channels to be alive
+    // while _chanselect2 runs.
+    int selected = -1;
+    defer([&]() {
+        for (i = 0; i < casec; i++) {
+            _selcase *cas = &casev_onheap[i];
+            if (cas->ch == nil || cas->ch->_elemops == nil)
+                continue;
+            if (cas->op == _CHANSEND) {
+                if (cas->flags & _INPLACE_DATA)
+                    continue;
+                if (i != selected)
+                    _elemassign(cas->ch->_elemops, cas->ch->_elemsize, casev[i].ptxrx, cas->ptxrx);
+            }
+            cas->ch->_elemops->destroy(cas->ptxrx);
+        }
+        _rtfree(rxtxdata, rxtxsize);
+    });
+
     // select ...
-    int selected = __chanselect2(casev_onheap.get(), casec, nv, g.get());
+    selected = __chanselect2(casev_onheap, casec, nv, g.get());
 
     // copy data back to original rx location.
-    // NOTE it is ok to access cas->ch because we pin all channels to be alive
-    // while _chanselect2 runs.
     _selcase *cas = &casev_onheap[selected];
     if (cas->op == _CHANRECV) {
         const _selcase *cas0 = &casev[selected];
         if (cas0->ptxrx != nil)
-            memcpy(cas0->ptxrx, cas->ptxrx, cas->ch->_elemsize);
+            _elemassign(cas->ch->_elemops, cas->ch->_elemsize, cas0->ptxrx, cas->ptxrx);
     }
 
     return selected;
 }
 
-static int __chanselect2(const _selcase *casev, int casec, const vector<int>& nv, _WaitGroup* g) {
+static int __chanselect2(const _selcase *casev, int casec, const _selorder& nv, _WaitGroup* g) {
     // storage for waiters we create    XXX stack-allocate (if !STACK_DEAD_WHILE_PARKED)
     //  XXX or let caller stack-allocate? but then we force it to know sizeof(_RecvSendWaiting)
-    _RecvSendWaiting *waitv = (_RecvSendWaiting *)calloc(sizeof(_RecvSendWaiting), casec);
+    _RecvSendWaiting *waitv = (_RecvSendWaiting *)_rtalloc(casec * sizeof(_RecvSendWaiting));
     int               waitc = 0;
     if (waitv == nil)
         throw bad_alloc();
+    memset((void *)waitv, 0, casec * sizeof(_RecvSendWaiting));
     // on exit: remove all registered waiters from their wait queues.
     defer([&]() {
-        for (int i = 0; i < waitc; i++) {
-            _RecvSendWaiting *w = &waitv[i];
-            w->chan->_mu.lock();    // NOTE we pin all channels alive before entering _chanselect2
-            list_del_init(&w->in_rxtxq); // thanks to _init used in _dequeWaiter
-            w->chan->_mu.unlock();       // it is ok to del twice even if w was already removed
-        }
-
-        bzero((void *)waitv, waitc*sizeof(waitv[0]));
-        free(waitv);
+        _selunregister(waitv, waitc);
+        _rtfree(waitv, casec * sizeof(_RecvSendWaiting));
         waitv = nil;
     });
 
+    int n = _selregister(casev, casec, nv, g, waitv, &waitc);
+    if (n != -1)
+        return n;
+
+    // wait for a case to become ready
+    g->wait();
+    return _selresult(casev, g);
+}
 
+// _selregister serves second pass of __chanselect2 and _chanselect_async.
+//
+// it subscribes waiters from group g on all rx/tx cases in nv order.
+// waiters are stored into waitv and *pwaitc is updated as they are registered.
+//
+// if a case becomes ready during registration, it is executed, no other case
+// is allowed to win, and its number is returned. Otherwise -1 is returned and
+// the caller should wait for g wakeup.
+static int _selregister(const _selcase *casev, int casec, const _selorder& nv, _WaitGroup* g,
+                        _RecvSendWaiting *waitv, int *pwaitc) {
     for (auto n : nv) {
         const _selcase *cas = &casev[n];
         _chan *ch = cas->ch;
@@ -1146,20 +1671,20 @@ static int __chanselect2(const _selcase *casev, int casec, const vector<int>& nv
             // queuing other cases.
             if (g->which != nil) {
                 ch->_mu.unlock();
-                goto wait_case_ready;
+                return -1;
             }
 
             // send
             if (cas->op == _CHANSEND) {
-                bool done = ch->_trysend(cas->ptx());
+                bool done = ch->_trysend(cas->ptx(), g);
                 if (done) {
                     g->which = &_sel_txrx_prepoll_won; // !nil not to let already queued cases win
                     return n;
                 }
 
-                if (waitc >= casec)
+                if (*pwaitc >= casec)
                     bug("select: waitv overflow");
-                _RecvSendWaiting *w = &waitv[waitc++];
+                _RecvSendWaiting *w = &waitv[(*pwaitc)++];
 
                 w->init(g, ch);
                 w->pdata = (void *)cas->ptx();
@@ -1167,11 +1692,12 @@ static int __chanselect2(const _selcase *casev, int casec, const vector<int>& nv
                 w->sel_n = n;
 
                 list_add_tail(&w->in_rxtxq, &ch->_sendq);
+                ch->_fdsync();
             }
 
             // recv
             else if (cas->op == _CHANRECV) {
-                bool ok, done = ch->_tryrecv(cas->prx(), &ok);
+                bool ok, done = ch->_tryrecv(cas->prx(), &ok, g);
                 if (done) {
                     g->which = &_sel_txrx_prepoll_won; // !nil not to let already queued cases win
                     if (cas->rxok != nil)
@@ -1179,9 +1705,9 @@ static int __chanselect2(const _selcase *casev, int casec, const vector<int>& nv
                     return n;
                 }
 
-                if (waitc >= casec)
+                if (*pwaitc >= casec)
                     bug("select: waitv overflow");
-                _RecvSendWaiting *w = &waitv[waitc++];
+                _RecvSendWaiting *w = &waitv[(*pwaitc)++];
 
                 w->init(g, ch);
                 w->pdata = cas->prx();
@@ -1199,9 +1725,27 @@ static int __chanselect2(const _selcase *casev, int casec, const vector<int>& nv
         ch->_mu.unlock();
     }
 
-    // wait for a case to become ready
-wait_case_ready:
-    g->wait();
+    return -1;
+}
+
+// _selunregister removes all registered waiters from their wait queues.
+static void _selunregister(_RecvSendWaiting *waitv, int waitc) {
+    for (int i = 0; i < waitc; i++) {
+        _RecvSendWaiting *w = &waitv[i];
+        w->chan->_mu.lock();    // NOTE we pin all channels alive before entering _chanselect2
+        list_del_init(&w->in_rxtxq); // it is ok to del twice even if w was already removed
+                                     // thanks to _init used in _dequeWaiter
+        w->chan->_fdsync();
+        w->chan->_mu.unlock();
+    }
+
+    bzero((void *)waitv, waitc*sizeof(waitv[0]));
+}
+
+// _selresult returns selected case after g was woken up.
+//
+// it panics if the selected case was send on closed channel.
+static int _selresult(const _selcase *casev, _WaitGroup* g) {
     if (g->which == &_sel_txrx_prepoll_won)
         bug("select: woke up with g.which=_sel_txrx_prepoll_won");
 
@@ -1222,6 +1766,320 @@ wait_case_ready:
     bug("select: selected case has invalid op");
 }
 
+
+// ---- select without blocking ----
+
+// _selasync represents select that was started by _chanselect_async and is
+// waiting for one of its cases to become ready.
+struct _selasync {
+    _WaitGroup          g;
+    const _selcase     *casev;
+    int                 casec;
+    _RecvSendWaiting   *waitv;
+    int                 waitc;
+
+    _selasync(const _selcase *casev, int casec);
+    ~_selasync();
+private:
+    _selasync(const _selasync&);    // don't copy
+    _selasync(_selasync&&);         // don't move
+};
+
+_selasync::_selasync(const _selcase *casev, int casec) {
+    _selasync *asel = this;
+    asel->casev = casev;
+    asel->casec = casec;
+    asel->waitc = 0;
+    asel->waitv = (_RecvSendWaiting *)calloc(sizeof(_RecvSendWaiting), max(casec, 1));
+    if (asel->waitv == nil)
+        throw bad_alloc();
+
+    // keep all channels alive while waiters are registered and until the
+    // result is retrieved.
+    for (int i=0; i < casec; i++)
+        _chanxincref(casev[i].ch);
+}
+
+_selasync::~_selasync() {
+    _selasync *asel = this;
+    _selunregister(asel->waitv, asel->waitc);
+    free(asel->waitv);
+    asel->waitv = nil;
+    for (int i=0; i < asel->casec; i++)
+        _chanxdecref(asel->casev[i].ch);
+}
+
+// _chanselect_async is non-blocking variant of _chanselect.
+//
+// Instead of parking current goroutine, it registers waiters on all channels
+// and returns. When one of the cases becomes ready, notify(arg) is called by
+// the goroutine that made the case ready. notify is called exactly once,
+// outside of any channel lock and possibly from another OS thread. It must
+// not block and must not call into libgolang channel operations.
+//
+// returns:
+//
+//  - selected case number, if a case was ready, or default was provided.
+//    *pasel is set to nil and notify won't be called.
+//  - -1, if no case was ready. *pasel is set to the select that is being waited
+//    for. After notify the result should be retrieved with _selasync_done.
+//    The wait can be also canceled with _selasync_cancel.
+//
+// casev and all data it points to must stay alive until _selasync_done or
+// successful _selasync_cancel.
+int _chanselect_async(const _selcase *casev, int casec, void (*notify)(void *arg), void *arg, _selasync **pasel) {
+    *pasel = nil;
+    if (casec < 0)
+        panic("select: casec < 0");
+
+    _selorder nv = _selshuffle(casec);
+
+    int  ndefault;
+    bool havenonnil;
+    int n = _selpoll(casev, casec, nv, &ndefault, &havenonnil);
+    if (n != -1)
+        return n;
+    if (ndefault != -1)
+        return ndefault;
+
+    // NOTE select{} or with nil-channels only -> notify is never called
+    unique_ptr<_selasync> asel (new _selasync(casev, casec));
+    asel->g._notify     = notify;
+    asel->g._notify_arg = arg;
+
+    n = _selregister(casev, casec, nv, &asel->g, asel->waitv, &asel->waitc);
+    if (n != -1)
+        return n; // asel is freed
+
+    *pasel = asel.release();
+    return -1;
+}
+
+// _selasync_done returns selected case of async select after its notify was called.
+//
+// asel is freed. If selected case was send on closed channel - it panics.
+int _selasync_done(_selasync *asel) {
+    unique_ptr<_selasync> _ (asel);
+    if (asel->g.which == nil)
+        bug("selasync: done: not yet notified");
+    if (asel->g.which == &_sel_async_cancelled)
+        bug("selasync: done: canceled");
+    return _selresult(asel->casev, &asel->g);
+}
+
+// _selasync_cancel tries to cancel async select.
+//
+// If it returns true, the select was canceled, no case was executed, notify
+// won't be called and asel is freed. If it returns false, a case was already
+// selected - the caller should wait for notify and then call _selasync_done as
+// usual.
+bool _selasync_cancel(_selasync *asel) {
+    _WaitGroup *g = &asel->g;
+    bool canceled;
+    g->_mu.lock();
+        canceled = (g->which == nil);
+        if (canceled)
+            g->which = &_sel_async_cancelled; // !nil not to let queued cases win
+    g->_mu.unlock();
+
+    if (canceled)
+        delete asel;
+    return canceled;
+}
+
+
+// ---- poller ----
+
+// _poller watches many channels for readiness to receive.
+//
+// A channel is registered with poller only once, after which the channel
+// itself keeps the poller updated about its readiness: every channel
+// operation that changes readiness links/unlinks the channel to/from poller
+// ready queue. Waiting on the poller thus costs O(1) instead of locking and
+// registering waiters on all channels, as select does.
+//
+// See _makepoller for details.
+struct _pollentry {
+    _poller     *poller;
+    _chan       *ch;
+    list_head   in_chan;    // in ch._pollq
+    list_head   in_poller;  // in poller._entryq
+    list_head   in_ready;   // in poller._readyq; empty if ch is not ready
+};
+
+struct _poller {
+    sync::Mutex     _mu;        // NOTE ∀ chan order is always: chan._mu > ._mu
+    list_head       _entryq;    // all registered channels  (_ -> _pollentry.in_poller)
+    list_head       _readyq;    // channels ready to receive (_ -> _pollentry.in_ready)
+
+    // _wakeup has element in its buffer when _readyq might be non-empty.
+    // poller waiters block receiving from it.
+    chan<structZ>   _wakeup;
+};
+
+// _makepoller creates new poller.
+//
+// Use _polleradd and _pollerremove to register and unregister channels, and
+// _pollerwait to wait for a registered channel to become ready to receive.
+// Readiness is reported similarly to _chanfd: a channel is ready when it has
+// buffered data, a blocked sender, or is closed. The receive should be done
+// without blocking, e.g. via _chantryrecv_, because other receivers might win
+// the data first.
+//
+// The poller keeps registered channels alive until they are unregistered,
+// or until the poller is freed with _pollerfree.
+_poller *_makepoller() {
+    _poller *p = new _poller();
+    INIT_LIST_HEAD(&p->_entryq);
+    INIT_LIST_HEAD(&p->_readyq);
+    p->_wakeup = makechan<structZ>(1);
+    return p;
+}
+
+// _pollerfree unregisters all channels from the poller and frees it.
+void _pollerfree(_poller *p) {
+    while (1) {
+        p->_mu.lock();
+        if (list_empty(&p->_entryq)) {
+            p->_mu.unlock();
+            break;
+        }
+        _chan *ch = list_entry(p->_entryq.next, _pollentry, in_poller)->ch;
+        p->_mu.unlock();
+        _pollerremove(p, ch);
+    }
+    delete p;
+}
+
+// _polleradd registers channel with the poller.
+//
+// It panics if ch is nil or is already registered with the poller.
+void _polleradd(_poller *p, _chan *ch) {
+    if (ch == nil)
+        panic("poller: add of nil channel");
+
+    _pollentry *e = new _pollentry();
+    e->poller = p;
+    e->ch     = ch;
+    INIT_LIST_HEAD(&e->in_ready);
+
+    ch->_mu.lock();
+    p->_mu.lock();
+        list_head *h;
+        list_for_each(h, &ch->_pollq) {
+            if (list_entry(h, _pollentry, in_chan)->poller == p) {
+                p->_mu.unlock();
+                ch->_mu.unlock();
+                delete e;
+                panic("poller: add: channel is already registered");
+            }
+        }
+
+        if (list_empty(&ch->_pollq))
+            ch->_pollready = ch->_recvready();
+        list_add_tail(&e->in_chan,   &ch->_pollq);
+        list_add_tail(&e->in_poller, &p->_entryq);
+        if (ch->_pollready) {
+            list_add_tail(&e->in_ready, &p->_readyq);
+            (void)p->_wakeup.trysend(structZ{});
+        }
+    p->_mu.unlock();
+    ch->_mu.unlock();
+
+    _chanxincref(ch);
+}
+
+// _pollerremove unregisters channel from the poller.
+//
+// It panics if ch is not registered with the poller.
+void _pollerremove(_poller *p, _chan *ch) {
+    if (ch == nil)
+        panic("poller: remove: channel is not registered");
+
+    _pollentry *e = nil;
+    ch->_mu.lock();
+    p->_mu.lock();
+        list_head *h;
+        list_for_each(h, &ch->_pollq) {
+            _pollentry *e_ = list_entry(h, _pollentry, in_chan);
+            if (e_->poller == p) {
+                e = e_;
+                break;
+            }
+        }
+        if (e != nil) {
+            list_del(&e->in_chan);
+            list_del(&e->in_poller);
+            list_del_init(&e->in_ready);
+        }
+    p->_mu.unlock();
+    ch->_mu.unlock();
+
+    if (e == nil)
+        panic("poller: remove: channel is not registered");
+    delete e;
+    _chanxdecref(ch);
+}
+
+// _pollerwait waits for a registered channel to become ready to receive.
+//
+// It returns the channel, or nil if no channel became ready during timeout_ns.
+// timeout_ns=0 means "don't block". timeout_ns=UINT64_MAX means "wait forever".
+//
+// Returned channel is not referenced: it stays alive only while it is
+// registered with the poller. Ready channels are returned in round-robin order,
+// and the same channel is returned again by subsequent waits while it stays ready.
+_chan *_pollerwait(_poller *p, uint64_t timeout_ns) {
+    uint64_t deadline = UINT64_MAX;
+    if (timeout_ns != UINT64_MAX)
+        deadline = time::_nanotime() + timeout_ns;
+
+    while (1) {
+        p->_mu.lock();
+        if (!list_empty(&p->_readyq)) {
+            _pollentry *e = list_entry(p->_readyq.next, _pollentry, in_ready);
+            list_del(&e->in_ready);
+            list_add_tail(&e->in_ready, &p->_readyq);
+            _chan *ch = e->ch;
+            p->_mu.unlock();
+
+            // let other waiters, if any, proceed too
+            (void)p->_wakeup.trysend(structZ{});
+            return ch;
+        }
+        p->_mu.unlock();
+
+        uint64_t dt = UINT64_MAX;
+        if (deadline != UINT64_MAX) {
+            uint64_t now = time::_nanotime();
+            dt = (now < deadline ? deadline - now : 0);
+        }
+        structZ _; bool ok;
+        if (!_chantryrecv_(p->_wakeup._rawchan(), &_, &ok, dt))
+            return nil;
+    }
+}
+
+// _pollnotify updates ready queues of pollers watching ch after ch readiness changed.
+// called with ch._mu locked.
+static void _pollnotify(_chan *ch, bool ready) {
+    list_head *h;
+    list_for_each(h, &ch->_pollq) {
+        _pollentry *e = list_entry(h, _pollentry, in_chan);
+        _poller    *p = e->poller;
+        p->_mu.lock();
+        if (ready) {
+            bool wasempty = list_empty(&p->_readyq);
+            list_add_tail(&e->in_ready, &p->_readyq);
+            if (wasempty)
+                (void)p->_wakeup.trysend(structZ{});
+        } else {
+            list_del_init(&e->in_ready);
+        }
+        p->_mu.unlock();
+    }
+}
+
 // _blockforever blocks current goroutine forever.
 void (*_tblockforever)() = nil;
 void _blockforever() {
@@ -1253,6 +2111,14 @@ template<> const std::type_info* _t_typeid<_error>          () { return &typeid(
 template<> const std::type_info* _t_typeid<_errorWrapper>   () { return &typeid(_errorWrapper); }
 
 
+// _tchandataqcap returns current capacity of _ch._dataq
+unsigned _tchandataqcap(_chan *_ch) {
+    _ch->_mu.lock();
+    unsigned cap = _ch->_dataq_cap;
+    _ch->_mu.unlock();
+    return cap;
+}
+
 // _tchanlenrecvqlen returns len(_ch._recvq)
 int _tchanrecvqlen(_chan *_ch) {
     int l = 0;
@@ -1310,17 +2176,192 @@ double now() {
 }}  // golang::time::
 
 
-// ---- misc ----
+// ---- runtime allocator ----
 
 // golang::
 namespace golang {
 
-// zalloc allocates zeroed memory.
-static void *zalloc(size_t size) {
-    void *mem = malloc(size);
-    if (mem != nil)
-        memset(mem, 0, size);
-    return mem;
+// _rtalloc and _rtfree allocate and free memory for runtime objects that are
+// created on every makechan, and on every blocking channel operation or
+// select: channels, waiters, wait groups, copies of select cases and of data
+// that is sent or received.
+//
+// Freed blocks are kept in per-thread free lists segregated by size class, so
+// that in steady state blocking channel operations and selects don't go to
+// malloc. Blocks larger than the largest class always go to malloc. A block
+// can be freed by a thread different from the one that allocated it.
+//
+// _rtfree must be given the same size that was given to _rtalloc.
+static const size_t   _RTALLOC_MINSIZE = 32;    // size classes are 32, 64, ..., 2048
+static const int      _RTALLOC_NCLASS  = 7;
+static const unsigned _RTALLOC_NCACHE  = 64;    // max blocks cached per thread per class
+
+struct _rtblock {
+    _rtblock *next;
+};
+
+// _rtcache is per-thread cache of free blocks.
+struct _rtcache {
+    _rtblock *freev [_RTALLOC_NCLASS];
+    unsigned  nfreev[_RTALLOC_NCLASS];
+    bool      dead;   // thread is exiting and the cache was released
+
+    // number of allocations served from this cache.
+    //
+    // It is updated only by the owning thread, so that cache hits do not
+    // touch memory shared in between threads. ReadMemStats sums it over all
+    // live caches.
+    atomic<uint64_t> cachehits;
+    list_head        in_cachev;     // entry in _rtcacheregistry.cachev
+
+    _rtcache();
+    ~_rtcache();
+};
+static thread_local _rtcache _t_rtcache;
+
+// _rtcacheregistry keeps track of live per-thread caches for ReadMemStats.
+//
+// It is locked only when a thread creates or releases its cache, and by
+// ReadMemStats. It uses std::mutex instead of sync::Mutex because caches are
+// released on thread exit, including exit of main thread after the runtime
+// might be already gone.
+struct _rtcacheregistry {
+    std::mutex  mu;
+    list_head   cachev;             // of _rtcache
+    uint64_t    cachehits_dead;     // cache hits of already released caches
+
+    _rtcacheregistry() {
+        INIT_LIST_HEAD(&cachev);
+        cachehits_dead = 0;
+    }
+};
+
+// _rtcachereg returns the registry of per-thread caches.
+// It is never freed, because caches are released during process exit.
+static _rtcacheregistry *_rtcachereg() {
+    static _rtcacheregistry *reg = new _rtcacheregistry();
+    return reg;
+}
+
+// counters for runtime.ReadMemStats .
+// mallocs and frees are counted only on slow path that goes to malloc/free.
+static atomic<uint64_t> _rtstat_mallocs   (0);
+static atomic<uint64_t> _rtstat_frees     (0);
+
+// _rtclass returns size class for size, or -1 if size is too big to be cached.
+static inline int _rtclass(size_t size) {
+    size_t csize = _RTALLOC_MINSIZE;
+    for (int c = 0; c < _RTALLOC_NCLASS; c++, csize <<= 1) {
+        if (size <= csize)
+            return c;
+    }
+    return -1;
+}
+
+static void *_rtalloc(size_t size) {
+    int c = _rtclass(size);
+    if (c != -1) {
+        _rtcache *cache = &_t_rtcache;
+        _rtblock *b = cache->freev[c];
+        if (b != nil) {
+            cache->freev[c] = b->next;
+            cache->nfreev[c]--;
+            // only we update cachehits -> no need for atomic read-modify-write
+            cache->cachehits.store(cache->cachehits.load(std::memory_order_relaxed) + 1,
+                                   std::memory_order_relaxed);
+            return b;
+        }
+        size = _RTALLOC_MINSIZE << c;
+    }
+
+    void *p = malloc(size);
+    if (p != nil)
+        _rtstat_mallocs.fetch_add(1, std::memory_order_relaxed);
+    return p;
+}
+
+static void _rtfree(void *p, size_t size) {
+    if (p == nil)
+        return;
+
+    int c = _rtclass(size);
+    if (c != -1) {
+        _rtcache *cache = &_t_rtcache;
+        if (!cache->dead && cache->nfreev[c] < _RTALLOC_NCACHE) {
+            _rtblock *b = (_rtblock *)p;
+            b->next = cache->freev[c];
+            cache->freev[c] = b;
+            cache->nfreev[c]++;
+            return;
+        }
+    }
+
+    free(p);
+    _rtstat_frees.fetch_add(1, std::memory_order_relaxed);
+}
+
+_rtcache::_rtcache() {
+    _rtcache *cache = this;
+    for (int c = 0; c < _RTALLOC_NCLASS; c++) {
+        cache->freev[c]  = nil;
+        cache->nfreev[c] = 0;
+    }
+    cache->dead      = false;
+    cache->cachehits = 0;
+
+    _rtcacheregistry *reg = _rtcachereg();
+    reg->mu.lock();
+    list_add_tail(&cache->in_cachev, &reg->cachev);
+    reg->mu.unlock();
+}
+
+// on thread exit: release all cached blocks.
+// blocks that are freed after that go directly to free.
+_rtcache::~_rtcache() {
+    _rtcache *cache = this;
+
+    _rtcacheregistry *reg = _rtcachereg();
+    reg->mu.lock();
+    list_del_init(&cache->in_cachev);
+    reg->cachehits_dead += cache->cachehits.load(std::memory_order_relaxed);
+    reg->mu.unlock();
+
+    for (int c = 0; c < _RTALLOC_NCLASS; c++) {
+        while (cache->freev[c] != nil) {
+            _rtblock *b = cache->freev[c];
+            cache->freev[c] = b->next;
+            free(b);
+            _rtstat_frees.fetch_add(1, std::memory_order_relaxed);
+        }
+        cache->nfreev[c] = 0;
+    }
+    cache->dead = true;
 }
 
 }   // golang::
+
+
+// golang::runtime::
+namespace golang {
+namespace runtime {
+
+// ReadMemStats populates m with statistics about libgolang runtime allocator.
+void ReadMemStats(MemStats *m) {
+    m->Mallocs   = _rtstat_mallocs  .load(std::memory_order_relaxed);
+    m->Frees     = _rtstat_frees    .load(std::memory_order_relaxed);
+
+    _rtcacheregistry *reg = _rtcachereg();
+    reg->mu.lock();
+    uint64_t cachehits = reg->cachehits_dead;
+    list_head *h;
+    list_for_each(h, &reg->cachev) {
+        _rtcache *cache = list_entry(h, _rtcache, in_cachev);
+        cachehits += cache->cachehits.load(std::memory_order_relaxed);
+    }
+    reg->mu.unlock();
+    m->CacheHits = cachehits;
+}
+
+}}  // golang::runtime::
+
+
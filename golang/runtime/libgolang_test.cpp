@@ -23,15 +23,21 @@
 #include "golang/runtime.h"
 #include "golang/time.h"
 
+#include <atomic>
 #include <stdio.h>
 #include <tuple>
 #include <utility>
 #include <string.h>
+#include <thread>
 #include <vector>
+#ifndef LIBGOLANG_OS_windows
+# include <poll.h>
+#endif
 
 #include "golang/_testing.h"
 using namespace golang;
 using std::move;
+using std::string;
 using std::tie;
 using std::vector;
 
@@ -144,6 +150,127 @@ void _test_chan_cpp() {
     //chan<chan<int>> zzz;
 }
 
+// verify chan<T> with T that is not trivially copyable.
+struct Tracked {
+    static std::atomic<int> nlive;
+    string s;
+
+    Tracked()                    { nlive++; }
+    Tracked(const string &s) : s(s) { nlive++; }
+    Tracked(const Tracked &x) : s(x.s) { nlive++; }
+    Tracked(Tracked &&x) : s(move(x.s)) { nlive++; }
+    Tracked& operator=(const Tracked &x) { s = x.s; return *this; }
+    ~Tracked()                   { nlive--; }
+};
+std::atomic<int> Tracked::nlive(0);
+
+void _test_chan_cpp_elemops() {
+    // buffered: send by copy and by move; receive from closed gives zero value
+    auto chs = makechan<string>(2);
+    string hello = "hello", world = "world";
+    chs.send(hello);
+    chs.send(move(world));
+    ASSERT(hello == "hello");
+    ASSERT(world == "");
+    ASSERT(chs.len() == 2);
+    ASSERT(chs.recv() == "hello");
+    chs.close();
+    string s; bool ok;
+    tie(s, ok) = chs.recv_();
+    ASSERT(s == "world" && ok == true);
+    tie(s, ok) = chs.recv_();
+    ASSERT(s == "" && ok == false);
+
+    // synchronous: value is moved directly into the peer
+    auto chs2 = makechan<string>();
+    auto done = makechan<structZ>();
+    go([chs2, done]() {
+        chs2.send(string(100, 'a'));
+        string rx;
+        int _ = select({
+            done.recvs(),       // 0
+            chs2.recvs(&rx),    // 1
+        });
+        ASSERT(_ == 1);
+        ASSERT(rx == "bbb");
+        done.close();
+    });
+    ASSERT(chs2.recv() == string(100, 'a'));
+    s = "bbb";
+    int _ = select({
+        chs2.sends(&s), // 0
+    });
+    ASSERT(_ == 0);
+    done.recv();
+
+    // not sent -> value is left intact
+    s = "abc";
+    ASSERT(!chs2.trysend(s));
+    ASSERT(!chs2.trysend(s, 1*time::millisecond));
+    ASSERT(s == "abc");
+    _ = select({
+        chs2.sends(&s), // 0
+        _default,       // 1
+    });
+    ASSERT(_ == 1);
+    ASSERT(s == "abc");
+
+    // move-only element
+    auto chp = makechan<std::unique_ptr<int>>(1);
+    chp.send(std::unique_ptr<int>(new int(5)));
+    auto p = chp.recv();
+    ASSERT(p != nil && *p == 5);
+
+    p.reset(new int(6));
+    _ = select({
+        chp.sends(&p),  // 0
+    });
+    ASSERT(_ == 0);
+    ASSERT(p == nil);
+    _ = select({
+        chp.recvs(&p),  // 0
+    });
+    ASSERT(_ == 0);
+    ASSERT(p != nil && *p == 6);
+
+    chp.send(std::unique_ptr<int>(new int(7)));
+    p = nil;
+    ASSERT(chp.tryrecv_(&p, &ok));
+    ASSERT(ok && p != nil && *p == 7);
+    ASSERT(!chp.tryrecv_(&p, &ok));
+    ASSERT(p != nil && *p == 7);
+
+    chp.send(std::unique_ptr<int>(new int(8)));
+    chp.close();
+    std::unique_ptr<int> p2;
+    tie(p2, ok) = chp.recv_();
+    ASSERT(ok && p2 != nil && *p2 == 8);
+    tie(p2, ok) = chp.recv_();
+    ASSERT(!ok && p2 == nil);
+
+    // elements left in channel buffer are destroyed together with the channel
+    ASSERT_EQ(Tracked::nlive.load(), 0);
+    {
+        auto cht = makechan<Tracked>(3);
+        cht.send(Tracked("a"));
+        cht.send(Tracked("b"));
+        cht.send(Tracked("c"));
+        ASSERT(cht.recv().s == "a");
+        ASSERT_EQ(Tracked::nlive.load(), 2);
+    }
+    ASSERT_EQ(Tracked::nlive.load(), 0);
+
+    // _wrapchan verifies that element operations match
+    const char *err = nil;
+    try {
+        _wrapchan<uintptr_t>(chp._rawchan());
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "wrapchan: elemops mismatch"));
+}
+
 // waitBlocked waits until at least nrx recv and ntx send operations block
 // waiting on the channel.
 void waitBlocked(_chan *ch, int nrx, int ntx) {
@@ -268,6 +395,72 @@ void _test_chan_vs_stackdeadwhileparked() {
     done.recv();
 }
 
+// verify that channels work with native thread that is not spawned by the
+// runtime - for example a thread of C extension that does its work with the GIL
+// released.
+void _test_chan_vs_native_thread() {
+    const int N = 1000;
+    auto ch   = makechan<int>();
+    auto ack  = makechan<int>();
+    auto done = makechan<structZ>();
+
+    std::thread([ch, ack, done]() {
+        for (int i=0; i<N; i++) {
+            ch.send(i);
+            if (ack.recv() != i)
+                panic("ack != i");
+        }
+        ch.close();
+        done.close();
+    }).detach();
+
+    int i, rx; bool ok;
+    for (i=0; i<N; i++) {
+        ASSERT_EQ(ch.recv(), i);
+        ack.send(i);
+    }
+    tie(rx, ok) = ch.recv_();
+    ASSERT(!ok);
+    done.recv();
+}
+
+// _bench_chan_vs_native_thread streams N values from native thread to us.
+void _bench_chan_vs_native_thread(int N) {
+    auto ch   = makechan<int>();
+
+    std::thread([ch, N]() {
+        for (int i=0; i<N; i++)
+            ch.send(i);
+        ch.close();
+    }).detach();
+
+    while (1) {
+        bool ok;
+        tie(std::ignore, ok) = ch.recv_();
+        if (!ok)
+            break;
+    }
+}
+
+// _bench_chan_pingpong_vs_native_thread does N roundtrips with native thread.
+void _bench_chan_pingpong_vs_native_thread(int N) {
+    auto ping = makechan<int>();
+    auto pong = makechan<int>();
+    auto done = makechan<structZ>();
+
+    std::thread([ping, pong, done, N]() {
+        for (int i=0; i<N; i++)
+            pong.send(ping.recv());
+        done.close();
+    }).detach();
+
+    for (int i=0; i<N; i++) {
+        ping.send(i);
+        pong.recv();
+    }
+    done.recv();
+}
+
 // small test to verify C++ go.
 static void _work(int i, chan<structZ> done);
 void _test_go_cpp() {
@@ -462,6 +655,428 @@ void _test_select_inplace() {
 }
 
 
+// verify _chanselect_async.
+static void _tnotify(void *arg) {
+    std::atomic<int> *pnotified = (std::atomic<int> *)arg;
+    pnotified->fetch_add(+1);
+}
+static void _twaitnotified(std::atomic<int> *pnotified) {
+    double t0 = time::now();
+    while (*pnotified == 0) {
+        if (time::now() - t0 > 10)
+            panic("deadlock");
+        time::sleep(0);
+    }
+}
+void _test_chanselect_async() {
+    auto ch  = makechan<int>(1);
+    auto ch2 = makechan<int>();
+    std::atomic<int> notified (0);
+    _selasync *asel;
+    int i, j, _;
+    bool ok;
+
+    // ready case is executed immediately
+    i = 1;
+    _selcase casev[2] = {ch.sends(&i), ch2.recvs(&j)};
+    _ = _chanselect_async(casev, 2, _tnotify, &notified, &asel);
+    ASSERT(_ == 0);
+    ASSERT(asel == nil);
+    ASSERT(ch.len() == 1);
+
+    // default
+    _selcase casevd[2] = {ch2.recvs(&j), _default};
+    _ = _chanselect_async(casevd, 2, _tnotify, &notified, &asel);
+    ASSERT(_ == 1);
+    ASSERT(asel == nil);
+    ASSERT(notified == 0);
+
+    // wait -> notify -> done
+    ASSERT(ch.recv() == 1);
+    j = 0; ok = false;
+    _selcase casevw[2] = {ch.recvs(&j, &ok), ch2.recvs()};
+    _ = _chanselect_async(casevw, 2, _tnotify, &notified, &asel);
+    ASSERT(_ == -1);
+    ASSERT(asel != nil);
+    ASSERT_EQ(_tchanrecvqlen(ch._rawchan()),  1);
+    ASSERT_EQ(_tchanrecvqlen(ch2._rawchan()), 1);
+    go([ch]() {
+        ch.send(2);
+    });
+    _twaitnotified(&notified);
+    ASSERT(notified == 1);
+    _ = _selasync_done(asel);
+    ASSERT(_ == 0);
+    ASSERT(j == 2);
+    ASSERT(ok == true);
+    ASSERT_EQ(_tchanrecvqlen(ch._rawchan()),  0);
+    ASSERT_EQ(_tchanrecvqlen(ch2._rawchan()), 0);
+
+    // cancel
+    notified = 0;
+    _ = _chanselect_async(casevw, 2, _tnotify, &notified, &asel);
+    ASSERT(_ == -1);
+    ASSERT(_selasync_cancel(asel) == true);
+    ASSERT_EQ(_tchanrecvqlen(ch._rawchan()),  0);
+    ASSERT_EQ(_tchanrecvqlen(ch2._rawchan()), 0);
+    ch.send(3);
+    ASSERT(notified == 0);
+    ASSERT(ch.recv() == 3);
+
+    // cancel after case was selected
+    _ = _chanselect_async(casevw, 2, _tnotify, &notified, &asel);
+    ASSERT(_ == -1);
+    ch.close();
+    ASSERT(notified == 1);
+    ASSERT(_selasync_cancel(asel) == false);
+    _ = _selasync_done(asel);
+    ASSERT(_ == 0);
+    ASSERT(j == 0);
+    ASSERT(ok == false);
+
+    // send on closed channel -> panic from _selasync_done
+    notified = 0;
+    auto ch3 = makechan<int>();
+    i = 4;
+    _selcase casevs[1] = {ch3.sends(&i)};
+    _ = _chanselect_async(casevs, 1, _tnotify, &notified, &asel);
+    ASSERT(_ == -1);
+    ch3.close();
+    ASSERT(notified == 1);
+    const char *err = nil;
+    try {
+        _selasync_done(asel);
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "send on closed channel"));
+}
+
+
+// verify chan.trysend/tryrecv_ - non-blocking and timed send/recv.
+void _test_chan_trysendrecv() {
+    int  rx;
+    bool ok;
+
+    // buffered
+    auto ch = makechan<int>(1);
+    rx = -1; ok = true;
+    ASSERT(!ch.tryrecv_(&rx, &ok));
+    ASSERT(rx == -1 && ok == true); // untouched
+    ASSERT( ch.trysend(1));
+    ASSERT(!ch.trysend(2));
+    ASSERT(!ch.trysend(2, 1*time::millisecond));
+    ASSERT(ch.len() == 1);
+    ASSERT( ch.tryrecv_(&rx, &ok));
+    ASSERT(rx == 1 && ok == true);
+    ASSERT(!ch.tryrecv_(&rx, &ok, 1*time::millisecond));
+    ASSERT_EQ(_tchanrecvqlen(ch._rawchan()), 0); // timed out waiter is removed
+
+    // synchronous: timed wait completed by peer
+    auto ch2 = makechan<int>();
+    go([ch2]() {
+        ch2.send(3);
+    });
+    ASSERT(ch2.tryrecv_(&rx, &ok, 10*time::second));
+    ASSERT(rx == 3 && ok == true);
+
+    go([ch2]() {
+        ASSERT(ch2.recv() == 4);
+    });
+    ASSERT(ch2.trysend(4, 10*time::second));
+    ASSERT(!ch2.trysend(5, 1*time::millisecond));
+    ASSERT_EQ(_tchansendqlen(ch2._rawchan()), 0);
+
+    // closed
+    ch2.close();
+    rx = -1;
+    ASSERT(ch2.tryrecv_(&rx, &ok));
+    ASSERT(rx == 0 && ok == false);
+    const char *err = nil;
+    try {
+        ch2.trysend(6);
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "send on closed channel"));
+
+    // nil channel is never ready
+    chan<int> chnil;
+    ASSERT(!chnil.trysend(1));
+    ASSERT(!chnil.tryrecv_(&rx, &ok, 1*time::millisecond));
+}
+
+
+// verify that buffered channel grows and shrinks its data queue on demand.
+void _test_chan_dataq_grow() {
+    auto ch = makechan<int>(1000);
+    _chan *_ch = ch._rawchan();
+    ASSERT_EQ(_tchandataqcap(_ch), 16u);
+
+    // grow with data queue wrapped around
+    for (int i = 0; i < 10; i++)
+        ch.send(i);
+    for (int i = 0; i < 5; i++)
+        ASSERT_EQ(ch.recv(), i);
+    for (int i = 10; i < 100; i++)
+        ch.send(i);
+    ASSERT_EQ(ch.len(), 95u);
+    ASSERT_EQ(_tchandataqcap(_ch), 128u);
+    for (int i = 5; i < 100; i++)
+        ASSERT_EQ(ch.recv(), i);
+    ASSERT_EQ(_tchandataqcap(_ch), 16u);
+
+    // capacity and blocking at capacity are not changed
+    for (int i = 0; i < 1000; i++)
+        ASSERT(ch.trysend(i));
+    ASSERT(!ch.trysend(1000));
+    ASSERT_EQ(ch.len(), 1000u);
+    ASSERT_EQ(ch.cap(), 1000u);
+    ASSERT_EQ(_tchandataqcap(_ch), 1000u);
+    for (int i = 0; i < 1000; i++)
+        ASSERT_EQ(ch.recv(), i);
+
+    // elements are moved when data queue is resized
+    auto chs = makechan<string>(100);
+    for (int i = 0; i < 50; i++)
+        chs.send(string(i, 'x'));
+    ASSERT_EQ(_tchandataqcap(chs._rawchan()), 64u);
+    for (int i = 0; i < 40; i++)
+        ASSERT(chs.recv() == string(i, 'x'));
+    ASSERT_EQ(_tchandataqcap(chs._rawchan()), 32u);
+    // the rest is destroyed together with the channel
+}
+
+
+// verify that runtime reuses memory of channels, waiters and select data.
+void _test_runtime_memstats() {
+    runtime::MemStats m0, m1;
+    auto ch = makechan<int>(1);
+    auto chs = makechan<string>();
+    ch = nil; chs = nil; // warm up caches of current thread
+
+    runtime::ReadMemStats(&m0);
+    for (int i = 0; i < 100; i++) {
+        ch  = makechan<int>(1);
+        chs = makechan<string>();
+        ch.send(i);
+        string s;
+        int _ = select({
+            ch.recvs(),     // 0
+            chs.recvs(&s),  // 1
+        });
+        ASSERT(_ == 0);
+        ch = nil; chs = nil;
+    }
+    runtime::ReadMemStats(&m1);
+    ASSERT(m1.CacheHits - m0.CacheHits >= 200);
+
+    // blocking select: waiters are parked and released on every iteration
+    // and, after warm up, have to be served from free lists instead of malloc.
+    const int N = 100;
+    auto chrx = makechan<int>();
+    auto done = makechan<structZ>();
+    chs = makechan<string>();
+    go([chrx, done]() {
+        for (int i = 0; i < N+1; i++) {
+            waitBlocked_RX(chrx);
+            chrx.send(i);
+        }
+        done.close();
+    });
+    for (int i = 0; i < N+1; i++) {
+        if (i == 1)
+            runtime::ReadMemStats(&m0); // i=0 warms up waiters cache
+        int rx; string s;
+        int _ = select({
+            chrx.recvs(&rx),    // 0
+            chs.recvs(&s),      // 1
+        });
+        ASSERT(_ == 0);
+        ASSERT(rx == i);
+    }
+    runtime::ReadMemStats(&m1);
+    done.recv();
+    ASSERT(m1.CacheHits - m0.CacheHits >= (uint64_t)N);
+    ASSERT(m1.Mallocs   - m0.Mallocs   <  (uint64_t)N);
+}
+
+
+// verify Poller.
+void _test_poller() {
+    auto ch1 = makechan<int>(1);
+    auto ch2 = makechan<int>();
+    auto ch3 = makechan<structZ>();
+    int  rx;
+    bool ok;
+
+    Poller poller;
+    poller.add(ch1);
+    poller.add(ch2);
+    poller.add(ch3);
+    ASSERT(poller.trywait() == nil);
+    ASSERT(poller.trywait(1*time::millisecond) == nil);
+
+    // buffered data -> ready; stays ready while there is data
+    ch1.send(1);
+    ASSERT(poller.wait() == ch1._rawchan());
+    ASSERT(poller.wait() == ch1._rawchan());
+    ASSERT(ch1.tryrecv_(&rx, &ok));
+    ASSERT(rx == 1 && ok == true);
+    ASSERT(poller.trywait() == nil);
+
+    // blocked sender -> ready; wait is woken up by the peer
+    go([ch2]() {
+        ch2.send(2);
+    });
+    ASSERT(poller.trywait(10*time::second) == ch2._rawchan());
+    ASSERT(ch2.tryrecv_(&rx, &ok));
+    ASSERT(rx == 2 && ok == true);
+    ASSERT(poller.trywait() == nil);
+
+    // closed -> ready; ready channels are returned in round-robin order
+    ch1.send(3);
+    ch3.close();
+    _chan *r1 = poller.wait();
+    _chan *r2 = poller.wait();
+    ASSERT(r1 != r2);
+    ASSERT(r1 == ch1._rawchan() || r1 == ch3._rawchan());
+    ASSERT(r2 == ch1._rawchan() || r2 == ch3._rawchan());
+    ASSERT(poller.wait() == r1);
+
+    // removed channel is not reported
+    poller.remove(ch3);
+    ASSERT(poller.wait() == ch1._rawchan());
+    ASSERT(poller.wait() == ch1._rawchan());
+    poller.remove(ch1);
+    ASSERT(poller.trywait() == nil);
+
+    // the poller keeps registered channels alive
+    {
+        auto ch4 = makechan<int>(1);
+        poller.add(ch4);
+        ASSERT_EQ(_chanrefcnt(ch4._rawchan()), 2);
+        ch4.send(4);
+    }
+    _chan *_ch4 = poller.wait();
+    ASSERT_EQ(_chanrefcnt(_ch4), 1);
+    ASSERT_EQ(_chanlen(_ch4), 1u);
+    _chanxincref(_ch4);
+    poller.remove(_wrapchan<int>(_ch4));
+    ASSERT_EQ(_chanrefcnt(_ch4), 1);
+    _chanxdecref(_ch4);
+
+    const char *err = nil;
+    try {
+        poller.add(ch2);
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "poller: add: channel is already registered"));
+    err = nil;
+    try {
+        poller.remove(ch3);
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "poller: remove: channel is not registered"));
+}
+
+
+// verify chan.fd readiness tracking.
+#ifndef LIBGOLANG_OS_windows
+static bool _treadable(int fd) {
+    struct pollfd pfd = {.fd = fd, .events = POLLIN, .revents = 0};
+    int n = poll(&pfd, 1, 0);
+    if (n < 0)
+        panic("poll failed");
+    return (n == 1 && (pfd.revents & POLLIN));
+}
+#endif
+void _test_chan_fd() {
+#ifndef LIBGOLANG_OS_windows
+    int _;
+
+    // buffered channel: readable <=> has data or is closed
+    auto ch = makechan<int>(2);
+    int fd = ch.fd();
+    ASSERT(fd >= 0);
+    ASSERT(ch.fd() == fd);  // created only once
+    ASSERT(!_treadable(fd));
+    ch.send(1);
+    ASSERT(_treadable(fd));
+    ch.send(2);
+    ASSERT(_treadable(fd));
+    ASSERT(ch.recv() == 1);
+    ASSERT(_treadable(fd));
+    ASSERT(ch.recv() == 2);
+    ASSERT(!_treadable(fd));
+    ch.close();
+    ASSERT(_treadable(fd));
+
+    // fd requested on channel that already has data
+    auto ch2 = makechan<int>(1);
+    ch2.send(1);
+    ASSERT(_treadable(ch2.fd()));
+
+    // synchronous channel: readable <=> there is blocked sender or closed
+    auto ch3 = makechan<int>();
+    fd = ch3.fd();
+    ASSERT(!_treadable(fd));
+    go([ch3]() {
+        ch3.send(3);
+    });
+    waitBlocked_TX(ch3);
+    ASSERT(_treadable(fd));
+    ASSERT(ch3.recv() == 3);
+    ASSERT(!_treadable(fd));
+
+    // sender in select that is unregistered after another case won
+    auto ch4 = makechan<int>();
+    auto done = makechan<structZ>();
+    go([ch3, ch4, done]() {
+        int i = 4;
+        int _ = select({
+            ch3.sends(&i),  // 0
+            ch4.recvs(),    // 1
+        });
+        ASSERT(_ == 1);
+        done.close();
+    });
+    waitBlocked_TX(ch3);
+    ASSERT(_treadable(fd));
+    ch4.send(0);
+    done.recv();
+    ASSERT(!_treadable(fd));
+
+    // recv from closed synchronous channel
+    ch3.close();
+    ASSERT(_treadable(fd));
+    int j = 1; bool ok = true;
+    _ = select({ch3.recvs(&j, &ok), _default});
+    ASSERT(_ == 0);
+    ASSERT(j == 0);
+    ASSERT(ok == false);
+    ASSERT(_treadable(fd));
+
+    // fd of nil channel -> panic
+    chan<int> chnil;
+    const char *err = nil;
+    try {
+        chnil.fd();
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "fd of nil channel"));
+#endif
+}
+
+
 // verify that defer works.
 void __test_defer(vector<int> *pcalled) {
     defer([&]() {
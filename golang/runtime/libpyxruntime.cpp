@@ -233,4 +233,44 @@ error PyFunc::operator() () const {
 }
 
 
+// PyBuffer
+int PyBuffer_Get(PyObject *obj, int flags, PyBuffer *pbuf) {
+    _PyBuffer *_pyb = new _PyBuffer();
+    if (PyObject_GetBuffer(obj, &_pyb->view, flags) == -1) {
+        _pyb->view.obj = nil;   // nothing to release
+        _pyb->decref();
+        return -1;
+    }
+    *pbuf = adoptref(_pyb);
+    return 0;
+}
+
+_PyBuffer::_PyBuffer() {
+    view.obj = nil;
+}
+_PyBuffer::~_PyBuffer() {
+    PyGILState_STATE gstate;
+    bool ok;
+
+    if (view.obj == nil)
+        return;
+
+    tie(gstate, ok) = pygil_ensure();
+    if (!ok) {
+        return; // python interpreter is stopped
+    }
+
+        PyBuffer_Release(&view);
+    PyGILState_Release(gstate);
+}
+
+void _PyBuffer::incref() {
+    object::incref();
+}
+void _PyBuffer::decref() {
+    if (__decref())
+        delete this;
+}
+
+
 }}} // golang::pyx::runtime
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+
+from __future__ import print_function, absolute_import
+
+from golang import go, chan, select, runtime
+from golang.golang_test import waitBlocked
+from six.moves import range as xrange
+
+
+# verify that runtime reuses memory of channels.
+def test_memstats():
+    chan(1) # warm up cache of current thread
+    m0 = runtime.ReadMemStats()
+    for i in xrange(100):
+        ch = chan(1)
+        ch.send(i)
+        assert ch.recv() == i
+        del ch
+    m1 = runtime.ReadMemStats()
+    assert m1.CacheHits - m0.CacheHits >= 100
+    assert m1.Mallocs  >= m0.Mallocs
+    assert m1.Frees    >= m0.Frees
+    assert repr(m1).startswith('MemStats(Mallocs=')
+
+    # blocking select across goroutines: after warm up waiters of blocked
+    # select have to come from free lists instead of malloc.
+    N = 100
+    ch1 = chan(); ch2 = chan()
+    def _():
+        for i in xrange(N+1):
+            waitBlocked(ch1.recv)
+            ch1.send(i)
+    go(_)
+    for i in xrange(N+1):
+        if i == 1:
+            m0 = runtime.ReadMemStats() # i=0 warms up waiters cache
+        _, _rx = select(ch1.recv, ch2.recv)
+        assert (_, _rx) == (0, i)
+    m1 = runtime.ReadMemStats()
+    assert m1.CacheHits - m0.CacheHits >= N
+    assert m1.Mallocs   - m0.Mallocs   <  N
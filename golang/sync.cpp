@@ -21,16 +21,397 @@
 // See sync.h for package overview.
 
 #include "golang/sync.h"
+#include "golang/time.h"
+
+#include <atomic>
+#include <mutex>
+#include <utility>
+#include <vector>
+using std::pair;
+using std::vector;
 
 // golang::sync:: (except Sema and Mutex)
 namespace golang {
 namespace sync {
 
+// WeightedSema
+
+// _wsemawaiter represents a waiter queued to acquire weighted semaphore.
+struct _wsemawaiter {
+    _wsemawaiter    *prev;
+    _wsemawaiter    *next;
+    int64_t         w;
+    chan<structZ>   ready;  // closed when units are granted to the waiter
+};
+
+WeightedSema::WeightedSema(int64_t n) {
+    WeightedSema& sema = *this;
+
+    sema._size       = n;
+    sema._cur        = 0;
+    sema._waitq_head = nil;
+    sema._waitq_tail = nil;
+}
+
+WeightedSema::~WeightedSema() {}
+
+error WeightedSema::acquire(context::Context ctx, int64_t w) {
+    WeightedSema& sema = *this;
+
+    sema._mu.lock();
+    if (sema._size - sema._cur >= w && sema._waitq_head == nil) {
+        sema._cur += w;
+        sema._mu.unlock();
+        return nil;
+    }
+
+    // don't even try if ctx is already done
+    error err = ctx->err();
+    if (err != nil) {
+        sema._mu.unlock();
+        return err;
+    }
+
+    // queue ourselves and wait.
+    // NOTE if w > size we block until ctx is done, as x/sync/semaphore does.
+    _wsemawaiter *wt = new _wsemawaiter();
+    wt->prev  = sema._waitq_tail;
+    wt->next  = nil;
+    wt->w     = w;
+    wt->ready = makechan<structZ>();
+    if (sema._waitq_tail != nil)
+        sema._waitq_tail->next = wt;
+    else
+        sema._waitq_head = wt;
+    sema._waitq_tail = wt;
+    chan<structZ> ready = wt->ready;
+    sema._mu.unlock();
+
+    int _ = select({
+        ready.recvs(),          // 0
+        ctx->done().recvs(),    // 1
+    });
+
+    if (_ == 0)
+        return nil;
+
+    // ctx is done
+    sema._mu.lock();
+    _ = select({
+        ready.recvs(),          // 0
+        _default,               // 1
+    });
+    if (_ == 0) {
+        // units were granted to us right after ctx became done;
+        // give them back as if we did not acquire anything.
+        sema._cur -= w;
+        sema._notify_waiters();
+    }
+    else {
+        bool isfront = (sema._waitq_head == wt);
+        sema._unlink(wt);
+        delete wt;
+        // if we were at the front and there are extra units available,
+        // waiters behind us might be able to proceed now.
+        if (isfront && sema._size > sema._cur)
+            sema._notify_waiters();
+    }
+    sema._mu.unlock();
+
+    return ctx->err();
+}
+
+bool WeightedSema::try_acquire(int64_t w) {
+    WeightedSema& sema = *this;
+
+    sema._mu.lock();
+    bool ok = (sema._size - sema._cur >= w && sema._waitq_head == nil);
+    if (ok)
+        sema._cur += w;
+    sema._mu.unlock();
+    return ok;
+}
+
+void WeightedSema::release(int64_t w) {
+    WeightedSema& sema = *this;
+
+    sema._mu.lock();
+    sema._cur -= w;
+    if (sema._cur < 0) {
+        sema._cur += w;
+        sema._mu.unlock();
+        panic("sync: WeightedSema: released more than held");
+    }
+    sema._notify_waiters();
+    sema._mu.unlock();
+}
+
+// _notify_waiters grants units to queued waiters in FIFO order.
+//
+// It stops at the first waiter whose request cannot be satisfied, so that
+// large requests are not starved by later small ones.
+//
+// Must be called under ._mu locked.
+void WeightedSema::_notify_waiters() {
+    WeightedSema& sema = *this;
+
+    while (sema._waitq_head != nil) {
+        _wsemawaiter *wt = sema._waitq_head;
+        if (sema._size - sema._cur < wt->w)
+            break;
+
+        sema._cur += wt->w;
+        sema._unlink(wt);
+        wt->ready.close();
+        delete wt;
+    }
+}
+
+// _unlink removes wt from waiters queue.
+//
+// Must be called under ._mu locked.
+void WeightedSema::_unlink(_wsemawaiter *wt) {
+    WeightedSema& sema = *this;
+
+    if (wt->prev != nil)
+        wt->prev->next = wt->next;
+    else
+        sema._waitq_head = wt->next;
+    if (wt->next != nil)
+        wt->next->prev = wt->prev;
+    else
+        sema._waitq_tail = wt->prev;
+    wt->prev = wt->next = nil;
+}
+
+
+// Broadcast
+
+// _bcwaiter represents a waiter parked on Broadcast.
+//
+// Waiters are allocated on heap (not on stack of waiting goroutine, since with
+// STACK_DEAD_WHILE_PARKED runtimes that stack is not accessible to notifier),
+// and are recycled via Broadcast._freeq for reuse in next waits.
+struct _bcwaiter {
+    _bcwaiter   *next;
+    Sema        wakeup;     // released by notifier when woken up
+    bool        woken;      // whether notifier woke us; protected by Broadcast._mu
+
+    _bcwaiter() {
+        next  = nil;
+        woken = false;
+        wakeup.acquire();   // Sema is created released; we need it acquired
+    }
+};
+
+Broadcast::Broadcast() {
+    Broadcast& bc = *this;
+
+    bc._gen        = 0;
+    bc._waitq      = nil;
+    bc._waitq_tail = nil;
+    bc._freeq      = nil;
+}
+
+Broadcast::~Broadcast() {
+    Broadcast& bc = *this;
+
+    while (bc._freeq != nil) {
+        _bcwaiter *w = bc._freeq;
+        bc._freeq = w->next;
+        delete w;
+    }
+}
+
+uint64_t Broadcast::gen() {
+    Broadcast& bc = *this;
+
+    bc._mu.lock();
+    uint64_t gen = bc._gen;
+    bc._mu.unlock();
+    return gen;
+}
+
+void Broadcast::broadcast() {
+    Broadcast& bc = *this;
+
+    bc._mu.lock();
+    bc._gen++;
+    _bcwaiter *w = bc._waitq;
+    bc._waitq      = nil;
+    bc._waitq_tail = nil;
+    while (w != nil) {
+        _bcwaiter *next = w->next;
+        w->next  = nil;
+        w->woken = true;
+        w->wakeup.release();
+        w = next;
+    }
+    if (bc._changed != nil) {
+        bc._changed.close();
+        bc._changed = nil;
+    }
+    bc._mu.unlock();
+}
+
+// _signal wakes up the oldest waiter, if any, without moving generation forward.
+void Broadcast::_signal() {
+    Broadcast& bc = *this;
+
+    bc._mu.lock();
+    _bcwaiter *w = bc._waitq;
+    if (w != nil) {
+        bc._waitq = w->next;
+        if (bc._waitq == nil)
+            bc._waitq_tail = nil;
+        w->next  = nil;
+        w->woken = true;
+        w->wakeup.release();
+    }
+    bc._mu.unlock();
+}
+
+// _enqueue queues new waiter to be woken up on next notification.
+//
+// Must be called under ._mu locked.
+_bcwaiter *Broadcast::_enqueue() {
+    Broadcast& bc = *this;
+
+    _bcwaiter *w = bc._freeq;
+    if (w != nil)
+        bc._freeq = w->next;
+    else
+        w = new _bcwaiter();
+
+    w->next  = nil;
+    w->woken = false;
+    if (bc._waitq_tail != nil)
+        bc._waitq_tail->next = w;
+    else
+        bc._waitq = w;
+    bc._waitq_tail = w;
+    return w;
+}
+
+// _park waits for w, previously queued via _enqueue, to be woken up.
+//
+// After _park returns w is given back to ._freeq and must not be used anymore.
+// Must be called without ._mu locked.   -> woken up (false on timeout)
+bool Broadcast::_park(_bcwaiter *w, uint64_t timeout_ns) {
+    Broadcast& bc = *this;
+    bool ok;
+
+    if (timeout_ns == UINT64_MAX) {
+        w->wakeup.acquire();
+        ok = true;
+    }
+    else
+        ok = w->wakeup._acquire_timed(timeout_ns);
+
+    bc._mu.lock();
+    if (!ok) {
+        if (w->woken) {
+            // notifier woke us after timeout but before we locked ._mu;
+            // consume its release so that w is left with acquired sema.
+            w->wakeup.acquire();
+            ok = true;
+        }
+        else {
+            // still queued - remove w from ._waitq
+            _bcwaiter *prev = nil;
+            for (_bcwaiter *it = bc._waitq; it != w; it = it->next)
+                prev = it;
+            if (prev != nil)
+                prev->next = w->next;
+            else
+                bc._waitq = w->next;
+            if (bc._waitq_tail == w)
+                bc._waitq_tail = prev;
+        }
+    }
+    w->next = bc._freeq;
+    bc._freeq = w;
+    bc._mu.unlock();
+    return ok;
+}
+
+uint64_t Broadcast::wait(uint64_t gen) {
+    Broadcast& bc = *this;
+    return bc._wait_timed(gen, UINT64_MAX);
+}
+
+uint64_t Broadcast::_wait_timed(uint64_t gen, uint64_t timeout_ns) {
+    Broadcast& bc = *this;
+
+    bc._mu.lock();
+    if (bc._gen == gen) {
+        _bcwaiter *w = bc._enqueue();
+        bc._mu.unlock();
+        bc._park(w, timeout_ns);
+        bc._mu.lock();
+    }
+    gen = bc._gen;
+    bc._mu.unlock();
+    return gen;
+}
+
+chan<structZ> Broadcast::changed(uint64_t gen) {
+    Broadcast& bc = *this;
+
+    bc._mu.lock();
+    defer([&]() {
+        bc._mu.unlock();
+    });
+
+    if (bc._gen != gen) {
+        // already changed - return channel that is ready right away
+        chan<structZ> ready = makechan<structZ>();
+        ready.close();
+        return ready;
+    }
+
+    if (bc._changed == nil)
+        bc._changed = makechan<structZ>();
+    return bc._changed;
+}
+
+// Cond
+Cond::Cond(Mutex *L) {
+    Cond& c = *this;
+    c.L = L;
+}
+
+Cond::~Cond() {}
+
+void Cond::wait() {
+    Cond& c = *this;
+
+    // queue ourselves before releasing .L so that signal/broadcast issued
+    // right after .L.unlock() is not lost.
+    c._bc._mu.lock();
+    _bcwaiter *w = c._bc._enqueue();
+    c._bc._mu.unlock();
+
+    c.L->unlock();
+    c._bc._park(w, UINT64_MAX);
+    c.L->lock();
+}
+
+void Cond::signal() {
+    Cond& c = *this;
+    c._bc._signal();
+}
+
+void Cond::broadcast() {
+    Cond& c = *this;
+    c._bc.broadcast();
+}
+
+
 // RWMutex
 RWMutex::RWMutex() {
     RWMutex& mu = *this;
 
-    mu._wakeupq = makechan<structZ>();
     mu._nread_active    = 0;
     mu._nwrite_waiting  = 0;
     mu._write_active    = false;
@@ -40,18 +421,14 @@ RWMutex::~RWMutex() {}
 
 // RWMutex implementation is based on
 // https://en.wikipedia.org/wiki/Readers%E2%80%93writer_lock#Using_a_condition_variable_and_a_mutex
-// but a channel ._wakeupq is used instead of condition variable.
+// but Broadcast ._wakeupq is used instead of condition variable.
 
-// _wakeup_all simulates broadcast cond notification by waking up all current
-// waiters and reallocating ._wakeupq for next round of queued waiters and
-// wakeup.
+// _wakeup_all wakes up all current waiters.
 //
 // Must be called under ._g locked.
 void RWMutex::_wakeup_all() {
     RWMutex& mu = *this;
-
-    mu._wakeupq.close();
-    mu._wakeupq = makechan<structZ>();
+    mu._wakeupq.broadcast();
 }
 
 void RWMutex::RLock() {
@@ -59,9 +436,9 @@ void RWMutex::RLock() {
 
     mu._g.lock();
     while (mu._nwrite_waiting > 0 || mu._write_active) {
-        chan<structZ> wakeupq = mu._wakeupq;
+        uint64_t gen = mu._wakeupq.gen();
         mu._g.unlock();
-        wakeupq.recv();
+        mu._wakeupq.wait(gen);
         mu._g.lock();
     }
 
@@ -89,9 +466,9 @@ void RWMutex::Lock() {
     mu._g.lock();
     mu._nwrite_waiting++;
     while (mu._nread_active > 0 || mu._write_active) {
-        chan<structZ> wakeupq = mu._wakeupq;
+        uint64_t gen = mu._wakeupq.gen();
         mu._g.unlock();
-        wakeupq.recv();
+        mu._wakeupq.wait(gen);
         mu._g.lock();
     }
 
@@ -154,7 +531,6 @@ void Once::do_(const func<void()> &f) {
 WaitGroup::WaitGroup() {
     WaitGroup& wg = *this;
     wg._count = 0;
-    wg._done  = makechan<structZ>();
 }
 
 WaitGroup::~WaitGroup() {}
@@ -178,27 +554,318 @@ void WaitGroup::add(int delta) {
     wg._count += delta;
     if (wg._count < 0)
         panic("sync: negative WaitGroup counter");
-    if (wg._count == 0) {
-        wg._done.close();
-        wg._done = makechan<structZ>();
-    }
+    if (wg._count == 0)
+        wg._done.broadcast();
 }
 
 void WaitGroup::wait() {
     WaitGroup& wg = *this;
 
-    chan<structZ> done = nil;
     wg._mu.lock();
-    if (wg._count != 0)
-        done = wg._done;
+    if (wg._count == 0) {
+        wg._mu.unlock();
+        return;
+    }
+    uint64_t gen = wg._done.gen();
     wg._mu.unlock();
 
-    if (done == nil)    // wg._count was =0
+    wg._done.wait(gen);
+}
+
+// Pool
+
+// Cache of every pool is split into _poolNShard shards. Every thread is
+// assigned its own shard (round-robin), so that unless there are more threads
+// than shards, .get() and .put() from different threads do not contend with
+// each other.
+static const unsigned _poolNShard = 16;
+
+// _poolShardMax limits how many objects a shard keeps.
+// Objects put into full shard are freed right away.
+static const size_t _poolShardMax = 64;
+
+// _poolTrimInterval is the period of pool trimming ticks.
+static const double _poolTrimInterval = 1*time::second;
+
+// Pool locks are plain std::mutex instead of sync.Mutex: a Pool can be
+// defined at namespace scope and so be used and destroyed during static
+// initialization and destruction, when the runtime (e.g. gevent) is not
+// available. Pool never blocks, nor calls new_/free, nor anything that could
+// switch goroutines, with its locks held, so OS-level mutex is ok here.
+struct _poolshard {
+    std::mutex      mu;
+    vector<void*>   objv;
+};
+
+struct _poolimpl {
+    func<void*()>       new_;
+    func<void(void*)>   free;
+
+    _poolshard          shardv[_poolNShard];
+    std::atomic<size_t> nshard_objs;    // total number of objects in shardv
+
+    std::mutex          victim_mu;      // lock order: victim_mu > shard.mu
+    vector<void*>       victimv;        // objects that stayed unused during last trimming tick
+};
+
+// _poolregistry is registry of all pools that are trimmed by trimming ticks.
+//
+// Trimming tick is scheduled only while some registered pool caches objects,
+// so that an idle program does not wake up every _poolTrimInterval.
+struct _poolregistry {
+    std::mutex          mu;
+    vector<_poolimpl*>  poolv;
+    std::atomic<bool>   trimArmed;  // whether trimming tick is scheduled
+
+    _poolregistry() : trimArmed(false) {}
+};
+
+// _poolreg returns the pool registry.
+//
+// The registry is function-local static so that it is created on first use
+// instead of depending on order of static initialization. It is never freed,
+// because pools might be destroyed during static destruction.
+static _poolregistry *_poolreg() {
+    static _poolregistry *reg = new _poolregistry();
+    return reg;
+}
+
+static std::atomic<unsigned> _poolShardNext(0);
+static thread_local int      _t_poolShard = -1;
+
+// _poolshardidx returns index of the shard assigned to current thread.
+static unsigned _poolshardidx() {
+    if (_t_poolShard < 0)
+        _t_poolShard = _poolShardNext.fetch_add(1) % _poolNShard;
+    return _t_poolShard;
+}
+
+static void _pooltrim_tick();
+
+// _pooltrim_arm schedules trimming tick if it is not yet scheduled.
+static void _pooltrim_arm() {
+    _poolregistry *reg = _poolreg();
+    if (reg->trimArmed.load())
+        return;
+
+    bool armed = false;
+    if (reg->trimArmed.compare_exchange_strong(armed, true))
+        time::after_func(_poolTrimInterval, _pooltrim_tick);
+}
+
+_Pool::_Pool(func<void*()> new_, func<void(void*)> free, bool autotrim) {
+    _Pool& pool = *this;
+    pool._impl     = nil;
+    pool._new      = new_;
+    pool._free     = free;
+    pool._autotrim = autotrim;
+}
+
+// _getimpl returns pool state, creating it on first use.
+_poolimpl *_Pool::_getimpl() {
+    _Pool& pool = *this;
+    _poolimpl *p = pool._impl.load();
+    if (p != nil)
+        return p;
+
+    p = new _poolimpl();
+    p->new_ = pool._new;
+    p->free = pool._free;
+    p->nshard_objs = 0;
+    for (unsigned i = 0; i < _poolNShard; i++)
+        p->shardv[i].objv.reserve(_poolShardMax);
+
+    _poolimpl *p0 = nil;
+    if (!pool._impl.compare_exchange_strong(p0, p)) {
+        delete p;   // another thread created it first
+        return p0;
+    }
+
+    if (pool._autotrim) {
+        _poolregistry *reg = _poolreg();
+        reg->mu.lock();
+        reg->poolv.push_back(p);
+        reg->mu.unlock();
+    }
+    return p;
+}
+
+_Pool::~_Pool() {
+    _Pool& pool = *this;
+    _poolimpl *p = pool._impl.load();
+    if (p == nil)
+        return;
+
+    if (pool._autotrim) {
+        _poolregistry *reg = _poolreg();
+        reg->mu.lock();
+        for (auto it = reg->poolv.begin(); it != reg->poolv.end(); ++it) {
+            if (*it == p) {
+                reg->poolv.erase(it);
+                break;
+            }
+        }
+        reg->mu.unlock();
+    }
+
+    // nothing else can use p now
+    for (unsigned i = 0; i < _poolNShard; i++) {
+        for (void *obj : p->shardv[i].objv)
+            p->free(obj);
+    }
+    for (void *obj : p->victimv)
+        p->free(obj);
+
+    delete p;
+    pool._impl = nil;
+}
+
+// _shardpop pops an object from shard, or returns nil if the shard is empty.
+static void *_shardpop(_poolimpl *p, _poolshard *shard) {
+    void *obj = nil;
+    shard->mu.lock();
+    if (!shard->objv.empty()) {
+        obj = shard->objv.back();
+        shard->objv.pop_back();
+        p->nshard_objs--;
+    }
+    shard->mu.unlock();
+    return obj;
+}
+
+void *_Pool::get() {
+    _Pool& pool = *this;
+    _poolimpl *p = pool._getimpl();
+    void *obj;
+
+    // our shard
+    unsigned idx = _poolshardidx();
+    obj = _shardpop(p, &p->shardv[idx]);
+    if (obj != nil)
+        return obj;
+
+    // victim cache
+    p->victim_mu.lock();
+    if (!p->victimv.empty()) {
+        obj = p->victimv.back();
+        p->victimv.pop_back();
+    }
+    p->victim_mu.unlock();
+    if (obj != nil)
+        return obj;
+
+    // steal from other threads
+    for (unsigned i = 1; i < _poolNShard && p->nshard_objs > 0; i++) {
+        obj = _shardpop(p, &p->shardv[(idx + i) % _poolNShard]);
+        if (obj != nil)
+            return obj;
+    }
+
+    // create new object
+    if (p->new_ == nil)
+        return nil;
+    return p->new_();
+}
+
+void _Pool::put(void *obj) {
+    _Pool& pool = *this;
+
+    if (obj == nil)
         return;
+    _poolimpl *p = pool._getimpl();
+
+    _poolshard *shard = &p->shardv[_poolshardidx()];
+    bool ok = false;
+    shard->mu.lock();
+    if (shard->objv.size() < _poolShardMax) {
+        shard->objv.push_back(obj); // capacity is reserved - does not throw
+        p->nshard_objs++;
+        ok = true;
+    }
+    shard->mu.unlock();
+
+    if (!ok) {
+        p->free(obj);
+        return;
+    }
 
-    done.recv();
+    // NOTE nshard_objs is incremented before checking trimArmed, while
+    // _pooltrim_tick clears trimArmed before checking nshard_objs. This way
+    // either the tick sees the object, or we see that we have to rearm.
+    if (pool._autotrim)
+        _pooltrim_arm();
 }
 
+// _pooltrim moves objects cached in p to victim cache and returns objects
+// that were in the victim cache before. Returned objects have to be freed by
+// caller.
+static vector<void*> _pooltrim(_poolimpl *p) {
+    // allocate new victim cache upfront so that nothing throws under locks
+    vector<void*> victimv;
+    victimv.reserve(_poolNShard * _poolShardMax);
+
+    p->victim_mu.lock();
+    vector<void*> garbage = std::move(p->victimv);
+    p->victimv = std::move(victimv);
+    for (unsigned i = 0; i < _poolNShard; i++) {
+        _poolshard *shard = &p->shardv[i];
+        shard->mu.lock();
+        p->victimv.insert(p->victimv.end(), shard->objv.begin(), shard->objv.end());
+        p->nshard_objs -= shard->objv.size();
+        shard->objv.clear();
+        shard->mu.unlock();
+    }
+    p->victim_mu.unlock();
+
+    return garbage;
+}
+
+void _Pool::_trim() {
+    _Pool& pool = *this;
+    _poolimpl *p = pool._impl.load();
+    if (p == nil)
+        return;
+
+    for (void *obj : _pooltrim(p))
+        p->free(obj);
+}
+
+// _pooltrim_tick trims all registered pools and reschedules itself while
+// there are pools with cached objects.
+static void _pooltrim_tick() {
+    _poolregistry *reg = _poolreg();
+    vector<pair<func<void(void*)>, vector<void*>>> garbage;
+
+    reg->mu.lock();
+    reg->trimArmed = false;
+    bool cached = false;
+    for (_poolimpl *p : reg->poolv) {
+        vector<void*> objv = _pooltrim(p);
+        if (!objv.empty())
+            garbage.push_back(make_pair(p->free, std::move(objv)));
+
+        p->victim_mu.lock();
+        cached = cached || !p->victimv.empty();
+        p->victim_mu.unlock();
+        cached = cached || (p->nshard_objs.load() > 0);
+    }
+    reg->mu.unlock();
+
+    if (cached)
+        _pooltrim_arm();
+
+    // free outside of registry lock: .free might need to take other locks.
+    for (auto& fv : garbage) {
+        for (void *obj : fv.second)
+            fv.first(obj);
+    }
+}
+
+
+// SingleFlight
+const global<error> _errSingleFlightPanic = errors::New("sync: SingleFlight: function panicked");
+
+
 // WorkGroup
 _WorkGroup::_WorkGroup()  {}
 _WorkGroup::~_WorkGroup() {}
@@ -211,35 +878,113 @@ WorkGroup NewWorkGroup(context::Context ctx) {
     WorkGroup g = adoptref(new _WorkGroup());
 
     tie(g->_ctx, g->_cancel) = context::with_cancel(ctx);
+    g->_limit   = -1;
+    g->_nworker = 0;
+    g->_nqueued = 0;
+    g->_taskq   = makechan<func<error(context::Context)>>();
     return g;
 }
 
+void _WorkGroup::set_limit(int n) {
+    _WorkGroup& g = *this;
+
+    g._mu.lock();
+    defer([&]() {
+        g._mu.unlock();
+    });
+
+    if (g._nworker != 0)
+        panic("sync: WorkGroup: set_limit while goroutines are still running");
+    g._limit = n;
+}
+
 void _WorkGroup::go(func<error(context::Context)> f) {
+    _WorkGroup& g = *this;
+
+    g._wg.add(1);
+
+    g._mu.lock();
+    if (g._limit < 0 || g._nworker < g._limit) {
+        g._nworker++;
+        g._mu.unlock();
+        g._spawn(f);
+        return;
+    }
+
+    // all workers are busy - hand f over to the first worker that becomes free.
+    g._nqueued++;
+    g._mu.unlock();
+    g._taskq.send(f);
+}
+
+bool _WorkGroup::try_go(func<error(context::Context)> f) {
+    _WorkGroup& g = *this;
+
+    g._mu.lock();
+    if (!(g._limit < 0 || g._nworker < g._limit)) {
+        g._mu.unlock();
+        return false;
+    }
+    g._nworker++;
+    g._mu.unlock();
+
+    g._wg.add(1);
+    g._spawn(f);
+    return true;
+}
+
+// _spawn spawns new worker to run f.
+//
+// After f completes the worker continues to run functions handed over by
+// blocked .go() calls, and exits when there are no such calls.
+void _WorkGroup::_spawn(func<error(context::Context)> f) {
     // NOTE = refptr<_WorkGroup> because we pass ref to g to spawned worker.
     WorkGroup g = newref(this);
 
-    g->_wg.add(1);
-
     golang::go([g, f]() {       // NOTE g ref passed to spawned worker
-        defer([&]() {
+        func<error(context::Context)> task = f;
+        while (1) {
+            g->_run(task);
+
+            // if there is .go() committed to send its task - take it over.
+            // Do the accounting before marking the task as done, so that
+            // after .wait() returns the workers are seen as exited.
+            g->_mu.lock();
+            bool more = (g->_nqueued > 0);
+            if (more)
+                g->_nqueued--;
+            else
+                g->_nworker--;
+            g->_mu.unlock();
+
             g->_wg.done();
-        });
+            if (!more)
+                return;
+            task = g->_taskq.recv();
+        }
+    });
+}
 
-        error err = f(g->_ctx); // TODO consider also propagating panic
-        if (err == nil)
-            return;
+// _run runs f as one task of the group.
+//
+// The caller is responsible to mark the task as done in ._wg .
+void _WorkGroup::_run(const func<error(context::Context)> &f) {
+    _WorkGroup& g = *this;
 
-        g->_mu.lock();
-        defer([&]() {
-            g->_mu.unlock();
-        });
+    error err = f(g._ctx);  // TODO consider also propagating panic
+    if (err == nil)
+        return;
 
-        if (g->_err == nil) {
-            // this goroutine is the first failed task
-            g->_err = err;
-            g->_cancel();
-        }
+    g._mu.lock();
+    defer([&]() {
+        g._mu.unlock();
     });
+
+    if (g._err == nil) {
+        // this task is the first failed task
+        g._err = err;
+        g._cancel();
+    }
 }
 
 error _WorkGroup::wait() {
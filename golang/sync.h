@@ -26,6 +26,11 @@
 //  - `Once` allows to execute an action only once.
 //  - `WaitGroup` allows to wait for a collection of tasks to finish.
 //  - `Sema`(*), `Mutex` and `RWMutex` provide low-level synchronization.
+//  - `WeightedSema`(*) bounds usage of a resource, e.g. memory, by weight.
+//  - `Broadcast`(*) and `Cond` allow to wait for and notify about events.
+//  - `Pool` allows to reuse temporary objects.
+//  - `SingleFlight`(*) suppresses duplicate concurrent calls.
+//  - `Map` is a map safe for concurrent use.
 //
 // See also https://golang.org/pkg/sync for Go sync package documentation.
 //
@@ -42,6 +47,10 @@
 
 #include <golang/libgolang.h>
 #include <golang/context.h>
+#include <golang/cxx.h>
+#include <golang/errors.h>
+
+#include <unordered_map>
 
 // ---- C-level API ----
 
@@ -82,6 +91,10 @@ public:
     LIBGOLANG_API void acquire();
     LIBGOLANG_API void release();
 
+    // _acquire_timed is like acquire, but gives up after timeout_ns.
+    // (internal for now)  -> acquired
+    LIBGOLANG_API bool _acquire_timed(uint64_t timeout_ns);
+
 private:
     Sema(const Sema&);      // don't copy
     Sema(Sema&&);           // don't move
@@ -102,12 +115,150 @@ private:
     Mutex(Mutex&&);         // don't move
 };
 
+// WeightedSema provides weighted semaphore.
+//
+// It bounds usage of a resource of total size n: .acquire(ctx, w) waits until
+// w units are available, or ctx is canceled, and .release(w) gives w units back.
+// Waiters are served in FIFO order: a large request is not starved by a
+// stream of small ones, because while it waits, later requests queue behind it.
+//
+// WeightedSema is modelled after https://godoc.org/golang.org/x/sync/semaphore.
+struct _wsemawaiter;
+class WeightedSema {
+    Mutex           _mu;
+    int64_t         _size;
+    int64_t         _cur;   // units currently acquired
+    _wsemawaiter    *_waitq_head;
+    _wsemawaiter    *_waitq_tail;
+
+public:
+    LIBGOLANG_API WeightedSema(int64_t n);
+    LIBGOLANG_API ~WeightedSema();
+
+    // acquire acquires w units of the semaphore, blocking until they are
+    // available or ctx is done.
+    //
+    // On success it returns nil. On failure it returns ctx.err() and leaves
+    // the semaphore unchanged.
+    LIBGOLANG_API error acquire(context::Context ctx, int64_t w);
+
+    // try_acquire acquires w units of the semaphore without blocking.
+    // It returns whether the units were acquired.
+    LIBGOLANG_API bool try_acquire(int64_t w);
+
+    // release releases w units of the semaphore.
+    LIBGOLANG_API void release(int64_t w);
+
+private:
+    void _notify_waiters();
+    void _unlink(_wsemawaiter *wt);
+
+    WeightedSema(const WeightedSema&);  // don't copy
+    WeightedSema(WeightedSema&&);       // don't move
+};
+
+// Broadcast allows to wait for and notify about events.
+//
+// Broadcast maintains generation counter that is incremented on every
+// .broadcast(). Waiters remember current generation via .gen() and then
+// .wait(gen) for the generation to change, for example:
+//
+//   sync::Broadcast changed;
+//
+//   // waiter                          // notifier
+//   mu.lock();                         mu.lock();
+//   while (!condition) {               modify condition;
+//       uint64_t gen = changed.gen();  changed.broadcast();
+//       mu.unlock();                   mu.unlock();
+//       changed.wait(gen);
+//       mu.lock();
+//   }
+//
+// There is no lost-wakeup race between mu.unlock() and .wait(gen): if the
+// notification happens in between, .wait(gen) returns immediately.
+//
+// Waiters park on per-waiter semaphores that are reused across generations,
+// so that, contrary to closing and recreating chan<structZ> on every
+// notification, .broadcast() does not allocate memory. To wait for
+// notification inside select, use .changed(gen) which returns channel that
+// becomes ready when the generation changes from gen. Such channel is
+// allocated at most once per generation and only when requested.
+struct _bcwaiter;
+class Broadcast {
+    Mutex           _mu;
+    uint64_t        _gen;
+    _bcwaiter       *_waitq;    // parked waiters; woken up on broadcast
+    _bcwaiter       *_waitq_tail;
+    _bcwaiter       *_freeq;    // waiters available for reuse
+    chan<structZ>   _changed;   // ready for select when ._gen changes; nil if not requested
+
+public:
+    LIBGOLANG_API Broadcast();
+    LIBGOLANG_API ~Broadcast();
+
+    // gen returns current generation.
+    LIBGOLANG_API uint64_t gen();
+
+    // broadcast wakes up all waiters and moves generation forward.
+    LIBGOLANG_API void broadcast();
+
+    // wait waits for generation to change from gen.
+    //
+    // it returns the new generation.
+    LIBGOLANG_API uint64_t wait(uint64_t gen);
+
+    // _wait_timed is like wait, but gives up after timeout_ns.
+    // (internal for now)  -> new generation, or gen on timeout
+    LIBGOLANG_API uint64_t _wait_timed(uint64_t gen, uint64_t timeout_ns);
+
+    // changed returns channel that becomes ready for receive when generation
+    // changes from gen.
+    //
+    // it is intended to be used as select case, e.g. bc.changed(gen).recvs().
+    // Received values are zero; the channel is closed on notification.
+    LIBGOLANG_API chan<structZ> changed(uint64_t gen);
+
+private:
+    _bcwaiter *_enqueue();
+    bool _park(_bcwaiter *w, uint64_t timeout_ns);
+    void _signal();
+    friend class Cond;
+
+    Broadcast(const Broadcast&);    // don't copy
+    Broadcast(Broadcast&&);         // don't move
+};
+
+// Cond provides condition variable.
+//
+// It mirrors sync.Cond from Go: .L must be held when calling .wait(); .wait()
+// atomically unlocks .L and suspends execution until woken up by .signal() or
+// .broadcast(). .L is locked again before .wait() returns.
+//
+// Waiting is implemented via Broadcast and so does not allocate a channel per
+// notification.
+class Cond {
+    Broadcast _bc;
+
+public:
+    Mutex *L;
+
+    LIBGOLANG_API Cond(Mutex *L);
+    LIBGOLANG_API ~Cond();
+    LIBGOLANG_API void wait();
+    LIBGOLANG_API void signal();
+    LIBGOLANG_API void broadcast();
+
+private:
+    Cond(const Cond&);      // don't copy
+    Cond(Cond&&);           // don't move
+};
+
 // RWMutex provides readers-writer mutex with preference for writers.
 //
 // https://en.wikipedia.org/wiki/Readers%E2%80%93writer_lock .
 class RWMutex {
     Mutex           _g;
-    chan<structZ>   _wakeupq; // closed & recreated every time to wakeup all waiters
+    Broadcast       _wakeupq; // broadcast every time to wakeup all waiters
 
     int  _nread_active;   // number of readers holding the lock
     int  _nwrite_waiting; // number of writers waiting for the lock
@@ -160,7 +311,7 @@ private:
 class WaitGroup {
     Mutex          _mu;
     int            _count;
-    chan<structZ>  _done;   // closed & recreated every time ._count drops to 0
+    Broadcast      _done;   // broadcast every time ._count drops to 0
 
 public:
     LIBGOLANG_API WaitGroup();
@@ -174,6 +325,425 @@ private:
     WaitGroup(WaitGroup&&);         // don't move
 };
 
+// _Pool is type-erased implementation of Pool<T> working with void* objects.
+//
+// new_ may be nil, in which case .get() returns nil if the pool is empty.
+// Pool never calls new_ or free with any of its locks held.
+//
+// Pool state is allocated on first use, not in constructor. This way Pool can
+// be defined at namespace scope and constructed during static initialization,
+// when libgolang runtime is not yet initialized. Pool does not use the runtime
+// for its locks, so such Pool can be also destroyed during static
+// destruction, when the runtime might be already gone.
+//
+// If autotrim=false the pool is not trimmed by trimming ticks, and its owner
+// has to call ._trim() itself.
+struct _poolimpl;
+class _Pool {
+    std::atomic<_poolimpl*> _impl;      // created on first use
+    func<void*()>           _new;
+    func<void(void*)>       _free;
+    bool                    _autotrim;
+
+public:
+    LIBGOLANG_API _Pool(func<void*()> new_, func<void(void*)> free, bool autotrim=true);
+    LIBGOLANG_API ~_Pool();
+    LIBGOLANG_API void *get();
+    LIBGOLANG_API void put(void *obj);
+    LIBGOLANG_API void _trim();
+
+private:
+    _poolimpl *_getimpl();
+    _Pool(const _Pool&);    // don't copy
+    _Pool(_Pool&&);         // don't move
+};
+
+// Pool allows to reuse temporary objects and so to reduce allocator pressure.
+//
+// It mirrors sync.Pool from Go: .get() returns object from the pool, or, if the
+// pool is empty, a new object created via New; .put() gives object back to the
+// pool for reuse. Objects that stay unused in the pool are freed
+// automatically: every trimming tick objects cached in the pool are moved to
+// victim cache, and objects that were still in the victim cache are freed.
+// Trimming ticks run only while pools have cached objects.
+//
+// For example:
+//
+//   sync::Pool<Buffer> bufpool;
+//   ...
+//   Buffer *buf = bufpool.get();
+//   ... use buf
+//   bufpool.put(buf);
+//
+// The pool keeps per-thread caches so that .get() and .put() from different
+// threads do not contend with each other. Under gevent all goroutines of a hub
+// run on the same OS thread and so share the same cache.
+//
+// Objects handed out by .get() are owned by the caller; the pool does not
+// reset them on .put().
+template<typename T>
+class Pool {
+    _Pool _p;
+
+public:
+    // Pool creates pool that creates new objects via `new T()`.
+    Pool();
+    // Pool creates pool that creates new objects via New.
+    Pool(func<T*()> New);
+    ~Pool();
+
+    T   *get();
+    void put(T *obj);
+
+    // _trim performs one trimming tick right away.
+    // (internal, mainly for tests)
+    void _trim();
+
+private:
+    Pool(const Pool&);      // don't copy
+    Pool(Pool&&);           // don't move
+};
+
+template<typename T>
+Pool<T>::Pool()
+    : _p([]() -> void*      { return new T(); },
+         [](void *obj)      { delete (T*)obj; }) {}
+
+template<typename T>
+Pool<T>::Pool(func<T*()> New)
+    : _p([New]() -> void*   { return New(); },
+         [](void *obj)      { delete (T*)obj; }) {}
+
+template<typename T>
+Pool<T>::~Pool() {}
+
+template<typename T>
+T *Pool<T>::get() {
+    return (T*)_p.get();
+}
+
+template<typename T>
+void Pool<T>::put(T *obj) {
+    _p.put(obj);
+}
+
+template<typename T>
+void Pool<T>::_trim() {
+    _p._trim();
+}
+
+// SingleFlight provides duplicate call suppression.
+//
+// Concurrent .do_(key, fn) calls with the same key share one execution of fn:
+// the first call runs fn and the other calls wait for it to complete and
+// receive the same result, for example:
+//
+//   sync::SingleFlight<string, Value> sf;
+//   ...
+//   Value v; error err; bool shared;
+//   tie(v, err, shared) = sf.do_(key, [&]() -> tuple<Value, error> {
+//       return loadExpensive(key);
+//   });
+//
+// .do_chan() is similar to .do_(), but does not block and delivers the result
+// via returned channel, which allows to wait for it inside select. .forget(key)
+// tells SingleFlight to forget about key: next .do_(key) will call fn instead of
+// waiting for currently running call to complete.
+//
+// If fn panics, the panic propagates to the caller that runs fn, while other
+// callers receive an error.
+//
+// SingleFlight is modelled after https://godoc.org/golang.org/x/sync/singleflight.
+template<typename K, typename V>
+class SingleFlight {
+public:
+    // Result is the result of a call delivered by .do_chan().
+    struct Result {
+        V       val;
+        error   err;
+        bool    shared; // whether the result was given to multiple callers
+    };
+
+private:
+    // _Call represents in-flight or completed call.
+    struct _Call : object {
+        WaitGroup   wg;
+        V           val;
+        error       err;
+        int         dups;   // number of callers that joined the call
+        std::vector<chan<Result>>  chans;   // to deliver result to .do_chan callers
+
+        _Call() : val(), dups(0) {}
+        void decref() {
+            if (__decref())
+                delete this;
+        }
+    };
+
+    Mutex                           _mu;
+    cxx::dict<K, refptr<_Call>>     _m;     // in-flight calls
+
+public:
+    SingleFlight() {}
+    ~SingleFlight() {}
+
+    // do_ executes fn, making sure that only one execution is in-flight for
+    // a given key at a time.
+    //
+    // -> (val, err, shared)
+    std::tuple<V, error, bool> do_(const K &key, func<std::tuple<V, error>()> fn);
+
+    // do_chan is like do_ but returns channel that will receive the result
+    // when it is ready. The channel is not closed.
+    //
+    // SingleFlight must stay alive until the result is delivered.
+    // It is not used by the call after that.
+    chan<Result> do_chan(const K &key, func<std::tuple<V, error>()> fn);
+
+    // forget tells SingleFlight to forget about key.
+    void forget(const K &key);
+
+private:
+    void _docall(refptr<_Call> c, const K &key, const func<std::tuple<V, error>()> &fn);
+
+    SingleFlight(const SingleFlight&);  // don't copy
+    SingleFlight(SingleFlight&&);       // don't move
+};
+
+// _errSingleFlightPanic is the error SingleFlight reports to waiters when
+// the function of their call panicked.
+extern LIBGOLANG_API const global<error> _errSingleFlightPanic;
+
+template<typename K, typename V>
+std::tuple<V, error, bool> SingleFlight<K,V>::do_(const K &key, func<std::tuple<V, error>()> fn) {
+    SingleFlight& sf = *this;
+    refptr<_Call> c; bool ok;
+
+    sf._mu.lock();
+    std::tie(c, ok) = sf._m.get_(key);
+    if (ok) {
+        c->dups++;
+        sf._mu.unlock();
+        c->wg.wait();
+        return std::make_tuple(c->val, c->err, true);
+    }
+    c = adoptref(new _Call());
+    c->wg.add(1);
+    sf._m[key] = c;
+    sf._mu.unlock();
+
+    sf._docall(c, key, fn);
+    return std::make_tuple(c->val, c->err, c->dups > 0);
+}
+
+template<typename K, typename V>
+chan<typename SingleFlight<K,V>::Result>
+SingleFlight<K,V>::do_chan(const K &key, func<std::tuple<V, error>()> fn) {
+    SingleFlight& sf = *this;
+    chan<Result> ch = makechan<Result>(1);
+    refptr<_Call> c; bool ok;
+
+    sf._mu.lock();
+    std::tie(c, ok) = sf._m.get_(key);
+    if (ok) {
+        c->dups++;
+        c->chans.push_back(ch);
+        sf._mu.unlock();
+        return ch;
+    }
+    c = adoptref(new _Call());
+    c->wg.add(1);
+    c->chans.push_back(ch);
+    sf._m[key] = c;
+    sf._mu.unlock();
+
+    SingleFlight *psf = this;
+    go([psf, c, key, fn]() {
+        psf->_docall(c, key, fn);
+    });
+    return ch;
+}
+
+// _docall runs fn for call c and delivers its result.
+template<typename K, typename V>
+void SingleFlight<K,V>::_docall(refptr<_Call> c, const K &key, const func<std::tuple<V, error>()> &fn) {
+    SingleFlight& sf = *this;
+    bool returned = false;
+
+    defer([&]() {
+        if (!returned)
+            c->err = _errSingleFlightPanic;
+        c->wg.done();
+
+        sf._mu.lock();
+        refptr<_Call> cur; bool ok;
+        std::tie(cur, ok) = sf._m.get_(key);
+        if (ok && cur == c)     // not forgotten
+            sf._m.erase(key);
+        // c is no longer reachable via ._m and so nothing else is added to c->chans
+        bool shared = c->dups > 0;
+        sf._mu.unlock();
+
+        // NOTE sf is not used after this point
+        for (auto &ch : c->chans)
+            ch.send(Result{c->val, c->err, shared});    // cap=1 - does not block
+    });
+
+    std::tie(c->val, c->err) = fn();
+    returned = true;
+}
+
+template<typename K, typename V>
+void SingleFlight<K,V>::forget(const K &key) {
+    SingleFlight& sf = *this;
+
+    sf._mu.lock();
+    sf._m.erase(key);
+    sf._mu.unlock();
+}
+
+// Map is a map safe for concurrent use by multiple goroutines.
+//
+// It mirrors sync.Map from Go. The map is split into shards, each protected by
+// its own mutex, and every key is handled by the shard selected by the key's
+// hash. Operations on keys from different shards do not contend with each
+// other, so that, contrary to a map protected by one global mutex, lookups from
+// multiple threads scale with the number of cores. Lookups take only the
+// shard lock and only for the duration of hash table lookup.
+//
+// .range_() calls f on a snapshot of every shard and without any lock held, so
+// f is free to access the map. Similarly to Go, range_ does not correspond to
+// a consistent snapshot of the whole map.
+template<typename K, typename V, typename Hash = std::hash<K>>
+class Map {
+    static const unsigned _NSHARD_LOG2 = 5;
+    static const unsigned _NSHARD      = 1 << _NSHARD_LOG2;
+    struct _Shard {
+        Mutex                           mu;
+        std::unordered_map<K, V, Hash>  m;
+    };
+    mutable _Shard _shardv[_NSHARD];
+
+    _Shard& _shard(const K &key) const {
+        // mix the hash so that shards and buckets of per-shard hash tables,
+        // which both depend on low bits, are selected by different bits.
+        uint64_t h = (uint64_t)Hash()(key) * 0x9e3779b97f4a7c15ULL;
+        return _shardv[h >> (64 - _NSHARD_LOG2)];
+    }
+
+public:
+    Map() {}
+    ~Map() {}
+
+    // load returns value stored for key, and whether it was present.
+    std::tuple<V, bool> load(const K &key) const { // -> (value, ok)
+        _Shard &sh = _shard(key);
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        auto it = sh.m.find(key);
+        if (it == sh.m.end())
+            return std::make_tuple(V(), false);
+        return std::make_tuple(it->second, true);
+    }
+
+    // get returns value stored for key, or zero value if key is not present.
+    V get(const K &key) const {
+        V v; bool _;
+        std::tie(v, _) = load(key);
+        return v;
+    }
+
+    // has returns whether key is present.
+    bool has(const K &key) const {
+        _Shard &sh = _shard(key);
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        return sh.m.find(key) != sh.m.end();
+    }
+
+    // store sets value for key.
+    void store(const K &key, const V &value) {
+        _Shard &sh = _shard(key);
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        sh.m[key] = value;
+    }
+
+    // load_or_store returns existing value for key if present. Otherwise it
+    // stores and returns value. loaded is true if the value was loaded.
+    std::tuple<V, bool> load_or_store(const K &key, const V &value) { // -> (actual, loaded)
+        _Shard &sh = _shard(key);
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        auto r = sh.m.emplace(key, value);
+        return std::make_tuple(r.first->second, !r.second);
+    }
+
+    // load_and_delete deletes value for key returning previous value if any.
+    std::tuple<V, bool> load_and_delete(const K &key) { // -> (value, loaded)
+        _Shard &sh = _shard(key);
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        auto it = sh.m.find(key);
+        if (it == sh.m.end())
+            return std::make_tuple(V(), false);
+        V v = std::move(it->second);
+        sh.m.erase(it);
+        return std::make_tuple(std::move(v), true);
+    }
+
+    // delete_ deletes value for key.
+    void delete_(const K &key) {
+        load_and_delete(key);
+    }
+
+    // range_ calls f for every key and value present in the map.
+    // If f returns false, range_ stops the iteration.
+    void range_(func<bool(const K &key, const V &value)> f) const {
+        for (unsigned i = 0; i < _NSHARD; i++) {
+            std::vector<std::pair<K, V>> itemv = _snapshot(_shardv[i]);
+            for (auto &kv : itemv) {
+                if (!f(kv.first, kv.second))
+                    return;
+            }
+        }
+    }
+
+    // len returns the number of keys present in the map.
+    size_t len() const {
+        size_t n = 0;
+        for (unsigned i = 0; i < _NSHARD; i++) {
+            _Shard &sh = _shardv[i];
+            sh.mu.lock();
+            n += sh.m.size();
+            sh.mu.unlock();
+        }
+        return n;
+    }
+
+private:
+    static std::vector<std::pair<K, V>> _snapshot(_Shard &sh) {
+        sh.mu.lock();
+        defer([&]() {
+            sh.mu.unlock();
+        });
+        return std::vector<std::pair<K, V>>(sh.m.begin(), sh.m.end());
+    }
+
+    Map(const Map&);    // don't copy
+    Map(Map&&);         // don't move
+};
+
 // WorkGroup is a group of goroutines working on a common task.
 //
 // Use .go() to spawn goroutines, and .wait() to wait for all of them to
@@ -198,6 +768,12 @@ private:
 //
 // NOTE if spawned function panics, the panic is currently _not_ propagated to .wait().
 //
+// The number of simultaneously running goroutines can be limited via
+// .set_limit(). With limit set, .go() blocks until a goroutine becomes
+// available, and .try_go() returns false instead of blocking. Goroutines are
+// reused: a goroutine that finished its function picks up function of a
+// blocked .go() call, if any, instead of exiting.
+//
 // WorkGroup is modelled after https://godoc.org/golang.org/x/sync/errgroup but
 // is not equal to it.
 typedef refptr<class _WorkGroup> WorkGroup;
@@ -208,6 +784,11 @@ class _WorkGroup : public object {
     Mutex               _mu;
     error               _err;
 
+    int                 _limit;     // max number of workers; < 0 means no limit
+    int                 _nworker;   // number of running workers
+    int                 _nqueued;   // number of .go() calls committed to send to ._taskq
+    chan<func<error(context::Context)>> _taskq; // blocked .go() -> worker that becomes free
+
     // don't new - create only via NewWorkGroup()
 private:
     _WorkGroup();
@@ -218,9 +799,19 @@ public:
 
 public:
     LIBGOLANG_API void go(func<error(context::Context)> f);
+    LIBGOLANG_API bool try_go(func<error(context::Context)> f);
     LIBGOLANG_API error wait();
 
+    // set_limit limits the number of simultaneously running goroutines to n.
+    //
+    // Negative n means no limit. The limit must not be changed while there
+    // are running goroutines in the group.
+    LIBGOLANG_API void set_limit(int n);
+
 private:
+    void _spawn(func<error(context::Context)> f);
+    void _run(const func<error(context::Context)> &f);
+
     _WorkGroup(const _WorkGroup&);  // don't copy
     _WorkGroup(_WorkGroup&&);       // don't move
 
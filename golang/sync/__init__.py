@@ -23,6 +23,13 @@
  - `Once` allows to execute an action only once.
  - `WaitGroup` allows to wait for a collection of tasks to finish.
  - `Sema`(*), `Mutex` and `RWMutex` provide low-level synchronization.
+ - `WeightedSema`(*) bounds usage of a resource, e.g. memory, by weight.
+ - `Broadcast`(*) and `Cond` allow to wait for and notify about events.
+ - `Pool` allows to reuse temporary objects.
+ - `SingleFlight`(*) suppresses duplicate concurrent calls.
+ - `Map` is a map safe for concurrent use.
+
+Subpackage `golang.sync.atomic` provides atomic integers and values.
 
 See also https://golang.org/pkg/sync for Go sync package documentation.
 
@@ -34,9 +41,15 @@ See also https://golang.org/pkg/sync for Go sync package documentation.
 from __future__ import print_function, absolute_import
 
 from golang._sync import \
-    PySema      as Sema,        \
-    PyMutex     as Mutex,       \
-    PyRWMutex   as RWMutex,     \
-    PyOnce      as Once,        \
-    PyWaitGroup as WaitGroup,   \
-    PyWorkGroup as WorkGroup
+    PySema         as Sema,          \
+    PyWeightedSema as WeightedSema,  \
+    PyMutex        as Mutex,         \
+    PyRWMutex      as RWMutex,       \
+    PyBroadcast    as Broadcast,     \
+    PyCond         as Cond,          \
+    PyPool         as Pool,          \
+    PySingleFlight as SingleFlight,  \
+    PyMap          as Map,           \
+    PyOnce         as Once,          \
+    PyWaitGroup    as WaitGroup,     \
+    PyWorkGroup    as WorkGroup
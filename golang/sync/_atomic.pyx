@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=2
+# cython: legacy_implicit_noexcept=True
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""_atomic.pyx implements atomic.py - see atomic.py for package overview."""
+
+from __future__ import print_function, absolute_import
+
+from golang cimport pypanic
+from cython cimport final
+from libc.stdint cimport int64_t, uint64_t
+
+# std::atomic<int64_t> - the same machinery that runtime/internal/atomic is built on.
+cdef extern from "<atomic>" namespace "std" nogil:
+    enum memory_order:
+        memory_order_relaxed
+        memory_order_seq_cst
+
+    cppclass _atomic_int64 "std::atomic<int64_t>":
+        int64_t load(memory_order)
+        void    store(int64_t, memory_order)
+        int64_t exchange(int64_t, memory_order)
+        int64_t fetch_add(int64_t, memory_order)
+        bint    compare_exchange_strong(int64_t& expected, int64_t desired, memory_order)
+
+
+# Int64 is atomic int64.
+#
+# By default all operations are sequentially consistent, as in Go.
+# Int64(relaxed=True) makes all operations use relaxed memory ordering: the
+# value itself stays atomic, but accesses to it do not order any other memory
+# access. This is enough for statistics counters and avoids the extra fences.
+@final
+cdef class PyInt64:
+    cdef _atomic_int64 v
+    cdef memory_order  mo
+
+    def __init__(PyInt64 pyv, int64_t value=0, relaxed=False):
+        pyv.mo = memory_order_relaxed if relaxed else memory_order_seq_cst
+        pyv.v.store(value, pyv.mo)
+
+    # load atomically loads the value.
+    def load(PyInt64 pyv): # -> int
+        return pyv.v.load(pyv.mo)
+
+    # store atomically stores value.
+    def store(PyInt64 pyv, int64_t value):
+        pyv.v.store(value, pyv.mo)
+
+    # add atomically adds delta to the value and returns the new value.
+    def add(PyInt64 pyv, int64_t delta): # -> int
+        # wraps around on overflow, as in Go
+        return <int64_t>(<uint64_t>pyv.v.fetch_add(delta, pyv.mo) + <uint64_t>delta)
+
+    # swap atomically stores new value and returns the old one.
+    def swap(PyInt64 pyv, int64_t new): # -> old
+        return pyv.v.exchange(new, pyv.mo)
+
+    # cas executes compare-and-swap operation for the value.
+    #
+    # It returns whether the swap was performed.
+    def cas(PyInt64 pyv, int64_t old, int64_t new): # -> bool
+        return pyv.v.compare_exchange_strong(old, new, pyv.mo)
+
+    def __repr__(PyInt64 pyv):
+        # NOTE use public name - PyInt64 is exported as sync.atomic.Int64
+        return "Int64(%d)" % pyv.load()
+
+
+# Value provides atomic load and store of a consistently typed object.
+#
+# As in Go, value of None cannot be stored, and all stored values must have the
+# same type. Load returns None if nothing was stored yet.
+#
+# Python objects are only ever accessed with the GIL held, and Value
+# operations do not release it. This makes each operation atomic with respect
+# to other goroutines without taking any additional lock.
+@final
+cdef class PyValue:
+    cdef object v
+
+    def __cinit__(PyValue pyv):
+        pyv.v = None
+
+    # load returns the value set by the most recent store.
+    def load(PyValue pyv): # -> obj | None
+        return pyv.v
+
+    # store sets the value to obj.
+    def store(PyValue pyv, obj):
+        pyv._check("store", obj)
+        pyv.v = obj
+
+    # swap stores new into the value and returns the previous value.
+    def swap(PyValue pyv, new): # -> old | None
+        pyv._check("swap", new)
+        old = pyv.v
+        pyv.v = new
+        return old
+
+    # cas executes compare-and-swap operation for the value.
+    #
+    # The comparison is by identity. It returns whether the swap was performed.
+    def cas(PyValue pyv, old, new): # -> bool
+        pyv._check("compare and swap", new)
+        if pyv.v is not old:
+            return False
+        pyv.v = new
+        return True
+
+    # _check verifies that obj can be put into the value.
+    cdef _check(PyValue pyv, op, obj):
+        if obj is None:
+            pypanic("sync/atomic: %s of nil value into Value" % op)
+        if pyv.v is not None and type(obj) is not type(pyv.v):
+            pypanic("sync/atomic: %s of inconsistently typed value into Value" % op)
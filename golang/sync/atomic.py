@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""Package atomic mirrors Go package sync/atomic.
+
+ - `Int64` is an atomic int64 with add, load, store, swap and cas operations.
+ - `Value` provides atomic load and store of a consistently typed object.
+
+Int64(relaxed=True) uses relaxed memory ordering, which is enough for e.g.
+statistics counters that do not order any other memory access.
+
+See also https://golang.org/pkg/sync/atomic for Go atomic package documentation.
+"""
+
+from __future__ import print_function, absolute_import
+
+from golang.sync._atomic import \
+    PyInt64     as Int64,       \
+    PyValue     as Value
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+
+from __future__ import print_function, absolute_import
+
+from golang import sync, context
+from golang.sync import atomic
+from golang.golang_test import panics
+from pytest import raises, mark
+from six.moves import range as xrange
+
+
+@mark.parametrize('relaxed', [False, True])
+def test_int64(relaxed):
+    v = atomic.Int64(relaxed=relaxed)
+    assert v.load() == 0
+    assert repr(v) == "Int64(0)"
+
+    v.store(5)
+    assert v.load() == 5
+    assert v.add(3)  == 8
+    assert v.add(-10) == -2
+    assert v.swap(7) == -2
+    assert v.load() == 7
+
+    assert v.cas(6, 1) == False
+    assert v.load() == 7
+    assert v.cas(7, 1) == True
+    assert v.load() == 1
+
+    v = atomic.Int64(3, relaxed=relaxed)
+    assert v.load() == 3
+
+    # int64 range and wraparound, as in Go
+    v.store(2**63-1)
+    assert v.add(1) == -2**63
+    assert v.load() == -2**63
+    with raises(OverflowError):
+        v.store(2**63)
+    with raises(OverflowError):
+        v.add(-2**63-1)
+
+    # concurrent adds are not lost
+    v = atomic.Int64(relaxed=relaxed)
+    N, K = 10, 1000
+    wg = sync.WorkGroup(context.background())
+    def _(ctx):
+        for i in xrange(K):
+            v.add(1)
+    for i in range(N):
+        wg.go(_)
+    wg.wait()
+    assert v.load() == N*K
+
+
+def test_value():
+    v = atomic.Value()
+    assert v.load() is None
+
+    a = [1]
+    v.store(a)
+    assert v.load() is a
+
+    b = [2]
+    assert v.swap(b) is a
+    assert v.load() is b
+
+    c = [3]
+    assert v.cas([2], c) == False   # comparison is by identity
+    assert v.load() is b
+    assert v.cas(b, c) == True
+    assert v.load() is c
+
+    # None and values of different type cannot be stored
+    with panics("sync/atomic: store of nil value into Value"):
+        v.store(None)
+    with panics("sync/atomic: store of inconsistently typed value into Value"):
+        v.store("abc")
+    with panics("sync/atomic: swap of inconsistently typed value into Value"):
+        v.swap("abc")
+    with panics("sync/atomic: compare and swap of nil value into Value"):
+        v.cas(c, None)
+    assert v.load() is c
+
+    # first swap/cas into empty Value
+    v = atomic.Value()
+    assert v.swap(1) is None
+    assert v.load() == 1
+    v = atomic.Value()
+    assert v.cas(None, 1) == True
+    assert v.load() == 1
@@ -17,9 +17,18 @@
 // See COPYING file for full licensing terms.
 // See https://www.nexedi.com/licensing for rationale and options.
 
+#include "golang/context.h"
+#include "golang/errors.h"
 #include "golang/sync.h"
+#include "golang/time.h"
 #include "golang/_testing.h"
+
+#include <string.h>
+#include <tuple>
 using namespace golang;
+using std::make_tuple;
+using std::tie;
+using std::tuple;
 
 // verify that sync::Once works.
 void _test_sync_once_cpp() {
@@ -40,3 +49,444 @@ void _test_sync_once_cpp() {
     });
     ASSERT(ncall == 1);
 }
+
+// verify that sync::Broadcast works.
+void _test_sync_broadcast_cpp() {
+    auto bc = _testing::newshared<sync::Broadcast>();
+    uint64_t gen0 = bc->gen();
+
+    // wait for already changed generation -> returns immediately
+    bc->broadcast();
+    uint64_t gen1 = bc->gen();
+    ASSERT(gen1 != gen0);
+    ASSERT(bc->wait(gen0) == gen1);
+
+    // timed wait with no notification
+    ASSERT(bc->_wait_timed(gen1, 1*time::millisecond) == gen1);
+
+    // broadcast wakes up all waiters; waiters are reused across generations
+    struct State {
+        sync::Mutex mu;
+        int         nready, nwoken;
+    };
+    for (int round = 0; round < 3; round++) {
+        const int N = 10;
+        chan<structZ> done = makechan<structZ>(N);
+        auto st = _testing::newshared<State>();
+        st->nready = st->nwoken = 0;
+        uint64_t gen = bc->gen();
+        for (int i = 0; i < N; i++) {
+            go([bc, st, done, gen]() {
+                st->mu.lock();
+                st->nready++;
+                st->mu.unlock();
+                uint64_t g = bc->wait(gen);
+                ASSERT(g != gen);
+                st->mu.lock();
+                st->nwoken++;
+                st->mu.unlock();
+                done.send(structZ{});
+            });
+        }
+        while (1) {
+            st->mu.lock();
+            int n = st->nready;
+            st->mu.unlock();
+            if (n == N)
+                break;
+            time::sleep(0);
+        }
+        st->mu.lock();
+        ASSERT(st->nwoken == 0);
+        st->mu.unlock();
+        bc->broadcast();
+        for (int i = 0; i < N; i++)
+            done.recv();
+        ASSERT(st->nwoken == N);
+    }
+
+    // changed(gen) is usable from select
+    uint64_t gen = bc->gen();
+    chan<structZ> ch = bc->changed(gen);
+    ASSERT(ch == bc->changed(gen));         // one channel per generation
+    int _ = select({ch.recvs(), _default});
+    ASSERT(_ == 1);
+    bc->broadcast();
+    _ = select({ch.recvs(), _default});
+    ASSERT(_ == 0);
+    _ = select({bc->changed(gen).recvs(), _default});   // already changed
+    ASSERT(_ == 0);
+    ASSERT(bc->changed(bc->gen()) != ch);
+}
+
+// verify that sync::Cond works.
+void _test_sync_cond_cpp() {
+    struct State {
+        sync::Mutex mu;
+        sync::Cond  cond;
+        int         value;
+        bool        stop;
+
+        State() : cond(&mu), value(0), stop(false) {}
+    };
+    auto st = _testing::newshared<State>();
+    chan<int> got = makechan<int>(10);
+
+    // consumer waits for value to change
+    const int N = 3;
+    for (int i = 0; i < N; i++) {
+        go([st, got]() {
+            st->mu.lock();
+            while (st->value == 0 && !st->stop)
+                st->cond.wait();
+            int v = st->value;
+            st->value = 0;
+            st->mu.unlock();
+            got.send(v);
+        });
+    }
+
+    // signal wakes up one waiter at a time
+    for (int i = 1; i <= N-1; i++) {
+        st->mu.lock();
+        st->value = i;
+        st->cond.signal();
+        st->mu.unlock();
+        ASSERT(got.recv() == i);
+    }
+
+    // broadcast wakes up everyone
+    st->mu.lock();
+    st->stop = true;
+    st->cond.broadcast();
+    st->mu.unlock();
+    ASSERT(got.recv() == 0);
+}
+
+// verify that sync::Pool works.
+static int _pooltObjAlive = 0;
+struct _PoolTObj {
+    int v;
+    _PoolTObj()  { v = 0; _pooltObjAlive++; }
+    ~_PoolTObj() { _pooltObjAlive--; }
+};
+static sync::Pool<_PoolTObj> _pooltGlobal;
+void _test_sync_pool_cpp() {
+    {
+        int nnew = 0;   // New is called only by us
+        auto pool = _testing::newshared<sync::Pool<_PoolTObj>>([&]() -> _PoolTObj* {
+            nnew++;
+            return new _PoolTObj();
+        });
+
+        // empty pool -> New
+        _PoolTObj *a = pool->get();
+        ASSERT(a != nil);
+        ASSERT(nnew == 1);
+        a->v = 1;
+
+        // put + get -> same object back
+        pool->put(a);
+        ASSERT(pool->get() == a);
+        ASSERT(nnew == 1);
+        pool->put(nil);  // ignored
+
+        // object survives one trimming tick (via victim cache) ...
+        pool->put(a);
+        pool->_trim();
+        ASSERT(_pooltObjAlive == 1);
+        ASSERT(pool->get() == a);
+        ASSERT(a->v == 1);  // pool does not reset objects
+
+        // ... but is freed on the second tick
+        pool->put(a);
+        pool->_trim();
+        pool->_trim();
+        ASSERT(_pooltObjAlive == 0);
+        a = pool->get();
+        ASSERT(nnew == 2);
+        ASSERT(a->v == 0);
+
+        // object put by another thread can be got here
+        pool->put(a);
+        chan<_PoolTObj*> ch = makechan<_PoolTObj*>();
+        go([pool, ch]() mutable {
+            _PoolTObj *b = new _PoolTObj();
+            b->v = 2;
+            pool->put(b);
+            pool = nil;     // so that pool is destroyed when our scope ends
+            ch.send(b);
+        });
+        _PoolTObj *b = ch.recv();
+        _PoolTObj *x = pool->get();
+        _PoolTObj *y = pool->get();
+        ASSERT((x == a && y == b) || (x == b && y == a));
+        ASSERT(nnew == 2);
+        pool->put(x);
+        pool->put(y);
+    }
+    // pool destruction frees cached objects
+    ASSERT(_pooltObjAlive == 0);
+
+    // default New is `new T()`
+    sync::Pool<_PoolTObj> pool;
+    _PoolTObj *a = pool.get();
+    ASSERT(a != nil && a->v == 0);
+    delete a;
+    ASSERT(_pooltObjAlive == 0);
+
+    // pool defined at namespace scope, i.e. constructed during static initialization
+    a = _pooltGlobal.get();
+    ASSERT(a != nil && _pooltObjAlive == 1);
+    _pooltGlobal.put(a);
+    ASSERT(_pooltGlobal.get() == a);
+    delete a;
+    ASSERT(_pooltObjAlive == 0);
+}
+
+// verify that WorkGroup.set_limit bounds the number of running goroutines.
+void _test_sync_workgroup_limit_cpp() {
+    sync::WorkGroup wg = sync::NewWorkGroup(context::background());
+    wg->set_limit(3);
+
+    struct State {
+        sync::Mutex mu;
+        int         nrun, nmax, ndone;
+    };
+    auto st = _testing::newshared<State>();
+    st->nrun = st->nmax = st->ndone = 0;
+    const int N = 100;
+    for (int i = 0; i < N; i++) {
+        wg->go([st](context::Context ctx) -> error {
+            st->mu.lock();
+            st->nrun++;
+            if (st->nrun > st->nmax)
+                st->nmax = st->nrun;
+            st->mu.unlock();
+            time::sleep(0);
+            st->mu.lock();
+            st->nrun--;
+            st->ndone++;
+            st->mu.unlock();
+            return nil;
+        });
+    }
+    ASSERT(wg->wait() == nil);
+    ASSERT(st->ndone == N);
+    ASSERT(st->nmax <= 3);
+
+    // try_go
+    chan<structZ> release = makechan<structZ>();
+    auto block = [release](context::Context ctx) -> error {
+        release.recv();
+        return nil;
+    };
+    wg = sync::NewWorkGroup(context::background());
+    wg->set_limit(1);
+    ASSERT(wg->try_go(block));
+    ASSERT(!wg->try_go(block));
+    release.close();
+    ASSERT(wg->wait() == nil);
+    ASSERT(wg->try_go(block));
+    ASSERT(wg->wait() == nil);
+}
+
+// verify that sync::WeightedSema works.
+void _test_sync_weightedsema_cpp() {
+    context::Context bg = context::background();
+    auto sema = _testing::newshared<sync::WeightedSema>(10);
+
+    ASSERT(sema->acquire(bg, 3) == nil);
+    ASSERT(sema->try_acquire(7));
+    ASSERT(!sema->try_acquire(1));
+    sema->release(7);
+
+    // FIFO: large request queued first is not overtaken by later small one
+    chan<int> acquired = makechan<int>(2);
+    go([sema, bg, acquired]() {
+        ASSERT(sema->acquire(bg, 10) == nil);
+        acquired.send(10);
+    });
+    while (sema->try_acquire(1)) {      // wait for big waiter to queue
+        sema->release(1);
+        time::sleep(0);                 // let big waiter run (e.g. under gevent)
+    }
+    go([sema, bg, acquired]() {
+        ASSERT(sema->acquire(bg, 1) == nil);
+        acquired.send(1);
+    });
+    time::sleep(1*time::millisecond);
+    ASSERT(acquired.len() == 0);
+    sema->release(3);
+    ASSERT(acquired.recv() == 10);
+    sema->release(10);
+    ASSERT(acquired.recv() == 1);
+    sema->release(1);
+
+    // acquire is canceled by ctx
+    ASSERT(sema->acquire(bg, 10) == nil);
+    context::Context ctx;
+    func<void()> cancel;
+    tie(ctx, cancel) = context::with_cancel(bg);
+    chan<error> errch = makechan<error>(1);
+    go([sema, ctx, errch]() {
+        errch.send(sema->acquire(ctx, 5));
+    });
+    time::sleep(1*time::millisecond);
+    ASSERT(errch.len() == 0);
+    cancel();
+    ASSERT(errch.recv() == context::canceled);
+    ASSERT(sema->acquire(ctx, 1) == context::canceled); // ctx already done
+    sema->release(10);
+    ASSERT(sema->try_acquire(10));      // canceled waiter left nothing behind
+    sema->release(10);
+
+    // release of more than held panics
+    const char *err = nil;
+    try {
+        sema->release(1);
+    } catch (...) {
+        err = recover();
+    }
+    ASSERT(err != nil);
+    ASSERT(!strcmp(err, "sync: WeightedSema: released more than held"));
+}
+
+// verify that sync::SingleFlight works.
+void _test_sync_singleflight_cpp() {
+    auto sf = _testing::newshared<sync::SingleFlight<string, int>>();
+    int v; error err; bool shared;
+
+    // single call
+    tie(v, err, shared) = sf->do_("a", []() -> tuple<int, error> {
+        return make_tuple(1, error(nil));
+    });
+    ASSERT(v == 1 && err == nil && !shared);
+
+    // concurrent calls share one execution
+    struct State {
+        chan<structZ> release;
+        chan<structZ> started;
+        int           ncall;
+    };
+    auto st = _testing::newshared<State>();
+    st->release = makechan<structZ>();
+    st->started = makechan<structZ>();
+    st->ncall   = 0;
+    auto fn = [st]() -> tuple<int, error> {
+        st->ncall++;
+        st->started.close();
+        st->release.recv();
+        return make_tuple(2, errors::New("oops"));
+    };
+    chan<tuple<int, error, bool>> resultq = makechan<tuple<int, error, bool>>(1);
+    go([sf, fn, resultq]() {
+        resultq.send(sf->do_("b", fn));
+    });
+    st->started.recv();
+    // NOTE do_chan joins in-flight call synchronously
+    const int N = 3;
+    chan<sync::SingleFlight<string, int>::Result> rchv[N];
+    for (int i = 0; i < N; i++)
+        rchv[i] = sf->do_chan("b", fn);
+    st->release.close();
+    tie(v, err, shared) = resultq.recv();
+    ASSERT(v == 2);
+    ASSERT(err != nil && err->Error() == "oops");
+    ASSERT(shared);
+    sync::SingleFlight<string, int>::Result r;
+    for (int i = 0; i < N; i++) {
+        r = rchv[i].recv();
+        ASSERT(r.val == 2 && r.err == err && r.shared);
+    }
+    ASSERT(st->ncall == 1);
+
+    // forget: next call runs fn even if previous call is still in-flight
+    st->release = makechan<structZ>();
+    st->started = makechan<structZ>();
+    st->ncall   = 0;
+    chan<sync::SingleFlight<string, int>::Result> rch = sf->do_chan("c", fn);
+    st->started.recv();
+    sf->forget("c");
+    tie(v, err, shared) = sf->do_("c", []() -> tuple<int, error> {
+        return make_tuple(3, error(nil));
+    });
+    ASSERT(v == 3 && err == nil && !shared);
+    st->release.close();
+    r = rch.recv();
+    ASSERT(r.val == 2 && !r.shared);
+    ASSERT(st->ncall == 1);
+}
+
+// verify that sync::Map works.
+void _test_sync_map_cpp() {
+    auto m = _testing::newshared<sync::Map<string, int>>();
+    int v; bool ok;
+
+    ASSERT(m->len() == 0);
+    tie(v, ok) = m->load("a");
+    ASSERT(v == 0 && !ok);
+    ASSERT(!m->has("a"));
+
+    m->store("a", 1);
+    tie(v, ok) = m->load("a");
+    ASSERT(v == 1 && ok);
+    ASSERT(m->get("a") == 1);
+    ASSERT(m->get("b") == 0);
+
+    tie(v, ok) = m->load_or_store("a", 2);
+    ASSERT(v == 1 && ok);
+    tie(v, ok) = m->load_or_store("b", 2);
+    ASSERT(v == 2 && !ok);
+    ASSERT(m->len() == 2);
+
+    tie(v, ok) = m->load_and_delete("a");
+    ASSERT(v == 1 && ok);
+    tie(v, ok) = m->load_and_delete("a");
+    ASSERT(v == 0 && !ok);
+    m->delete_("b");
+    ASSERT(m->len() == 0);
+
+    // concurrent access from several goroutines
+    const int N = 4, K = 1000;
+    chan<structZ> done = makechan<structZ>(N);
+    for (int g = 0; g < N; g++) {
+        go([m, done, g]() {
+            for (int i = 0; i < K; i++) {
+                string key = "k" + std::to_string(i);
+                int actual; bool loaded;
+                tie(actual, loaded) = m->load_or_store(key, i);
+                ASSERT(actual == i);
+                ASSERT(m->get(key) == i);
+                m->store("g" + std::to_string(g), i);
+            }
+            done.send(structZ{});
+        });
+    }
+    for (int g = 0; g < N; g++)
+        done.recv();
+    ASSERT(m->len() == K + N);
+
+    // range_ visits every item; f can access the map
+    int n = 0;
+    m->range_([&](const string &key, const int &value) -> bool {
+        if (key[0] == 'k') {
+            ASSERT(key == "k" + std::to_string(value));
+            m->delete_(key);
+        }
+        else
+            ASSERT(value == K-1);
+        n++;
+        return true;
+    });
+    ASSERT(n == K + N);
+    ASSERT(m->len() == N);
+
+    // range_ stops when f returns false
+    n = 0;
+    m->range_([&](const string &key, const int &value) -> bool {
+        n++;
+        return false;
+    });
+    ASSERT(n == 1);
+}
@@ -27,7 +27,7 @@ from _pytest._code import Traceback
 from golang.golang_test import import_pyx_tests, panics
 from golang.time_test import dt
 from six.moves import range as xrange
-import sys, six
+import sys, six, gc, weakref
 
 import_pyx_tests("golang._sync_test")
 
@@ -66,6 +66,56 @@ def test_mutex():           _test_mutex(sync.Mutex(),   'lock',    'unlock')
 def test_sema():            _test_mutex(sync.Sema(),    'acquire', 'release')
 def test_rwmutex_basic():   _test_mutex(sync.RWMutex(), 'Lock',    'Unlock')
 
+def test_weightedsema():
+    bg   = context.background()
+    sema = sync.WeightedSema(10)
+
+    sema.acquire(bg, 3)
+    assert sema.try_acquire(7) == True
+    assert sema.try_acquire()  == False
+    sema.release(7)
+
+    # FIFO: queued large request is not overtaken by small one
+    ch = chan(2)
+    def big():
+        sema.acquire(bg, 10)
+        ch.send('big')
+    go(big)
+    while sema.try_acquire():   # wait for big to queue
+        sema.release()
+        time.sleep(0)           # let big run (e.g. under gevent)
+    def small():
+        sema.acquire(bg)
+        ch.send('small')
+    go(small)
+    time.sleep(1*dt)
+    assert len(ch) == 0
+    sema.release(3)
+    assert ch.recv() == 'big'
+    sema.release(10)
+    assert ch.recv() == 'small'
+    sema.release()
+
+    # acquire is canceled by ctx
+    sema.acquire(bg, 10)
+    ctx, cancel = context.with_cancel(bg)
+    def _():
+        with raises(Exception) as exc:
+            sema.acquire(ctx, 5)
+        ch.send(exc.value)
+    go(_)
+    time.sleep(1*dt)
+    assert len(ch) == 0
+    cancel()
+    assert ch.recv() == context.canceled
+    sema.release(10)
+    assert sema.try_acquire(10) == True
+    sema.release(10)
+
+    with panics("sync: WeightedSema: released more than held"):
+        sema.release()
+
+
 def test_rwmutex():
     mu = sync.RWMutex()
 
@@ -208,6 +258,253 @@ def test_once():
     assert l == [2]
 
 
+def test_broadcast():
+    bc = sync.Broadcast()
+    gen0 = bc.gen()
+    bc.broadcast()
+    gen1 = bc.gen()
+    assert gen1 != gen0
+    assert bc.wait(gen0) == gen1            # already changed -> no wait
+    assert bc.wait(gen1, timeout=1*dt) == gen1  # timeout
+
+    ch = chan(3)
+    def _():
+        ch.send(bc.wait(gen1))
+    for i in range(3):
+        go(_)
+
+    time.sleep(1*dt)
+    assert len(ch) == 0
+    bc.broadcast()
+    gen2 = bc.gen()
+    for i in range(3):
+        assert ch.recv() == gen2
+
+    # changed is usable from select
+    changed = bc.changed(gen2)
+    assert select(changed.recv, default) == (1, None)
+    bc.broadcast()
+    assert select(changed.recv, default) == (0, None)
+    assert select(bc.changed(gen2).recv, default) == (0, None)
+
+
+def test_cond():
+    mu   = sync.Mutex()
+    cond = sync.Cond(mu)
+    assert cond.L is mu
+    q    = []
+    ch   = chan(3)
+
+    def _():
+        with mu:
+            while len(q) == 0:
+                cond.wait()
+            ch.send(q.pop(0))
+    for i in range(3):
+        go(_)
+
+    time.sleep(1*dt)
+    assert len(ch) == 0
+    with mu:
+        q.append('a')
+        cond.signal()
+    assert ch.recv() == 'a'
+    time.sleep(1*dt)
+    assert len(ch) == 0
+
+    with mu:
+        q.extend(['b', 'c'])
+        cond.broadcast()
+    assert sorted([ch.recv(), ch.recv()]) == ['b', 'c']
+
+
+def test_pool():
+    # pool without new -> None when empty
+    pool = sync.Pool()
+    assert pool.get() is None
+    a = object()
+    pool.put(a)
+    assert pool.get() is a
+    assert pool.get() is None
+    pool.put(None)  # ignored
+    assert pool.get() is None
+
+    # pool with new
+    nnew = [0]
+    def new():
+        nnew[0] += 1
+        return bytearray(nnew[0])
+    pool = sync.Pool(new=new)
+    b = pool.get()
+    assert b == bytearray(1)
+    assert nnew == [1]
+    pool.put(b)
+    assert pool.get() is b
+    assert nnew == [1]
+
+    # object put from another thread can be reused here
+    done = chan()
+    def _():
+        pool.put(b)
+        done.close()
+    go(_)
+    done.recv()
+    assert pool.get() is b
+    assert nnew == [1]
+
+    # the pool keeps references to cached objects; unused objects are
+    # released after two trimming ticks
+    class Obj(object):
+        pass
+    o = Obj()
+    wo = weakref.ref(o)
+    pool.put(o)
+    del o
+    assert wo() is not None
+    pool._trim()
+    assert wo() is not None     # in victim cache
+    pool._trim()
+    gc.collect()
+    assert wo() is None         # released
+
+    # pool destruction releases cached objects
+    o = Obj()
+    wo = weakref.ref(o)
+    pool.put(o)
+    del o
+    del pool
+    gc.collect()
+    assert wo() is None
+
+
+def test_singleflight():
+    sf = sync.SingleFlight()
+    assert sf.do('a', lambda: 1) == (1, False)
+
+    # concurrent calls share one execution
+    release = chan()
+    ncall   = [0]
+    def fn():
+        ncall[0] += 1
+        release.recv()
+        return 2
+    N = 5
+    ch = chan(N)
+    def _():
+        ch.send(sf.do('b', fn))
+    for i in range(N):
+        go(_)
+    time.sleep(1*dt)
+    rch = sf.do_chan('b', fn)
+    assert len(ch) == 0
+    release.close()
+    for i in range(N):
+        assert ch.recv() == (2, True)
+    assert rch.recv() == (2, None, True)
+    assert ncall == [1]
+
+    # exception is delivered to all callers
+    release = chan()
+    def fail():
+        release.recv()
+        raise MyError('eee')
+    def _():
+        with raises(MyError) as exc:
+            sf.do('c', fail)
+        ch.send(exc.value)
+    for i in range(2):
+        go(_)
+    time.sleep(1*dt)
+    rch = sf.do_chan('c', fail)
+    release.close()
+    e1, e2 = ch.recv(), ch.recv()
+    assert e1 is e2
+    assert e1.args == ('eee',)
+    v, e, shared = rch.recv()
+    assert v is None  and  e is e1  and  shared
+
+    # forget
+    release = chan()
+    ncall   = [0]
+    rch = sf.do_chan('d', fn)
+    time.sleep(1*dt)
+    sf.forget('d')
+    assert sf.do('d', lambda: 3) == (3, False)
+    release.close()
+    assert rch.recv() == (2, None, False)
+    assert ncall == [1]
+
+
+def test_map():
+    m = sync.Map()
+    assert len(m) == 0
+    assert m.load('a') == (None, False)
+    m.store('a', 1)
+    assert m.load('a') == (1, True)
+    assert m.load_or_store('a', 2) == (1, True)
+    assert m.load_or_store('b', 2) == (2, False)
+    assert m.load_or_store('b', 2) == (2, True)     # the same object is already there
+    assert len(m) == 2
+    assert m.load_and_delete('a') == (1, True)
+    assert m.load_and_delete('a') == (None, False)
+    m.delete('b')
+    m.delete('b')
+    assert len(m) == 0
+
+    # concurrent access
+    N, K = 4, 100
+    wg = sync.WaitGroup()
+    wg.add(N)
+    def _(g):
+        for i in range(K):
+            actual, _ = m.load_or_store(i, 'v%d' % i)
+            assert actual == 'v%d' % i
+            m.store(('g', g), i)
+        wg.done()
+    for g in range(N):
+        go(_, g)
+    wg.wait()
+    assert len(m) == K + N
+
+    # load_or_store is atomic even if key's __hash__ switches goroutines
+    class YieldKey(object):
+        def __hash__(self):
+            time.sleep(0)
+            return 1
+        def __eq__(self, other):
+            return isinstance(other, YieldKey)
+        def __ne__(self, other):
+            return not (self == other)
+    m2 = sync.Map()
+    ch = chan(N)
+    def _(i):
+        ch.send(m2.load_or_store(YieldKey(), i))
+    for i in range(N):
+        go(_, i)
+    resv = [ch.recv() for i in range(N)]
+    assert len(set(actual for (actual, _) in resv)) == 1
+    assert [loaded for (_, loaded) in resv].count(False) == 1
+
+    # range; f can modify the map
+    seen = {}
+    def f(k, v):
+        seen[k] = v
+        m.delete(k)
+        return True
+    m.range(f)
+    assert len(seen) == K + N
+    assert len(m) == 0
+
+    m.store(1, 1)
+    m.store(2, 2)
+    n = [0]
+    def f(k, v):
+        n[0] += 1
+        return False
+    m.range(f)
+    assert n == [1]
+
+
 def test_waitgroup():
     wg = sync.WaitGroup()
     wg.add(2)
@@ -339,6 +636,58 @@ def test_workgroup():
     wg.wait()
     assert l == [1, 2]
 
+def test_workgroup_limit():
+    ctx = context.background()
+    mu  = sync.Mutex()
+
+    # at most 2 tasks run simultaneously; all tasks are run
+    wg = sync.WorkGroup(ctx)
+    wg.set_limit(2)
+    nrun = [0]  # currently running
+    nmax = [0]  # max simultaneously running
+    done = []
+    N = 20
+    for i in range(N):
+        def _(ctx, i):
+            with mu:
+                nrun[0] += 1
+                nmax[0] = max(nmax[0], nrun[0])
+            time.sleep(0.1*dt)
+            with mu:
+                nrun[0] -= 1
+                done.append(i)
+        wg.go(_, i)
+    wg.wait()
+    assert nmax[0] <= 2
+    assert sorted(done) == list(range(N))
+
+    # try_go fails while the limit is reached
+    wg = sync.WorkGroup(ctx)
+    wg.set_limit(1)
+    release = chan()
+    def _(ctx):
+        release.recv()
+    assert wg.try_go(_) == True
+    assert wg.try_go(_) == False
+    with panics("sync: WorkGroup: set_limit while goroutines are still running"):
+        wg.set_limit(2)
+    release.close()
+    wg.wait()
+    assert wg.try_go(_) == True     # worker is free again
+    wg.wait()
+
+    # error of a task run by reused worker is reported
+    wg = sync.WorkGroup(ctx)
+    wg.set_limit(1)
+    for i in range(3):
+        def _(ctx, i):
+            if i == 2:
+                raise MyError('ddd')
+        wg.go(_, i)
+    with raises(MyError) as exc:
+        wg.wait()
+    assert exc.value.args == ('ddd',)
+
 @func
 def test_workgroup_with():
     # verify with support for sync.WorkGroup
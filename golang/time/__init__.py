@@ -25,6 +25,8 @@
  - `tick`, `after` and `after_func` are convenience wrappers to use
    tickers and timers easily.
 
+Subpackage `golang.time.rate` provides rate limiter.
+
 See also https://golang.org/pkg/time for Go time package documentation.
 """
 
@@ -0,0 +1,78 @@
+# cython: language_level=2
+# cython: legacy_implicit_noexcept=True
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""Package rate mirrors Go package golang.org/x/time/rate.
+
+ - `Limiter` controls how frequently events are allowed to happen.
+ - `Limit` defines maximum frequency of events; `inf` is infinite limit.
+ - `every` converts minimum time interval between events to Limit.
+
+Limiter implements a token bucket of size burst, that is refilled at rate r
+tokens per second. The tokens are computed lazily whenever the limiter is used:
+a limiter does not run any goroutine or timer by itself, so idle limiters cost
+nothing. Only wait, when it really has to sleep, arms a timer for the time of
+the sleep.
+
+See also https://pkg.go.dev/golang.org/x/time/rate for Go rate package documentation.
+"""
+
+from golang cimport error, refptr, cbool
+from golang cimport context
+
+cdef extern from "golang/time/rate.h" namespace "golang::time::rate" nogil:
+    ctypedef double Limit
+    const Limit inf
+
+    Limit every(double interval)
+
+    cppclass _Limiter:
+        Limit  limit()
+        int    burst()
+        double tokens()
+        void   set_limit(Limit r)
+        void   set_burst(int burst)
+        cbool  allow(int n)
+        Reservation reserve(int n)
+        error  wait(context.Context ctx, int n)
+
+    cppclass Limiter (refptr[_Limiter]):
+        # Limiter.X = Limiter->X in C++.
+        Limit  limit        "_ptr()->limit"     ()
+        int    burst        "_ptr()->burst"     ()
+        double tokens       "_ptr()->tokens"    ()
+        void   set_limit    "_ptr()->set_limit" (Limit r)
+        void   set_burst    "_ptr()->set_burst" (int burst)
+        cbool  allow        "_ptr()->allow"     (int n)
+        Reservation reserve "_ptr()->reserve"   (int n)
+        error  wait         "_ptr()->wait"      (context.Context ctx, int n)
+
+    Limiter new_limiter(Limit r, int burst)
+
+
+    cppclass _Reservation:
+        cbool  ok()
+        double delay()
+        void   cancel()
+
+    cppclass Reservation (refptr[_Reservation]):
+        # Reservation.X = Reservation->X in C++.
+        cbool  ok           "_ptr()->ok"        ()
+        double delay        "_ptr()->delay"     ()
+        void   cancel       "_ptr()->cancel"    ()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=2
+# cython: legacy_implicit_noexcept=True
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""_rate.pyx implements rate.py - see _rate.pxd for package overview."""
+
+from __future__ import print_function, absolute_import
+
+from golang cimport nil, error, pyerror, cbool, topyexc
+from golang cimport context
+from cython cimport final
+
+
+# Limiter controls how frequently events are allowed to happen.
+#
+# It allows events up to rate r and permits bursts of at most burst events.
+# See Limiter in rate.h for details.
+@final
+cdef class PyLimiter:
+    cdef Limiter lim
+
+    def __init__(PyLimiter pylim, Limit r, int burst):
+        with nogil:
+            pylim.lim = new_limiter_pyexc(r, burst)
+
+    def __dealloc__(PyLimiter pylim):
+        pylim.lim = nil
+
+    # limit returns the maximum overall event rate.
+    def limit(PyLimiter pylim): # -> Limit
+        cdef Limit r
+        with nogil:
+            r = limiter_limit_pyexc(pylim.lim)
+        return r
+
+    # burst returns the maximum burst size.
+    def burst(PyLimiter pylim): # -> int
+        cdef int b
+        with nogil:
+            b = limiter_burst_pyexc(pylim.lim)
+        return b
+
+    # tokens returns the number of tokens available now.
+    def tokens(PyLimiter pylim): # -> float
+        cdef double t
+        with nogil:
+            t = limiter_tokens_pyexc(pylim.lim)
+        return t
+
+    # set_limit sets new limit for the limiter.
+    def set_limit(PyLimiter pylim, Limit r):
+        with nogil:
+            limiter_setlimit_pyexc(pylim.lim, r)
+
+    # set_burst sets new burst size for the limiter.
+    def set_burst(PyLimiter pylim, int burst):
+        with nogil:
+            limiter_setburst_pyexc(pylim.lim, burst)
+
+    # allow reports whether n events may happen now.
+    def allow(PyLimiter pylim, int n=1): # -> bool
+        cdef cbool ok
+        with nogil:
+            ok = limiter_allow_pyexc(pylim.lim, n)
+        return ok
+
+    # reserve returns Reservation that indicates how long the caller must wait
+    # before n events happen.
+    def reserve(PyLimiter pylim, int n=1): # -> Reservation
+        cdef PyReservation pyr = PyReservation.__new__(PyReservation)
+        with nogil:
+            pyr.r = limiter_reserve_pyexc(pylim.lim, n)
+        return pyr
+
+    # wait blocks until n events may happen.
+    #
+    # It raises ctx.err() if ctx is done, or an error if n exceeds burst or
+    # the wait would exceed ctx deadline.
+    def wait(PyLimiter pylim, context.PyContext pyctx not None, int n=1):
+        cdef error err
+        with nogil:
+            err = limiter_wait_pyexc(pylim.lim, pyctx.ctx, n)
+        if err != nil:
+            raise pyerror.from_error(err)
+
+
+# Reservation holds information about events that are permitted by Limiter to
+# happen after a delay.
+@final
+cdef class PyReservation:
+    cdef Reservation r
+
+    def __init__(PyReservation pyr):
+        raise TypeError("cannot create %s directly" % type(pyr).__name__)
+
+    def __dealloc__(PyReservation pyr):
+        pyr.r = nil
+
+    # ok returns whether the limiter can provide the requested number of
+    # tokens within the maximum wait time.
+    def ok(PyReservation pyr): # -> bool
+        cdef cbool ok
+        with nogil:
+            ok = reservation_ok_pyexc(pyr.r)
+        return ok
+
+    # delay returns for how long, in seconds, the reservation holder must wait
+    # before taking the reserved action.
+    def delay(PyReservation pyr): # -> float
+        cdef double dt
+        with nogil:
+            dt = reservation_delay_pyexc(pyr.r)
+        return dt
+
+    # cancel indicates that the reservation holder will not perform the
+    # reserved action, and gives the tokens back to the limiter.
+    def cancel(PyReservation pyr):
+        with nogil:
+            reservation_cancel_pyexc(pyr.r)
+
+
+# ---- misc ----
+pyinf = inf
+
+def pyevery(double interval): # -> Limit
+    return every(interval)
+
+cdef nogil:
+
+    Limiter new_limiter_pyexc(Limit r, int burst)           except +topyexc:
+        return new_limiter(r, burst)
+    Limit limiter_limit_pyexc(Limiter lim)                  except +topyexc:
+        return lim.limit()
+    int limiter_burst_pyexc(Limiter lim)                    except +topyexc:
+        return lim.burst()
+    double limiter_tokens_pyexc(Limiter lim)                except +topyexc:
+        return lim.tokens()
+    void limiter_setlimit_pyexc(Limiter lim, Limit r)       except +topyexc:
+        lim.set_limit(r)
+    void limiter_setburst_pyexc(Limiter lim, int burst)     except +topyexc:
+        lim.set_burst(burst)
+    cbool limiter_allow_pyexc(Limiter lim, int n)           except +topyexc:
+        return lim.allow(n)
+    Reservation limiter_reserve_pyexc(Limiter lim, int n)   except +topyexc:
+        return lim.reserve(n)
+    error limiter_wait_pyexc(Limiter lim, context.Context ctx, int n)  except +topyexc:
+        return lim.wait(ctx, n)
+
+    cbool reservation_ok_pyexc(Reservation r)               except +topyexc:
+        return r.ok()
+    double reservation_delay_pyexc(Reservation r)           except +topyexc:
+        return r.delay()
+    void reservation_cancel_pyexc(Reservation r)            except +topyexc:
+        r.cancel()
@@ -0,0 +1,347 @@
+// Copyright (C) 2026  Nexedi SA and Contributors.
+//                     Kirill Smelkov <kirr@nexedi.com>
+//
+// This program is free software: you can Use, Study, Modify and Redistribute
+// it under the terms of the GNU General Public License version 3, or (at your
+// option) any later version, as published by the Free Software Foundation.
+//
+// You can also Link and Combine this program with other software covered by
+// the terms of any of the Free Software licenses or any of the Open Source
+// Initiative approved licenses and Convey the resulting work. Corresponding
+// source of such a combination shall include the source code for all other
+// software used.
+//
+// This program is distributed WITHOUT ANY WARRANTY; without even the implied
+// warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+//
+// See COPYING file for full licensing terms.
+// See https://www.nexedi.com/licensing for rationale and options.
+
+// Package rate mirrors Go package golang.org/x/time/rate.
+// See rate.h for package overview.
+
+// Limiter organization
+//
+// The limiter does not refill its bucket in the background. Instead it
+// remembers the number of tokens at time ._last, and on every use computes
+// how many tokens were accumulated since then from the elapsed time. The
+// number of tokens can become negative: this represents reservations made for
+// the future, and the time to act for a new reservation is the time it takes
+// to refill the bucket back to zero.
+//
+// The implementation closely follows golang.org/x/time/rate, with time kept
+// as int64 nanoseconds from time::_nanotime, and durations as double seconds.
+
+#include "golang/time/rate.h"
+#include "golang/fmt.h"
+#include "golang/time.h"
+
+
+// golang::time::rate::
+namespace golang {
+namespace time {
+namespace rate {
+
+static int64_t _now() {
+    return int64_t(time::_nanotime());
+}
+
+Limit every(double interval) {
+    if (interval <= 0)
+        return inf;
+    return 1 / interval;
+}
+
+
+// ---- Limiter ----
+
+_Limiter::_Limiter()  {}
+_Limiter::~_Limiter() {}
+void _Limiter::decref() {
+    if (__decref())
+        delete this;
+}
+
+Limiter new_limiter(Limit r, int burst) {
+    Limiter lim = adoptref(new _Limiter());
+    lim->_limit     = r;
+    lim->_burst     = burst;
+    lim->_tokens    = burst;
+    lim->_last      = _now();
+    lim->_lastEvent = 0;
+    return lim;
+}
+
+Limit _Limiter::limit() {
+    _Limiter& lim = *this;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+    return lim._limit;
+}
+
+int _Limiter::burst() {
+    _Limiter& lim = *this;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+    return lim._burst;
+}
+
+double _Limiter::tokens() {
+    _Limiter& lim = *this;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+    int64_t now;
+    double  tokens;
+    lim._advance(_now(), &now, &tokens);
+    return tokens;
+}
+
+void _Limiter::set_limit(Limit r) {
+    _Limiter& lim = *this;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+    // account tokens accumulated with previous limit before switching
+    lim._advance(_now(), &lim._last, &lim._tokens);
+    lim._limit = r;
+}
+
+void _Limiter::set_burst(int burst) {
+    _Limiter& lim = *this;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+    lim._advance(_now(), &lim._last, &lim._tokens);
+    lim._burst = burst;
+}
+
+bool _Limiter::allow(int n) {
+    _Limiter& lim = *this;
+    return lim._reserve(_now(), n, 0)->_ok;
+}
+
+Reservation _Limiter::reserve(int n) {
+    _Limiter& lim = *this;
+    return lim._reserve(_now(), n, INFINITY);
+}
+
+error _Limiter::wait(context::Context ctx, int n) {
+    _Limiter& lim = *this;
+
+    lim._mu.lock();
+    int   burst = lim._burst;
+    Limit limit = lim._limit;
+    lim._mu.unlock();
+
+    if (n > burst && limit != inf)
+        return fmt::errorf("rate: wait(n=%d) exceeds limiter's burst %d", n, burst);
+
+    // don't even try if ctx is already done
+    error err = ctx->err();
+    if (err != nil)
+        return err;
+
+    // don't reserve tokens that we won't be able to use before ctx deadline
+    int64_t now = _now();
+    double  maxWait = INFINITY;
+    double  deadline = ctx->deadline();
+    if (deadline != INFINITY)
+        maxWait = deadline - now*1E-9;
+
+    Reservation r = lim._reserve(now, n, maxWait);
+    if (!r->_ok)
+        return fmt::errorf("rate: wait(n=%d) would exceed context deadline", n);
+
+    double delay = r->_delayFrom(now);
+    if (delay == 0)
+        return nil;
+
+    // we have to sleep - this is the only place where the limiter uses a timer
+    time::Timer t = time::new_timer(delay);
+    int _ = select({
+        t->c.recvs(),           // 0
+        ctx->done().recvs(),    // 1
+    });
+    if (_ == 0)
+        return nil;
+
+    // ctx is done - give the tokens back
+    t->stop();
+    r->_cancelAt(_now());
+    return ctx->err();
+}
+
+// _reserve is the common implementation of allow, reserve and wait.
+//
+// maxWait limits for how long, in seconds, the reservation holder could wait
+// to act. Tokens are consumed only if the reservation is ok.
+//
+// must be called with lim._mu unlocked.
+Reservation _Limiter::_reserve(int64_t now, int n, double maxWait) {
+    _Limiter& lim = *this;
+
+    Reservation r = adoptref(new _Reservation());
+    r->_lim       = newref(&lim);
+    r->_tokens    = 0;
+    r->_timeToAct = now;
+
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+
+    r->_limit = lim._limit;
+
+    if (lim._limit == inf) {
+        r->_ok     = true;
+        r->_tokens = n;
+        return r;
+    }
+
+    if (lim._limit == 0) {
+        // no refill: allow what is left in the burst once.
+        // such reservation cannot be canceled.
+        r->_ok = (lim._burst >= n);
+        if (r->_ok)
+            lim._burst -= n;
+        return r;
+    }
+
+    int64_t t;
+    double  tokens;
+    lim._advance(now, &t, &tokens);
+
+    tokens -= n;
+    double wait = 0;
+    if (tokens < 0)
+        wait = lim._duration_from_tokens(-tokens);
+
+    r->_ok = (n <= lim._burst && wait <= maxWait);
+    if (r->_ok) {
+        r->_tokens    = n;
+        r->_timeToAct = t + int64_t(wait*1E9);
+
+        lim._last      = t;
+        lim._tokens    = tokens;
+        lim._lastEvent = r->_timeToAct;
+    }
+    return r;
+}
+
+// _advance computes the number of tokens the limiter has at time now.
+//
+// It returns adjusted now, and the tokens without updating the limiter.
+// must be called with lim._mu locked.
+void _Limiter::_advance(int64_t now, int64_t *pnow, double *ptokens) {
+    _Limiter& lim = *this;
+
+    int64_t last = lim._last;
+    if (now < last)
+        last = now;
+
+    double tokens = lim._tokens + lim._tokens_from_duration(now - last);
+    if (tokens > lim._burst)
+        tokens = lim._burst;
+
+    *pnow    = now;
+    *ptokens = tokens;
+}
+
+// _tokens_from_duration returns how many tokens are accumulated during d ns.
+double _Limiter::_tokens_from_duration(int64_t d) {
+    _Limiter& lim = *this;
+    if (lim._limit <= 0)
+        return 0;
+    return d*1E-9 * lim._limit;
+}
+
+// _duration_from_tokens returns how many seconds it takes to accumulate tokens.
+double _Limiter::_duration_from_tokens(double tokens) {
+    _Limiter& lim = *this;
+    if (lim._limit <= 0)
+        return INFINITY;
+    return tokens / lim._limit;
+}
+
+
+// ---- Reservation ----
+
+_Reservation::_Reservation()  {}
+_Reservation::~_Reservation() {}
+void _Reservation::decref() {
+    if (__decref())
+        delete this;
+}
+
+bool _Reservation::ok() {
+    return _ok;
+}
+
+double _Reservation::delay() {
+    return _delayFrom(_now());
+}
+
+double _Reservation::_delayFrom(int64_t now) {
+    _Reservation& r = *this;
+    if (!r._ok)
+        return INFINITY;
+    int64_t delay = r._timeToAct - now;
+    if (delay < 0)
+        return 0;
+    return delay*1E-9;
+}
+
+void _Reservation::cancel() {
+    _cancelAt(_now());
+}
+
+// _cancelAt cancels the reservation at time now.
+//
+// Tokens are restored only to the extent they were not yet used by
+// reservations made after this one.
+void _Reservation::_cancelAt(int64_t now) {
+    _Reservation& r = *this;
+    if (!r._ok)
+        return;
+
+    _Limiter& lim = *r._lim;
+    lim._mu.lock();
+    defer([&]() {
+        lim._mu.unlock();
+    });
+
+    if (lim._limit == inf || r._tokens == 0 || r._timeToAct < now)
+        return;
+
+    // restore tokens, minus those already reserved by later reservations
+    double restore = r._tokens - lim._tokens_from_duration(lim._lastEvent - r._timeToAct);
+    int    ntok    = r._tokens;
+    r._tokens = 0; // cancel is idempotent
+    if (restore <= 0)
+        return;
+
+    int64_t t;
+    double  tokens;
+    lim._advance(now, &t, &tokens);
+    tokens += restore;
+    if (tokens > lim._burst)
+        tokens = lim._burst;
+    lim._last   = t;
+    lim._tokens = tokens;
+
+    if (r._timeToAct == lim._lastEvent) {
+        int64_t prevEvent = r._timeToAct - int64_t(ntok / r._limit * 1E9);
+        if (prevEvent >= now)
+            lim._lastEvent = prevEvent;
+    }
+}
+
+}}} // golang::time::rate::
@@ -0,0 +1,180 @@
+#ifndef _NXD_LIBGOLANG_TIME_RATE_H
+#define _NXD_LIBGOLANG_TIME_RATE_H
+
+// Copyright (C) 2026  Nexedi SA and Contributors.
+//                     Kirill Smelkov <kirr@nexedi.com>
+//
+// This program is free software: you can Use, Study, Modify and Redistribute
+// it under the terms of the GNU General Public License version 3, or (at your
+// option) any later version, as published by the Free Software Foundation.
+//
+// You can also Link and Combine this program with other software covered by
+// the terms of any of the Free Software licenses or any of the Open Source
+// Initiative approved licenses and Convey the resulting work. Corresponding
+// source of such a combination shall include the source code for all other
+// software used.
+//
+// This program is distributed WITHOUT ANY WARRANTY; without even the implied
+// warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+//
+// See COPYING file for full licensing terms.
+// See https://www.nexedi.com/licensing for rationale and options.
+
+// Package rate mirrors Go package golang.org/x/time/rate.
+//
+//  - `Limiter` controls how frequently events are allowed to happen.
+//  - `Limit` defines maximum frequency of events; `inf` is infinite limit.
+//  - `every` converts minimum time interval between events to Limit.
+//
+// Limiter implements a token bucket of size burst, that is refilled at rate
+// r tokens per second. The tokens are computed lazily from time::_nanotime
+// whenever the limiter is used: a limiter does not run any goroutine or timer
+// by itself, so idle limiters cost nothing. Only wait, when it really has to
+// sleep, arms a timer for the time of the sleep.
+//
+// See also https://pkg.go.dev/golang.org/x/time/rate for Go rate package documentation.
+
+#include <golang/libgolang.h>
+#include <golang/context.h>
+#include <golang/sync.h>
+
+#include <math.h>
+
+
+// golang::time::rate::
+namespace golang {
+namespace time {
+namespace rate {
+
+// Limit defines maximum frequency of events, in events per second.
+typedef double Limit;
+
+// inf is the infinite rate limit; it allows all events, even if burst is zero.
+constexpr Limit inf = INFINITY;
+
+// every converts minimum time interval between events to Limit.
+LIBGOLANG_API Limit every(double interval);
+
+
+typedef refptr<struct _Limiter>     Limiter;
+typedef refptr<struct _Reservation> Reservation;
+
+// new_limiter creates new Limiter that allows events up to rate r and permits
+// bursts of at most burst events.
+LIBGOLANG_API Limiter new_limiter(Limit r, int burst);
+
+// Limiter controls how frequently events are allowed to happen.
+//
+// The limiter starts full with burst tokens. Every event consumes one token,
+// and tokens are refilled at rate .limit() up to .burst() .
+//
+// There are three ways to consume tokens:
+//
+//  - allow does not block and reports whether the event may happen now.
+//  - reserve always succeeds(*) and returns Reservation telling how long the
+//    caller must wait before the event may happen.
+//  - wait blocks until the event may happen, or ctx is done.
+//
+// (*) unless n exceeds burst.
+struct _Limiter : object {
+private:
+    sync::Mutex _mu;
+    Limit       _limit;
+    int         _burst;
+    double      _tokens;
+    int64_t     _last;      // time of last ._tokens update, ns
+    int64_t     _lastEvent; // latest time of a rate-limited event (past or future), ns
+
+    // don't new - create only via new_limiter()
+private:
+    _Limiter();
+    ~_Limiter();
+    friend Limiter LIBGOLANG_API new_limiter(Limit r, int burst);
+    friend struct _Reservation;
+public:
+    LIBGOLANG_API void decref();
+
+public:
+    // limit returns the maximum overall event rate.
+    LIBGOLANG_API Limit limit();
+    // burst returns the maximum burst size.
+    LIBGOLANG_API int burst();
+    // tokens returns the number of tokens available now.
+    LIBGOLANG_API double tokens();
+
+    // set_limit sets new limit for the limiter.
+    //
+    // Reservations that were already made are not affected.
+    LIBGOLANG_API void set_limit(Limit r);
+    // set_burst sets new burst size for the limiter.
+    LIBGOLANG_API void set_burst(int burst);
+
+    // allow reports whether n events may happen now.
+    //
+    // If yes, corresponding tokens are consumed.
+    LIBGOLANG_API bool allow(int n=1);
+
+    // reserve returns Reservation that indicates how long the caller must wait
+    // before n events happen.
+    //
+    // The limiter takes this reservation into account when allowing future
+    // events. If n exceeds burst, the reservation is not ok.
+    // Use reservation.cancel() to give the tokens back if the events won't happen.
+    LIBGOLANG_API Reservation reserve(int n=1);
+
+    // wait blocks until n events may happen.
+    //
+    // It returns error if n exceeds burst, ctx is done, or if the wait would
+    // exceed ctx deadline. Only wait that actually has to sleep uses a timer.
+    LIBGOLANG_API error wait(context::Context ctx, int n=1);
+
+private:
+    void        _advance(int64_t now, int64_t *pnow, double *ptokens);
+    Reservation _reserve(int64_t now, int n, double maxWait);
+    double      _tokens_from_duration(int64_t d);
+    double      _duration_from_tokens(double tokens);
+};
+
+// Reservation holds information about events that are permitted by Limiter to
+// happen after a delay.
+//
+// Reservation can be canceled to give reserved tokens back to the limiter.
+struct _Reservation : object {
+private:
+    bool    _ok;
+    Limiter _lim;
+    int     _tokens;
+    int64_t _timeToAct; // ns
+    Limit   _limit;     // limit at reservation time
+
+    // don't new - create only via Limiter.reserve() & co
+private:
+    _Reservation();
+    ~_Reservation();
+    friend struct _Limiter;
+public:
+    LIBGOLANG_API void decref();
+
+public:
+    // ok returns whether the limiter can provide the requested number of
+    // tokens within the maximum wait time.
+    //
+    // If ok is false, delay returns inf, and cancel does nothing.
+    LIBGOLANG_API bool ok();
+
+    // delay returns for how long, in seconds, the reservation holder must wait
+    // before taking the reserved action. Zero delay means to act immediately.
+    LIBGOLANG_API double delay();
+
+    // cancel indicates that the reservation holder will not perform the
+    // reserved action, and reverses its effect on the limiter as much as possible.
+    LIBGOLANG_API void cancel();
+
+private:
+    double _delayFrom(int64_t now);
+    void   _cancelAt(int64_t now);
+};
+
+}}} // golang::time::rate::
+
+#endif  // _NXD_LIBGOLANG_TIME_RATE_H
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""Package rate mirrors Go package golang.org/x/time/rate.
+
+ - `Limiter` controls how frequently events are allowed to happen.
+ - `inf` is infinite rate limit.
+ - `every` converts minimum time interval between events to rate limit.
+
+For example:
+
+    lim = rate.Limiter(10, 1)   # 10 events/s, no bursts
+    ...
+    lim.wait(ctx)               # blocks, without holding the GIL, until the event may happen
+
+Tokens are computed lazily on use, so idle limiters cost nothing, and only a
+wait that really has to sleep arms a timer.
+
+See also https://pkg.go.dev/golang.org/x/time/rate for Go rate package documentation.
+"""
+
+from __future__ import print_function, absolute_import
+
+from golang.time._rate import \
+    PyLimiter       as Limiter,     \
+    PyReservation   as Reservation, \
+    pyinf           as inf,         \
+    pyevery         as every
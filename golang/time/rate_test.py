@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+
+from __future__ import print_function, absolute_import
+
+from golang import context, time
+from golang.time import rate
+from golang.time_test import dt
+from pytest import raises
+
+
+def test_limiter():
+    assert rate.every(0.5) == 2
+    assert rate.every(0)   == rate.inf
+
+    lim = rate.Limiter(1/dt, 3)
+    assert lim.limit() == 1/dt
+    assert lim.burst() == 3
+
+    # starts full with burst tokens
+    assert lim.allow()
+    assert lim.allow()
+    assert lim.allow()
+    assert not lim.allow()
+    assert not lim.allow(4)
+
+    # reserve always succeeds for n <= burst and tells how long to wait
+    r = lim.reserve()
+    assert r.ok()
+    assert 0 < r.delay() <= dt
+    assert lim.tokens() < 0
+    r.cancel()
+    assert 0 <= lim.tokens() < 1
+    r.cancel()  # idempotent
+    assert lim.tokens() < 1
+
+    r = lim.reserve(4)
+    assert not r.ok()
+    assert r.delay() == rate.inf
+
+    with raises(TypeError):
+        rate.Reservation()
+
+    # tokens are refilled at rate r up to burst
+    time.sleep(5*dt)
+    assert 2 < lim.tokens() <= 3
+
+    # set_limit / set_burst
+    lim.set_limit(2/dt)
+    assert lim.limit() == 2/dt
+    lim.set_burst(5)
+    assert lim.burst() == 5
+
+    # inf allows everything
+    lim = rate.Limiter(rate.inf, 0)
+    for i in range(100):
+        assert lim.allow()
+
+    # zero limit allows only the burst
+    lim = rate.Limiter(0, 2)
+    assert lim.allow()
+    assert lim.allow()
+    assert not lim.allow()
+
+
+def test_limiter_wait():
+    bg = context.background()
+
+    lim = rate.Limiter(1/dt, 1)
+    t0 = time.now()
+    lim.wait(bg)        # token available - does not sleep
+    lim.wait(bg)        # sleeps ~dt
+    lim.wait(bg)        # sleeps ~dt
+    t1 = time.now()
+    assert t1 - t0 >= 1.5*dt
+
+    # n > burst
+    with raises(Exception) as exc:
+        lim.wait(bg, 2)
+    assert str(exc.value) == "rate: wait(n=2) exceeds limiter's burst 1"
+
+    # ctx canceled while sleeping -> tokens are given back
+    lim = rate.Limiter(1/(10*dt), 1)
+    assert lim.allow()
+    ctx, cancel = context.with_cancel(bg)
+    time.after_func(dt, cancel)
+    with raises(Exception) as exc:
+        lim.wait(ctx)
+    assert exc.value == context.canceled
+    assert lim.tokens() < 0.5
+    r = lim.reserve()
+    assert r.delay() < 10*dt
+    r.cancel()
+
+    # already canceled ctx
+    with raises(Exception) as exc:
+        lim.wait(ctx)
+    assert exc.value == context.canceled
+
+    # wait that would exceed ctx deadline fails immediately without consuming tokens
+    ctx, cancel = context.with_timeout(bg, 2*dt)
+    t0 = time.now()
+    with raises(Exception) as exc:
+        lim.wait(ctx)
+    assert str(exc.value) == "rate: wait(n=1) would exceed context deadline"
+    assert time.now() - t0 < dt
+    cancel()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=2
+# cython: legacy_implicit_noexcept=True
+# distutils: language=c++
+#
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""_atomic.pyx implements atomic.py - see atomic.py for package overview."""
+
+from __future__ import print_function, absolute_import
+
+from golang cimport topyexc
+
+
+# cache_test.cpp
+cdef extern from * nogil:
+    """
+    extern void _test_x_cache_cpp();
+    """
+    void _test_x_cache_cpp()                    except +topyexc
+def test_x_cache_cpp():
+    with nogil:
+        _test_x_cache_cpp()
@@ -0,0 +1,281 @@
+#ifndef _NXD_LIBGOLANG_X_CACHE_H
+#define _NXD_LIBGOLANG_X_CACHE_H
+
+// Copyright (C) 2026  Nexedi SA and Contributors.
+//                     Kirill Smelkov <kirr@nexedi.com>
+//
+// This program is free software: you can Use, Study, Modify and Redistribute
+// it under the terms of the GNU General Public License version 3, or (at your
+// option) any later version, as published by the Free Software Foundation.
+//
+// You can also Link and Combine this program with other software covered by
+// the terms of any of the Free Software licenses or any of the Open Source
+// Initiative approved licenses and Convey the resulting work. Corresponding
+// source of such a combination shall include the source code for all other
+// software used.
+//
+// This program is distributed WITHOUT ANY WARRANTY; without even the implied
+// warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+//
+// See COPYING file for full licensing terms.
+// See https://www.nexedi.com/licensing for rationale and options.
+
+// Package cache provides bounded LRU cache with per-entry TTL.
+//
+//  - `Cache` is LRU cache of bounded capacity whose entries expire after TTL.
+//  - `Stats` represents cache hit/miss/eviction counters.
+//
+// Expiry is lazy: an expired entry is dropped when it is accessed, or when it
+// reaches LRU tail and is evicted to make room for a new entry. There is no
+// background goroutine that periodically scans the cache, and the memory used
+// by entries is always bounded by the cache capacity.
+//
+// Cache.get_or_load coalesces concurrent loads of the same key via
+// sync::SingleFlight.
+
+#include <golang/libgolang.h>
+#include <golang/sync.h>
+#include <golang/time.h>
+
+#include <math.h>
+#include <tuple>
+#include <unordered_map>
+
+
+// golang::x::cache::
+namespace golang {
+namespace x {
+namespace cache {
+
+// Stats represents cache statistics.
+struct Stats {
+    uint64_t hits;          // lookups that found live entry
+    uint64_t misses;        // lookups that did not find live entry
+    uint64_t evictions;     // live entries dropped to make room for new ones
+    uint64_t expirations;   // entries dropped because their TTL expired
+    uint64_t loads;         // loads performed by get_or_load
+};
+
+// Cache is LRU cache of bounded capacity whose entries expire after TTL.
+//
+// When the cache is full, storing new entry evicts the least recently used
+// one. Every entry expires after TTL given to .set() or, by default, the TTL
+// the cache was created with. TTL=INFINITY means no expiry.
+//
+// For example:
+//
+//   x::cache::Cache<string, Value> c(1000, 60*time::second);
+//   ...
+//   Value v; error err;
+//   tie(v, err) = c.get_or_load(key, [&]() -> tuple<Value, error> {
+//       return loadExpensive(key);
+//   });
+//
+// Cache is safe for concurrent use by multiple goroutines.
+template<typename K, typename V, typename Hash = std::hash<K>>
+class Cache {
+    // _Entry represents one cache entry linked into LRU list.
+    struct _Entry {
+        K       key;
+        V       val;
+        double  expires;    // time when the entry expires
+        _Entry  *prev;      // ↑ more recently used
+        _Entry  *next;      // ↓ less recently used
+    };
+
+    sync::Mutex                             _mu;
+    std::unordered_map<K, _Entry*, Hash>    _m;
+    _Entry                                  _lru;   // sentinel: .next=MRU, .prev=LRU
+    size_t                                  _capacity;
+    double                                  _ttl;
+    Stats                                   _stats;
+    sync::SingleFlight<K, V>                _sf;    // for get_or_load
+
+public:
+    // Cache creates new cache that holds up to capacity entries, each
+    // expiring after ttl seconds by default.
+    Cache(size_t capacity, double ttl = INFINITY) {
+        if (capacity == 0)
+            panic("cache: capacity must be > 0");
+        _capacity = capacity;
+        _ttl      = ttl;
+        _stats    = Stats{};
+        _lru.prev = _lru.next = &_lru;
+    }
+
+    ~Cache() {
+        purge();
+    }
+
+    // get returns value for key, and whether it was present and not expired.
+    //
+    // Accessing an entry makes it the most recently used one.
+    std::tuple<V, bool> get(const K &key) { // -> (value, ok)
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+        _Entry *e = _lookup(key, time::now());
+        if (e == nil)
+            return std::make_tuple(V(), false);
+        return std::make_tuple(e->val, true);
+    }
+
+    // set stores value for key with default TTL of the cache.
+    void set(const K &key, const V &value) {
+        set(key, value, _ttl);
+    }
+
+    // set stores value for key, so that it expires after ttl seconds.
+    void set(const K &key, const V &value, double ttl) {
+        double now = time::now();
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+
+        auto it = _m.find(key);
+        if (it != _m.end()) {
+            _Entry *e = it->second;
+            e->val     = value;
+            e->expires = now + ttl;
+            _unlink(e);
+            _pushFront(e);
+            return;
+        }
+
+        while (_m.size() >= _capacity)
+            _evict(_lru.prev, now);
+
+        _Entry *e = new _Entry{key, value, now + ttl, nil, nil};
+        _m[key] = e;
+        _pushFront(e);
+    }
+
+    // delete_ deletes key from the cache.
+    //
+    // It returns whether key was present.
+    bool delete_(const K &key) {
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+        auto it = _m.find(key);
+        if (it == _m.end())
+            return false;
+        _drop(it->second);
+        return true;
+    }
+
+    // get_or_load returns value for key, loading it with load on cache miss.
+    //
+    // Concurrent get_or_load calls for the same key share one load. The
+    // loaded value is stored into the cache with default TTL. If load returns
+    // error, nothing is stored and the error is returned to all callers.
+    std::tuple<V, error> get_or_load(const K &key, func<std::tuple<V, error>()> load) {
+        V v; bool ok;
+        std::tie(v, ok) = get(key);
+        if (ok)
+            return std::make_tuple(v, error(nil));
+
+        error err; bool _;
+        std::tie(v, err, _) = _sf.do_(key, [&]() -> std::tuple<V, error> {
+            V v; error err;
+            std::tie(v, err) = load();
+            _mu.lock();
+            _stats.loads++;
+            _mu.unlock();
+            if (err == nil)
+                set(key, v);
+            return std::make_tuple(v, err);
+        });
+        return std::make_tuple(v, err);
+    }
+
+    // len returns the number of entries in the cache.
+    //
+    // Expired entries that were not yet dropped are included.
+    size_t len() {
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+        return _m.size();
+    }
+
+    // purge removes all entries from the cache.
+    void purge() {
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+        while (_lru.next != &_lru)
+            _drop(_lru.next);
+    }
+
+    // stats returns current cache statistics.
+    Stats stats() {
+        _mu.lock();
+        defer([&]() {
+            _mu.unlock();
+        });
+        return _stats;
+    }
+
+private:
+    // _lookup returns live entry for key, or nil, and updates the statistics.
+    // must be called under _mu.
+    _Entry *_lookup(const K &key, double now) {
+        auto it = _m.find(key);
+        if (it == _m.end()) {
+            _stats.misses++;
+            return nil;
+        }
+        _Entry *e = it->second;
+        if (now >= e->expires) {
+            _stats.expirations++;
+            _stats.misses++;
+            _drop(e);
+            return nil;
+        }
+        _stats.hits++;
+        _unlink(e);
+        _pushFront(e);
+        return e;
+    }
+
+    // _evict drops e to make room for a new entry.
+    void _evict(_Entry *e, double now) {
+        if (now >= e->expires)
+            _stats.expirations++;
+        else
+            _stats.evictions++;
+        _drop(e);
+    }
+
+    void _drop(_Entry *e) {
+        _unlink(e);
+        _m.erase(e->key);
+        delete e;
+    }
+
+    void _unlink(_Entry *e) {
+        e->prev->next = e->next;
+        e->next->prev = e->prev;
+        e->prev = e->next = nil;
+    }
+
+    void _pushFront(_Entry *e) {
+        e->prev = &_lru;
+        e->next = _lru.next;
+        _lru.next->prev = e;
+        _lru.next = e;
+    }
+
+    Cache(const Cache&);    // don't copy
+    Cache(Cache&&);         // don't move
+};
+
+}}} // golang::x::cache::
+
+#endif  // _NXD_LIBGOLANG_X_CACHE_H
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+"""Package cache provides bounded LRU cache with per-entry TTL.
+
+ - `Cache` is LRU cache of bounded capacity whose entries expire after TTL.
+ - `Stats` represents cache hit/miss/eviction counters.
+
+Expiry is lazy: an expired entry is dropped when it is accessed, or when it
+reaches LRU tail and is evicted to make room for a new entry. There is no
+background goroutine that periodically scans the cache, and the memory used by
+entries is always bounded by the cache capacity.
+
+Cache.get_or_load coalesces concurrent loads of the same key via
+sync.SingleFlight.
+
+C++ counterpart is provided in cache.h .
+"""
+
+from __future__ import print_function, absolute_import
+
+from golang import panic, sync, time
+from collections import OrderedDict, namedtuple
+
+
+# Stats represents cache statistics.
+#
+#   hits          lookups that found live entry
+#   misses        lookups that did not find live entry
+#   evictions     live entries dropped to make room for new ones
+#   expirations   entries dropped because their TTL expired
+#   loads         loads performed by get_or_load
+Stats = namedtuple('Stats', 'hits misses evictions expirations loads')
+
+_default = object()
+_missing = object()
+
+
+# Cache is LRU cache of bounded capacity whose entries expire after TTL.
+#
+# When the cache is full, storing new entry evicts the least recently used
+# one. Every entry expires after ttl given to .set() or, by default, the ttl
+# the cache was created with. ttl=None means no expiry.
+#
+# For example:
+#
+#   c = cache.Cache(1000, ttl=60*time.second)
+#   ...
+#   v = c.get_or_load(key, lambda: load_expensive(key))
+#
+# Cache is safe for concurrent use by multiple goroutines.
+class Cache(object):
+    def __init__(c, capacity, ttl=None):
+        if capacity <= 0:
+            panic("cache: capacity must be > 0")
+        c._capacity = capacity
+        c._ttl      = ttl
+        c._mu       = sync.Mutex()
+        c._m        = OrderedDict() # key -> [value, expires]; last = most recently used
+        c._sf       = sync.SingleFlight()
+        c._nhit     = 0
+        c._nmiss    = 0
+        c._nevict   = 0
+        c._nexpire  = 0
+        c._nload    = 0
+
+    # get returns value for key, or default if key is not present or expired.
+    #
+    # Accessing an entry makes it the most recently used one.
+    def get(c, key, default=None):
+        now = time.now()
+        with c._mu:
+            e = c._lookup(key, now)
+        if e is None:
+            return default
+        return e[0]
+
+    # set stores value for key, so that it expires after ttl seconds.
+    #
+    # If ttl is not given, the default ttl of the cache is used.
+    def set(c, key, value, ttl=_default):
+        if ttl is _default:
+            ttl = c._ttl
+        now = time.now()
+        expires = (now + ttl) if ttl is not None else None
+        with c._mu:
+            e = c._m.get(key)
+            if e is not None:
+                e[0] = value
+                e[1] = expires
+                _touch(c._m, key)
+                return
+
+            while len(c._m) >= c._capacity:
+                _, lru = c._m.popitem(last=False)
+                if _expired(lru, now):
+                    c._nexpire += 1
+                else:
+                    c._nevict  += 1
+
+            c._m[key] = [value, expires]
+
+    # delete deletes key from the cache.
+    #
+    # It returns whether key was present.
+    def delete(c, key): # -> bool
+        with c._mu:
+            return c._m.pop(key, None) is not None
+
+    # get_or_load returns value for key, loading it with load() on cache miss.
+    #
+    # Concurrent get_or_load calls for the same key share one load. The loaded
+    # value is stored into the cache with default ttl. If load raises, nothing
+    # is stored and the exception is raised to all callers.
+    def get_or_load(c, key, load):
+        v = c.get(key, _missing)
+        if v is not _missing:
+            return v
+
+        def _():
+            try:
+                v = load()
+            finally:
+                with c._mu:
+                    c._nload += 1
+            c.set(key, v)
+            return v
+        v, _ = c._sf.do(key, _)
+        return v
+
+    # __len__ returns the number of entries in the cache.
+    #
+    # Expired entries that were not yet dropped are included.
+    def __len__(c):
+        with c._mu:
+            return len(c._m)
+
+    # purge removes all entries from the cache.
+    def purge(c):
+        with c._mu:
+            c._m.clear()
+
+    # stats returns current cache statistics.
+    def stats(c): # -> Stats
+        with c._mu:
+            return Stats(c._nhit, c._nmiss, c._nevict, c._nexpire, c._nload)
+
+    # _lookup returns live entry for key, or None, and updates the statistics.
+    # must be called under _mu.
+    def _lookup(c, key, now):
+        e = c._m.get(key)
+        if e is None:
+            c._nmiss += 1
+            return None
+        if _expired(e, now):
+            c._nexpire += 1
+            c._nmiss   += 1
+            del c._m[key]
+            return None
+        c._nhit += 1
+        _touch(c._m, key)
+        return e
+
+
+def _expired(e, now):
+    return e[1] is not None and now >= e[1]
+
+# _touch marks key as the most recently used one in ordered dict m.
+def _touch(m, key):
+    move_to_end = getattr(m, 'move_to_end', None)
+    if move_to_end is not None:
+        move_to_end(key)
+    else: # py2
+        m[key] = m.pop(key)
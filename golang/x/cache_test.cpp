@@ -0,0 +1,154 @@
+// Copyright (C) 2026  Nexedi SA and Contributors.
+//                     Kirill Smelkov <kirr@nexedi.com>
+//
+// This program is free software: you can Use, Study, Modify and Redistribute
+// it under the terms of the GNU General Public License version 3, or (at your
+// option) any later version, as published by the Free Software Foundation.
+//
+// You can also Link and Combine this program with other software covered by
+// the terms of any of the Free Software licenses or any of the Open Source
+// Initiative approved licenses and Convey the resulting work. Corresponding
+// source of such a combination shall include the source code for all other
+// software used.
+//
+// This program is distributed WITHOUT ANY WARRANTY; without even the implied
+// warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+//
+// See COPYING file for full licensing terms.
+// See https://www.nexedi.com/licensing for rationale and options.
+
+#include "golang/x/cache.h"
+#include "golang/errors.h"
+#include "golang/time.h"
+#include "golang/_testing.h"
+
+#include <tuple>
+using namespace golang;
+using std::make_tuple;
+using std::tie;
+using std::tuple;
+
+namespace cache = golang::x::cache;
+
+// verify that x::cache::Cache works.
+void _test_x_cache_cpp() {
+    cache::Cache<string, int> c(3);
+    int v; bool ok;
+
+    tie(v, ok) = c.get("a");
+    ASSERT(v == 0 && !ok);
+
+    c.set("a", 1);
+    c.set("b", 2);
+    c.set("c", 3);
+    ASSERT(c.len() == 3);
+    tie(v, ok) = c.get("a");    // a becomes MRU
+    ASSERT(v == 1 && ok);
+
+    // LRU entry is evicted
+    c.set("d", 4);
+    ASSERT(c.len() == 3);
+    tie(v, ok) = c.get("b");
+    ASSERT(!ok);
+    tie(v, ok) = c.get("a");
+    ASSERT(v == 1 && ok);
+
+    // set of existing key updates it in place
+    c.set("c", 33);
+    ASSERT(c.len() == 3);
+    tie(v, ok) = c.get("c");
+    ASSERT(v == 33 && ok);
+
+    ASSERT(c.delete_("c"));
+    ASSERT(!c.delete_("c"));
+    ASSERT(c.len() == 2);
+
+    cache::Stats st = c.stats();
+    ASSERT(st.hits == 3);
+    ASSERT(st.misses == 2);
+    ASSERT(st.evictions == 1);
+    ASSERT(st.expirations == 0);
+
+    c.purge();
+    ASSERT(c.len() == 0);
+
+    // per-entry TTL
+    const double dt = 10*time::millisecond;
+    c.set("x", 1, 2*dt);
+    c.set("y", 2);
+    time::sleep(3*dt);
+    tie(v, ok) = c.get("x");
+    ASSERT(!ok);
+    tie(v, ok) = c.get("y");
+    ASSERT(v == 2 && ok);
+    ASSERT(c.len() == 1);
+    ASSERT(c.stats().expirations == 1);
+
+    // expired entries are dropped first, as they reach LRU tail
+    cache::Cache<string, int> c2(2, 2*dt);
+    c2.set("a", 1);
+    c2.set("b", 2, INFINITY);
+    time::sleep(3*dt);
+    c2.set("c", 3);
+    ASSERT(c2.stats().expirations == 1);
+    ASSERT(c2.stats().evictions   == 0);
+    tie(v, ok) = c2.get("b");
+    ASSERT(v == 2 && ok);
+
+    // get_or_load
+    auto c3 = _testing::newshared<cache::Cache<string, int>>(10);
+    struct LoadState {
+        int           nload;
+        chan<structZ> loading;
+        chan<structZ> release;
+    };
+    auto ls = _testing::newshared<LoadState>();
+    ls->nload = 0;
+    error err;
+    tie(v, err) = c3->get_or_load("a", [&]() -> tuple<int, error> {
+        ls->nload++;
+        return make_tuple(1, error(nil));
+    });
+    ASSERT(v == 1 && err == nil && ls->nload == 1);
+    tie(v, err) = c3->get_or_load("a", [&]() -> tuple<int, error> {
+        ls->nload++;
+        return make_tuple(2, error(nil));
+    });
+    ASSERT(v == 1 && err == nil && ls->nload == 1);
+
+    // load error is not cached
+    error eload = errors::New("load failed");
+    tie(v, err) = c3->get_or_load("b", [&]() -> tuple<int, error> {
+        ls->nload++;
+        return make_tuple(0, eload);
+    });
+    ASSERT(err == eload && ls->nload == 2);
+    ASSERT(c3->len() == 1);
+    ASSERT(c3->stats().loads == 2);
+
+    // concurrent get_or_load of the same key share one load
+    ls->loading = makechan<structZ>();
+    ls->release = makechan<structZ>();
+    const int N = 4;
+    chan<int> done = makechan<int>(N);
+    for (int i = 0; i < N; i++) {
+        go([c3, ls, done]() {
+            int v; error err;
+            tie(v, err) = c3->get_or_load("c", [ls]() -> tuple<int, error> {
+                ls->nload++;
+                ls->loading.close();
+                ls->release.recv();
+                return make_tuple(3, error(nil));
+            });
+            ASSERT(err == nil);
+            done.send(v);
+        });
+        if (i == 0)
+            ls->loading.recv();
+    }
+    time::sleep(dt);    // let other goroutines join the load
+    ls->release.close();
+    for (int i = 0; i < N; i++)
+        ASSERT(done.recv() == 3);
+    ASSERT(ls->nload == 3);
+}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2026  Nexedi SA and Contributors.
+#                     Kirill Smelkov <kirr@nexedi.com>
+#
+# This program is free software: you can Use, Study, Modify and Redistribute
+# it under the terms of the GNU General Public License version 3, or (at your
+# option) any later version, as published by the Free Software Foundation.
+#
+# You can also Link and Combine this program with other software covered by
+# the terms of any of the Free Software licenses or any of the Open Source
+# Initiative approved licenses and Convey the resulting work. Corresponding
+# source of such a combination shall include the source code for all other
+# software used.
+#
+# This program is distributed WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See COPYING file for full licensing terms.
+# See https://www.nexedi.com/licensing for rationale and options.
+
+from __future__ import print_function, absolute_import
+
+from golang import go, chan, time
+from golang.x import cache
+from golang.golang_test import import_pyx_tests, panics
+from golang.time_test import dt
+from pytest import raises
+
+import_pyx_tests("golang.x._cache_test")
+
+
+def test_cache():
+    with panics("cache: capacity must be > 0"):
+        cache.Cache(0)
+
+    c = cache.Cache(3)
+    assert c.get("a") is None
+    assert c.get("a", 0) == 0
+
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("c", 3)
+    assert len(c) == 3
+    assert c.get("a") == 1      # a becomes MRU
+
+    # LRU entry is evicted
+    c.set("d", 4)
+    assert len(c) == 3
+    assert c.get("b") is None
+    assert c.get("a") == 1
+
+    # set of existing key updates it in place
+    c.set("c", 33)
+    assert len(c) == 3
+    assert c.get("c") == 33
+
+    assert c.delete("c") == True
+    assert c.delete("c") == False
+    assert len(c) == 2
+
+    assert c.stats() == cache.Stats(hits=3, misses=3, evictions=1, expirations=0, loads=0)
+
+    c.purge()
+    assert len(c) == 0
+
+
+def test_cache_ttl():
+    # per-entry ttl
+    c = cache.Cache(10)
+    c.set("x", 1, ttl=2*dt)
+    c.set("y", 2)
+    time.sleep(3*dt)
+    assert c.get("x") is None
+    assert c.get("y") == 2
+    assert len(c) == 1
+    assert c.stats().expirations == 1
+
+    # default ttl; expired entries are dropped as they reach LRU tail
+    c = cache.Cache(2, ttl=2*dt)
+    c.set("a", 1)
+    c.set("b", 2, ttl=None)
+    time.sleep(3*dt)
+    c.set("c", 3)
+    assert c.stats().expirations == 1
+    assert c.stats().evictions   == 0
+    assert c.get("b") == 2
+
+
+def test_cache_get_or_load():
+    c = cache.Cache(10)
+    nload = [0]
+    def load(v):
+        def _():
+            nload[0] += 1
+            return v
+        return _
+
+    assert c.get_or_load("a", load(1)) == 1
+    assert c.get_or_load("a", load(2)) == 1
+    assert nload == [1]
+
+    # load error is not cached
+    def bad():
+        nload[0] += 1
+        raise RuntimeError("load failed")
+    with raises(RuntimeError, match="load failed"):
+        c.get_or_load("b", bad)
+    assert nload == [2]
+    assert len(c) == 1
+    assert c.stats().loads == 2
+
+    # concurrent get_or_load of the same key share one load
+    loading = chan()
+    release = chan()
+    def slow():
+        nload[0] += 1
+        loading.close()
+        release.recv()
+        return 3
+    N = 4
+    done = chan(N)
+    for i in range(N):
+        def _():
+            done.send(c.get_or_load("c", slow))
+        go(_)
+        if i == 0:
+            loading.recv()
+    time.sleep(dt)  # let other goroutines join the load
+    release.close()
+    for i in range(N):
+        assert done.recv() == 3
+    assert nload == [3]
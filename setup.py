@@ -236,7 +236,8 @@ setup(
                          'golang/os/signal.cpp',
                          'golang/strings.cpp',
                          'golang/sync.cpp',
-                         'golang/time.cpp'],
+                         'golang/time.cpp',
+                         'golang/time/rate.cpp'],
                         depends = [
                             'golang/libgolang.h',
                             'golang/runtime.h',
@@ -254,6 +255,7 @@ setup(
                             'golang/strings.h',
                             'golang/sync.h',
                             'golang/time.h',
+                            'golang/time/rate.h',
                             '3rdparty/ratas/src/timer-wheel.h'],
                         include_dirs    = [
                             '3rdparty/include',
@@ -274,7 +276,8 @@ setup(
                         ['golang/_golang.pyx'],
                         depends = [
                             'golang/_golang_str.pyx',
-                            'golang/_golang_str_pickle.pyx']),
+                            'golang/_golang_str_pickle.pyx'],
+                        dsos = ['golang.runtime.libpyxruntime']),
 
                     Ext('golang.runtime._runtime_thread',
                         ['golang/runtime/_runtime_thread.pyx']),
@@ -289,7 +292,8 @@ setup(
                     Ext('golang._golang_test',
                         ['golang/_golang_test.pyx',
                          'golang/runtime/libgolang_test_c.c',
-                         'golang/runtime/libgolang_test.cpp']),
+                         'golang/runtime/libgolang_test.cpp'],
+                        dsos = ['golang.runtime.libpyxruntime']),
 
                     Ext('golang.pyx._runtime_test',
                         ['golang/pyx/_runtime_test.pyx'],
@@ -344,13 +348,23 @@ setup(
                         ['golang/_sync_test.pyx',
                          'golang/sync_test.cpp']),
 
+                    Ext('golang.sync._atomic',
+                        ['golang/sync/_atomic.pyx']),
+
                     Ext('golang._time',
                         ['golang/_time.pyx'],
                         dsos = ['golang.runtime.libpyxruntime']),
+
+                    Ext('golang.time._rate',
+                        ['golang/time/_rate.pyx']),
+
+                    Ext('golang.x._cache_test',
+                        ['golang/x/_cache_test.pyx',
+                         'golang/x/cache_test.cpp']),
                   ],
     include_package_data = True,
 
-    install_requires = ['gevent', 'six', 'decorator', 'Importing;python_version<="2.7"',
+    install_requires = ['gevent', 'six', 'decorator;python_version<="2.7"', 'Importing;python_version<="2.7"',
                         # only runtime part: for dylink_prepare_dso
                         # also need to pin setuptools ≥ 60.2 because else wheel configures logging
                         # to go to stdout and so dylink_prepare_dso garbles program output